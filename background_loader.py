@@ -0,0 +1,93 @@
+"""
+Background Loader for ClipIQ
+
+Builds expensive objects (LangChain imports, LLM clients, the processor)
+on a background thread so the hotkey listener can start immediately.
+Callers that need the object before it is ready simply wait for it.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class BackgroundLoader:
+    """Runs a factory once on a background thread and hands out its result."""
+
+    def __init__(self, factory: Callable[[], Any], name: str = "clipiq-init"):
+        """
+        Initialize the loader.
+
+        Args:
+            factory: Zero-argument callable that builds the object
+            name: Name of the background thread
+        """
+        self.factory = factory
+        self.name = name
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> "BackgroundLoader":
+        """
+        Start building in the background. Calling start() again is a no-op.
+
+        Returns:
+            The loader itself, for chaining
+        """
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        """Run the factory and record its result or error."""
+        try:
+            self._result = self.factory()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.finished_at = time.perf_counter()
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        """True once the factory has finished (successfully or not)."""
+        return self._done.is_set()
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """Seconds the factory took, or None if it has not finished."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Return the built object, waiting for it if necessary.
+
+        Starts the loader if it has not been started yet.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits forever)
+
+        Returns:
+            The factory's result
+
+        Raises:
+            TimeoutError: If the object is not ready within timeout
+            Exception: Whatever the factory raised
+        """
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} did not finish within {timeout} seconds")
+        if self._error is not None:
+            raise self._error
+        return self._result
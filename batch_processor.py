@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Batch Processor for ClipIQ
+
+Runs EnhancedProcessor over files, directories and JSONL corpora without
+the hotkey loop. Records are read lazily and only a bounded window of
+requests is in flight, so memory stays flat regardless of corpus size.
+Results are written as JSONL in input order; JSONL lines that are not a
+valid record are reported as errors in place and the run continues.
+
+Usage:
+    python clipiq.py batch docs/ tickets.jsonl -o results.jsonl --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, TextIO
+
+
+class BatchRecord:
+    """A single document to process."""
+
+    def __init__(self, record_id: str, text: str, command: Optional[str] = None,
+                 error: Optional[str] = None):
+        """
+        Initialize the record.
+
+        Args:
+            record_id: Identifier written back with the result
+            text: Text to process (may contain a <#command>)
+            command: Optional command applied to the whole text
+            error: Why the input could not be read (the record is not processed)
+        """
+        self.record_id = record_id
+        self.text = text
+        self.command = command
+        self.error = error
+
+
+def read_jsonl(path: str, text_field: str = "text") -> Iterator[BatchRecord]:
+    """
+    Read records from a JSONL file, one per line.
+
+    Each line is an object with the text under text_field and optional
+    'id' and 'command' fields. Blank lines are skipped. Lines that are not
+    such an object yield a record with error set instead of stopping the run;
+    a file that cannot be opened or is not UTF-8 yields one error record
+    (and the rest of the file is skipped).
+
+    Args:
+        path: JSONL file path
+        text_field: Name of the field holding the text
+
+    Yields:
+        BatchRecord for every line
+    """
+    try:
+        handle = open(path, encoding="utf-8")
+    except OSError as e:
+        yield BatchRecord(path, "", error=f"{path}: could not be opened ({e})")
+        return
+    with handle:
+        try:
+            yield from _parse_jsonl_lines(path, handle, text_field)
+        except UnicodeDecodeError as e:
+            yield BatchRecord(path, "", error=f"{path}: not UTF-8 text ({e}); rest of the file skipped")
+
+
+def _parse_jsonl_lines(path: str, handle: TextIO, text_field: str) -> Iterator[BatchRecord]:
+    """Yield a record (or error record) for every non-blank line of an open JSONL file."""
+    for line_number, line in enumerate(handle, 1):
+        if not line.strip():
+            continue
+        record_id = f"{path}:{line_number}"
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield BatchRecord(record_id, "", error=f"{record_id}: invalid JSON ({e})")
+            continue
+        if not isinstance(data, dict):
+            yield BatchRecord(record_id, "", error=f"{record_id}: expected a JSON object")
+            continue
+        record_id = str(data.get("id", record_id))
+        command = data.get("command")
+        if text_field not in data:
+            error = f"{path}:{line_number}: missing '{text_field}' field"
+        elif not isinstance(data[text_field], str):
+            error = f"{path}:{line_number}: '{text_field}' must be a string"
+        elif command is not None and not isinstance(command, str):
+            error = f"{path}:{line_number}: 'command' must be a string"
+        else:
+            yield BatchRecord(record_id, data[text_field], command)
+            continue
+        yield BatchRecord(record_id, "", error=error)
+
+
+def iter_records(paths: Iterable[str], text_field: str = "text") -> Iterator[BatchRecord]:
+    """
+    Lazily yield records from files, directories and JSONL files.
+
+    Directories are walked recursively in sorted order. Files ending in
+    .jsonl are read line by line; any other file is one record. Files that
+    cannot be read as UTF-8 text yield a record with error set.
+
+    Args:
+        paths: Input paths
+        text_field: JSONL field holding the text
+
+    Yields:
+        BatchRecord in input order
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, files in os.walk(path):
+                directories.sort()
+                for name in sorted(files):
+                    yield from iter_records([os.path.join(root, name)], text_field)
+        elif path.endswith(".jsonl"):
+            yield from read_jsonl(path, text_field)
+        else:
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    text = handle.read()
+            except (OSError, UnicodeDecodeError) as e:
+                # A binary or unreadable file fails its own record, not the run
+                yield BatchRecord(path, "", error=f"{path}: could not be read as UTF-8 text ({e})")
+                continue
+            yield BatchRecord(path, text)
+
+
+class BatchSummary:
+    """Throughput and latency statistics with bounded memory."""
+
+    def __init__(self, sample_size: int = 10000):
+        """
+        Initialize the summary.
+
+        Args:
+            sample_size: Maximum number of latencies kept for percentiles
+        """
+        self.sample_size = sample_size
+        self.records = 0
+        self.input_chars = 0
+        self.output_chars = 0
+        self.collapsed = 0
+        self.errors = 0
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self._latencies: list[float] = []
+        self._random = random.Random(0)
+
+    def add(self, latency: float, input_chars: int, output_chars: int):
+        """Record one finished request (reservoir-sampling its latency)."""
+        self.records += 1
+        self.input_chars += input_chars
+        self.output_chars += output_chars
+        if len(self._latencies) < self.sample_size:
+            self._latencies.append(latency)
+        else:
+            index = self._random.randrange(self.records)
+            if index < self.sample_size:
+                self._latencies[index] = latency
+
+    def finish(self):
+        """Mark the end of the run."""
+        self.finished_at = time.perf_counter()
+
+    def percentile(self, fraction: float) -> float:
+        """Return a latency percentile in seconds (0.0 if empty)."""
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self) -> dict:
+        """Summarize the run."""
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            "records": self.records,
+            "elapsed_s": elapsed,
+            "records_per_s": self.records / elapsed if elapsed > 0 else 0.0,
+            "input_chars": self.input_chars,
+            "output_chars": self.output_chars,
+            "collapsed": self.collapsed,
+            "errors": self.errors,
+            "latency_p50_ms": self.percentile(0.50) * 1000,
+            "latency_p95_ms": self.percentile(0.95) * 1000,
+            "latency_max_ms": max(self._latencies, default=0.0) * 1000,
+        }
+
+
+def _process_record(processor, record: BatchRecord, use_cache: bool) -> tuple[str, float]:
+    """Process one record, returning (output, latency_seconds)."""
+    start = time.perf_counter()
+    if record.command:
+        output = processor.process_with_specific_command(record.text, record.command, use_cache=use_cache)
+    else:
+        output = processor.process_clipboard_content(record.text, use_cache=use_cache)
+    return output, time.perf_counter() - start
+
+
+def run_batch(processor, records: Iterable[BatchRecord], output: TextIO,
+              concurrency: int = 4, use_cache: bool = True,
+              include_input: bool = False) -> BatchSummary:
+    """
+    Process records concurrently and write results to output in input order.
+
+    At most 2 * concurrency records are read ahead of the output, so memory
+    use does not depend on corpus size. A record identical (same text and
+    command) to one still in that window reuses its request instead of
+    sending another. Records with an error are written as
+    {"id": ..., "error": ...} without being processed.
+
+    Args:
+        processor: EnhancedProcessor (or compatible) instance
+        records: Iterable of BatchRecord
+        output: Text stream receiving one JSON object per line
+        concurrency: Maximum concurrent requests
+        use_cache: False to bypass the response cache
+        include_input: Also write the input text with every result
+
+    Returns:
+        BatchSummary for the run
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    summary = BatchSummary()
+    window: deque[tuple[BatchRecord, Future]] = deque()
+    # (text, command) -> [future, records in the window using it]
+    in_window: dict[tuple[str, Optional[str]], list] = {}
+
+    def write_oldest():
+        record, future = window.popleft()
+        if future is None:
+            output.write(json.dumps({"id": record.record_id, "error": record.error}, ensure_ascii=False) + "\n")
+            summary.errors += 1
+            return
+        key = (record.text, record.command)
+        in_window[key][1] -= 1
+        if not in_window[key][1]:
+            del in_window[key]
+        processed, latency = future.result()
+        result = {"id": record.record_id, "output": processed, "latency_ms": round(latency * 1000, 2)}
+        if record.command:
+            result["command"] = record.command
+        if include_input:
+            result["input"] = record.text
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        summary.add(latency, len(record.text), len(processed))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="clipiq-batch") as executor:
+        for record in records:
+            if len(window) >= concurrency * 2:
+                write_oldest()
+            if record.error:
+                window.append((record, None))
+                continue
+            key = (record.text, record.command)
+            if key in in_window:
+                summary.collapsed += 1
+            else:
+                in_window[key] = [executor.submit(_process_record, processor, record, use_cache), 0]
+            in_window[key][1] += 1
+            window.append((record, in_window[key][0]))
+        while window:
+            write_oldest()
+
+    output.flush()
+    summary.finish()
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser for the batch subcommand."""
+    parser = argparse.ArgumentParser(
+        prog="clipiq batch",
+        description="Process files, directories or JSONL corpora with ClipIQ"
+    )
+    parser.add_argument("inputs", nargs="+", help="files, directories or .jsonl files")
+    parser.add_argument("-o", "--output", default="-", help="output JSONL path (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="concurrent requests (default: 4)")
+    parser.add_argument("--command", help="command applied to every record without its own command")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the text (default: text)")
+    parser.add_argument("--include-input", action="store_true", help="write input text with each result")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    parser.add_argument("--metrics", action="store_true", help="print per-stage latency percentiles")
+    parser.add_argument("--metrics-file", help="write stage metrics (Prometheus text, or JSON for .json)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report prompt tokens and LLM calls per record without calling the LLM")
+    parser.add_argument("--model", help="model for --dry-run token counts (default: the configured LLM's)")
+    parser.add_argument("--max-prompt-tokens", type=int, help="cap on prompt tokens per LLM call (enables the budget even if CLIPIQ_TOKEN_BUDGET=0)")
+    parser.add_argument("--rpm", type=float, help="requests per minute allowed by the provider quota")
+    parser.add_argument("--tpm", type=float, help="tokens per minute allowed by the provider quota")
+    return parser
+
+
+def dry_run(args: argparse.Namespace) -> int:
+    """
+    Estimate prompt tokens and LLM calls for the corpus without calling the LLM.
+
+    Writes one JSON object per record (with its send/split/reject decision)
+    and prints the totals on stderr.
+
+    Args:
+        args: Parsed batch arguments
+
+    Returns:
+        Process exit code
+    """
+    from token_budget import DEFAULT_MODEL, PromptBudget, estimate_corpus
+
+    budget = PromptBudget(args.model or DEFAULT_MODEL,
+                          max_prompt_tokens=args.max_prompt_tokens)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    def write_estimate(record: BatchRecord, estimate: dict):
+        output.write(json.dumps({"id": record.record_id, **estimate}, ensure_ascii=False) + "\n")
+
+    def readable(records: Iterable[BatchRecord]) -> Iterator[BatchRecord]:
+        for record in records:
+            if record.error:
+                print(f"⚠️  Skipped {record.error}", file=sys.stderr)
+            else:
+                yield record
+
+    try:
+        totals = estimate_corpus(readable(iter_records(args.inputs, args.text_field)), budget,
+                                 args.command, on_record=write_estimate)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    counting = "tiktoken" if totals["exact_counts"] else "estimated"
+    print(
+        f"🧮 {totals['records']} records for {totals['model']} "
+        f"(limit {totals['limit']} prompt tokens per call, {counting} counts)",
+        file=sys.stderr
+    )
+    print(
+        f"   Prompt tokens {totals['prompt_tokens']} | largest prompt {totals['max_prompt_tokens']} | "
+        f"{totals['calls']} LLM calls ({totals['send']} sent as-is, {totals['split']} split, "
+        f"{totals['reject']} rejected)",
+        file=sys.stderr
+    )
+    return 0
+
+
+def main(argv: Optional[list[str]] = None, processor=None) -> int:
+    """
+    Entry point for the batch subcommand.
+
+    Args:
+        argv: Command line arguments (default: sys.argv[1:])
+        processor: Optional processor (default: ProcessorFactory.create_from_environment()
+                   with the --rpm/--tpm, --max-prompt-tokens and --no-cache options applied)
+
+    Returns:
+        Process exit code (1 if any record could not be read)
+    """
+    args = build_parser().parse_args(argv)
+    if args.dry_run:
+        return dry_run(args)
+
+    metrics = None
+    if args.metrics or args.metrics_file:
+        from metrics import get_stage_metrics
+        metrics = get_stage_metrics()
+        metrics.enabled = True
+
+    if processor is None:
+        import warnings
+        warnings.filterwarnings("ignore")
+        from enhanced_processor import ProcessorFactory
+        if args.rpm or args.tpm:
+            # Stay within the quota instead of provoking 429s and retrying them
+            # (limits must be configured before the LLM is created)
+            from rate_limit import configure_from_environment, configure_rate_limit
+            configure_from_environment()
+            configure_rate_limit(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+        # Same configuration as the app: CLIPIQ_* cache, token budget and deadline
+        processor = ProcessorFactory.create_from_environment()
+        if args.no_cache:
+            processor.cache = None
+        if args.max_prompt_tokens:
+            if processor.token_budget is None:
+                # CLIPIQ_TOKEN_BUDGET=0 disabled the budget, but the flag asks for one
+                from token_budget import PromptBudget
+                processor.token_budget = PromptBudget.for_llm(
+                    processor.llm, context_tokens=int(os.getenv("CLIPIQ_CONTEXT_TOKENS", "0")) or None)
+            processor.token_budget.max_prompt_tokens = args.max_prompt_tokens
+
+    records = iter_records(args.inputs, args.text_field)
+    if args.command:
+        records = (
+            record if record.command or record.error else BatchRecord(record.record_id, record.text, args.command)
+            for record in records
+        )
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = run_batch(
+            processor, records, output,
+            concurrency=args.concurrency,
+            use_cache=not args.no_cache,
+            include_input=args.include_input
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    stats = summary.to_dict()
+    print(
+        f"📊 Processed {stats['records']} records in {stats['elapsed_s']:.2f} s "
+        f"({stats['records_per_s']:.2f} records/s)",
+        file=sys.stderr
+    )
+    print(
+        f"   Latency p50 {stats['latency_p50_ms']:.0f} ms | p95 {stats['latency_p95_ms']:.0f} ms | "
+        f"max {stats['latency_max_ms']:.0f} ms",
+        file=sys.stderr
+    )
+    if stats["errors"]:
+        print(f"   Errors: {stats['errors']} records could not be read (written with an \"error\" field)",
+              file=sys.stderr)
+    if stats["collapsed"]:
+        print(f"   Duplicates: {stats['collapsed']} records reused an identical in-flight request",
+              file=sys.stderr)
+    from rate_limit import get_rate_limiter
+    limiter = get_rate_limiter(getattr(processor, "llm", None))
+    if limiter is not None:
+        rate_stats = limiter.stats()
+        print(f"   Rate limit: {rate_stats['throttled']} calls waited {rate_stats['waited_s']:.1f} s for quota",
+              file=sys.stderr)
+    if metrics is not None:
+        if args.metrics:
+            print(metrics.format_table(), file=sys.stderr)
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+LLM backend benchmark for ClipIQ
+
+Compares the direct backend (DirectOpenAI + PromptChain) with the LangChain
+backend (langchain_community OpenAI + PromptTemplate | llm | cleanup):
+
+- import time: fresh interpreters importing everything needed to build
+  the processor with each backend
+- per-request overhead: requests through EnhancedProcessor (blocking and
+  streaming) against the local fake server with zero latency, so the
+  time measured is client-side overhead plus the loopback round trip
+
+Usage:
+    python bench_backends.py [--requests N] [--runs N] [--json]
+"""
+
+import argparse
+import json
+import time
+import warnings
+
+from bench_startup import measure
+from enhanced_processor import EnhancedProcessor
+from fake_openai_server import FakeOpenAIServer
+from llm_backend import DirectOpenAI
+
+
+IMPORTS = {
+    "direct": [
+        "from llm_backend import DirectOpenAI",
+        "from enhanced_processor import EnhancedProcessor",
+        "EnhancedProcessor(llm=DirectOpenAI(openai_api_key='benchmark'), backend='direct')",
+    ],
+    "langchain": [
+        "from langchain_community.llms.openai import OpenAI",
+        "from enhanced_processor import EnhancedProcessor",
+        "EnhancedProcessor(llm=OpenAI(openai_api_key='benchmark'), backend='langchain')",
+    ],
+}
+
+TEXT = "Helo wrld, this is a short clipbord snippet"
+
+
+def make_processor(backend: str, base_url: str) -> EnhancedProcessor:
+    """Processor for backend talking to the fake server, without cache or retries."""
+    if backend == "direct":
+        llm = DirectOpenAI(openai_api_base=base_url, openai_api_key="local", max_retries=0)
+    else:
+        from langchain_community.llms.openai import OpenAI
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            llm = OpenAI(openai_api_base=base_url, openai_api_key="local", max_retries=0)
+    return EnhancedProcessor(llm=llm, cache=None, backend=backend)
+
+
+def time_requests(function, requests: int) -> float:
+    """Mean seconds per call over requests calls (after one warm-up call)."""
+    function()
+    start = time.perf_counter()
+    for _ in range(requests):
+        function()
+    return (time.perf_counter() - start) / requests
+
+
+def run_benchmark(requests: int = 200, runs: int = 3) -> dict:
+    """
+    Run the benchmark.
+
+    Args:
+        requests: Requests per backend and mode
+        runs: Fresh interpreters per import measurement
+
+    Returns:
+        Dictionary with import times and per-request times per backend
+    """
+    results = {backend: {"import": measure(statements, runs)} for backend, statements in IMPORTS.items()}
+    with FakeOpenAIServer(port=0, seed=0) as server:
+        for backend in IMPORTS:
+            processor = make_processor(backend, server.base_url)
+            results[backend]["invoke_us"] = time_requests(
+                lambda: processor.process_clipboard_content(TEXT), requests) * 1e6
+            results[backend]["stream_us"] = time_requests(
+                lambda: "".join(processor.stream_clipboard_content(TEXT)), requests) * 1e6
+            assert processor.process_clipboard_content(TEXT) == TEXT, backend
+    return results
+
+
+def main():
+    """Run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description="Benchmark ClipIQ LLM backends")
+    parser.add_argument("--requests", type=int, default=200, help="requests per backend and mode")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per import measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.requests, args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("🔌 ClipIQ LLM Backend Benchmark")
+    print("=" * 72)
+    print(f"   {'backend':<12} {'import + build':>16} {'per request':>14} {'per stream':>14}")
+    for backend, result in results.items():
+        imported = result["import"]["median_ms"]
+        imported = f"{imported:10.1f} ms" if imported is not None else f"{'n/a':>13}"
+        print(f"   {backend:<12} {imported:>16} {result['invoke_us']:>11.0f} us {result['stream_us']:>11.0f} us")
+    direct, langchain = results["direct"], results["langchain"]
+    print()
+    print(f"   Overhead saved per request: {langchain['invoke_us'] - direct['invoke_us']:.0f} us "
+          f"(stream: {langchain['stream_us'] - direct['stream_us']:.0f} us)")
+    if direct["import"]["median_ms"] and langchain["import"]["median_ms"]:
+        print(f"   Import time saved: {langchain['import']['median_ms'] - direct['import']['median_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Command parser benchmark for ClipIQ
+
+Compares the single-pass scanner in CommandParser with the previous
+multi-regex implementation (findall + sub + whitespace regex, plus the
+extra has_command/get_all_commands scans) on large and adversarial inputs.
+
+Usage:
+    python bench_command_parser.py [--repeat N] [--json]
+"""
+
+import argparse
+import json
+import re
+import time
+
+from command_parser import CommandParser
+
+
+COMMAND_REGEX = re.compile(r'<#([^>]+)>', re.IGNORECASE)
+
+
+def legacy_parse(text: str):
+    """The previous parse path: one findall, one sub and one whitespace pass per call."""
+    matches = COMMAND_REGEX.findall(text)
+    valid_commands = [cmd.strip() for cmd in matches if cmd.strip()]
+    command = valid_commands[-1] if valid_commands else None
+    if command:
+        cleaned = re.sub(r'\s+', ' ', COMMAND_REGEX.sub('', text).strip())
+        return cleaned, command, True
+    return text, "", False
+
+
+def legacy_full(text: str):
+    """Legacy parse plus the has_command and get_all_commands scans callers also ran."""
+    result = legacy_parse(text)
+    COMMAND_REGEX.findall(text)
+    COMMAND_REGEX.findall(text)
+    return result
+
+
+def scanner_full(parser: CommandParser, text: str):
+    """Single scan providing parse result, has_command and all commands."""
+    scan = parser.scan(text)
+    if scan.has_command:
+        return scan.cleaned_content, scan.command, True
+    return text, "", False
+
+
+def build_inputs() -> dict:
+    """Build the benchmark corpus."""
+    paragraph = "The quick brown fox jumps over the lazy dog. " * 20 + "\n\n"
+    return {
+        "huge_with_command_5mb": paragraph * (5_000_000 // len(paragraph)) + "<#translate to spanish>",
+        "huge_without_command_5mb": paragraph * (5_000_000 // len(paragraph)),
+        "many_fragments_10k": "word <#fix this> " * 10_000,
+        "empty_tags_10k": "text <#> more <#   > " * 10_000,
+        "unclosed_tags_5k": "<#" * 5_000,
+        "unclosed_tags_with_text_2k": "<#unclosed tag " * 2_000,
+    }
+
+
+def best_of(function, repeat: int) -> float:
+    """Return the best wall-clock time in seconds over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(repeat: int = 3) -> dict:
+    """
+    Run all cases.
+
+    Args:
+        repeat: Runs per case (best time is reported)
+
+    Returns:
+        Dictionary of case name to timings in milliseconds
+    """
+    parser = CommandParser()
+    results = {}
+    for name, text in build_inputs().items():
+        assert scanner_full(parser, text) == legacy_parse(text), name
+        legacy = best_of(lambda: legacy_full(text), repeat)
+        scanner = best_of(lambda: scanner_full(parser, text), repeat)
+        results[name] = {
+            "chars": len(text),
+            "legacy_ms": legacy * 1000,
+            "scanner_ms": scanner * 1000,
+            "speedup": legacy / scanner if scanner else float("inf"),
+        }
+    return results
+
+
+def main():
+    """Run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description="Benchmark ClipIQ command parsing")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("🔎 ClipIQ Command Parser Benchmark")
+    print("=" * 72)
+    print(f"   {'case':<30} {'chars':>10} {'legacy':>11} {'scanner':>11} {'speedup':>8}")
+    for name, result in results.items():
+        print(
+            f"   {name:<30} {result['chars']:>10} {result['legacy_ms']:>8.2f} ms "
+            f"{result['scanner_ms']:>8.2f} ms {result['speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmark suite for ClipIQ
+
+Micro-benchmarks for CommandParser, PromptManager.build_prompt and
+categorize_command, plus end-to-end EnhancedProcessor runs against
+FakeLLM with configurable latency and output size distributions.
+Results are written as JSON so runs can be compared over time.
+
+Usage:
+    python bench_pipeline.py --latency lognormal:0.05,0.5 --requests 200 -o results.json
+    python bench_pipeline.py --compare results.json
+    python bench_pipeline.py --base-url http://127.0.0.1:1234/v1   # against fake_openai_server.py
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+SHORT_COMMAND = "Helo wrld, how are yu today? <#translate to french>"
+SHORT_PLAIN = "Helo wrld, how are yu today?"
+PARAGRAPH = (
+    "The quarterly report shows steady growth across all regions. Revenue "
+    "increased compared to last year, while operating costs stayed flat. "
+)
+
+# Commands covering every template category plus the generic fallback
+COMMANDS = [
+    "translate to french", "summarize", "explain", "fix grammar",
+    "make formal", "bullet points", "rewrite as a haiku",
+]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return a percentile of values (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    """Summarize latencies in milliseconds."""
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def time_operation(operation: Callable[[], object], repeat: int = 5) -> dict:
+    """
+    Time a fast operation with timeit.
+
+    Args:
+        operation: Zero-argument callable
+        repeat: Number of timing rounds (the best round is reported)
+
+    Returns:
+        Dictionary with ns_per_op and ops_per_s
+    """
+    timer = timeit.Timer(operation)
+    loops, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=loops)) / loops
+    return {"ns_per_op": best * 1e9, "ops_per_s": 1 / best if best > 0 else 0.0, "loops": loops}
+
+
+def run_micro_benchmarks(repeat: int = 5) -> dict:
+    """
+    Benchmark parsing, prompt building and categorization.
+
+    Returns:
+        Dictionary mapping benchmark name to timing results
+    """
+    from command_parser import CommandParser
+    from prompt_templates import PromptManager, categorize_command
+
+    parser = CommandParser()
+    manager = PromptManager()
+    template = manager.get_template("translate")
+    document = PARAGRAPH * 80 + "<#summarize>"
+
+    cases = {
+        "command_parser.parse/short_command": lambda: parser.parse_clipboard_content(SHORT_COMMAND),
+        "command_parser.parse/short_plain": lambda: parser.parse_clipboard_content(SHORT_PLAIN),
+        "command_parser.parse/10kb_command": lambda: parser.parse_clipboard_content(document),
+        "prompt_manager.build_prompt/short": lambda: manager.build_prompt(template, SHORT_PLAIN, "translate to french"),
+        "prompt_manager.build_prompt/10kb": lambda: manager.build_prompt(template, document, "translate to french"),
+        "prompt_manager.get_prompt_for_command": lambda: manager.get_prompt_for_command(SHORT_PLAIN, "summarize"),
+        "categorize_command/known": lambda: categorize_command("translate to french"),
+        "categorize_command/generic": lambda: categorize_command("rewrite as a haiku"),
+    }
+    return {name: time_operation(operation, repeat) for name, operation in cases.items()}
+
+
+def _timed(operation: Callable[[], object]) -> float:
+    """Run an operation and return its wall time in seconds."""
+    start = time.perf_counter()
+    operation()
+    return time.perf_counter() - start
+
+
+def _scenario(latencies: list[float], wall: float, llm, simulated_start: float,
+              sequential: bool) -> dict:
+    """Build a scenario result; overhead is only meaningful for sequential runs."""
+    result = {
+        "requests": len(latencies),
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall if wall > 0 else 0.0,
+        **latency_summary(latencies),
+    }
+    if sequential and latencies and hasattr(llm, "simulated_seconds"):
+        simulated = llm.simulated_seconds - simulated_start
+        result["overhead_ms_per_request"] = max(0.0, wall - simulated) / len(latencies) * 1000
+    return result
+
+
+def run_pipeline_benchmarks(latency: str = "constant:0.02", output_chars: Optional[str] = None,
+                            requests: int = 50, concurrency: int = 8,
+                            seed: Optional[int] = 0, base_url: Optional[str] = None,
+                            hedge: bool = False) -> dict:
+    """
+    Run end-to-end EnhancedProcessor scenarios against FakeLLM.
+
+    With base_url the real OpenAI client is used instead, e.g. against
+    fake_openai_server.py; latency and output settings then belong to the server.
+
+    Args:
+        latency: Latency distribution spec (see fake_llm.parse_distribution)
+        output_chars: Output size distribution spec (None echoes the input)
+        requests: Requests per scenario
+        concurrency: Concurrency for the threaded, async and bulk scenarios
+        seed: Random seed for the fake LLM
+        base_url: Optional OpenAI-compatible endpoint to benchmark over HTTP
+        hedge: Wrap the LLM in HedgedLLM and report hedging stats
+
+    Returns:
+        Dictionary mapping scenario name to latency/throughput results
+    """
+    from enhanced_processor import EnhancedProcessor, StreamStats
+    from fake_llm import FakeLLM, parse_distribution
+
+    if base_url:
+        from langchain_community.llms.openai import OpenAI
+        llm = OpenAI(openai_api_base=base_url, openai_api_key="benchmark", max_retries=0)
+    else:
+        llm = FakeLLM(
+            latency=parse_distribution(latency),
+            output_chars=parse_distribution(output_chars) if output_chars else None,
+            seed=seed
+        )
+    if hedge:
+        from hedging import HedgedLLM
+        llm = HedgedLLM(llm)
+    processor = EnhancedProcessor(llm=llm, max_chunk_workers=concurrency)
+    command_texts = [f"{SHORT_PLAIN} #{i} <#{COMMANDS[i % len(COMMANDS)]}>" for i in range(requests)]
+    plain_texts = [f"{SHORT_PLAIN} #{i}" for i in range(requests)]
+    results = {}
+
+    for name, texts in (("sequential_command", command_texts), ("sequential_default", plain_texts)):
+        simulated_start = getattr(llm, "simulated_seconds", 0.0)
+        start = time.perf_counter()
+        latencies = [_timed(lambda text=text: processor.process_clipboard_content(text, use_cache=False))
+                     for text in texts]
+        results[name] = _scenario(latencies, time.perf_counter() - start, llm, simulated_start, True)
+
+    first_tokens = []
+    simulated_start = getattr(llm, "simulated_seconds", 0.0)
+    start = time.perf_counter()
+    latencies = []
+    for text in command_texts:
+        stats = StreamStats()
+        latencies.append(_timed(lambda: list(processor.stream_clipboard_content(text, stats=stats, use_cache=False))))
+        if stats.time_to_first_token is not None:
+            first_tokens.append(stats.time_to_first_token)
+    results["stream_command"] = _scenario(latencies, time.perf_counter() - start, llm, simulated_start, True)
+    results["stream_command"]["ttft"] = latency_summary(first_tokens)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(
+            lambda text: _timed(lambda: processor.process_clipboard_content(text, use_cache=False)),
+            command_texts
+        ))
+    results["threaded_command"] = _scenario(latencies, time.perf_counter() - start, llm, 0.0, False)
+
+    async def run_async() -> list[float]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(text: str) -> float:
+            async with semaphore:
+                started = time.perf_counter()
+                await processor.aprocess_clipboard_content(text, use_cache=False)
+                return time.perf_counter() - started
+
+        return await asyncio.gather(*(one(text) for text in command_texts))
+
+    start = time.perf_counter()
+    latencies = asyncio.run(run_async())
+    results["async_command"] = _scenario(latencies, time.perf_counter() - start, llm, 0.0, False)
+
+    wall = _timed(lambda: processor.process_many(command_texts, max_concurrency=concurrency, use_cache=False))
+    results["process_many"] = {
+        "requests": len(command_texts),
+        "wall_s": wall,
+        "throughput_rps": len(command_texts) / wall if wall > 0 else 0.0,
+    }
+
+    document = PARAGRAPH * 400
+    wall = _timed(lambda: processor.process_chunked(document, chunk_size=4000, max_workers=concurrency,
+                                                    use_cache=False))
+    results["chunked_document"] = {"chars": len(document), "wall_s": wall}
+
+    if hedge:
+        results["hedging"] = llm.stats()
+
+    return results
+
+
+def git_commit() -> Optional[str]:
+    """Return the current git commit, or None outside a git checkout."""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_suite(latency: str = "constant:0.02", output_chars: Optional[str] = None,
+              requests: int = 50, concurrency: int = 8, seed: Optional[int] = 0,
+              repeat: int = 5, micro: bool = True, pipeline: bool = True,
+              base_url: Optional[str] = None, hedge: bool = False) -> dict:
+    """
+    Run the benchmark suite.
+
+    Returns:
+        Report with metadata, micro-benchmarks and pipeline scenarios
+    """
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": {
+                "latency": latency,
+                "output_chars": output_chars or "echo",
+                "requests": requests,
+                "concurrency": concurrency,
+                "seed": seed,
+                "base_url": base_url,
+                "hedge": hedge,
+            },
+        },
+        "micro": run_micro_benchmarks(repeat) if micro else {},
+        "pipeline": {},
+    }
+    if pipeline:
+        report["pipeline"] = run_pipeline_benchmarks(latency, output_chars, requests, concurrency, seed, base_url, hedge)
+    return report
+
+
+def compare_reports(baseline: dict, current: dict) -> list[tuple[str, float, float, float]]:
+    """
+    Compare two reports.
+
+    Returns:
+        List of (metric, baseline, current, percent change); lower is better for every metric
+    """
+    rows = []
+    for name, result in current.get("micro", {}).items():
+        before = baseline.get("micro", {}).get(name)
+        if before:
+            rows.append((f"{name} ns/op", before["ns_per_op"], result["ns_per_op"]))
+    for name, result in current.get("pipeline", {}).items():
+        before = baseline.get("pipeline", {}).get(name, {})
+        for metric in ("p50_ms", "p95_ms", "overhead_ms_per_request", "wall_s"):
+            if metric in result and metric in before:
+                rows.append((f"{name} {metric}", before[metric], result[metric]))
+    return [
+        (metric, before, after, (after - before) / before * 100 if before else 0.0)
+        for metric, before, after in rows
+    ]
+
+
+def print_report(report: dict):
+    """Print a human-readable summary."""
+    config = report["meta"]["config"]
+    print("🧪 ClipIQ Pipeline Benchmark")
+    print("=" * 60)
+    target = config.get("base_url") or f"latency {config['latency']} | output {config['output_chars']}"
+    print(f"Commit {report['meta']['git_commit']} | Python {report['meta']['python']} | {target}")
+    if report["micro"]:
+        print("\nMicro-benchmarks:")
+        for name, result in report["micro"].items():
+            print(f"   {name:<44} {result['ns_per_op']:>12,.0f} ns/op")
+    if report["pipeline"]:
+        print(f"\nPipeline ({config.get('base_url') or 'FakeLLM'}):")
+        for name, result in report["pipeline"].items():
+            if name == "hedging":
+                continue
+            line = f"   {name:<22} wall {result['wall_s']:7.3f} s"
+            if "p50_ms" in result:
+                line += f" | p50 {result['p50_ms']:7.1f} ms | p95 {result['p95_ms']:7.1f} ms | p99 {result['p99_ms']:7.1f} ms"
+            if "throughput_rps" in result:
+                line += f" | {result['throughput_rps']:7.1f} req/s"
+            if "overhead_ms_per_request" in result:
+                line += f" | overhead {result['overhead_ms_per_request']:.2f} ms/req"
+            print(line)
+        ttft = report["pipeline"].get("stream_command", {}).get("ttft")
+        if ttft:
+            print(f"   stream TTFT p50 {ttft['p50_ms']:.1f} ms | p95 {ttft['p95_ms']:.1f} ms")
+        hedging = report["pipeline"].get("hedging")
+        if hedging:
+            print(f"   hedging: {hedging['hedged']}/{hedging['requests']} hedged, {hedging['hedge_wins']} won | "
+                  f"p99 primary {hedging['primary_p99_ms']:.1f} ms → observed {hedging['observed_p99_ms']:.1f} ms | "
+                  f"saved {hedging['saved_ms_total']:.0f} ms")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the suite from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark the ClipIQ pipeline with a fake LLM")
+    parser.add_argument("--latency", default="constant:0.02",
+                        help="LLM latency distribution, e.g. 0.05, uniform:0.01,0.1, lognormal:0.05,0.5")
+    parser.add_argument("--output-chars", help="output size distribution (default: echo the input)")
+    parser.add_argument("--requests", type=int, default=50, help="requests per pipeline scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrency for parallel scenarios")
+    parser.add_argument("--seed", type=int, default=0, help="fake LLM random seed")
+    parser.add_argument("--base-url", help="benchmark an OpenAI-compatible endpoint instead of FakeLLM")
+    parser.add_argument("--hedge", action="store_true", help="hedge LLM calls and report tail latency saved")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per micro-benchmark")
+    parser.add_argument("--micro-only", action="store_true", help="skip the pipeline scenarios")
+    parser.add_argument("--pipeline-only", action="store_true", help="skip the micro-benchmarks")
+    parser.add_argument("-o", "--output", help="write the JSON report to this path")
+    parser.add_argument("--compare", help="compare against a previous JSON report")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore")
+    report = run_suite(
+        latency=args.latency,
+        output_chars=args.output_chars,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        seed=args.seed,
+        repeat=args.repeat,
+        micro=not args.pipeline_only,
+        pipeline=not args.micro_only,
+        base_url=args.base_url,
+        hedge=args.hedge
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        print(f"\nCompared with {args.compare} (commit {baseline['meta'].get('git_commit')}):")
+        for metric, before, after, change in compare_reports(baseline, report):
+            marker = "🔴" if change > 10 else "🟢" if change < -10 else "  "
+            print(f"   {marker} {metric:<52} {before:>12.2f} → {after:>12.2f} ({change:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Registry benchmark for ClipIQ
+
+Measures the per-call overhead of the module-level helpers before and
+after the process-wide registry: a new PromptManager (core template copy
+and environment read) plus str.format per prompt, a new CommandParser per
+parse, and a new EnhancedProcessor with its own OpenAI client per
+convenience call, against the shared, precompiled components.
+
+No requests are sent; OPENAI_API_KEY defaults to a dummy value.
+
+Usage:
+    python bench_registry.py [--calls N] [--repeat N] [--json]
+"""
+
+import argparse
+import json
+import os
+import time
+import warnings
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from command_parser import CommandParser, parse_command
+from enhanced_processor import EnhancedProcessor
+from prompt_templates import PromptManager, build_prompt_for_command
+from registry import get_registry
+from langchain_community.llms.openai import OpenAI
+
+
+CONTENT = "Helo wrld, this is a short clipboard snippet with a few typos in it."
+CUSTOM_DEFAULT = "Dear {name}, fix the following text and return only the result: {text}"
+
+
+def legacy_build_prompt(template: str, content: str, command: str = "") -> str:
+    """The previous build_prompt: str.format, falling back on KeyError."""
+    try:
+        return template.format(text=content, command_detail=command)
+    except KeyError:
+        result = template.replace("{text}", content)
+        if command:
+            result = result.replace("{command_detail}", command)
+        return result
+
+
+def legacy_prompt_for_command(content: str, command: str) -> str:
+    """Previous build_prompt_for_command: a new PromptManager and str.format per call."""
+    manager = PromptManager()
+    from prompt_templates import categorize_command
+    return legacy_build_prompt(manager.get_template(categorize_command(command)), content, command)
+
+
+def legacy_default_prompt(content: str) -> str:
+    """Previous build_default_prompt: a new PromptManager and str.format per call."""
+    return legacy_build_prompt(PromptManager().get_template('default'), content)
+
+
+def registry_default_prompt(content: str) -> str:
+    """Default prompt from the shared manager and compiled template."""
+    return get_registry().prompt_manager().get_default_prompt(content)
+
+
+def legacy_processor():
+    """Previous convenience-function setup: a new processor and OpenAI client per call."""
+    return EnhancedProcessor(llm=OpenAI())
+
+
+def per_call(function, calls: int, repeat: int) -> float:
+    """Return the best time per call in seconds over repeat runs of calls calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def build_cases() -> dict:
+    """Build (legacy, registry) callables for each helper."""
+    return {
+        "prompt_for_command": (
+            lambda: legacy_prompt_for_command(CONTENT, "translate to spanish"),
+            lambda: build_prompt_for_command(CONTENT, "translate to spanish"),
+        ),
+        "default_prompt_fallback": (
+            lambda: legacy_default_prompt(CONTENT),
+            lambda: registry_default_prompt(CONTENT),
+        ),
+        "parse_command": (
+            lambda: CommandParser().parse_clipboard_content(CONTENT + " <#fix>"),
+            lambda: parse_command(CONTENT + " <#fix>"),
+        ),
+        "processor_setup": (
+            legacy_processor,
+            lambda: get_registry().processor(),
+        ),
+    }
+
+
+def run_benchmark(calls: int = 2000, repeat: int = 3) -> dict:
+    """
+    Run all cases.
+
+    Args:
+        calls: Calls per run (processor setup uses a tenth of them)
+        repeat: Runs per case (best time is reported)
+
+    Returns:
+        Dictionary of case name to per-call timings in microseconds
+    """
+    results = {}
+    with warnings.catch_warnings():
+        # LangChain's OpenAI deprecation warning on every client
+        warnings.simplefilter("ignore")
+        for name, (legacy, shared) in build_cases().items():
+            environment = {"NO_MORE_TYPO_PROMPT_TEMPLATE": CUSTOM_DEFAULT} if "fallback" in name else {}
+            saved = {key: os.environ.get(key) for key in environment}
+            os.environ.update(environment)
+            try:
+                assert legacy() == shared() or name == "processor_setup", name
+                case_calls = max(calls // 10, 1) if name == "processor_setup" else calls
+                legacy_time = per_call(legacy, case_calls, repeat)
+                shared_time = per_call(shared, case_calls, repeat)
+            finally:
+                for key, value in saved.items():
+                    if value is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = value
+            results[name] = {
+                "legacy_us": legacy_time * 1e6,
+                "registry_us": shared_time * 1e6,
+                "saved_us": (legacy_time - shared_time) * 1e6,
+                "speedup": legacy_time / shared_time if shared_time else float("inf"),
+            }
+    return results
+
+
+def main():
+    """Run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description="Benchmark ClipIQ per-call setup overhead")
+    parser.add_argument("--calls", type=int, default=2000, help="calls per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.calls, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("🗂️  ClipIQ Registry Benchmark (per call)")
+    print("=" * 72)
+    print(f"   {'case':<26} {'legacy':>12} {'registry':>12} {'saved':>12} {'speedup':>8}")
+    for name, result in results.items():
+        print(
+            f"   {name:<26} {result['legacy_us']:>9.2f} us {result['registry_us']:>9.2f} us "
+            f"{result['saved_us']:>9.2f} us {result['speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for ClipIQ
+
+Measures, in fresh interpreters, how long each module takes to import and
+how long it takes until the hotkeys are ready (fast-start path) compared
+with the old eager path that built the processor before the listener.
+
+Usage:
+    python bench_startup.py [--runs N] [--json]
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clipiq.py")
+
+# Modules imported by clipiq.py, in startup order (after the ready imports)
+MODULES = [
+    "command_parser",
+    "prompt_templates",
+    "response_cache",
+    "text_chunker",
+    "llm_backend",
+    "langchain_core.prompts",
+    "langchain.schema.runnable",
+    "langchain_community.llms.openai",
+    "enhanced_processor",
+]
+
+
+def ready_imports(path: str = ENTRY_POINT) -> list[str]:
+    """
+    Import statements clipiq.py runs before the "Ready" banner.
+
+    Read from the entry point itself: its module-level imports that come
+    before the hotkey listener is set up. Imports inside functions and the
+    headless subcommand branches run later (or never) on the hotkey path.
+
+    Args:
+        path: Path of clipiq.py
+
+    Returns:
+        Import statements in startup order
+    """
+    with open(path, encoding="utf-8") as handle:
+        tree = ast.parse(handle.read(), path)
+    listener_line = min((node.lineno for node in ast.walk(tree)
+                         if isinstance(node, ast.Attribute) and node.attr == "GlobalHotKeys"),
+                        default=float("inf"))
+    return [ast.unparse(node) for node in tree.body
+            if isinstance(node, (ast.Import, ast.ImportFrom)) and node.lineno < listener_line]
+
+
+def imported_module(statement: str) -> str:
+    """Top-level module an import statement loads ("from a.b import c" gives "a.b")."""
+    node = ast.parse(statement).body[0]
+    return node.names[0].name if isinstance(node, ast.Import) else node.module
+
+
+TIMED_SNIPPET = """
+import json, time
+statements = {statements!r}
+namespace = {{}}
+errors = []
+start = time.perf_counter()
+for statement in statements:
+    try:
+        exec(statement, namespace)
+    except Exception as e:
+        errors.append(f"{{type(e).__name__}}: {{str(e).splitlines()[0] if str(e) else ''}}")
+print(json.dumps({{"seconds": time.perf_counter() - start, "error": errors[0] if errors else None}}))
+"""
+
+BUILD_PROCESSOR = [
+    "from llm_backend import DirectOpenAI",
+    "from enhanced_processor import EnhancedProcessor",
+    "EnhancedProcessor(llm=DirectOpenAI(openai_api_key='benchmark'))",
+]
+
+
+def time_in_fresh_interpreter(statements: list[str]) -> dict:
+    """
+    Run statements in a new Python process and time them.
+
+    Each statement runs even if an earlier one fails (e.g. pynput without
+    a display), so the remaining timings are still meaningful.
+
+    Args:
+        statements: Python statements to time
+
+    Returns:
+        Dictionary with 'seconds' and the first 'error' (None on success)
+    """
+    snippet = TIMED_SNIPPET.format(statements=statements)
+    completed = subprocess.run(
+        [sys.executable, "-c", snippet],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "PYTHONWARNINGS": "ignore"}
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        stderr = completed.stderr.strip().splitlines()
+        return {"seconds": None, "error": stderr[-1] if stderr else f"exit code {completed.returncode}"}
+    return json.loads(lines[-1])
+
+
+def measure(statements: list[str], runs: int) -> dict:
+    """
+    Time statements over several fresh interpreters.
+
+    Returns:
+        Dictionary with median/min seconds and the first error seen
+    """
+    results = [time_in_fresh_interpreter(statements) for _ in range(runs)]
+    seconds = [r["seconds"] for r in results if r["seconds"] is not None]
+    errors = [r["error"] for r in results if r["error"]]
+    return {
+        "median_ms": statistics.median(seconds) * 1000 if seconds else None,
+        "min_ms": min(seconds) * 1000 if seconds else None,
+        "error": errors[0] if errors else None,
+    }
+
+
+def run_benchmark(runs: int = 5) -> dict:
+    """
+    Run the full startup benchmark.
+
+    Args:
+        runs: Fresh interpreters per measurement
+
+    Returns:
+        Dictionary with per-module import times and startup paths
+    """
+    ready = ready_imports()
+    stdlib = getattr(sys, "stdlib_module_names", ())
+    statements = {imported_module(statement): statement for statement in ready
+                  if imported_module(statement) not in stdlib}
+    statements.update({module: f"import {module}" for module in MODULES})
+    modules = {module: measure([statement], runs) for module, statement in statements.items()}
+
+    paths = {
+        # Hotkeys ready on the new path: what clipiq.py imports before the banner
+        "fast_start_time_to_ready": measure(ready, runs),
+        # Work done in the background after the banner
+        "background_processor_init": measure(BUILD_PROCESSOR, runs),
+        # Old path: everything built before the banner
+        "eager_time_to_ready": measure(ready + BUILD_PROCESSOR, runs),
+    }
+    return {"python": sys.version.split()[0], "runs": runs, "modules": modules, "paths": paths}
+
+
+def _format(result: dict) -> str:
+    """Format a measurement for the console."""
+    if result["median_ms"] is None:
+        return f"unavailable ({result['error']})"
+    text = f"{result['median_ms']:8.1f} ms (min {result['min_ms']:.1f} ms)"
+    if result["error"]:
+        text += f"  ⚠️  {result['error']}"
+    return text
+
+
+def main():
+    """Run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description="Measure ClipIQ startup time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("🚀 ClipIQ Startup Benchmark")
+    print("=" * 60)
+    print("Import time per module (fresh interpreter, cumulative):")
+    for module, result in report["modules"].items():
+        print(f"   {module:<34} {_format(result)}")
+    print()
+    print("Startup paths:")
+    for path, result in report["paths"].items():
+        print(f"   {path:<34} {_format(result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Cancellation Tokens and Deadlines for ClipIQ
+
+A CancellationToken travels with a request through EnhancedProcessor.
+When the request goes stale (a newer hotkey press, or the clipboard
+changed underneath it) the token is cancelled: streams stop at the next
+chunk and close their HTTP response, async calls are cancelled outright,
+and the processor raises CancelledRequestError instead of returning a
+result, so a stale result can never reach the clipboard.
+
+Blocking synchronous calls run under call_cancellable and
+iterate_cancellable, which stop waiting as soon as the token is cancelled
+and make it available to the call as current_token(). Only clients that
+follow it (the direct backend's DirectOpenAI) actually abort: they shut
+their HTTP connection down at once. With other clients, including the
+LangChain backend, cancelling only stops the wait; the request runs to
+completion in the background, holding its connection (and any rate-limit
+reservation) until then, and its result is discarded.
+
+A Deadline is a token that cancels itself when the request's time budget
+runs out, so every stage (parsing, LLM calls, fallbacks) only gets what
+is left of it.
+"""
+
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
+
+
+class CancelledRequestError(Exception):
+    """The request was cancelled before it finished."""
+
+
+class DeadlineExceededError(CancelledRequestError):
+    """The request ran out of its time budget."""
+
+
+class CancellationToken:
+    """Thread-safe, one-shot cancellation flag with callbacks."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self._error: type[CancelledRequestError] = CancelledRequestError
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() was called."""
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        """True if the token was cancelled because a deadline ran out."""
+        return self._event.is_set() and issubclass(self._error, DeadlineExceededError)
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        Cancel the request and run the registered callbacks.
+
+        Args:
+            reason: Why the request was cancelled (shown in the error)
+
+        Returns:
+            True if this call cancelled the token, False if it already was
+        """
+        return self._cancel(reason, CancelledRequestError)
+
+    def _cancel(self, reason: str, error: type[CancelledRequestError]) -> bool:
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._error = error
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        return True
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run callback on cancellation (immediately if already cancelled).
+
+        Returns:
+            Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or timeout; returns True if cancelled."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        """
+        Raise if the token was cancelled.
+
+        Raises:
+            CancelledRequestError: If cancel() was called (DeadlineExceededError
+                                   if a Deadline expired)
+        """
+        if self._event.is_set():
+            raise self._error(f"Request cancelled: {self.reason}")
+
+
+_current_token: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar(
+    "clipiq_cancellation_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    """
+    The token of the call_cancellable/iterate_cancellable call running in this context.
+
+    Blocking clients register a callback on it to abort their request
+    instead of holding the connection until the response arrives.
+    """
+    return _current_token.get()
+
+
+class Deadline(CancellationToken):
+    """
+    Cancellation token that cancels itself when its time budget runs out.
+
+    It is also cancelled (with the parent's reason) when an optional parent
+    token is, so a request can have both a deadline and be superseded.
+    Call close() once the request is done to stop the timer.
+    """
+
+    def __init__(self, seconds: float, parent: Optional[CancellationToken] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Start the deadline.
+
+        Args:
+            seconds: Time budget for the whole request
+            parent: Optional token whose cancellation cancels this one
+            clock: Monotonic clock (for tests)
+        """
+        super().__init__()
+        self.seconds = seconds
+        self._clock = clock
+        self.expires_at = clock() + seconds
+        self._timer = threading.Timer(max(seconds, 0.0), self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+        self._unlink = lambda: None
+        if parent is not None:
+            self._unlink = parent.add_callback(
+                lambda: self._cancel(parent.reason or "cancelled", parent._error))
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (0 once expired)."""
+        return max(self.expires_at - self._clock(), 0.0)
+
+    def _expire(self):
+        self._cancel(f"deadline of {self.seconds:g}s exceeded", DeadlineExceededError)
+
+    def close(self):
+        """Stop the timer and detach from the parent token."""
+        self._timer.cancel()
+        self._unlink()
+
+
+def raise_if_cancelled(token: Optional[CancellationToken]):
+    """Raise CancelledRequestError if token is set and cancelled."""
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def raise_if_stale(token: Optional[CancellationToken]):
+    """
+    Raise if token was cancelled, except when only its deadline ran out.
+
+    Used once a result is in hand: a superseded request's result is stale,
+    but a result that arrives just after the deadline still beats the
+    degraded fallback.
+    """
+    if token is not None and not token.expired:
+        token.raise_if_cancelled()
+
+
+async def await_cancellable(awaitable: Awaitable[Any], token: Optional[CancellationToken]) -> Any:
+    """
+    Await awaitable, cancelling it as soon as token is cancelled.
+
+    Cancelling the task aborts an in-flight HTTP request, so its connection
+    is released immediately. The token may be cancelled from any thread.
+
+    Raises:
+        CancelledRequestError: If token was cancelled before or during the await
+    """
+    if token is None:
+        return await awaitable
+    raise_if_cancelled(token)
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(awaitable)
+
+    def cancel_task():
+        loop.call_soon_threadsafe(task.cancel)
+
+    remove = token.add_callback(cancel_task)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if token.cancelled:
+            token.raise_if_cancelled()
+        raise
+    finally:
+        remove()
+
+
+# Helper threads shared by call_cancellable; a call abandoned by its caller
+# keeps its thread until the underlying request returns
+CANCELLABLE_WORKERS = 32
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _cancellable_executor() -> ThreadPoolExecutor:
+    """The shared helper pool of call_cancellable, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CANCELLABLE_WORKERS,
+                                           thread_name_prefix="clipiq-cancellable")
+        return _executor
+
+
+def call_cancellable(function: Callable[[], Any], token: Optional[CancellationToken],
+                     aborts_on_cancel: bool = False) -> Any:
+    """
+    Call a blocking function, but stop waiting for it once token is cancelled.
+
+    The function runs on a shared helper thread with token as
+    current_token(); when the token is cancelled first the caller returns
+    right away and the function's eventual result is discarded. Unless the
+    client aborts on the token, the abandoned request keeps its connection
+    until it returns (see the module docstring).
+
+    Args:
+        function: Blocking call
+        token: Optional cancellation token
+        aborts_on_cancel: The function's client aborts its own request when
+                          current_token() is cancelled (DirectOpenAI), so it
+                          runs on the caller's thread without a helper
+
+    Raises:
+        CancelledRequestError: If token was cancelled before function returned
+    """
+    if token is None:
+        return function()
+    token.raise_if_cancelled()
+    if aborts_on_cancel:
+        reset = _current_token.set(token)
+        try:
+            return function()
+        except Exception:
+            # The abort surfaces as a connection error; report the cancellation instead
+            token.raise_if_cancelled()
+            raise
+        finally:
+            _current_token.reset(reset)
+
+    context = contextvars.copy_context()
+    context.run(_current_token.set, token)
+    done = threading.Event()
+    future: Future = _cancellable_executor().submit(context.run, function)
+    future.add_done_callback(lambda _: done.set())
+    remove = token.add_callback(done.set)
+    try:
+        done.wait()
+    finally:
+        remove()
+    if future.done() and (future.exception() is None or not token.cancelled):
+        return future.result()
+    # Skipped if it has not started yet; otherwise it finishes in the background
+    # (an error from a client that aborted on the token is the cancellation)
+    future.cancel()
+    token.raise_if_cancelled()
+
+
+def iterate_cancellable(iterable: Iterable[Any], token: Optional[CancellationToken]) -> Iterator[Any]:
+    """
+    Iterate a blocking iterable (e.g. an LLM stream), but stop waiting for
+    the next item once token is cancelled.
+
+    The iterable is consumed on a helper thread with token as
+    current_token(); after cancellation or when this generator is closed,
+    the helper stops and closes the iterable as soon as its pending item
+    arrives (at once for streams that abort on cancellation).
+
+    Raises:
+        CancelledRequestError: If token was cancelled before the iterable finished
+    """
+    if token is None:
+        yield from iterable
+        return
+    token.raise_if_cancelled()
+    items: queue.Queue = queue.Queue()
+    finished = object()
+    stop = threading.Event()
+
+    def pump():
+        _current_token.set(token)
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                items.put((item, None))
+                if stop.is_set():
+                    break
+        except BaseException as error:
+            items.put((finished, error))
+        else:
+            items.put((finished, None))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    remove = token.add_callback(lambda: items.put((finished, None)))
+    threading.Thread(target=pump, name="clipiq-stream", daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                token.raise_if_cancelled()
+                return
+            yield item
+    finally:
+        stop.set()
+        remove()
@@ -0,0 +1,356 @@
+"""
+Clipboard Watcher for ClipIQ
+
+Watches the clipboard and dispatches newly copied text that carries a
+<#command>, so it is processed without pressing the hotkey.
+
+Change detection is layered to keep idle wakeups low:
+- Native notifications where available (wl-paste --watch on Wayland,
+  clipnotify on X11) wake the watcher only when the clipboard changes.
+- Clipboard sequence numbers (Windows GetClipboardSequenceNumber, macOS
+  NSPasteboard.changeCount) are polled instead of reading the content.
+- Otherwise the content itself is polled and hashed, with the interval
+  backing off while the clipboard is idle.
+
+Rapid copies are debounced (only the last one is dispatched), and text
+ClipIQ writes itself is ignored.
+"""
+
+import ctypes
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from command_parser import CommandParser
+
+
+def content_hash(text: str) -> bytes:
+    """Return a short digest of clipboard text."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def sequence_number_source() -> Optional[Callable[[], int]]:
+    """
+    Return a cheap clipboard change counter for this platform, if any.
+
+    Returns:
+        Zero-argument callable returning a number that changes whenever
+        the clipboard does, or None
+    """
+    if sys.platform == "win32":
+        try:
+            return ctypes.windll.user32.GetClipboardSequenceNumber
+        except AttributeError:
+            return None
+    if sys.platform == "darwin":
+        try:
+            from AppKit import NSPasteboard
+        except ImportError:
+            return None
+        pasteboard = NSPasteboard.generalPasteboard()
+        return pasteboard.changeCount
+    return None
+
+
+def native_notifier_command() -> Optional[tuple[list[str], bool]]:
+    """
+    Return a command that reports clipboard changes, if one is installed.
+
+    Returns:
+        (argv, exits_per_change) or None. Commands that exit per change
+        are restarted after every notification; the others print one line
+        per change.
+    """
+    if os.getenv("WAYLAND_DISPLAY") and shutil.which("wl-paste"):
+        return ["wl-paste", "--watch", "echo"], False
+    if os.getenv("DISPLAY") and shutil.which("clipnotify"):
+        return ["clipnotify"], True
+    return None
+
+
+class CommandNotifier:
+    """Runs a clipboard notifier command and calls notify() on every change."""
+
+    def __init__(self, argv: list[str], exits_per_change: bool, notify: Callable[[], None]):
+        """
+        Initialize the notifier.
+
+        Args:
+            argv: Command to run
+            exits_per_change: True if the command exits after each change
+            notify: Callback invoked for every change
+        """
+        self.argv = argv
+        self.exits_per_change = exits_per_change
+        self.notify = notify
+        self.alive = False
+        self._process: Optional[subprocess.Popen] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "CommandNotifier":
+        """Start the notifier thread."""
+        self.alive = True
+        self._thread = threading.Thread(target=self._run, name="clipiq-clipboard-notify", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        """Read notifications until stopped; mark the notifier dead if the command fails."""
+        try:
+            while not self._stopped.is_set():
+                self._process = subprocess.Popen(
+                    self.argv, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+                )
+                if self.exits_per_change:
+                    if self._process.wait() != 0:
+                        break
+                    self.notify()
+                    continue
+                for _ in self._process.stdout:
+                    self.notify()
+                break
+        except OSError:
+            pass
+        finally:
+            self.alive = False
+            self.notify()
+
+    def stop(self):
+        """Stop the notifier and its process."""
+        self._stopped.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+
+
+class ClipboardWatcher:
+    """
+    Polls or listens for clipboard changes and dispatches command text.
+
+    Counters (polls, reads, changes, dispatched, debounced, ignored_own,
+    skipped_no_command) are available through stats().
+    """
+
+    def __init__(self, on_change: Callable[[str], None],
+                 paste: Optional[Callable[[], str]] = None,
+                 should_dispatch: Optional[Callable[[str], bool]] = None,
+                 min_interval: float = 0.25, max_interval: float = 2.0,
+                 debounce: float = 0.5, native: bool = True,
+                 sequence_number: Optional[Callable[[], int]] = None):
+        """
+        Initialize the watcher.
+
+        Args:
+            on_change: Called on the watcher thread with each dispatched text
+            paste: Clipboard reader (default: pyperclip.paste)
+            should_dispatch: Filter for changed text (default: CommandParser().has_command)
+            min_interval: Poll interval right after a change, in seconds
+            max_interval: Poll interval once the clipboard has been idle
+            debounce: Seconds the clipboard must stay unchanged before dispatching
+            native: Use native change notifications / sequence numbers when available
+            sequence_number: Optional change counter overriding platform detection
+        """
+        if paste is None:
+            import pyperclip
+            paste = pyperclip.paste
+        self.on_change = on_change
+        self.paste = paste
+        self.should_dispatch = should_dispatch or CommandParser().has_command
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.debounce = debounce
+        self.sequence_number = sequence_number or (sequence_number_source() if native else None)
+        self.native = native
+
+        self._interval = min_interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._own_writes: deque[bytes] = deque(maxlen=8)
+        self._last_hash: Optional[bytes] = None
+        self._last_sequence: Optional[int] = None
+        self._pending: Optional[tuple[str, bytes, float]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._notifier: Optional[CommandNotifier] = None
+
+        self.polls = 0
+        self.reads = 0
+        self.changes = 0
+        self.dispatched = 0
+        self.debounced = 0
+        self.ignored_own = 0
+        self.skipped_no_command = 0
+
+    @property
+    def mode(self) -> str:
+        """How changes are detected: 'notify', 'sequence' or 'poll'."""
+        if self._notifier is not None and self._notifier.alive:
+            return "notify"
+        if self.sequence_number is not None:
+            return "sequence"
+        return "poll"
+
+    def start(self) -> "ClipboardWatcher":
+        """
+        Start watching on a background thread.
+
+        The current clipboard content is taken as the baseline and is not
+        dispatched.
+
+        Returns:
+            The watcher itself, for chaining
+        """
+        self._read_baseline()
+        if self.native and self.sequence_number is None:
+            command = native_notifier_command()
+            if command is not None:
+                self._notifier = CommandNotifier(command[0], command[1], self.notify).start()
+        self._thread = threading.Thread(target=self._run, name="clipiq-clipboard-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop watching."""
+        self._stopped.set()
+        self._wake.set()
+        if self._notifier is not None:
+            self._notifier.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """Signal that the clipboard may have changed (wakes the watcher immediately)."""
+        self._wake.set()
+
+    def ignore(self, text: str):
+        """
+        Ignore a clipboard write made by ClipIQ itself.
+
+        Call this before writing text to the clipboard.
+
+        Args:
+            text: Text about to be written
+        """
+        with self._lock:
+            self._own_writes.append(content_hash(text))
+
+    def stats(self) -> dict:
+        """
+        Get watcher counters.
+
+        Returns:
+            Dictionary with the detection mode and counters
+        """
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "polls": self.polls,
+                "reads": self.reads,
+                "changes": self.changes,
+                "dispatched": self.dispatched,
+                "debounced": self.debounced,
+                "ignored_own": self.ignored_own,
+                "skipped_no_command": self.skipped_no_command,
+            }
+
+    def _read_baseline(self):
+        """Record the current clipboard so it is not treated as a change."""
+        if self.sequence_number is not None:
+            self._last_sequence = self.sequence_number()
+        try:
+            self._last_hash = content_hash(self.paste() or "")
+        except Exception:
+            self._last_hash = None
+
+    def _timeout(self) -> float:
+        """Seconds to sleep before the next check."""
+        if self._pending is not None:
+            return max(0.0, self._pending[2] + self.debounce - time.monotonic())
+        if self.mode == "notify":
+            # Notifications drive the watcher; the timeout is only a safety net
+            return self.max_interval * 15
+        return self._interval
+
+    def _run(self):
+        """Watch loop."""
+        while not self._stopped.is_set():
+            self._wake.wait(self._timeout())
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.check()
+            except Exception:
+                # Clipboard backends fail transiently (e.g. another app holds it)
+                self._interval = self.max_interval
+
+    def check(self):
+        """
+        Check the clipboard once, then dispatch a settled pending change.
+
+        Normally called by the watch thread; exposed for tests and for
+        callers that drive their own loop.
+        """
+        with self._lock:
+            self.polls += 1
+
+        changed = True
+        if self.sequence_number is not None:
+            sequence = self.sequence_number()
+            changed = sequence != self._last_sequence
+            self._last_sequence = sequence
+
+        if changed:
+            text = self.paste() or ""
+            digest = content_hash(text)
+            with self._lock:
+                self.reads += 1
+            changed = digest != self._last_hash
+            if changed:
+                self._last_hash = digest
+                self._record_change(text, digest)
+
+        # Back off while idle, snap back after a change
+        if changed:
+            self._interval = self.min_interval
+        else:
+            self._interval = min(self.max_interval, self._interval * 1.5)
+
+        if self._pending is not None and time.monotonic() - self._pending[2] >= self.debounce:
+            text, _, _ = self._pending
+            self._pending = None
+            with self._lock:
+                self.dispatched += 1
+            self.on_change(text)
+
+    def _record_change(self, text: str, digest: bytes):
+        """Classify a changed clipboard and make it the pending dispatch if relevant."""
+        with self._lock:
+            self.changes += 1
+            if digest in self._own_writes:
+                self._own_writes.remove(digest)
+                self.ignored_own += 1
+                own_write = True
+            else:
+                own_write = False
+
+        if own_write:
+            # Only the user's copies supersede a pending change, not ClipIQ's own writes
+            return
+        if self._pending is not None:
+            # A newer copy supersedes the one still waiting out the debounce
+            self._pending = None
+            with self._lock:
+                self.debounced += 1
+
+        if not self.should_dispatch(text):
+            with self._lock:
+                self.skipped_no_command += 1
+            return
+        self._pending = (text, digest, time.monotonic())
@@ -1,13 +1,47 @@
 # pip install --upgrade pyperclip pynput langchain langchain-openai langchain-community langchain-core
+import time
+startup_started_at = time.perf_counter()
+
+import sys
+
+# Headless subcommands run before any hotkey/clipboard setup
+if len(sys.argv) > 1 and sys.argv[1] == "batch":
+    from batch_processor import main as batch_main
+    sys.exit(batch_main(sys.argv[2:]))
+if len(sys.argv) > 1 and sys.argv[1] == "daemon":
+    from clipiq_daemon import main as daemon_main
+    sys.exit(daemon_main(sys.argv[2:]))
+
 import pyperclip
 from pynput import keyboard
-from langchain_community.llms.openai import OpenAI
-import sys
 import os
 import warnings
 
-# Import enhanced processing capabilities
-from enhanced_processor import EnhancedProcessor
+# Only lightweight modules are imported up front. LangChain and the enhanced
+# processor are imported on a background thread once the hotkeys are live.
+from background_loader import BackgroundLoader
+from cancellation import CancelledRequestError
+from hotkey_worker import HotkeyWorker
+from metrics import get_stage_metrics
+
+# Per-stage latency metrics: --metrics (or CLIPIQ_METRICS=1) records them,
+# --metrics-file PATH (or CLIPIQ_METRICS_FILE) also exports them after every
+# job as Prometheus text, or JSON if PATH ends in .json
+metrics = get_stage_metrics()
+metrics_file = os.getenv("CLIPIQ_METRICS_FILE")
+if "--metrics-file" in sys.argv[1:-1]:
+    metrics_file = sys.argv[sys.argv.index("--metrics-file") + 1]
+if "--metrics" in sys.argv or metrics_file:
+    metrics.enabled = True
+
+# Watch mode: copied text containing a <#command> is processed automatically
+watch_mode = "--watch" in sys.argv or os.getenv("CLIPIQ_WATCH") == "1"
+watcher = None
+
+# Speculative mode: copied text is processed in the background right away,
+# so the hotkey can use the finished or in-flight result
+speculate_mode = "--speculate" in sys.argv or os.getenv("CLIPIQ_SPECULATE") == "1"
+speculator = None
 
 print("""
 ╔══════════════════════════════════════════════════════════════════════════════════════════════════════════════════════════════════════════════╗
@@ -43,6 +77,7 @@ print("""
 ║                                                                                                                                              ║
 ║  Activate processing: [ctrl]+[shift]+[z]                                                                                                    ║
 ║  Exit app: [ctrl]+[shift]+[x]                                                                                                                ║
+║  Stage timings: [ctrl]+[shift]+[m]                                                                                                           ║
 ║                                                                                                                                              ║
 ║  2024 devquasar.com                                                                                                                          ║
 ║                                                                                                                                              ║
@@ -53,69 +88,266 @@ print("""
 # Suppress all warnings
 warnings.filterwarnings("ignore")
 
-# Initialize the enhanced processor
-print("Initializing ClipIQ - Intelligent Clipboard Processing...")
-try:
-    llm = OpenAI()
-    enhanced_processor = EnhancedProcessor(llm=llm)
-    print("✅ ClipIQ processor ready with command support!")
-    print("   • Use <#command> syntax for intelligent processing")
-    print("   • Regular text will be processed for typos (backward compatible)")
-    print("   • Powered by AI for instant text transformation")
-    print()
-except Exception as e:
-    print(f"❌ Failed to initialize enhanced processor: {e}")
-    print("   Falling back to basic typo fixing...")
-    
-    # Fallback to original implementation
-    from langchain_core.prompts import PromptTemplate
-    from langchain.schema.runnable import RunnableLambda
-    
-    default_prompt = "Fix the syntax and typos text:\n\n{text}\n\nThe correct string is:"
-    custom_prompt = os.getenv("NO_MORE_TYPO_PROMPT_TEMPLATE", default_prompt)
-    
-    if "{text}" not in custom_prompt:
-        custom_prompt += "\n CONTEXT: \n {text}"
+
+def build_processor():
+    """
+    Import LangChain and build the processor. Runs on a background thread.
     
-    prompt = PromptTemplate.from_template(custom_prompt)
-    cleanup = RunnableLambda(lambda x: x.strip().strip('"').strip("'"))
-    no_typo_chain = prompt | llm | cleanup
-    enhanced_processor = None
+    Returns:
+        Tuple of (enhanced_processor, no_typo_chain); exactly one of them is set
+    """
+    try:
+        # Import enhanced processing capabilities; the LLM, cache and token
+        # budget are configured from CLIPIQ_* environment variables
+        from enhanced_processor import ProcessorFactory
+        
+        llm = ProcessorFactory.create_llm_from_environment()
+        enhanced_processor = ProcessorFactory.create_from_environment(llm)
+        print(f"✅ ClipIQ processor ready with command support! ({(time.perf_counter() - startup_started_at) * 1000:.0f} ms after launch)")
+        print("   • Use <#command> syntax for intelligent processing")
+        print("   • Regular text will be processed for typos (backward compatible)")
+        print("   • Powered by AI for instant text transformation")
+        print()
+        return enhanced_processor, None
+    except Exception as e:
+        print(f"❌ Failed to initialize enhanced processor: {e}")
+        print("   Falling back to basic typo fixing...")
+        
+        # Fallback to original implementation
+        from langchain_community.llms.openai import OpenAI
+        from langchain_core.prompts import PromptTemplate
+        from langchain.schema.runnable import RunnableLambda
+        
+        default_prompt = "Fix the syntax and typos text:\n\n{text}\n\nThe correct string is:"
+        custom_prompt = os.getenv("NO_MORE_TYPO_PROMPT_TEMPLATE", default_prompt)
+        
+        if "{text}" not in custom_prompt:
+            custom_prompt += "\n CONTEXT: \n {text}"
+        
+        prompt = PromptTemplate.from_template(custom_prompt)
+        cleanup = RunnableLambda(lambda x: x.strip().strip('"').strip("'"))
+        return None, prompt | OpenAI() | cleanup
 
 
-def on_activate():
-    """Process clipboard content with enhanced AI capabilities."""
+# Processor is built in the background after the hotkey listener is up
+loader = BackgroundLoader(build_processor)
+
+
+def loaded_processor():
+    """Return the enhanced processor if it finished loading, without waiting."""
+    if not loader.ready:
+        return None
     try:
-        original_clipboard_content = pyperclip.paste()
-        
-        if not original_clipboard_content:
-            print("⚠️  Clipboard is empty")
-            return
+        return loader.get(timeout=0)[0]
+    except Exception:
+        return None
+
+
+def process_job(job):
+    """Process a queued clipboard snapshot on a worker thread."""
+    original_clipboard_content = job.text
+    try:
+        if not loader.ready:
+            print("⏳ Waiting for ClipIQ processor to finish initializing...")
+        enhanced_processor, no_typo_chain = loader.get()
+        metrics.record("queue", "all", job.queue_time)
+        category = "default"
         
         print(f"📝 Processing: {original_clipboard_content[:50]}{'...' if len(original_clipboard_content) > 50 else ''}")
         
-        if enhanced_processor:
-            # Use enhanced processor with command support
-            processed_content = enhanced_processor.process_clipboard_content(original_clipboard_content)
+        processed_content = claim_speculative_result(original_clipboard_content)
+        if processed_content is not None:
+            print("⚡ Using speculative result")
+        elif enhanced_processor:
+            # Stream the result, showing progress as chunks arrive
+            from enhanced_processor import StreamStats
+            stats = StreamStats()
+            chunks = []
+            print("   ", end="", flush=True)
+            try:
+                for chunk in enhanced_processor.stream_clipboard_content(original_clipboard_content, stats,
+                                                                         cancel_token=job.token):
+                    chunks.append(chunk)
+                    print(chunk, end="", flush=True)
+            finally:
+                print()
+            processed_content = "".join(chunks)
+            category = stats.category or "default"
+            ttft = stats.time_to_first_token
+            print(f"⏱️  First token: {ttft * 1000:.0f} ms | Total: {stats.total_time * 1000:.0f} ms"
+                  if ttft is not None else f"⏱️  Total: {stats.total_time * 1000:.0f} ms")
+            if stats.status == "partial":
+                # The stream broke off mid-answer; half a result must not replace the text
+                print("⚠️  The response was cut off before it finished")
+                print("   Original content remains in clipboard")
+                print()
+                return
+            if stats.status.startswith("deadline_"):
+                # CLIPIQ_DEADLINE ran out; the result is partial, cached or the original text
+                print(f"⏰ Deadline reached, using the {stats.status[len('deadline_'):]} result")
         else:
             # Fallback to original implementation
             processed_content = no_typo_chain.invoke({"text": original_clipboard_content})
         
-        pyperclip.copy(processed_content)
-        print(f"✅ Processed and copied to clipboard")
-        print(f"📋 Result: {processed_content[:100]}{'...' if len(processed_content) > 100 else ''}")
-        print()
+        copy_result(processed_content, category, job.submitted_at, job)
         
+    except CancelledRequestError as e:
+        # A newer press (or clipboard change) superseded this job; its result
+        # must not overwrite the clipboard
+        print(f"🚫 Discarded stale request: {e}")
+        print()
     except Exception as e:
         print(f"❌ Processing failed: {e}")
         print("   Original content remains in clipboard")
         print()
 
 
+def copy_result(processed_content, category, submitted_at, job=None):
+    """Write a result to the clipboard and report it (a stale job's result is dropped)."""
+    def write():
+        if watcher is not None:
+            watcher.ignore(processed_content)
+        pyperclip.copy(processed_content)
+    
+    with metrics.span("copy", category):
+        if job is None:
+            write()
+        elif not worker.commit(job, write):
+            raise CancelledRequestError(f"Request cancelled: {job.token.reason}")
+    metrics.record("total", category, time.perf_counter() - submitted_at)
+    if metrics_file:
+        metrics.write(metrics_file)
+    print(f"✅ Processed and copied to clipboard")
+    print(f"📋 Result: {processed_content[:100]}{'...' if len(processed_content) > 100 else ''}")
+    print()
+
+
+def speculative_process(text):
+    """Process copied text ahead of a hotkey press (runs on the speculation pool)."""
+    enhanced_processor, no_typo_chain = loader.get()
+    if enhanced_processor:
+        return enhanced_processor.process_clipboard_content(text)
+    return no_typo_chain.invoke({"text": text})
+
+
+def claim_speculative_result(text):
+    """Return the speculative result for text (waiting if in flight), or None."""
+    future = speculator.claim(text) if speculator is not None else None
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None
+
+
+def on_drop(job):
+    """Report a pending job evicted by a newer press."""
+    print(f"⚠️  Dropped stale request: {job.text[:50]}{'...' if len(job.text) > 50 else ''}")
+
+
+# Background worker pool so the hotkey thread never waits on the LLM; a press
+# for new text cancels the request in flight so the newest one runs next
+worker = HotkeyWorker(process_job, num_workers=1, max_queue_size=4, on_drop=on_drop,
+                      supersede=True).start()
+
+
+def on_activate():
+    """Snapshot the clipboard and queue it for background processing."""
+    try:
+        start = time.perf_counter()
+        with metrics.span("paste"):
+            original_clipboard_content = pyperclip.paste()
+        
+        if not original_clipboard_content:
+            print("⚠️  Clipboard is empty")
+            return
+        
+        # A finished speculation is copied straight away; an in-flight one is
+        # picked up by the worker
+        speculation = speculator.lookup(original_clipboard_content) if speculator is not None else None
+        if speculation is not None and speculation.done():
+            processed_content = claim_speculative_result(original_clipboard_content)
+            if processed_content is not None:
+                print(f"⚡ Speculative result ready ({(time.perf_counter() - start) * 1000:.1f} ms)")
+                worker.cancel_in_flight("superseded by a newer hotkey press")
+                copy_result(processed_content, "all", start)
+                return
+        
+        queued = worker.submit(original_clipboard_content)
+        ack_ms = (time.perf_counter() - start) * 1000
+        if queued:
+            print(f"📥 Queued ({ack_ms:.1f} ms)")
+        else:
+            print(f"⏳ Already processing this text ({ack_ms:.1f} ms)")
+        
+    except Exception as e:
+        print(f"❌ Failed to read clipboard: {e}")
+        print()
+
+
+def on_clipboard_change(text):
+    """Queue copied command text (watch mode) or pre-process it (speculative mode)."""
+    # A result for the previous clipboard text would overwrite what was just copied
+    if worker.cancel_in_flight("clipboard changed", keep=text):
+        print("🚫 Clipboard changed, cancelled the request in flight")
+    if watch_mode and (speculator is None or has_command(text)):
+        if worker.submit(text):
+            print(f"👀 Copied command detected, queued: {text[:50]}{'...' if len(text) > 50 else ''}")
+    elif speculator is not None:
+        speculator.speculate(text)
+
+
+def on_metrics():
+    """Print per-stage latency percentiles."""
+    if not metrics.enabled:
+        print("📈 Stage metrics are disabled; start with --metrics or CLIPIQ_METRICS=1")
+        print()
+        return
+    print("📈 Stage latency (rolling window):")
+    print(metrics.format_table())
+    print()
+
+
 def on_exit():
     """Exit the application gracefully."""
     print("👋 Exiting no_more_typo app...")
+    worker.shutdown(wait=False)
+    if watcher is not None:
+        watcher.stop(timeout=1)
+    if speculator is not None:
+        speculator.shutdown()
+        spec_stats = speculator.stats()
+        print(f"   Speculation: {spec_stats['started']} started, "
+              f"{spec_stats['hits_ready'] + spec_stats['hits_in_flight']} paid off "
+              f"({spec_stats['hits_in_flight']} in flight), {spec_stats['misses']} misses, "
+              f"{spec_stats['skipped_budget']} over budget")
+    if metrics.enabled:
+        print(metrics.format_table())
+        if metrics_file:
+            metrics.write(metrics_file)
+    enhanced_processor = loaded_processor()
     if enhanced_processor:
+        if enhanced_processor.cache is not None:
+            cache_stats = enhanced_processor.cache.stats()
+            print(f"   Cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, "
+                  f"{cache_stats['misses']} misses")
+        llm = enhanced_processor.llm
+        if hasattr(llm, "breaker"):
+            retry_stats = llm.stats()
+            print(f"   Retries: {retry_stats['retries']} retried, {retry_stats['gave_up']} gave up; "
+                  f"circuit {retry_stats['state']} (opened {retry_stats['opens']}x, "
+                  f"{retry_stats['rejected']} calls failed fast)")
+            llm = llm.llm
+        if hasattr(llm, "hedge_delay"):
+            hedge_stats = llm.stats()
+            print(f"   Hedging: {hedge_stats['hedged']}/{hedge_stats['requests']} requests hedged, "
+                  f"{hedge_stats['hedge_wins']} won, {hedge_stats['saved_ms_total']:.0f} ms saved")
+            llm = llm.primary
+        if hasattr(llm, "limiter") and llm.limiter is not None:
+            rate_stats = llm.stats()
+            print(f"   Rate limit: {rate_stats['requests']} requests, {rate_stats['tokens']} tokens; "
+                  f"{rate_stats['throttled']} waited {rate_stats['waited_s']:.1f} s for quota")
         print("   Enhanced AI processor shut down")
     print("   Goodbye!")
     sys.exit(0)
@@ -144,18 +376,48 @@ def print_help():
 # Print startup help
 print_help()
 
-print("🎯 Ready! Press Ctrl+Shift+Z to process clipboard content")
-print("   Press Ctrl+Shift+X to exit")
-print()
-
 # Set up global hotkeys
 try:
     with keyboard.GlobalHotKeys(
         {
             '<ctrl>+<shift>+z': on_activate,
+            '<ctrl>+<shift>+m': on_metrics,
             '<ctrl>+<shift>+x': on_exit
         }
     ) as h:
+        h.wait()
+        print(f"🎯 Ready in {(time.perf_counter() - startup_started_at) * 1000:.0f} ms! Press Ctrl+Shift+Z to process clipboard content")
+        if metrics.enabled:
+            print("   Press Ctrl+Shift+M to show stage timings")
+        print("   Press Ctrl+Shift+X to exit")
+        print()
+        
+        # Build the processor while the user copies their first text
+        loader.start()
+        
+        if speculate_mode:
+            from speculative import SpeculativeProcessor
+            speculator = SpeculativeProcessor(
+                speculative_process,
+                max_calls_per_minute=int(os.getenv("CLIPIQ_SPECULATE_PER_MINUTE", "10")),
+                max_chars=int(os.getenv("CLIPIQ_SPECULATE_MAX_CHARS", "2000"))
+            )
+        
+        if watch_mode or speculate_mode:
+            from clipboard_watcher import ClipboardWatcher
+            from command_parser import CommandParser
+            has_command = CommandParser().has_command
+            # Speculation looks at every copy; watch mode alone only at command text
+            watcher = ClipboardWatcher(
+                on_clipboard_change,
+                should_dispatch=(lambda text: True) if speculator is not None else has_command
+            ).start()
+            if watch_mode:
+                print(f"👀 Watch mode ({watcher.mode}): copied text with a <#command> is processed automatically")
+            if speculator is not None:
+                print(f"🔮 Speculative mode: copied text is pre-processed "
+                      f"(max {speculator.max_calls_per_minute}/min, {speculator.max_chars} chars)")
+            print()
         h.join()
 except KeyboardInterrupt:
     print("\n👋 Received interrupt signal, exiting...")
@@ -18,12 +18,34 @@ a = Analysis(
         'enhanced_processor',
         'command_parser', 
         'prompt_templates',
+        'hotkey_worker',
+        'background_loader',
+        'batch_processor',
+        'clipiq_daemon',
+        'clipiq_client',
+        'scheduler',
+        'metrics',
+        'clipboard_watcher',
+        'speculative',
+        'hedging',
+        'resilience',
+        'rate_limit',
+        'token_budget',
+        'text_chunker',
+        'response_cache',
+        'single_flight',
+        'cancellation',
+        'registry',
+        'llm_backend',
+        'sqlite3',
         # Core dependencies
         'pyperclip',
         'pynput',
         'pynput.keyboard',
         'pynput._util',
         'pynput._util.darwin',
+        'tiktoken',
+        'tiktoken_ext.openai_public',
         # Standard library modules that might be missed
         'warnings',
         'sys',
@@ -41,6 +63,13 @@ a = Analysis(
         'test_prompt_templates', 
         'test_enhanced_processor',
         'test_integration',
+        'bench_startup',
+        'bench_command_parser',
+        'bench_registry',
+        'bench_backends',
+        'bench_pipeline',
+        'fake_llm',
+        'fake_openai_server',
     ],
     noarchive=False,
     optimize=0,
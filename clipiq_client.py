@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+ClipIQ Daemon Client
+
+Tiny standard-library client for the ClipIQ daemon (clipiq_daemon.py).
+It avoids LangChain and the processor entirely, so shell scripts and
+editor plugins get ClipIQ results in milliseconds from the warm daemon.
+
+Usage:
+    echo "Helo wrld" | python clipiq_client.py process
+    python clipiq_client.py process "Hola <#translate to english>" --stream
+    python clipiq_client.py process --priority bulk < report.txt
+    python clipiq_client.py preview "some text" --command "summarize"
+    python clipiq_client.py categorize "<#explain this>"
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+from typing import Any, Iterator, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_SOCKET_PATH = os.getenv(
+    "CLIPIQ_SOCKET", os.path.join(os.path.expanduser("~"), ".cache", "clipiq", "daemon.sock")
+)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.getenv("CLIPIQ_DAEMON_PORT", "8765"))
+
+
+class DaemonError(Exception):
+    """The daemon answered with an error or could not be reached."""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ClipIQClient:
+    """Client for the daemon's JSON API over a Unix socket or local HTTP."""
+
+    def __init__(self, socket_path: Optional[str] = None, url: Optional[str] = None,
+                 timeout: Optional[float] = 120.0):
+        """
+        Initialize the client.
+
+        Args:
+            socket_path: Unix socket of the daemon (default: DEFAULT_SOCKET_PATH
+                         if it exists and no url is given)
+            url: HTTP base URL, e.g. http://127.0.0.1:8765 (used if no socket)
+            timeout: Socket timeout in seconds
+        """
+        if socket_path is None and url is None and hasattr(socket, "AF_UNIX") \
+                and os.path.exists(DEFAULT_SOCKET_PATH):
+            socket_path = DEFAULT_SOCKET_PATH
+        self.socket_path = socket_path
+        self.url = url or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+        self.timeout = timeout
+
+    def _connect(self) -> http.client.HTTPConnection:
+        """Open a connection to the daemon."""
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        parts = urlsplit(self.url)
+        return http.client.HTTPConnection(parts.hostname or DEFAULT_HOST, parts.port or DEFAULT_PORT,
+                                          timeout=self.timeout)
+
+    def _send(self, method: str, path: str,
+              payload: Optional[dict] = None) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a request and return the connection and the response (body unread)."""
+        connection = self._connect()
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+        except OSError as e:
+            connection.close()
+            where = self.socket_path or self.url
+            raise DaemonError(f"ClipIQ daemon not reachable at {where}: {e}") from e
+        if response.status >= 400:
+            try:
+                message = json.loads(response.read()).get("error", response.reason)
+            except ValueError:
+                message = response.reason
+            connection.close()
+            raise DaemonError(f"{response.status}: {message}")
+        return connection, response
+
+    def request(self, method: str, path: str, payload: Optional[dict] = None) -> dict:
+        """
+        Send a request and decode the JSON response.
+
+        Args:
+            method: HTTP method
+            path: API path, e.g. /process
+            payload: Optional JSON body
+
+        Returns:
+            Decoded response
+
+        Raises:
+            DaemonError: If the daemon is unreachable or returns an error
+        """
+        connection, response = self._send(method, path, payload)
+        try:
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+    def process(self, text: str, command: Optional[str] = None, use_cache: bool = True,
+                priority: Optional[str] = None, deadline_ms: Optional[float] = None) -> str:
+        """
+        Process clipboard-style text (optionally with an explicit command,
+        priority class and deadline in milliseconds).
+        """
+        payload = {"text": text, "command": command, "use_cache": use_cache, "priority": priority,
+                   "deadline_ms": deadline_ms}
+        return self.request("POST", "/process", payload)["output"]
+
+    def stream(self, text: str, command: Optional[str] = None, use_cache: bool = True,
+               priority: Optional[str] = None, deadline_ms: Optional[float] = None) -> Iterator[str]:
+        """
+        Process text and yield output chunks as the daemon streams them.
+
+        Yields:
+            Text chunks; their concatenation equals process(text, command)
+        """
+        payload = {"text": text, "command": command, "use_cache": use_cache, "stream": True,
+                   "priority": priority, "deadline_ms": deadline_ms}
+        connection, response = self._send("POST", "/process", payload)
+        try:
+            for line in response:
+                event = json.loads(line)
+                if "error" in event:
+                    raise DaemonError(event["error"])
+                if "chunk" in event:
+                    yield event["chunk"]
+        finally:
+            connection.close()
+
+    def preview(self, text: str, command: Optional[str] = None) -> dict:
+        """Render the prompt that would be sent, without calling the LLM."""
+        return self.request("POST", "/preview", {"text": text, "command": command})
+
+    def categorize(self, text: str) -> dict:
+        """Parse text for a <#command> and return its template category."""
+        return self.request("POST", "/categorize", {"text": text})
+
+    def health(self) -> dict:
+        """Check that the daemon is up and whether its processor is ready."""
+        return self.request("GET", "/health")
+
+    def stats(self) -> dict:
+        """Fetch cache, LLM and stage metrics counters."""
+        return self.request("GET", "/stats")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser for the client."""
+    parser = argparse.ArgumentParser(description="Talk to a running ClipIQ daemon")
+    parser.add_argument("action", choices=["process", "preview", "categorize", "health", "stats"])
+    parser.add_argument("text", nargs="?", help="text to send (default: read stdin)")
+    parser.add_argument("--command", help="command applied to the text (instead of an inline <#command>)")
+    parser.add_argument("--stream", action="store_true", help="print output as it is generated")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    parser.add_argument("--priority", choices=["interactive", "normal", "bulk"],
+                        help="scheduling class of the request (default: normal)")
+    parser.add_argument("--deadline-ms", type=float,
+                        help="return the best available result after this many milliseconds")
+    parser.add_argument("--socket", help=f"daemon Unix socket (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--url", help=f"daemon HTTP URL (default: http://{DEFAULT_HOST}:{DEFAULT_PORT})")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Entry point for the client."""
+    args = build_parser().parse_args(argv)
+    client = ClipIQClient(socket_path=args.socket, url=args.url)
+    try:
+        if args.action in ("health", "stats"):
+            result: Any = client.request("GET", f"/{args.action}")
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+            return 0
+
+        text = args.text if args.text is not None else sys.stdin.read()
+        if args.action == "process":
+            if args.stream:
+                for chunk in client.stream(text, args.command, use_cache=not args.no_cache,
+                                           priority=args.priority, deadline_ms=args.deadline_ms):
+                    sys.stdout.write(chunk)
+                    sys.stdout.flush()
+                sys.stdout.write("\n")
+            else:
+                print(client.process(text, args.command, use_cache=not args.no_cache,
+                                     priority=args.priority, deadline_ms=args.deadline_ms))
+        elif args.action == "preview":
+            print(client.preview(text, args.command)["prompt"])
+        else:
+            print(json.dumps(client.categorize(text), ensure_ascii=False))
+    except DaemonError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
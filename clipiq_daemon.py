@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+ClipIQ Daemon
+
+Keeps one warm EnhancedProcessor (LLM connection pool, response cache,
+parsers and templates) in memory and serves it over a Unix socket and
+local HTTP, so editor plugins and shell scripts do not pay the Python +
+LangChain start-up cost on every call. clipiq_client.py is the matching
+standard-library client.
+
+API (JSON bodies):
+    POST /process     {"text", "command"?, "use_cache"?, "stream"?, "priority"?, "deadline_ms"?}
+                      -> {"output", "status", "latency_ms"}, or NDJSON chunk events when streaming
+    POST /preview     {"text", "command"?} -> {"prompt", "category", "prompt_tokens"?}
+    POST /categorize  {"text"} -> {"has_command", "command", "content", "category"}
+    GET  /health      -> {"status", "ready", "model"?}
+    GET  /stats       -> request, scheduler, cache, dedup, LLM, rate limit and stage metrics counters
+
+Processing requests go through a PriorityScheduler: "priority" is
+"interactive", "normal" (default) or "bulk", and a full queue is answered
+with 503 and a Retry-After header. "deadline_ms" bounds a request's
+processing time; when it runs out the best available result is returned
+with a "deadline_*" status.
+
+Usage:
+    python clipiq.py daemon [--port 8765] [--socket PATH] [--no-http]
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator, Optional
+
+from background_loader import BackgroundLoader
+from clipiq_client import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_SOCKET_PATH
+from scheduler import NORMAL, PriorityScheduler, ScheduledProcessor, SchedulerFullError, validate_priority
+
+# Host headers accepted over HTTP; anything else (e.g. a DNS-rebound web
+# page) is refused so only local tools can spend LLM tokens
+LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1", "[::1]"})
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class RequestError(Exception):
+    """A client error answered with HTTP 400."""
+
+
+def _default_factory():
+    """Build the processor configured by CLIPIQ_* environment variables."""
+    from enhanced_processor import ProcessorFactory
+    return ProcessorFactory.create_from_environment()
+
+
+class ClipIQDaemon:
+    """Serves one shared processor over a Unix socket and/or local HTTP."""
+
+    def __init__(self, processor: Any = None, factory: Optional[Callable[[], Any]] = None,
+                 host: str = DEFAULT_HOST, port: Optional[int] = DEFAULT_PORT,
+                 socket_path: Optional[str] = DEFAULT_SOCKET_PATH,
+                 scheduler: Optional[PriorityScheduler] = None):
+        """
+        Initialize the daemon (call start() or serve_forever() to run it).
+
+        Args:
+            processor: Ready processor to serve
+            factory: Builds the processor in the background if none is given
+                     (default: ProcessorFactory.create_from_environment)
+            host: HTTP interface (keep it local)
+            port: HTTP port (0 picks a free port, None disables HTTP)
+            socket_path: Unix socket path (None disables the socket)
+            scheduler: Orders processing requests by priority (default: PriorityScheduler())
+        """
+        if port is None and socket_path is None:
+            raise ValueError("enable at least one of HTTP (port) and the Unix socket (socket_path)")
+        if processor is not None:
+            factory = lambda: processor
+        self.loader = BackgroundLoader(factory or _default_factory, name="clipiq-daemon-init")
+        self.scheduler = scheduler or PriorityScheduler()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self.requests = 0
+        self.errors = 0
+
+        self.servers: list[socketserver.BaseServer] = []
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.unix_server: Optional[_UnixHTTPServer] = None
+        self.socket_path = socket_path
+        if port is not None:
+            self.httpd = ThreadingHTTPServer((host, port), _Handler)
+            self.servers.append(self.httpd)
+        if socket_path is not None:
+            self.unix_server = _UnixHTTPServer(socket_path)
+            self.servers.append(self.unix_server)
+        for server in self.servers:
+            server.daemon_threads = True
+            server.app = self
+
+    @property
+    def base_url(self) -> Optional[str]:
+        """HTTP base URL, or None if HTTP is disabled."""
+        if self.httpd is None:
+            return None
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def processor(self) -> Any:
+        """The shared processor, waiting for it to finish building if needed."""
+        return self.loader.get()
+
+    def start(self) -> "ClipIQDaemon":
+        """
+        Start building the processor and serve on background threads.
+
+        Returns:
+            The daemon itself, for chaining
+        """
+        self.loader.start()
+        for server in self.servers:
+            # A short poll interval keeps stop() quick
+            thread = threading.Thread(target=server.serve_forever, args=(0.1,), name="clipiq-daemon", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def serve_forever(self):
+        """Serve until interrupted (Ctrl+C)."""
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop serving, close the sockets and remove the socket file."""
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self.unix_server is not None:
+            self.unix_server.remove_socket_file()
+
+    def __enter__(self) -> "ClipIQDaemon":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count_request(self, failed: bool = False):
+        """Count a handled request."""
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+
+    def scheduled_processor(self, payload: dict) -> ScheduledProcessor:
+        """The shared processor, scheduled at the request's priority."""
+        priority = payload.get("priority") or NORMAL
+        if not isinstance(priority, str):
+            raise RequestError("'priority' must be a string")
+        try:
+            validate_priority(priority)
+        except ValueError as e:
+            raise RequestError(str(e)) from e
+        return ScheduledProcessor(self.processor, self.scheduler, priority)
+
+    def process(self, payload: dict) -> dict:
+        """Handle POST /process (non-streaming)."""
+        from enhanced_processor import StreamStats
+        text, command = _text_and_command(payload)
+        use_cache = bool(payload.get("use_cache", True))
+        deadline = _deadline(payload)
+        processor = self.scheduled_processor(payload)
+        stats = StreamStats()
+        start = time.perf_counter()
+        if command:
+            output = processor.process_with_specific_command(text, command, use_cache=use_cache,
+                                                             deadline=deadline, stats=stats)
+        else:
+            output = processor.process_clipboard_content(text, use_cache=use_cache,
+                                                         deadline=deadline, stats=stats)
+        return {"output": output, "status": stats.status,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    def stream(self, payload: dict) -> Iterator[dict]:
+        """
+        Handle POST /process with "stream": true.
+
+        Yields:
+            {"chunk": text} events, then one {"done": true, ...} event
+        """
+        from enhanced_processor import StreamStats
+        text, command = _text_and_command(payload)
+        use_cache = bool(payload.get("use_cache", True))
+        deadline = _deadline(payload)
+        processor = self.scheduled_processor(payload)
+        stats = StreamStats()
+        start = time.perf_counter()
+        if command:
+            # Explicit commands have no streaming path; send the result as one chunk
+            output = processor.process_with_specific_command(text, command, use_cache=use_cache,
+                                                             deadline=deadline, stats=stats)
+            if output:
+                yield {"chunk": output}
+            yield {"done": True, "status": stats.status,
+                   "total_ms": round((time.perf_counter() - start) * 1000, 2)}
+            return
+
+        for chunk in processor.stream_clipboard_content(text, stats=stats, use_cache=use_cache,
+                                                        deadline=deadline):
+            yield {"chunk": chunk}
+        ttft = stats.time_to_first_token
+        yield {
+            "done": True,
+            "status": stats.status,
+            "category": stats.category,
+            "ttft_ms": round(ttft * 1000, 2) if ttft is not None else None,
+            "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def preview(self, payload: dict) -> dict:
+        """Handle POST /preview."""
+        text, command = _text_and_command(payload)
+        processor = self.processor
+        content, parsed_command, has_command = processor.command_parser.parse_clipboard_content(text)
+        if command:
+            content, parsed_command = text, command
+        elif not has_command:
+            parsed_command = None
+        prompt = processor.preview_prompt(content, parsed_command)
+        result = {
+            "prompt": prompt,
+            "category": processor.get_command_category(parsed_command) if parsed_command else "default",
+        }
+        if getattr(processor, "token_budget", None) is not None:
+            result["prompt_tokens"] = processor.token_budget.counter.count(prompt)
+        return result
+
+    def categorize(self, payload: dict) -> dict:
+        """Handle POST /categorize."""
+        text, _ = _text_and_command(payload)
+        processor = self.processor
+        content, command, has_command = processor.command_parser.parse_clipboard_content(text)
+        return {
+            "has_command": has_command,
+            "command": command if has_command else None,
+            "content": content,
+            "category": processor.get_command_category(command) if has_command else "default",
+        }
+
+    def health(self) -> dict:
+        """Handle GET /health (never waits for the processor)."""
+        result = {"status": "ok", "ready": self.loader.ready,
+                  "uptime_s": round(time.time() - self.started_at, 1)}
+        if self.loader.ready:
+            try:
+                result["model"] = self.loader.get(timeout=0).model_identity
+            except Exception as e:
+                result["status"] = "error"
+                result["error"] = str(e)
+        return result
+
+    def stats(self) -> dict:
+        """Handle GET /stats."""
+        with self._lock:
+            result: dict = {"requests": self.requests, "errors": self.errors}
+        result["scheduler"] = self.scheduler.stats()
+        if not self.loader.ready:
+            return result
+        processor = self.processor
+        if getattr(processor, "cache", None) is not None:
+            result["cache"] = processor.cache.stats()
+        if getattr(processor, "single_flight", None) is not None:
+            result["dedup"] = processor.single_flight.stats()
+        llm_stats = getattr(processor.llm, "stats", None)
+        if callable(llm_stats):
+            result["llm"] = llm_stats()
+        from rate_limit import get_rate_limiter
+        limiter = get_rate_limiter(processor.llm)
+        if limiter is not None:
+            result["rate_limit"] = limiter.stats()
+        metrics = getattr(processor, "metrics", None)
+        if metrics is not None and metrics.enabled:
+            result["metrics"] = metrics.snapshot()
+        return result
+
+
+def _text_and_command(payload: dict) -> tuple[str, Optional[str]]:
+    """Validate and extract the text and optional command of a request."""
+    text = payload.get("text")
+    if not isinstance(text, str):
+        raise RequestError("'text' must be a string")
+    command = payload.get("command")
+    if command is not None and not isinstance(command, str):
+        raise RequestError("'command' must be a string")
+    return text, command or None
+
+
+def _deadline(payload: dict) -> Optional[float]:
+    """Validate and extract the optional deadline of a request, in seconds."""
+    deadline_ms = payload.get("deadline_ms")
+    if deadline_ms is None:
+        return None
+    if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+        raise RequestError("'deadline_ms' must be a positive number")
+    return deadline_ms / 1000
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix domain socket, readable only by the current user."""
+
+    def __init__(self, socket_path: str):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported on this platform")
+        directory = os.path.dirname(socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._remove_stale(socket_path)
+        super().__init__(socket_path, _UnixHandler)
+        os.chmod(socket_path, 0o600)
+
+    @staticmethod
+    def _remove_stale(socket_path: str):
+        """Remove a socket file left behind by a daemon that is no longer running."""
+        if not os.path.exists(socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+        else:
+            raise OSError(f"A ClipIQ daemon is already listening on {socket_path}")
+        finally:
+            probe.close()
+
+    def remove_socket_file(self):
+        """Delete the socket file."""
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler; the ClipIQDaemon is available as self.server.app."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "ClipIQDaemon/1.0"
+    # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        """Keep the daemon console quiet; counters are available from /stats."""
+
+    def _is_local_request(self) -> bool:
+        """Refuse HTTP requests whose Host header is not a local name."""
+        if not isinstance(self.client_address, tuple):
+            return True
+        host = self.headers.get("Host") or ""
+        if host.startswith("["):
+            host = host[:host.find("]") + 1]
+        else:
+            host = host.split(":", 1)[0]
+        return host in LOCAL_HOSTS
+
+    def do_GET(self):
+        app = self.server.app
+        if not self._is_local_request():
+            self._send_error(403, "Only local requests are served")
+            return
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, app.health())
+        elif path == "/stats":
+            self._send_json(200, app.stats())
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        app = self.server.app
+        if not self._is_local_request():
+            self._reject(403, "Only local requests are served")
+            return
+        routes = {"/process": app.process, "/preview": app.preview, "/categorize": app.categorize}
+        handler = routes.get(self.path.rstrip("/"))
+        if handler is None:
+            self._reject(404, f"Unknown path {self.path}")
+            return
+        # Browsers cannot send JSON cross-origin without a CORS preflight, which is never answered
+        if not (self.headers.get("Content-Type") or "").startswith("application/json"):
+            self._reject(415, "Content-Type must be application/json")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            self._reject(413, f"Content-Length must be between 0 and {MAX_BODY_BYTES} bytes")
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise RequestError("Request body must be a JSON object")
+            if handler == app.process and payload.get("stream"):
+                self._send_stream(app.stream(payload))
+                app.count_request()
+                return
+            result = handler(payload)
+        except SchedulerFullError as e:
+            app.count_request(failed=True)
+            self._send_error(503, str(e), {"Retry-After": str(max(1, round(e.retry_after)))})
+            return
+        except (RequestError, ValueError) as e:
+            app.count_request(failed=True)
+            self._send_error(400, str(e))
+            return
+        except Exception as e:
+            app.count_request(failed=True)
+            self._send_error(500, f"{type(e).__name__}: {e}")
+            return
+        app.count_request()
+        self._send_json(200, result)
+
+    def _send_stream(self, events: Iterator[dict]):
+        """Send events as newline-delimited JSON using chunked encoding."""
+        # Validation errors surface before the first event, while a 400 can still be sent
+        first = next(events)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_event(first)
+            try:
+                for event in events:
+                    self._write_event(event)
+            except Exception as e:
+                self._write_event({"error": f"{type(e).__name__}: {e}"})
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; closing the generator stops the LLM stream
+            events.close()
+            self.close_connection = True
+
+    def _write_event(self, event: dict):
+        """Write one NDJSON line as an HTTP chunk."""
+        self._write_chunk((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _write_chunk(self, payload: bytes):
+        """Write one HTTP chunk (an empty payload ends the body)."""
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, data: dict, headers: Optional[dict] = None):
+        """Send a JSON response."""
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _reject(self, status: int, message: str):
+        """Answer without reading the request body, then close the connection."""
+        self.close_connection = True
+        self._send_error(status, message)
+
+    def _send_error(self, status: int, message: str, headers: Optional[dict] = None):
+        """Send a JSON error body."""
+        self._send_json(status, {"error": message}, headers)
+
+
+class _UnixHandler(_Handler):
+    """Request handler for the Unix socket (TCP_NODELAY does not apply)."""
+
+    disable_nagle_algorithm = False
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser for the daemon subcommand."""
+    parser = argparse.ArgumentParser(
+        prog="clipiq daemon",
+        description="Serve a warm ClipIQ processor over a Unix socket and local HTTP"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"HTTP interface (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"HTTP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"Unix socket (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--no-http", action="store_true", help="serve only on the Unix socket")
+    parser.add_argument("--no-socket", action="store_true", help="serve only over HTTP")
+    parser.add_argument("--max-concurrency", type=int, default=8,
+                        help="LLM requests processed at once across all priorities (default: 8)")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Entry point for the daemon subcommand."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    args = build_parser().parse_args(argv)
+    socket_path = None if args.no_socket or not hasattr(socket, "AF_UNIX") else args.socket
+
+    try:
+        daemon = ClipIQDaemon(host=args.host, port=None if args.no_http else args.port,
+                              socket_path=socket_path,
+                              scheduler=PriorityScheduler(args.max_concurrency))
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not start the ClipIQ daemon: {e}", file=sys.stderr)
+        return 1
+    if daemon.base_url:
+        print(f"🛰️  ClipIQ daemon on {daemon.base_url}")
+    if daemon.socket_path:
+        print(f"   Unix socket {daemon.socket_path}")
+    print("   Try: echo 'Helo wrld' | python clipiq_client.py process")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 ClipIQ daemon stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
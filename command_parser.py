@@ -7,12 +7,69 @@ and separates the content from the command for further processing.
 
 import re
 from typing import Tuple, Optional
+from registry import get_registry
+
+
+DEFAULT_COMMAND_PATTERN = r'<#([^>]+)>'
+
+
+class CommandScan:
+    """Result of scanning text for commands in a single pass."""
+    
+    def __init__(self, parts: list[str], spans: Optional[list[Tuple[int, int]]] = None):
+        """
+        Initialize the scan result.
+        
+        Args:
+            parts: Alternating text pieces and raw command texts:
+                   [piece, command, piece, command, ..., piece]
+            spans: Optional (start, end) offsets of each non-empty command tag.
+                   Computed from parts (assuming <#...> tags) when omitted.
+        """
+        self._parts = parts
+        self._spans = spans
+        self._cleaned_content: Optional[str] = None
+        self.commands = [command for raw in parts[1::2] if (command := raw.strip())]
+    
+    @property
+    def command(self) -> Optional[str]:
+        """Last non-empty command, or None if there is none."""
+        return self.commands[-1] if self.commands else None
+    
+    @property
+    def has_command(self) -> bool:
+        """True if at least one non-empty command was found."""
+        return bool(self.commands)
+    
+    @property
+    def spans(self) -> list[Tuple[int, int]]:
+        """(start, end) offsets of each non-empty command tag (computed on first use)."""
+        if self._spans is None:
+            spans = []
+            position = 0
+            for index, part in enumerate(self._parts):
+                if index % 2:
+                    tag_end = position + len(part) + 3
+                    if part.strip():
+                        spans.append((position, tag_end))
+                    position = tag_end
+                else:
+                    position += len(part)
+            self._spans = spans
+        return self._spans
+    
+    @property
+    def cleaned_content(self) -> str:
+        """Text with every command tag removed and whitespace collapsed (computed on first use)."""
+        if self._cleaned_content is None:
+            self._cleaned_content = " ".join("".join(self._parts[0::2]).split())
+        return self._cleaned_content
 
 
 class CommandParser:
     """Parses and extracts commands from clipboard content."""
     
-    def __init__(self, command_pattern: str = r'<#([^>]+)>'):
+    def __init__(self, command_pattern: str = DEFAULT_COMMAND_PATTERN):
         """
         Initialize the command parser.
         
@@ -21,6 +78,52 @@ class CommandParser:
         """
         self.command_pattern = command_pattern
         self.command_regex = re.compile(command_pattern, re.IGNORECASE)
+        self._use_fast_scan = command_pattern == DEFAULT_COMMAND_PATTERN
+    
+    def scan(self, text: str) -> CommandScan:
+        """
+        Find all commands, their spans and the cleaned content in one pass.
+        
+        For the default <#...> pattern the text is split once by the regex,
+        but only up to the last '>': a tag can never close after it, and
+        leaving the tail out keeps runs of unclosed '<#' linear instead of
+        quadratic. Custom patterns are scanned with finditer.
+        
+        Args:
+            text: Text to scan
+            
+        Returns:
+            CommandScan with the same results as the individual methods
+        """
+        if not text:
+            return CommandScan([text or ""], [])
+        
+        if not self._use_fast_scan:
+            return self._scan_regex(text)
+        
+        head_end = text.rfind('>') + 1
+        if head_end == 0:
+            return CommandScan([text], [])
+        if head_end == len(text):
+            return CommandScan(self.command_regex.split(text))
+        
+        parts = self.command_regex.split(text[:head_end])
+        parts[-1] += text[head_end:]
+        return CommandScan(parts)
+    
+    def _scan_regex(self, text: str) -> CommandScan:
+        """Scan text using the configured regex (for custom patterns)."""
+        parts = []
+        spans = []
+        position = 0
+        for match in self.command_regex.finditer(text):
+            parts.append(text[position:match.start()])
+            parts.append(match.group(1))
+            position = match.end()
+            if match.group(1).strip():
+                spans.append(match.span())
+        parts.append(text[position:])
+        return CommandScan(parts, spans)
     
     def parse_clipboard_content(self, text: str) -> Tuple[str, str, bool]:
         """
@@ -38,12 +141,10 @@ class CommandParser:
         if not text or not isinstance(text, str):
             return text or "", "", False
         
-        command = self.extract_command(text)
-        has_command = command is not None and command.strip() != ""
+        scan = self.scan(text)
         
-        if has_command:
-            clean_content = self.clean_content(text)
-            return clean_content, command.strip(), True
+        if scan.has_command:
+            return scan.cleaned_content, scan.command, True
         else:
             # Return original text if no valid command found
             return text, "", False
@@ -60,15 +161,9 @@ class CommandParser:
         """
         if not text:
             return None
-            
-        matches = self.command_regex.findall(text)
-        if matches:
-            # Filter out empty or whitespace-only commands
-            valid_commands = [cmd.strip() for cmd in matches if cmd.strip()]
-            if valid_commands:
-                # Return the last valid command found
-                return valid_commands[-1]
-        return None
+        
+        # Empty or whitespace-only commands are skipped; the last valid one wins
+        return self.scan(text).command
     
     def clean_content(self, text: str) -> str:
         """
@@ -82,17 +177,9 @@ class CommandParser:
         """
         if not text:
             return text
-            
-        # Remove all command occurrences
-        cleaned = self.command_regex.sub('', text)
         
-        # Clean up extra whitespace
-        cleaned = cleaned.strip()
-        
-        # Remove extra spaces that might be left after command removal
-        cleaned = re.sub(r'\s+', ' ', cleaned)
-        
-        return cleaned
+        # Remove all command occurrences and collapse leftover whitespace
+        return self.scan(text).cleaned_content
     
     def has_command(self, text: str) -> bool:
         """
@@ -118,9 +205,8 @@ class CommandParser:
         """
         if not text:
             return []
-            
-        matches = self.command_regex.findall(text)
-        return [match.strip() for match in matches if match.strip()]
+        
+        return self.scan(text).commands
     
     def validate_command(self, command: str, max_length: int = 100) -> bool:
         """
@@ -165,7 +251,7 @@ def parse_command(text: str) -> Tuple[str, str, bool]:
     Returns:
         Tuple of (clean_content, command, has_command)
     """
-    parser = CommandParser()
+    parser = get_registry().parser()
     return parser.parse_clipboard_content(text)
 
 
@@ -179,7 +265,7 @@ def extract_command_simple(text: str) -> Optional[str]:
     Returns:
         Command if found, None otherwise
     """
-    parser = CommandParser()
+    parser = get_registry().parser()
     return parser.extract_command(text)
 
 
@@ -193,5 +279,5 @@ def clean_text(text: str) -> str:
     Returns:
         Cleaned text
     """
-    parser = CommandParser()
+    parser = get_registry().parser()
     return parser.clean_content(text)
\ No newline at end of file
@@ -5,15 +5,141 @@ Integrates command parsing and prompt template management to provide
 enhanced clipboard processing with command-based functionality.
 """
 
-from typing import Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterator, Optional
+from llm_backend import LLMBackend, OutputCleanup, PromptChain, as_runnable, backend_from_environment, clean_output
+from cancellation import (
+    CancellationToken,
+    CancelledRequestError,
+    Deadline,
+    DeadlineExceededError,
+    await_cancellable,
+    call_cancellable,
+    iterate_cancellable,
+    raise_if_cancelled,
+    raise_if_stale
+)
 from command_parser import CommandParser
-from prompt_templates import PromptManager
-from langchain_community.llms.openai import OpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain.schema.runnable import RunnableLambda
+from metrics import StageMetrics, get_stage_metrics
+from prompt_templates import PromptManager, categorize_command
+from registry import get_registry
+from resilience import UpstreamUnavailableError
+from response_cache import ResponseCache, make_cache_key
+from single_flight import SingleFlight
+from text_chunker import TextChunker
+from token_budget import BudgetDecision, PromptBudget, TokenBudgetError
+import os
+import time
 import warnings
 
 
+def _leading_strip_length(text: str) -> int:
+    """Number of leading characters removed by the cleanup step."""
+    position = len(text) - len(text.lstrip())
+    position += len(text[position:]) - len(text[position:].lstrip('"'))
+    position += len(text[position:]) - len(text[position:].lstrip("'"))
+    return position
+
+
+def _trailing_strip_length(text: str) -> int:
+    """Number of trailing characters removed by the cleanup step."""
+    end = len(text.rstrip())
+    end = len(text[:end].rstrip('"'))
+    end = len(text[:end].rstrip("'"))
+    return len(text) - end
+
+
+class StreamCleaner:
+    """
+    Incremental version of the cleanup step for streamed LLM output.
+    
+    Joining everything returned by feed() produces exactly
+    ``text.strip().strip('"').strip("'")`` for the full text: leading
+    whitespace/quotes are dropped once real content arrives, and trailing
+    whitespace/quotes are held back until more content follows them.
+    """
+    
+    def __init__(self):
+        """Initialize an empty cleaner."""
+        self._head = ""
+        self._pending = ""
+        self._started = False
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Add a raw chunk and return the cleaned text that is now safe to emit.
+        
+        Args:
+            chunk: Raw text chunk from the LLM
+            
+        Returns:
+            Cleaned text (may be empty)
+        """
+        if not chunk:
+            return ""
+        
+        if not self._started:
+            self._head += chunk
+            lead = _leading_strip_length(self._head)
+            if lead >= len(self._head):
+                return ""
+            self._started = True
+            self._pending = self._head[lead:]
+            self._head = ""
+        else:
+            self._pending += chunk
+        
+        emit_upto = len(self._pending) - _trailing_strip_length(self._pending)
+        ready, self._pending = self._pending[:emit_upto], self._pending[emit_upto:]
+        return ready
+
+
+class StreamStats:
+    """Timing and status information collected while streaming a request."""
+    
+    def __init__(self):
+        """Initialize empty stats."""
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.chars = 0
+        self.status = "pending"
+        self.category: Optional[str] = None
+    
+    def start(self):
+        """Mark the start of the request."""
+        self.started_at = time.perf_counter()
+    
+    def record_chunk(self, chunk: str):
+        """Record a cleaned chunk that was yielded to the caller."""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(chunk)
+    
+    def finish(self, status: str):
+        """Mark the end of the request with its final status."""
+        self.finished_at = time.perf_counter()
+        self.status = status
+    
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds from request start to the first yielded chunk."""
+        if self.started_at is None or self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+    
+    @property
+    def total_time(self) -> Optional[float]:
+        """Seconds from request start to completion."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
 class EnhancedProcessor:
     """
     Enhanced processor that handles both traditional typo fixing and command-based processing.
@@ -25,126 +151,1112 @@ class EnhancedProcessor:
     - Backward compatibility with original typo-fixing functionality
     """
     
-    def __init__(self, llm: Optional[OpenAI] = None):
+    def __init__(self, llm: Optional[LLMBackend] = None, chunk_size: Optional[int] = None,
+                 max_chunk_workers: int = 4, cache: Optional[ResponseCache] = None,
+                 metrics: Optional[StageMetrics] = None,
+                 token_budget: Optional[PromptBudget] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 deadline: Optional[float] = None, backend: Optional[str] = None):
         """
         Initialize the enhanced processor.
         
         Args:
-            llm: Optional LLM instance. If not provided, creates a new OpenAI instance.
+            llm: Optional LLM instance. If not provided, uses the shared client of the backend.
+            chunk_size: Content longer than this many characters is split into
+                        chunks for default (typo-fixing) processing (default: None,
+                        no chunking; create_from_environment enables it)
+            max_chunk_workers: Maximum number of chunks processed concurrently
+            cache: Optional response cache. If not provided, responses are not cached.
+            metrics: Optional stage metrics (default: the global instance, disabled
+                     unless CLIPIQ_METRICS=1)
+            token_budget: Optional prompt token budget. Oversized prompts are then
+                          split on token boundaries or rejected before the LLM call.
+            single_flight: Deduplicates concurrent identical requests (default: a
+                           new SingleFlight; share one between processors to
+                           deduplicate across them)
+            deadline: Default time budget in seconds for each request, covering
+                      parsing, LLM calls and fallbacks (None: unbounded)
+            backend: "direct" (built-in HTTP client and chain) or "langchain"
+                     (LangChain OpenAI client and chain); default: CLIPIQ_BACKEND,
+                     else "langchain"
         """
-        # Initialize components
-        self.command_parser = CommandParser()
-        self.prompt_manager = PromptManager()
+        # Shared, pre-built components (see registry.py)
+        registry = get_registry()
+        self.command_parser = registry.parser()
+        self.prompt_manager = registry.prompt_manager()
+        self.chunk_size = chunk_size
+        self.max_chunk_workers = max_chunk_workers
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else get_stage_metrics()
+        self.token_budget = token_budget
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.deadline = deadline
+        self.backend = backend_from_environment(backend)
         
         # Initialize LLM
         if llm is None:
-            self.llm = OpenAI()
+            # Pooled client: processors share its HTTP connections
+            self.llm = registry.llm(self.backend)
         else:
             self.llm = llm
         
-        # Create cleanup function
-        self.cleanup = RunnableLambda(
-            lambda x: x.strip().strip('"').strip("'")
-        )
-        
-        # Create traditional chain for backward compatibility
+        # Create traditional chain (and cleanup step) for backward compatibility
         self._setup_traditional_chain()
     
+    @property
+    def model_identity(self) -> str:
+        """Identify the model and endpoint responses come from (used in cache keys)."""
+        model = getattr(self.llm, 'model_name', None) or getattr(self.llm, 'model', None)
+        base_url = getattr(self.llm, 'openai_api_base', None) or ''
+        return f"{model or type(self.llm).__name__}@{base_url}"
+    
+    def _lookup_cache(self, category: str, command: str, prompt: str,
+                      use_cache: bool) -> tuple[Optional[str], Optional[str]]:
+        """
+        Look up a rendered prompt in the response cache.
+        
+        Args:
+            category: Template category ('default' for typo fixing)
+            command: Command string (empty for default processing)
+            prompt: Fully rendered prompt
+            use_cache: False to bypass the cache for this request
+            
+        Returns:
+            Tuple of (cache_key, cached_value). The key is None when caching
+            is disabled; the value is None on a miss.
+        """
+        if not use_cache or self.cache is None:
+            return None, None
+        with self.metrics.span("cache", category):
+            key = make_cache_key(category, command, prompt, self.model_identity)
+            return key, self.cache.get(key)
+    
+    def _check_budget(self, prompt: str, content: str) -> Optional[BudgetDecision]:
+        """
+        Check a rendered prompt against the token budget.
+        
+        Args:
+            prompt: Fully rendered prompt
+            content: Content embedded in the prompt
+            
+        Returns:
+            The SPLIT decision if the content must be chunked, otherwise None
+            
+        Raises:
+            TokenBudgetError: If the prompt is too large even when split
+        """
+        if self.token_budget is None:
+            return None
+        decision = self.token_budget.check(prompt, content)
+        return decision if decision.action == BudgetDecision.SPLIT else None
+    
+    def _start_deadline(self, cancel_token: Optional[CancellationToken],
+                        deadline: Optional[float]) -> Optional[CancellationToken]:
+        """
+        Token for one request: a Deadline (linked to cancel_token) when a time
+        budget applies, otherwise cancel_token itself.
+        """
+        seconds = deadline if deadline is not None else self.deadline
+        if seconds is None:
+            return cancel_token
+        return Deadline(seconds, parent=cancel_token)
+    
+    @staticmethod
+    def _end_deadline(token: Optional[CancellationToken], cancel_token: Optional[CancellationToken]):
+        """Stop the timer of a Deadline created by _start_deadline."""
+        if token is not cancel_token:
+            token.close()
+    
+    def _degrade(self, error: DeadlineExceededError, content: str, command: Optional[str],
+                 use_cache: bool) -> tuple[str, str]:
+        """
+        Best result once the deadline has passed.
+        
+        Args:
+            error: The expired deadline
+            content: Content being processed (command removed)
+            command: Command, or None for default processing
+            use_cache: False if the response cache must not be used
+            
+        Returns:
+            Tuple of (result, status): a cached answer for the command (or for
+            its default fallback) with "deadline_cached", otherwise the
+            original content with "deadline_original"
+        """
+        cached = None
+        if use_cache and self.cache is not None:
+            try:
+                if command:
+                    prompt = self.prompt_manager.get_prompt_for_command(content, command)
+                    _, cached = self._lookup_cache(categorize_command(command), command, prompt, True)
+                if cached is None:
+                    prompt = self.prompt_manager.get_default_prompt(content)
+                    _, cached = self._lookup_cache('default', '', prompt, True)
+            except Exception:
+                cached = None
+        if cached is not None:
+            warnings.warn(f"{error}. Returning cached result.")
+            return cached, "deadline_cached"
+        warnings.warn(f"{error}. Returning original content.")
+        return content, "deadline_original"
+    
+    def _process_split(self, content: str, command: Optional[str], decision: BudgetDecision,
+                       use_cache: bool, cancel_token: Optional[CancellationToken] = None) -> str:
+        """Process content that exceeds the token budget as token-sized chunks."""
+        return self.process_chunked(content, command, chunk_size=decision.chunk_tokens,
+                                    length_function=self.token_budget.length_function,
+                                    use_cache=use_cache, cancel_token=cancel_token)
+    
     def _setup_traditional_chain(self):
         """Set up the traditional no_typo chain for backward compatibility."""
         # Get default prompt template
         default_template_str = self.prompt_manager.get_template('default')
         
-        # Create LangChain PromptTemplate
-        default_prompt = PromptTemplate.from_template(default_template_str)
+        if self.backend == "direct":
+            # Same prompt | llm | cleanup steps without LangChain's per-call overhead
+            self.cleanup = OutputCleanup()
+            self.traditional_chain = PromptChain(default_template_str, self.llm, self.cleanup)
+            return
         
-        # Create traditional chain
-        self.traditional_chain = default_prompt | self.llm | self.cleanup
+        from langchain_core.prompts import PromptTemplate
+        from langchain_core.runnables import RunnableLambda
+        
+        # Create LangChain PromptTemplate and chain
+        default_prompt = PromptTemplate.from_template(default_template_str)
+        self.cleanup = RunnableLambda(clean_output)
+        self.traditional_chain = default_prompt | as_runnable(self.llm) | self.cleanup
     
-    def process_clipboard_content(self, clipboard_text: str) -> str:
+    def process_clipboard_content(self, clipboard_text: str, use_cache: bool = True,
+                                  cancel_token: Optional[CancellationToken] = None,
+                                  deadline: Optional[float] = None,
+                                  stats: Optional[StreamStats] = None) -> str:
         """
         Main processing method for clipboard content.
         
         Args:
             clipboard_text: Raw clipboard content that may contain commands
+            use_cache: False to bypass the response cache for this request
+            cancel_token: Optional token that abandons the request when cancelled
+            deadline: Time budget in seconds (default: self.deadline). When it
+                      runs out, a cached answer or the original content is returned.
+            stats: Optional StreamStats filled with the final status ("complete",
+                   "fallback", "deadline_cached" or "deadline_original")
             
         Returns:
             Processed content ready to be copied back to clipboard
+            
+        Raises:
+            CancelledRequestError: If cancel_token was cancelled
         """
+        if stats is None:
+            stats = StreamStats()
+        stats.start()
         if not clipboard_text or not isinstance(clipboard_text, str):
+            stats.finish("complete")
             return clipboard_text or ""
         
+        token = self._start_deadline(cancel_token, deadline)
+        content, command = clipboard_text, None
         try:
             # Parse clipboard content for commands
-            content, command, has_command = self.command_parser.parse_clipboard_content(clipboard_text)
+            with self.metrics.span("parse"):
+                content, command, has_command = self.command_parser.parse_clipboard_content(clipboard_text)
+            raise_if_cancelled(token)
             
             if has_command:
-                return self._process_with_command(content, command)
+                stats.category = categorize_command(command)
+                result = self._process_with_command(content, command, use_cache, token)
+            elif self.chunk_size and len(content) > self.chunk_size:
+                stats.category = "default"
+                result = self.process_chunked(content, use_cache=use_cache, cancel_token=token)
             else:
-                return self._process_default(content)
+                stats.category = "default"
+                result = self._process_default(content, use_cache, token)
+            stats.finish("complete")
+            return result
                 
+        except DeadlineExceededError as e:
+            result, status = self._degrade(e, content, command, use_cache)
+            stats.finish(status)
+            return result
+        except CancelledRequestError:
+            stats.finish("cancelled")
+            raise
         except Exception as e:
             # Fallback to original content if processing fails
             warnings.warn(f"Enhanced processing failed: {e}. Falling back to original content.")
+            stats.finish("fallback")
             return clipboard_text
+        finally:
+            self._end_deadline(token, cancel_token)
     
-    def _process_with_command(self, content: str, command: str) -> str:
+    def _process_with_command(self, content: str, command: str, use_cache: bool = True,
+                              cancel_token: Optional[CancellationToken] = None) -> str:
         """
         Process content with a specific command.
         
         Args:
             content: Cleaned content (command removed)
             command: The command to execute
+            use_cache: False to bypass the response cache
+            cancel_token: Optional token that abandons the request when cancelled
             
         Returns:
             Processed content based on the command
         """
         try:
+            category = categorize_command(command)
+            
             # Generate prompt for the command
-            prompt = self.prompt_manager.get_prompt_for_command(content, command)
+            with self.metrics.span("prompt", category):
+                prompt = self.prompt_manager.get_prompt_for_command(content, command)
+                split = self._check_budget(prompt, content)
+            if split is not None:
+                return self._process_split(content, command, split, use_cache, cancel_token)
             
-            # Process with LLM
-            result = self.llm.invoke(prompt)
+            cache_key, cached = self._lookup_cache(category, command, prompt, use_cache)
+            if cached is not None:
+                return cached
+            raise_if_cancelled(cancel_token)
+            
+            def call_llm() -> str:
+                # Process with LLM
+                with self.metrics.span("llm", category):
+                    result = self.llm.invoke(prompt)
+                
+                # Clean up result
+                with self.metrics.span("cleanup", category):
+                    result = self.cleanup.invoke(result)
+                if cache_key is not None:
+                    self.cache.set(cache_key, result)
+                return result
             
-            # Clean up result
-            return self.cleanup.invoke(result)
+            # Concurrent identical requests share one LLM call
+            result = self.single_flight.do((category, command, content),
+                                           lambda: call_cancellable(call_llm, cancel_token, self._aborts_on_cancel()),
+                                           cancel_token)
+            # A blocking call cannot be interrupted; it is no longer waited for
+            # once the token is cancelled, and a stale result is discarded
+            raise_if_stale(cancel_token)
+            return result
             
+        except CancelledRequestError:
+            raise
+        except (UpstreamUnavailableError, TokenBudgetError) as e:
+            # The default chain would wait on the same unavailable upstream
+            # again, or hit the same token limit
+            warnings.warn(f"{e}. Returning original content.")
+            return content
         except Exception as e:
             # Fallback to default processing if command processing fails
             warnings.warn(f"Command processing failed for '{command}': {e}. Falling back to default processing.")
-            return self._process_default(content)
+            return self._process_default(content, use_cache, cancel_token)
+    
+    def _aborts_on_cancel(self) -> bool:
+        """True if the LLM aborts its own request on cancellation (see call_cancellable)."""
+        return isinstance(self.llm, LLMBackend) and self.llm.aborts_on_cancel
     
-    def _process_default(self, content: str) -> str:
+    def _process_default(self, content: str, use_cache: bool = True,
+                         cancel_token: Optional[CancellationToken] = None) -> str:
         """
         Process content with default typo-fixing behavior.
         
         Args:
             content: Content to process
+            use_cache: False to bypass the response cache
+            cancel_token: Optional token that abandons the request when cancelled
             
         Returns:
             Processed content with typos fixed
         """
         try:
-            # Use traditional chain for backward compatibility
-            return self.traditional_chain.invoke({"text": content})
+            cache_key = None
+            if (use_cache and self.cache is not None) or self.token_budget is not None:
+                with self.metrics.span("prompt", "default"):
+                    prompt = self.prompt_manager.get_default_prompt(content)
+                    split = self._check_budget(prompt, content)
+                if split is not None:
+                    return self._process_split(content, None, split, use_cache, cancel_token)
+                cache_key, cached = self._lookup_cache('default', '', prompt, use_cache)
+                if cached is not None:
+                    return cached
+            raise_if_cancelled(cancel_token)
+            
+            def call_llm() -> str:
+                # Use traditional chain for backward compatibility (prompt, LLM and
+                # cleanup run as one chain, so they are timed together as 'llm')
+                with self.metrics.span("llm", "default"):
+                    result = self.traditional_chain.invoke({"text": content})
+                if cache_key is not None:
+                    self.cache.set(cache_key, result)
+                return result
+            
+            # Concurrent identical requests share one LLM call
+            result = self.single_flight.do(("default", "", content),
+                                           lambda: call_cancellable(call_llm, cancel_token, self._aborts_on_cancel()),
+                                           cancel_token)
+            raise_if_stale(cancel_token)
+            return result
             
+        except CancelledRequestError:
+            raise
         except Exception as e:
             # Ultimate fallback to original content
             warnings.warn(f"Default processing failed: {e}. Returning original content.")
             return content
     
-    def process_with_specific_command(self, content: str, command: str) -> str:
+    def process_chunked(self, content: str, command: Optional[str] = None,
+                        chunk_size: Optional[int] = None,
+                        max_workers: Optional[int] = None,
+                        use_cache: bool = True,
+                        length_function: Optional[Callable[[str], int]] = None,
+                        cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Process large content as independent chunks in parallel.
+        
+        Content is split on paragraph/sentence boundaries, chunks are processed
+        concurrently with bounded parallelism, and the results are joined in
+        order with the original whitespace between them. Each chunk falls back
+        independently, exactly like a single request would.
+        
+        Args:
+            content: Content to process (command already removed)
+            command: Optional command applied to every chunk (default: typo fixing)
+            chunk_size: Maximum chunk size in characters, or in length_function
+                        units (default: self.chunk_size)
+            max_workers: Maximum concurrent chunks (default: self.max_chunk_workers)
+            use_cache: False to bypass the response cache
+            length_function: Optional chunk size measure (e.g. a token counter)
+            cancel_token: Optional token that abandons every chunk when cancelled
+            
+        Returns:
+            Processed content
+        """
+        chunker = TextChunker(chunk_size or self.chunk_size or 4000, length_function)
+        chunked = chunker.split(content)
+        if len(chunked) == 0:
+            return content
+        
+        if command:
+            process_chunk = partial(self._process_with_command, command=command, use_cache=use_cache,
+                                    cancel_token=cancel_token)
+        else:
+            process_chunk = partial(self._process_default, use_cache=use_cache, cancel_token=cancel_token)
+        
+        if len(chunked) == 1:
+            return chunked.reassemble([process_chunk(chunked.chunks[0])])
+        
+        workers = min(max_workers or self.max_chunk_workers, len(chunked))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clipiq-chunk") as executor:
+            processed = list(executor.map(process_chunk, chunked.chunks))
+        return chunked.reassemble(processed)
+    
+    async def aprocess_clipboard_content(self, clipboard_text: str, use_cache: bool = True,
+                                         cancel_token: Optional[CancellationToken] = None,
+                                         deadline: Optional[float] = None,
+                                         stats: Optional[StreamStats] = None) -> str:
+        """
+        Async variant of process_clipboard_content.
+        
+        Uses the LLM's native async invocation, so many requests can run
+        concurrently on one event loop. Fallback behaviour is identical to
+        the synchronous path.
+        
+        Args:
+            clipboard_text: Raw clipboard content that may contain commands
+            use_cache: False to bypass the response cache for this request
+            cancel_token: Optional token that abandons the request when cancelled
+            deadline: Time budget in seconds (default: self.deadline)
+            stats: Optional StreamStats filled with the final status
+            
+        Returns:
+            Processed content ready to be copied back to clipboard
+            
+        Raises:
+            CancelledRequestError: If cancel_token was cancelled
+        """
+        if stats is None:
+            stats = StreamStats()
+        stats.start()
+        if not clipboard_text or not isinstance(clipboard_text, str):
+            stats.finish("complete")
+            return clipboard_text or ""
+        
+        token = self._start_deadline(cancel_token, deadline)
+        content, command = clipboard_text, None
+        try:
+            # Parse clipboard content for commands
+            with self.metrics.span("parse"):
+                content, command, has_command = self.command_parser.parse_clipboard_content(clipboard_text)
+            raise_if_cancelled(token)
+            
+            if has_command:
+                stats.category = categorize_command(command)
+                result = await self._aprocess_with_command(content, command, use_cache, token)
+            elif self.chunk_size and len(content) > self.chunk_size:
+                stats.category = "default"
+                result = await self.aprocess_chunked(content, use_cache=use_cache, cancel_token=token)
+            else:
+                stats.category = "default"
+                result = await self._aprocess_default(content, use_cache, token)
+            stats.finish("complete")
+            return result
+                
+        except DeadlineExceededError as e:
+            result, status = self._degrade(e, content, command, use_cache)
+            stats.finish(status)
+            return result
+        except CancelledRequestError:
+            stats.finish("cancelled")
+            raise
+        except Exception as e:
+            # Fallback to original content if processing fails
+            warnings.warn(f"Enhanced processing failed: {e}. Falling back to original content.")
+            stats.finish("fallback")
+            return clipboard_text
+        finally:
+            self._end_deadline(token, cancel_token)
+    
+    async def _aprocess_with_command(self, content: str, command: str, use_cache: bool = True,
+                                     cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Async variant of _process_with_command.
+        
+        Args:
+            content: Cleaned content (command removed)
+            command: The command to execute
+            use_cache: False to bypass the response cache
+            cancel_token: Optional token that abandons the request when cancelled
+            
+        Returns:
+            Processed content based on the command
+        """
+        try:
+            category = categorize_command(command)
+            with self.metrics.span("prompt", category):
+                prompt = self.prompt_manager.get_prompt_for_command(content, command)
+                split = self._check_budget(prompt, content)
+            if split is not None:
+                return await self.aprocess_chunked(content, command, chunk_size=split.chunk_tokens,
+                                                   length_function=self.token_budget.length_function,
+                                                   use_cache=use_cache, cancel_token=cancel_token)
+            
+            cache_key, cached = self._lookup_cache(category, command, prompt, use_cache)
+            if cached is not None:
+                return cached
+            
+            async def call_llm() -> str:
+                # Cancelling the token cancels the request itself, closing its connection
+                with self.metrics.span("llm", category):
+                    raw_result = await await_cancellable(self.llm.ainvoke(prompt), cancel_token)
+                with self.metrics.span("cleanup", category):
+                    result = self.cleanup.invoke(raw_result)
+                if cache_key is not None:
+                    self.cache.set(cache_key, result)
+                return result
+            
+            return await self.single_flight.ado((category, command, content), call_llm, cancel_token)
+            
+        except CancelledRequestError:
+            raise
+        except (UpstreamUnavailableError, TokenBudgetError) as e:
+            # The default chain would wait on the same unavailable upstream
+            # again, or hit the same token limit
+            warnings.warn(f"{e}. Returning original content.")
+            return content
+        except Exception as e:
+            # Fallback to default processing if command processing fails
+            warnings.warn(f"Command processing failed for '{command}': {e}. Falling back to default processing.")
+            return await self._aprocess_default(content, use_cache, cancel_token)
+    
+    async def _aprocess_default(self, content: str, use_cache: bool = True,
+                                cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Async variant of _process_default.
+        
+        Args:
+            content: Content to process
+            use_cache: False to bypass the response cache
+            cancel_token: Optional token that abandons the request when cancelled
+            
+        Returns:
+            Processed content with typos fixed
+        """
+        try:
+            cache_key = None
+            if (use_cache and self.cache is not None) or self.token_budget is not None:
+                with self.metrics.span("prompt", "default"):
+                    prompt = self.prompt_manager.get_default_prompt(content)
+                    split = self._check_budget(prompt, content)
+                if split is not None:
+                    return await self.aprocess_chunked(content, chunk_size=split.chunk_tokens,
+                                                       length_function=self.token_budget.length_function,
+                                                       use_cache=use_cache, cancel_token=cancel_token)
+                cache_key, cached = self._lookup_cache('default', '', prompt, use_cache)
+                if cached is not None:
+                    return cached
+            
+            async def call_llm() -> str:
+                with self.metrics.span("llm", "default"):
+                    result = await await_cancellable(self.traditional_chain.ainvoke({"text": content}),
+                                                     cancel_token)
+                if cache_key is not None:
+                    self.cache.set(cache_key, result)
+                return result
+            
+            return await self.single_flight.ado(("default", "", content), call_llm, cancel_token)
+            
+        except CancelledRequestError:
+            raise
+        except Exception as e:
+            # Ultimate fallback to original content
+            warnings.warn(f"Default processing failed: {e}. Returning original content.")
+            return content
+    
+    async def aprocess_with_specific_command(self, content: str, command: str, use_cache: bool = True,
+                                             cancel_token: Optional[CancellationToken] = None,
+                                             deadline: Optional[float] = None,
+                                             stats: Optional[StreamStats] = None) -> str:
+        """
+        Async variant of process_with_specific_command.
+        
+        Args:
+            content: Content to process
+            command: Command to execute
+            use_cache: False to bypass the response cache
+            cancel_token: Optional token that abandons the request when cancelled
+            deadline: Time budget in seconds (default: self.deadline)
+            stats: Optional StreamStats filled with the final status
+            
+        Returns:
+            Processed content
+        """
+        if stats is None:
+            stats = StreamStats()
+        stats.start()
+        stats.category = categorize_command(command)
+        token = self._start_deadline(cancel_token, deadline)
+        try:
+            result = await self._aprocess_with_command(content, command, use_cache, token)
+            stats.finish("complete")
+            return result
+        except DeadlineExceededError as e:
+            result, status = self._degrade(e, content, command, use_cache)
+            stats.finish(status)
+            return result
+        except CancelledRequestError:
+            stats.finish("cancelled")
+            raise
+        finally:
+            self._end_deadline(token, cancel_token)
+    
+    async def aprocess_chunked(self, content: str, command: Optional[str] = None,
+                               chunk_size: Optional[int] = None,
+                               max_workers: Optional[int] = None,
+                               use_cache: bool = True,
+                               length_function: Optional[Callable[[str], int]] = None,
+                               cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Async variant of process_chunked, bounded by a semaphore.
+        
+        Args:
+            content: Content to process (command already removed)
+            command: Optional command applied to every chunk (default: typo fixing)
+            chunk_size: Maximum chunk size in characters, or in length_function
+                        units (default: self.chunk_size)
+            max_workers: Maximum concurrent chunks (default: self.max_chunk_workers)
+            use_cache: False to bypass the response cache
+            length_function: Optional chunk size measure (e.g. a token counter)
+            cancel_token: Optional token that abandons every chunk when cancelled
+            
+        Returns:
+            Processed content
+        """
+        chunked = TextChunker(chunk_size or self.chunk_size or 4000, length_function).split(content)
+        if len(chunked) == 0:
+            return content
+        
+        semaphore = asyncio.Semaphore(max_workers or self.max_chunk_workers)
+        
+        async def process_chunk(chunk: str) -> str:
+            async with semaphore:
+                if command:
+                    return await self._aprocess_with_command(chunk, command, use_cache, cancel_token)
+                return await self._aprocess_default(chunk, use_cache, cancel_token)
+        
+        processed = await asyncio.gather(*(process_chunk(chunk) for chunk in chunked.chunks))
+        return chunked.reassemble(list(processed))
+    
+    def stream_clipboard_content(self, clipboard_text: str,
+                                 stats: Optional[StreamStats] = None,
+                                 use_cache: bool = True,
+                                 cancel_token: Optional[CancellationToken] = None,
+                                 deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Streaming variant of process_clipboard_content.
+        
+        Yields cleaned chunks as the LLM produces them. Joining all chunks
+        gives the same text process_clipboard_content would return: content
+        over chunk_size is streamed one chunk at a time with the original
+        whitespace between chunks. Failures before the first chunk fall back
+        exactly like the blocking path; failures mid-stream stop the stream
+        with the partial result.
+        
+        Args:
+            clipboard_text: Raw clipboard content that may contain commands
+            stats: Optional StreamStats filled with time-to-first-token,
+                   total time and final status
+            use_cache: False to bypass the response cache (a hit is yielded
+                       as a single chunk)
+            cancel_token: Optional token that stops the stream when cancelled;
+                          the LLM stream is closed and nothing more is yielded
+            deadline: Time budget in seconds (default: self.deadline). When it
+                      runs out the stream stops with what was already yielded
+                      ("deadline_partial"), or yields a cached answer or the
+                      original content ("deadline_cached"/"deadline_original")
+            
+        Yields:
+            Cleaned text chunks
+            
+        Raises:
+            CancelledRequestError: If cancel_token was cancelled (stats status
+                                   is "cancelled")
+        """
+        if stats is None:
+            stats = StreamStats()
+        stats.start()
+        
+        if not clipboard_text or not isinstance(clipboard_text, str):
+            stats.finish("complete")
+            if clipboard_text:
+                yield clipboard_text
+            return
+        
+        token = self._start_deadline(cancel_token, deadline)
+        try:
+            with self.metrics.span("parse"):
+                content, command, has_command = self.command_parser.parse_clipboard_content(clipboard_text)
+        except Exception as e:
+            self._end_deadline(token, cancel_token)
+            warnings.warn(f"Enhanced processing failed: {e}. Falling back to original content.")
+            stats.record_chunk(clipboard_text)
+            stats.finish("fallback")
+            yield clipboard_text
+            return
+        
+        try:
+            yield from self._stream_content(content, command if has_command else None, stats,
+                                            use_cache, token)
+        except DeadlineExceededError as e:
+            if stats.chunks:
+                warnings.warn(f"{e}. Returning partial result.")
+                stats.finish("deadline_partial")
+                return
+            result, status = self._degrade(e, content, command if has_command else None, use_cache)
+            if result:
+                stats.record_chunk(result)
+            stats.finish(status)
+            if result:
+                yield result
+        except CancelledRequestError:
+            stats.finish("cancelled")
+            raise
+        finally:
+            self._end_deadline(token, cancel_token)
+    
+    def _stream_content(self, content: str, command: Optional[str], stats: StreamStats,
+                        use_cache: bool, cancel_token: Optional[CancellationToken]) -> Iterator[str]:
+        """
+        Stream parsed content with its command, falling back like the blocking path.
+        
+        Cancellation (including an expired deadline) is raised to the caller.
+        """
+        if command:
+            try:
+                raise_if_cancelled(cancel_token)
+                stats.category = categorize_command(command)
+                with self.metrics.span("prompt", stats.category):
+                    prompt = self.prompt_manager.get_prompt_for_command(content, command)
+                    split = self._check_budget(prompt, content)
+                if split is not None:
+                    yield from self._stream_split(content, command, split, stats, use_cache, cancel_token)
+                    stats.finish("complete")
+                    return
+                cache_key, cached = self._lookup_cache(stats.category, command, prompt, use_cache)
+                yield from self._stream_prompt(prompt, stats, cache_key, cached, cancel_token)
+                stats.finish("complete")
+                return
+            except CancelledRequestError:
+                raise
+            except Exception as e:
+                if stats.chunks:
+                    warnings.warn(f"Command streaming failed for '{command}': {e}. Returning partial result.")
+                    stats.finish("partial")
+                    return
+                if isinstance(e, (UpstreamUnavailableError, TokenBudgetError)):
+                    warnings.warn(f"{e}. Returning original content.")
+                    stats.record_chunk(content)
+                    stats.finish("fallback")
+                    yield content
+                    return
+                warnings.warn(f"Command processing failed for '{command}': {e}. Falling back to default processing.")
+        
+        try:
+            raise_if_cancelled(cancel_token)
+            stats.category = "default"
+            if not command and self.chunk_size and len(content) > self.chunk_size:
+                yield from self._stream_chunked(content, stats, use_cache, cancel_token)
+            else:
+                yield from self._stream_default(content, stats, use_cache, cancel_token)
+            stats.finish("complete" if not command else "fallback")
+        except CancelledRequestError:
+            raise
+        except Exception as e:
+            if stats.chunks:
+                warnings.warn(f"Default streaming failed: {e}. Returning partial result.")
+                stats.finish("partial")
+                return
+            warnings.warn(f"Default processing failed: {e}. Returning original content.")
+            stats.record_chunk(content)
+            stats.finish("fallback")
+            yield content
+    
+    def _stream_default(self, content: str, stats: StreamStats, use_cache: bool,
+                        cancel_token: Optional[CancellationToken]) -> Iterator[str]:
+        """Stream content through the default prompt, splitting it if over the token budget."""
+        with self.metrics.span("prompt", "default"):
+            prompt = self.prompt_manager.get_default_prompt(content)
+            split = self._check_budget(prompt, content)
+        if split is not None:
+            yield from self._stream_split(content, None, split, stats, use_cache, cancel_token)
+        else:
+            cache_key, cached = self._lookup_cache('default', '', prompt, use_cache)
+            yield from self._stream_prompt(prompt, stats, cache_key, cached, cancel_token)
+    
+    def _stream_chunked(self, content: str, stats: StreamStats, use_cache: bool,
+                        cancel_token: Optional[CancellationToken]) -> Iterator[str]:
+        """
+        Stream content over chunk_size one chunk at a time, in order.
+        
+        The original whitespace is yielded between chunks, so the joined
+        output matches process_chunked. A chunk that fails before yielding
+        anything is yielded unchanged, like a failed chunk in process_chunked;
+        a failure mid-chunk is raised to the caller.
+        """
+        chunked = TextChunker(self.chunk_size).split(content)
+        for chunk, separator in zip(chunked.chunks, chunked.separators):
+            if separator:
+                stats.record_chunk(separator)
+                yield separator
+            streamed = False
+            try:
+                for piece in self._stream_default(chunk, stats, use_cache, cancel_token):
+                    streamed = True
+                    yield piece
+            except CancelledRequestError:
+                raise
+            except Exception as e:
+                if streamed:
+                    raise
+                warnings.warn(f"Default processing failed: {e}. Returning original content.")
+                stats.record_chunk(chunk)
+                yield chunk
+        if chunked.separators[-1]:
+            stats.record_chunk(chunked.separators[-1])
+            yield chunked.separators[-1]
+    
+    def _stream_prompt(self, prompt: str, stats: StreamStats,
+                       cache_key: Optional[str] = None,
+                       cached: Optional[str] = None,
+                       cancel_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        """
+        Stream a prompt through the LLM, cleaning chunks incrementally.
+        
+        Args:
+            prompt: Fully rendered prompt
+            stats: Stats object updated for every yielded chunk
+            cache_key: Optional key under which the complete result is cached
+            cached: Cached result to yield instead of calling the LLM
+            cancel_token: Optional token checked before every chunk
+            
+        Yields:
+            Cleaned text chunks
+        """
+        raise_if_cancelled(cancel_token)
+        if cached is not None:
+            if cached:
+                stats.record_chunk(cached)
+                yield cached
+            return
+        
+        cleaner = StreamCleaner()
+        chunks = []
+        category = stats.category or "default"
+        started = time.perf_counter()
+        # With a token, waiting for the next chunk stops as soon as it is cancelled
+        stream = iterate_cancellable(self.llm.stream(prompt), cancel_token)
+        try:
+            for raw_chunk in stream:
+                raise_if_cancelled(cancel_token)
+                chunk = cleaner.feed(raw_chunk)
+                if chunk:
+                    if not chunks:
+                        self.metrics.record("first_token", category, time.perf_counter() - started)
+                    stats.record_chunk(chunk)
+                    chunks.append(chunk)
+                    yield chunk
+        finally:
+            # Closing the LLM stream releases its HTTP response (and connection)
+            # right away when the stream is abandoned or cancelled
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        self.metrics.record("llm", category, time.perf_counter() - started)
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, "".join(chunks))
+    
+    def _stream_split(self, content: str, command: Optional[str], decision: BudgetDecision,
+                      stats: StreamStats, use_cache: bool,
+                      cancel_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        """Process over-budget content in parallel chunks and yield it as one chunk."""
+        result = self._process_split(content, command, decision, use_cache, cancel_token)
+        if result:
+            stats.record_chunk(result)
+            yield result
+    
+    def process_with_specific_command(self, content: str, command: str, use_cache: bool = True,
+                                      cancel_token: Optional[CancellationToken] = None,
+                                      deadline: Optional[float] = None,
+                                      stats: Optional[StreamStats] = None) -> str:
         """
         Public method to process content with a specific command.
         
         Args:
             content: Content to process
             command: Command to execute
+            use_cache: False to bypass the response cache
+            cancel_token: Optional token that abandons the request when cancelled
+            deadline: Time budget in seconds (default: self.deadline)
+            stats: Optional StreamStats filled with the final status
             
         Returns:
             Processed content
         """
-        return self._process_with_command(content, command)
+        if stats is None:
+            stats = StreamStats()
+        stats.start()
+        stats.category = categorize_command(command)
+        token = self._start_deadline(cancel_token, deadline)
+        try:
+            result = self._process_with_command(content, command, use_cache, token)
+            stats.finish("complete")
+            return result
+        except DeadlineExceededError as e:
+            result, status = self._degrade(e, content, command, use_cache)
+            stats.finish(status)
+            return result
+        except CancelledRequestError:
+            stats.finish("cancelled")
+            raise
+        finally:
+            self._end_deadline(token, cancel_token)
+    
+    def process_many(self, texts: list[str], max_concurrency: Optional[int] = None,
+                     use_cache: bool = True) -> list[str]:
+        """
+        Process many clipboard texts through the LLM's batch interface.
+        
+        Items are parsed, grouped by template category and dispatched with one
+        batch call per group instead of one invoke per item. Every item falls
+        back independently, exactly like process_clipboard_content: a failed
+        command is retried with default processing (unless the upstream is
+        unavailable), and a failed default returns the item's content.
+        Items with the same command and content are sent once and the result
+        is copied to every duplicate (counted in single_flight.stats()).
+        
+        Args:
+            texts: Raw clipboard texts that may contain commands
+            max_concurrency: Passed to the LLM batch call as max_concurrency
+            use_cache: False to bypass the response cache
+            
+        Returns:
+            Processed texts in input order
+        """
+        results: list[Optional[str]] = [None] * len(texts)
+        command_groups: dict[str, list[tuple[int, str, str]]] = {}
+        default_items: list[tuple[int, str]] = []
+        first_index: dict[tuple[Optional[str], str], int] = {}
+        duplicates: list[tuple[int, int]] = []
+        
+        for index, text in enumerate(texts):
+            if not text or not isinstance(text, str):
+                results[index] = text or ""
+                continue
+            try:
+                content, command, has_command = self.command_parser.parse_clipboard_content(text)
+            except Exception as e:
+                warnings.warn(f"Enhanced processing failed: {e}. Falling back to original content.")
+                results[index] = text
+                continue
+            
+            # Collapse exact duplicates; they are filled in from the first occurrence
+            first = first_index.setdefault((command if has_command else None, content), index)
+            if first != index:
+                duplicates.append((index, first))
+                continue
+            
+            if has_command:
+                command_groups.setdefault(categorize_command(command), []).append((index, content, command))
+            else:
+                default_items.append((index, content))
+        
+        config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        for category, items in command_groups.items():
+            default_items.extend(self._batch_commands(category, items, results, config, use_cache))
+        self._batch_default(default_items, results, config, use_cache)
+        
+        for index, first in duplicates:
+            results[index] = results[first]
+        if duplicates:
+            self.single_flight.record_batch_collapsed(len(duplicates))
+        return results
+    
+    def _batch_commands(self, category: str, items: list[tuple[int, str, str]],
+                        results: list[Optional[str]], config: Optional[dict],
+                        use_cache: bool) -> list[tuple[int, str]]:
+        """
+        Run one category of command items through llm.batch.
+        
+        Args:
+            category: Template category shared by the items
+            items: List of (result index, content, command)
+            results: Result list filled in place
+            config: Optional batch config
+            use_cache: False to bypass the response cache
+            
+        Returns:
+            List of (result index, content) that need default processing
+        """
+        fallbacks = []
+        pending = []
+        prompts = []
+        for index, content, command in items:
+            try:
+                prompt = self.prompt_manager.get_prompt_for_command(content, command)
+                split = self._check_budget(prompt, content)
+                if split is not None:
+                    results[index] = self._process_split(content, command, split, use_cache)
+                    continue
+                cache_key, cached = self._lookup_cache(category, command, prompt, use_cache)
+            except TokenBudgetError as e:
+                warnings.warn(f"{e}. Returning original content.")
+                results[index] = content
+                continue
+            except Exception as e:
+                warnings.warn(f"Command processing failed for '{command}': {e}. Falling back to default processing.")
+                fallbacks.append((index, content))
+                continue
+            if cached is not None:
+                results[index] = cached
+                continue
+            pending.append((index, content, command, cache_key))
+            prompts.append(prompt)
+        
+        if not prompts:
+            return fallbacks
+        
+        try:
+            outputs = self.llm.batch(prompts, config=config, return_exceptions=True)
+        except Exception as e:
+            outputs = [e] * len(prompts)
+        
+        for (index, content, command, cache_key), output in zip(pending, outputs):
+            try:
+                if isinstance(output, Exception):
+                    raise output
+                result = self.cleanup.invoke(output)
+            except UpstreamUnavailableError as e:
+                warnings.warn(f"{e}. Returning original content.")
+                results[index] = content
+                continue
+            except Exception as e:
+                warnings.warn(f"Command processing failed for '{command}': {e}. Falling back to default processing.")
+                fallbacks.append((index, content))
+                continue
+            if cache_key is not None:
+                self.cache.set(cache_key, result)
+            results[index] = result
+        return fallbacks
+    
+    def _batch_default(self, items: list[tuple[int, str]], results: list[Optional[str]],
+                       config: Optional[dict], use_cache: bool):
+        """
+        Run default (typo-fixing) items through traditional_chain.batch.
+        
+        Content over chunk_size is split into chunks that join the same batch
+        and are reassembled afterwards.
+        
+        Args:
+            items: List of (result index, content)
+            results: Result list filled in place
+            config: Optional batch config
+            use_cache: False to bypass the response cache
+        """
+        units = []
+        chunked_items = {}
+        for index, content in items:
+            if self.chunk_size and len(content) > self.chunk_size:
+                chunked = TextChunker(self.chunk_size).split(content)
+                chunked_items[index] = (chunked, list(chunked.chunks))
+                units.extend((index, position, chunk) for position, chunk in enumerate(chunked.chunks))
+            else:
+                units.append((index, None, content))
+        
+        def store(index: int, position: Optional[int], value: str):
+            if position is None:
+                results[index] = value
+            else:
+                chunked_items[index][1][position] = value
+        
+        pending = []
+        for index, position, content in units:
+            cache_key, cached = None, None
+            if (use_cache and self.cache is not None) or self.token_budget is not None:
+                prompt = self.prompt_manager.get_default_prompt(content)
+                try:
+                    split = self._check_budget(prompt, content)
+                except TokenBudgetError as e:
+                    warnings.warn(f"{e}. Returning original content.")
+                    store(index, position, content)
+                    continue
+                if split is not None:
+                    store(index, position, self._process_split(content, None, split, use_cache))
+                    continue
+                cache_key, cached = self._lookup_cache('default', '', prompt, use_cache)
+            if cached is not None:
+                store(index, position, cached)
+            else:
+                pending.append((index, position, content, cache_key))
+        
+        if pending:
+            inputs = [{"text": content} for _, _, content, _ in pending]
+            try:
+                outputs = self.traditional_chain.batch(inputs, config=config, return_exceptions=True)
+            except Exception as e:
+                outputs = [e] * len(inputs)
+            
+            for (index, position, content, cache_key), output in zip(pending, outputs):
+                if isinstance(output, Exception):
+                    # Ultimate fallback to original content
+                    warnings.warn(f"Default processing failed: {output}. Returning original content.")
+                    output = content
+                elif cache_key is not None:
+                    self.cache.set(cache_key, output)
+                store(index, position, output)
+        
+        for index, (chunked, processed) in chunked_items.items():
+            results[index] = chunked.reassemble(processed)
     
     def get_available_commands(self) -> list[str]:
         """
@@ -225,7 +1337,7 @@ class ProcessorFactory:
         return EnhancedProcessor()
     
     @staticmethod
-    def create_processor_with_llm(llm: OpenAI) -> EnhancedProcessor:
+    def create_processor_with_llm(llm: LLMBackend) -> EnhancedProcessor:
         """
         Create processor with custom LLM instance.
         
@@ -237,6 +1349,90 @@ class ProcessorFactory:
         """
         return EnhancedProcessor(llm=llm)
     
+    @staticmethod
+    def create_llm_from_environment():
+        """
+        Create the LLM configured by CLIPIQ_* environment variables.
+        
+        CLIPIQ_BACKEND picks the client ("direct" or "langchain"), CLIPIQ_MODEL
+        its model and CLIPIQ_CHAT_API=1 the chat completions endpoint (direct
+        backend only). Retries and the circuit breaker are on unless
+        CLIPIQ_RESILIENCE=0; hedging is on with CLIPIQ_HEDGE=1; calls wait for
+        RPM/TPM quota when CLIPIQ_RPM, CLIPIQ_TPM or CLIPIQ_RATE_LIMITS are set.
+        
+        Returns:
+            LLM (DirectOpenAI or OpenAI, possibly wrapped by RateLimitedLLM/HedgedLLM/ResilientLLM)
+        """
+        from rate_limit import RateLimitedLLM, configure_from_environment, get_rate_limiter
+        
+        backend = backend_from_environment()
+        resilient = os.getenv("CLIPIQ_RESILIENCE", "1") != "0"
+        # ResilientLLM does the retrying, with a bounded timeout per attempt
+        client_options = {"max_retries": 0, "request_timeout": float(os.getenv("CLIPIQ_LLM_TIMEOUT", "30"))} if resilient else {}
+        if os.getenv("CLIPIQ_MODEL"):
+            client_options["model_name"] = os.getenv("CLIPIQ_MODEL")
+        if os.getenv("CLIPIQ_CHAT_API") == "1":
+            if backend == "direct":
+                client_options["chat"] = True
+            else:
+                warnings.warn("CLIPIQ_CHAT_API=1 needs CLIPIQ_BACKEND=direct; using the completions endpoint.")
+        # Every client for the same backend and model shares one process-wide limiter;
+        # it wraps the raw client so retries and hedges also wait for quota
+        configure_from_environment()
+        
+        def create_client(**options):
+            client = get_registry().llm(backend, **client_options, **options)
+            limiter = get_rate_limiter(client)
+            return RateLimitedLLM(client, limiter) if limiter is not None else client
+        
+        llm = create_client()
+        if os.getenv("CLIPIQ_HEDGE") == "1":
+            # Duplicate slow requests (to CLIPIQ_HEDGE_BASE_URL if set) to cut tail latency
+            from hedging import HedgedLLM
+            alternate_url = os.getenv("CLIPIQ_HEDGE_BASE_URL")
+            llm = HedgedLLM(llm, alternate=create_client(openai_api_base=alternate_url) if alternate_url else None,
+                            max_hedge_rate=float(os.getenv("CLIPIQ_HEDGE_MAX_RATE", "0.1")))
+        if resilient:
+            # Retry 429/5xx with jittered backoff and fail fast while the upstream is down
+            from resilience import ResilientLLM, RetryPolicy
+            llm = ResilientLLM(llm, policy=RetryPolicy(budget=float(os.getenv("CLIPIQ_RETRY_BUDGET", "8"))))
+        return llm
+    
+    @staticmethod
+    def create_from_environment(llm=None) -> EnhancedProcessor:
+        """
+        Create the processor configured by CLIPIQ_* environment variables.
+        
+        Args:
+            llm: Optional LLM (default: create_llm_from_environment())
+            
+        Returns:
+            EnhancedProcessor with the response cache (unless CLIPIQ_CACHE=0),
+            token budget (unless CLIPIQ_TOKEN_BUDGET=0), request deadline
+            (CLIPIQ_DEADLINE seconds, if set) and chunking threshold
+            (CLIPIQ_CHUNK_SIZE characters, default 4000; 0 disables chunking)
+        """
+        from response_cache import create_default_cache
+        
+        if llm is None:
+            llm = ProcessorFactory.create_llm_from_environment()
+        # Cache responses in memory (and on disk if requested) unless CLIPIQ_CACHE=0
+        cache = create_default_cache() if os.getenv("CLIPIQ_CACHE", "1") != "0" else None
+        # Split or reject prompts that do not fit the model before calling it
+        token_budget = None
+        if os.getenv("CLIPIQ_TOKEN_BUDGET", "1") != "0":
+            token_budget = PromptBudget.for_llm(
+                llm,
+                context_tokens=int(os.getenv("CLIPIQ_CONTEXT_TOKENS", "0")) or None,
+                max_prompt_tokens=int(os.getenv("CLIPIQ_MAX_PROMPT_TOKENS", "0")) or None
+            )
+        # Bound every request by CLIPIQ_DEADLINE seconds (unset or 0: no deadline)
+        deadline = float(os.getenv("CLIPIQ_DEADLINE", "0")) or None
+        # Fix long text without a command in parallel chunks (CLIPIQ_CHUNK_SIZE=0: one call)
+        chunk_size = int(os.getenv("CLIPIQ_CHUNK_SIZE", "4000")) or None
+        return EnhancedProcessor(llm=llm, chunk_size=chunk_size, cache=cache, token_budget=token_budget,
+                                 deadline=deadline)
+    
     @staticmethod
     def create_processor_for_testing() -> EnhancedProcessor:
         """
@@ -250,7 +1446,7 @@ class ProcessorFactory:
         return EnhancedProcessor()
 
 
-# Convenience functions for backward compatibility
+# Convenience functions for backward compatibility; they share one processor
 def process_clipboard_content(clipboard_text: str) -> str:
     """
     Convenience function to process clipboard content.
@@ -261,7 +1457,7 @@ def process_clipboard_content(clipboard_text: str) -> str:
     Returns:
         Processed content
     """
-    processor = EnhancedProcessor()
+    processor = get_registry().processor()
     return processor.process_clipboard_content(clipboard_text)
 
 
@@ -276,7 +1472,7 @@ def process_with_command(content: str, command: str) -> str:
     Returns:
         Processed content
     """
-    processor = EnhancedProcessor()
+    processor = get_registry().processor()
     return processor.process_with_specific_command(content, command)
 
 
@@ -291,5 +1487,5 @@ def get_preview_prompt(content: str, command: str = None) -> str:
     Returns:
         Prompt that would be sent to LLM
     """
-    processor = EnhancedProcessor()
+    processor = get_registry().processor()
     return processor.preview_prompt(content, command)
\ No newline at end of file
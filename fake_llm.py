@@ -0,0 +1,300 @@
+"""
+Fake LLM for ClipIQ benchmarks and tests
+
+A LangChain-compatible LLM that never calls a provider. Latency and
+output size are drawn from configurable distributions, so the whole
+EnhancedProcessor pipeline (invoke, stream, batch and async) can be
+measured without network access or API costs.
+"""
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from pydantic import PrivateAttr
+
+
+FILLER_TEXT = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua. "
+)
+
+TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+
+class LatencyDistribution(ABC):
+    """Base class for distributions of non-negative values (seconds or sizes)."""
+
+    @abstractmethod
+    def sample(self, rng: random.Random) -> float:
+        """Draw one value."""
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Return the spec string accepted by parse_distribution."""
+
+
+class ConstantLatency(LatencyDistribution):
+    """Always returns the same value."""
+
+    def __init__(self, value: float):
+        self.value = value
+
+    def sample(self, rng: random.Random) -> float:
+        return self.value
+
+    def describe(self) -> str:
+        return f"constant:{self.value}"
+
+
+class UniformLatency(LatencyDistribution):
+    """Uniformly distributed between low and high."""
+
+    def __init__(self, low: float, high: float):
+        if high < low:
+            raise ValueError("high must not be smaller than low")
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.uniform(self.low, self.high)
+
+    def describe(self) -> str:
+        return f"uniform:{self.low},{self.high}"
+
+
+class LogNormalLatency(LatencyDistribution):
+    """Log-normal with the given median; sigma controls the tail (0.5 ≈ p99 at 3x median)."""
+
+    def __init__(self, median: float, sigma: float):
+        if median <= 0:
+            raise ValueError("median must be positive")
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+    def describe(self) -> str:
+        return f"lognormal:{self.median},{self.sigma}"
+
+
+def parse_distribution(spec: str) -> LatencyDistribution:
+    """
+    Parse a distribution spec.
+
+    Accepted forms: '0.2', 'constant:0.2', 'uniform:0.1,0.5',
+    'lognormal:0.2,0.6' (median, sigma).
+
+    Args:
+        spec: Distribution spec string
+
+    Returns:
+        LatencyDistribution instance
+    """
+    kind, _, arguments = spec.partition(":")
+    if not arguments:
+        return ConstantLatency(float(kind))
+
+    values = [float(value) for value in arguments.split(",")]
+    try:
+        if kind == "constant" and len(values) == 1:
+            return ConstantLatency(values[0])
+        if kind == "uniform" and len(values) == 2:
+            return UniformLatency(*values)
+        if kind == "lognormal" and len(values) == 2:
+            return LogNormalLatency(*values)
+    except ValueError as e:
+        raise ValueError(f"Invalid distribution '{spec}': {e}") from e
+    raise ValueError(f"Unknown distribution spec: '{spec}'")
+
+
+def extract_prompt_text(prompt: str) -> str:
+    """
+    Pull the user text out of a rendered ClipIQ prompt.
+
+    All built-in templates put the text between the first and last blank
+    line; anything else is echoed whole.
+
+    Args:
+        prompt: Rendered prompt
+
+    Returns:
+        The text portion of the prompt
+    """
+    parts = prompt.split("\n\n")
+    if len(parts) >= 3:
+        return "\n\n".join(parts[1:-1])
+    return prompt
+
+
+def make_output(prompt: str, size: Optional[int]) -> str:
+    """
+    Build a fake completion.
+
+    Args:
+        prompt: Rendered prompt
+        size: Output size in characters, or None to echo the prompt text
+
+    Returns:
+        Completion text
+    """
+    if size is None:
+        return extract_prompt_text(prompt)
+    repeats = size // len(FILLER_TEXT) + 1
+    return (FILLER_TEXT * repeats)[:size]
+
+
+def split_tokens(text: str) -> list[str]:
+    """Split text into word-sized streaming tokens (joining them gives text back)."""
+    return TOKEN_PATTERN.findall(text)
+
+
+class FakeLLM(LLM):
+    """
+    LangChain LLM with simulated latency and output size.
+
+    Attributes:
+        latency: Distribution of total request time in seconds
+        output_chars: Distribution of output size in characters (None echoes the prompt text)
+        first_token_fraction: Share of the request time spent before the first streamed token
+        failure_rate: Probability that a call raises FakeLLMError
+        seed: Optional random seed for reproducible runs
+        model_name: Name reported as the model identity
+    """
+
+    latency: Any = ConstantLatency(0.0)
+    output_chars: Any = None
+    first_token_fraction: float = 0.3
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+    model_name: str = "fake-llm"
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+    _simulated_seconds: float = PrivateAttr(default=0.0)
+
+    def model_post_init(self, context: Any) -> None:
+        """Create the random generator after pydantic validation."""
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "clipiq-fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {
+            "model_name": self.model_name,
+            "latency": self.latency.describe(),
+            "output_chars": self.output_chars.describe() if self.output_chars else "echo",
+        }
+
+    @property
+    def calls(self) -> int:
+        """Number of completed or failed calls."""
+        return self._calls
+
+    @property
+    def simulated_seconds(self) -> float:
+        """Total simulated provider time across all calls."""
+        return self._simulated_seconds
+
+    def reset_stats(self):
+        """Reset call counters."""
+        with self._lock:
+            self._calls = 0
+            self._simulated_seconds = 0.0
+
+    def _plan(self, prompt: str) -> tuple[float, str, bool]:
+        """Draw (latency, output, should_fail) for one call."""
+        with self._lock:
+            latency = max(0.0, self.latency.sample(self._rng))
+            size = None
+            if self.output_chars is not None:
+                size = max(0, int(self.output_chars.sample(self._rng)))
+            should_fail = self._rng.random() < self.failure_rate
+            self._calls += 1
+            self._simulated_seconds += latency
+        return latency, make_output(prompt, size), should_fail
+
+    def _call(self, prompt: str, stop: Optional[list[str]] = None,
+              run_manager: Any = None, **kwargs: Any) -> str:
+        latency, output, should_fail = self._plan(prompt)
+        time.sleep(latency)
+        if should_fail:
+            raise FakeLLMError("Simulated provider failure")
+        return output
+
+    def _generate(self, prompts: list[str], stop: Optional[list[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        # A provider serves the prompts of one batch request concurrently
+        if len(prompts) == 1:
+            texts = [self._call(prompts[0], stop=stop, run_manager=run_manager, **kwargs)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+                texts = list(executor.map(
+                    lambda prompt: self._call(prompt, stop=stop, run_manager=run_manager, **kwargs),
+                    prompts
+                ))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _acall(self, prompt: str, stop: Optional[list[str]] = None,
+                     run_manager: Any = None, **kwargs: Any) -> str:
+        latency, output, should_fail = self._plan(prompt)
+        await asyncio.sleep(latency)
+        if should_fail:
+            raise FakeLLMError("Simulated provider failure")
+        return output
+
+    def _stream_schedule(self, prompt: str) -> tuple[float, float, list[str], bool]:
+        """Return (first token delay, per-token delay, tokens, should_fail)."""
+        latency, output, should_fail = self._plan(prompt)
+        tokens = split_tokens(output) or [""]
+        first_delay = latency * self.first_token_fraction
+        per_token = (latency - first_delay) / max(1, len(tokens) - 1)
+        return first_delay, per_token, tokens, should_fail
+
+    def _stream(self, prompt: str, stop: Optional[list[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        first_delay, per_token, tokens, should_fail = self._stream_schedule(prompt)
+        time.sleep(first_delay)
+        if should_fail:
+            raise FakeLLMError("Simulated provider failure")
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(per_token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, prompt: str, stop: Optional[list[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        first_delay, per_token, tokens, should_fail = self._stream_schedule(prompt)
+        await asyncio.sleep(first_delay)
+        if should_fail:
+            raise FakeLLMError("Simulated provider failure")
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(per_token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class FakeLLMError(Exception):
+    """Raised by FakeLLM to simulate a provider failure."""
+
+    # Reported like an HTTP 503 so retry logic treats it as transient
+    status_code = 503
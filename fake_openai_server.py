@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI-compatible server for ClipIQ
+
+A small local server speaking the parts of the OpenAI API used by the
+langchain_community OpenAI client (/v1/completions, plus
+/v1/chat/completions and /v1/models). Responses are echoed, scripted or
+generated at a configurable size, with simulated latency, token-by-token
+streaming, 429/500 injection and dropped connections, so EnhancedProcessor
+and clipiq.py can be load-tested offline.
+
+Usage:
+    python fake_openai_server.py --port 1234 --latency lognormal:0.3,0.5 --error-429 0.05
+    OPENAI_API_BASE=http://127.0.0.1:1234/v1 OPENAI_API_KEY=local python clipiq.py
+"""
+
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+
+from fake_llm import (
+    ConstantLatency, LatencyDistribution, extract_prompt_text, make_output,
+    parse_distribution, split_tokens
+)
+
+
+class FakeOpenAIServer:
+    """
+    Threaded OpenAI-compatible HTTP server with fault injection.
+
+    Attributes:
+        latency: Distribution of total response time in seconds
+        output_chars: Output size distribution (None echoes the prompt text)
+        responses: Scripted responses returned in turn (overrides echo/size)
+        first_token_fraction: Share of the response time spent before the first streamed token
+        error_429_rate: Probability of answering 429 Too Many Requests
+        error_500_rate: Probability of answering 500 Internal Server Error
+        drop_rate: Probability of dropping the connection (mid-stream when streaming)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1234,
+                 latency: Optional[LatencyDistribution] = None,
+                 output_chars: Optional[LatencyDistribution] = None,
+                 responses: Optional[list[str]] = None,
+                 first_token_fraction: float = 0.3,
+                 error_429_rate: float = 0.0, error_500_rate: float = 0.0,
+                 drop_rate: float = 0.0, retry_after: float = 1.0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the server (call start() or serve_forever() to run it).
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Response time distribution (default: no delay)
+            output_chars: Output size distribution (default: echo)
+            responses: Scripted responses, cycled in order
+            first_token_fraction: Share of latency before the first streamed token
+            error_429_rate: Probability of a 429 response
+            error_500_rate: Probability of a 500 response
+            drop_rate: Probability of closing the connection without a complete response
+            retry_after: Retry-After header value for 429 responses
+            seed: Optional random seed
+        """
+        self.latency = latency or ConstantLatency(0.0)
+        self.output_chars = output_chars
+        self.responses = list(responses or [])
+        self.first_token_fraction = first_token_fraction
+        self.error_429_rate = error_429_rate
+        self.error_500_rate = error_500_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._response_index = 0
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self.streams = 0
+        self.errors_429 = 0
+        self.errors_500 = 0
+        self.drops = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass as openai_api_base / base_url."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        """
+        Serve on a background thread.
+
+        Returns:
+            The server itself, for chaining
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted."""
+        self.httpd.serve_forever()
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self) -> dict:
+        """
+        Get request counters.
+
+        Returns:
+            Dictionary with request, stream, error and drop counts
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "streams": self.streams,
+                "errors_429": self.errors_429,
+                "errors_500": self.errors_500,
+                "drops": self.drops,
+            }
+
+    def plan(self, stream: bool) -> tuple[Optional[str], float]:
+        """
+        Decide the outcome of one request.
+
+        Returns:
+            (fault, latency) where fault is None, '429', '500' or 'drop'
+        """
+        with self._lock:
+            self.requests += 1
+            self.streams += stream
+            roll = self._rng.random()
+            latency = max(0.0, self.latency.sample(self._rng))
+            if roll < self.error_429_rate:
+                self.errors_429 += 1
+                return "429", latency
+            roll -= self.error_429_rate
+            if roll < self.error_500_rate:
+                self.errors_500 += 1
+                return "500", latency
+            roll -= self.error_500_rate
+            if roll < self.drop_rate:
+                self.drops += 1
+                return "drop", latency
+            return None, latency
+
+    def completion_text(self, prompt: str) -> str:
+        """Build the response text for one prompt."""
+        with self._lock:
+            if self.responses:
+                text = self.responses[self._response_index % len(self.responses)]
+                self._response_index += 1
+                return text
+            size = None
+            if self.output_chars is not None:
+                size = max(0, int(self.output_chars.sample(self._rng)))
+        return make_output(prompt, size)
+
+
+def _count_tokens(text: str) -> int:
+    """Rough token count for the usage block."""
+    return len(split_tokens(text))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler; the FakeOpenAIServer is available as self.server.app."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOpenAI/1.0"
+    # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        """Keep load tests quiet."""
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "fake-model", "object": "model", "created": 0, "owned_by": "clipiq"}
+            ]})
+        else:
+            self._send_error(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Request body is not valid JSON", "invalid_request_error")
+            return
+
+        path = self.path.rstrip("/")
+        if path == "/v1/completions":
+            prompt = body.get("prompt", "")
+            prompts = prompt if isinstance(prompt, list) else [prompt]
+            chat = False
+        elif path == "/v1/chat/completions":
+            messages = body.get("messages") or [{}]
+            prompts = [str(messages[-1].get("content", ""))]
+            chat = True
+        else:
+            self._send_error(404, f"Unknown path {self.path}", "invalid_request_error")
+            return
+
+        app = self.server.app
+        stream = bool(body.get("stream"))
+        fault, latency = app.plan(stream)
+        model = body.get("model", "fake-model")
+
+        if fault == "429":
+            time.sleep(latency * app.first_token_fraction)
+            self._send_error(429, "Rate limit reached (injected)", "rate_limit_exceeded",
+                             {"Retry-After": str(app.retry_after)})
+            return
+        if fault == "500":
+            time.sleep(latency * app.first_token_fraction)
+            self._send_error(500, "The server had an error (injected)", "server_error")
+            return
+
+        texts = [app.completion_text(prompt) for prompt in prompts]
+        if stream:
+            self._stream(texts, chat, model, latency, app.first_token_fraction, drop=fault == "drop")
+            return
+
+        time.sleep(latency)
+        if fault == "drop":
+            self._drop()
+            return
+        self._send_json(200, self._completion_body(prompts, texts, chat, model))
+
+    def _completion_body(self, prompts: list[str], texts: list[str], chat: bool, model: str) -> dict:
+        """Build a non-streaming response."""
+        if chat:
+            choices = [{"index": 0, "message": {"role": "assistant", "content": texts[0]},
+                        "finish_reason": "stop"}]
+        else:
+            choices = [{"index": i, "text": text, "logprobs": None, "finish_reason": "stop"}
+                       for i, text in enumerate(texts)]
+        prompt_tokens = sum(_count_tokens(extract_prompt_text(p)) for p in prompts)
+        completion_tokens = sum(_count_tokens(text) for text in texts)
+        return {
+            "id": f"cmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion" if chat else "text_completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _stream(self, texts: list[str], chat: bool, model: str, latency: float,
+                first_token_fraction: float, drop: bool):
+        """Send an SSE stream, one token per event, using chunked encoding."""
+        streams = [(index, split_tokens(text) or [""]) for index, text in enumerate(texts)]
+        total_tokens = sum(len(tokens) for _, tokens in streams)
+        first_delay = latency * first_token_fraction
+        per_token = (latency - first_delay) / max(1, total_tokens - 1)
+        drop_after = total_tokens // 2 if drop else None
+        completion_id = f"cmpl-{uuid.uuid4().hex[:24]}"
+
+        time.sleep(first_delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            sent = 0
+            for index, tokens in streams:
+                for token in tokens:
+                    if sent and per_token:
+                        time.sleep(per_token)
+                    if drop_after is not None and sent >= drop_after:
+                        self._drop()
+                        return
+                    self._write_event(self._chunk(completion_id, model, chat, index, token, None))
+                    sent += 1
+                self._write_event(self._chunk(completion_id, model, chat, index, "", "stop"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    @staticmethod
+    def _chunk(completion_id: str, model: str, chat: bool, index: int, token: str,
+               finish_reason: Optional[str]) -> dict:
+        """Build one streaming event."""
+        if chat:
+            choice = {"index": index, "delta": {"content": token} if token else {},
+                      "finish_reason": finish_reason}
+        else:
+            choice = {"index": index, "text": token, "logprobs": None, "finish_reason": finish_reason}
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk" if chat else "text_completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [choice],
+        }
+
+    def _write_event(self, data: dict):
+        """Write one SSE event."""
+        self._write_chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, payload: bytes):
+        """Write one HTTP chunk (an empty payload ends the body)."""
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _drop(self):
+        """Close the connection abruptly."""
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _send_json(self, status: int, data: dict, headers: Optional[dict] = None):
+        """Send a JSON response."""
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, message: str, error_type: str, headers: Optional[dict] = None):
+        """Send an OpenAI-style error body."""
+        self._send_json(status, {"error": {"message": message, "type": error_type,
+                                           "param": None, "code": error_type}}, headers)
+
+
+def load_responses(path: str) -> list[str]:
+    """
+    Load scripted responses.
+
+    A .jsonl file holds one JSON string (or object with a 'text' field) per
+    line; any other file holds one response per line.
+
+    Args:
+        path: Responses file path
+
+    Returns:
+        List of responses
+    """
+    responses = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            if path.endswith(".jsonl"):
+                data = json.loads(line)
+                responses.append(data["text"] if isinstance(data, dict) else str(data))
+            else:
+                responses.append(line.rstrip("\n"))
+    return responses
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    """Run the server from the command line."""
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server for load testing")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=1234, help="port to bind (default: 1234)")
+    parser.add_argument("--latency", default="0", help="response time distribution, e.g. lognormal:0.3,0.5")
+    parser.add_argument("--output-chars", help="output size distribution (default: echo the input)")
+    parser.add_argument("--responses", help="file with scripted responses (one per line, or .jsonl)")
+    parser.add_argument("--first-token-fraction", type=float, default=0.3,
+                        help="share of latency before the first streamed token")
+    parser.add_argument("--error-429", type=float, default=0.0, help="probability of a 429 response")
+    parser.add_argument("--error-500", type=float, default=0.0, help="probability of a 500 response")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability of a dropped connection")
+    parser.add_argument("--seed", type=int, help="random seed")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency=parse_distribution(args.latency),
+        output_chars=parse_distribution(args.output_chars) if args.output_chars else None,
+        responses=load_responses(args.responses) if args.responses else None,
+        first_token_fraction=args.first_token_fraction,
+        error_429_rate=args.error_429,
+        error_500_rate=args.error_500,
+        drop_rate=args.drop,
+        seed=args.seed
+    )
+    print(f"🧪 Fake OpenAI server on {server.base_url}")
+    print(f"   export OPENAI_API_BASE={server.base_url} OPENAI_API_KEY=local")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats()}")
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Hedged LLM Requests for ClipIQ
+
+Cuts tail latency by hedging: when the primary call has not answered
+within a percentile of recently observed latency, a duplicate request is
+sent to the same or an alternate backend and whichever finishes first
+wins. A hard cap on the hedge rate bounds the extra cost.
+
+HedgedLLM implements the LLMBackend interface, so it can replace the LLM
+anywhere in EnhancedProcessor (including the prompt | llm | cleanup chain).
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from llm_backend import LLMBackend
+
+from metrics import RollingHistogram
+
+
+class HedgedLLM(LLMBackend):
+    """
+    LLM wrapper that hedges invoke/ainvoke calls to an LLM.
+
+    Streaming and batch calls are passed to the primary unchanged.
+    Attributes not defined here (model_name, openai_api_base, ...) are read
+    from the primary, so cache keys and model identity are unaffected.
+    """
+
+    def __init__(self, primary: LLMBackend, alternate: Optional[LLMBackend] = None,
+                 percentile: float = 0.95, min_delay: float = 0.05,
+                 initial_delay: Optional[float] = None, min_samples: int = 20,
+                 max_hedge_rate: float = 0.1, window: int = 200, max_workers: int = 16,
+                 max_hedge_workers: int = 4):
+        """
+        Initialize the hedged LLM.
+
+        Args:
+            primary: LLM (or runnable) receiving every request
+            alternate: Optional backend for hedges (default: the primary again)
+            percentile: Hedge once the primary is slower than this percentile of recent latency
+            min_delay: Never hedge earlier than this many seconds
+            initial_delay: Hedge delay used before min_samples latencies are known
+                           (None disables hedging until then)
+            min_samples: Latencies needed before the percentile is trusted
+            max_hedge_rate: Maximum share of recent and in-flight requests that may be hedged
+            window: Number of recent requests used for latency and hedge rate
+            max_workers: Threads available for concurrent synchronous primary calls
+            max_hedge_workers: Threads reserved for synchronous hedges, so a busy
+                               primary pool never delays a hedge; a hedge is
+                               skipped while all of them are busy
+        """
+        if not 0.0 <= max_hedge_rate <= 1.0:
+            raise ValueError("max_hedge_rate must be between 0 and 1")
+        self.primary = primary
+        self.alternate = alternate
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.max_hedge_workers = max_hedge_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clipiq-primary")
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max_hedge_workers, thread_name_prefix="clipiq-hedge")
+        self._lock = threading.Lock()
+        self._primary_latency = RollingHistogram(window)
+        self._observed_latency = RollingHistogram(window)
+        self._recent_hedges: deque[bool] = deque(maxlen=window)
+        self._recent_hedge_count = 0
+        # Requests and hedges that have not finished yet count toward the cap
+        self._in_flight = 0
+        self._in_flight_hedges = 0
+        self._busy_hedge_workers = 0
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.skipped_rate_cap = 0
+        self.skipped_busy = 0
+        self.saved_seconds = 0.0
+        self.saved_samples = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes missing on the wrapper itself
+        if name == "primary":
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds to wait for the primary before hedging.
+
+        Returns:
+            Delay in seconds, or None if hedging is not possible yet
+        """
+        with self._lock:
+            if self._primary_latency.count < self.min_samples:
+                delay = self.initial_delay
+            else:
+                delay = self._primary_latency.percentile(self.percentile)
+        return None if delay is None else max(self.min_delay, delay)
+
+    def _start_request(self):
+        """Count a new request."""
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+
+    def _allow_hedge(self, needs_worker: bool = False) -> bool:
+        """
+        Reserve a hedge if the hedge rate stays within the cap.
+
+        The rate counts finished requests in the window plus requests and
+        hedges still in flight, so many concurrent slow calls cannot all
+        hedge before any of them finishes.
+
+        Args:
+            needs_worker: Also reserve a hedge worker thread (synchronous calls)
+        """
+        with self._lock:
+            hedges = self._recent_hedge_count + self._in_flight_hedges + 1
+            if hedges / (len(self._recent_hedges) + self._in_flight) > self.max_hedge_rate:
+                self.skipped_rate_cap += 1
+                return False
+            if needs_worker:
+                if self._busy_hedge_workers >= self.max_hedge_workers:
+                    self.skipped_busy += 1
+                    return False
+                self._busy_hedge_workers += 1
+            self._in_flight_hedges += 1
+            self.hedged += 1
+            return True
+
+    def _release_hedge_worker(self, future: Future):
+        """Free a hedge worker once its call has finished (losers run to completion)."""
+        with self._lock:
+            self._busy_hedge_workers -= 1
+
+    def _finish_request(self, latency: float, hedged: bool):
+        """Record the latency the caller observed and whether it was hedged."""
+        with self._lock:
+            self._in_flight -= 1
+            self._in_flight_hedges -= hedged
+            self._observed_latency.observe(latency)
+            if len(self._recent_hedges) == self._recent_hedges.maxlen and self._recent_hedges[0]:
+                self._recent_hedge_count -= 1
+            self._recent_hedges.append(hedged)
+            self._recent_hedge_count += hedged
+
+    def _record_primary(self, latency: float):
+        """Record how long the primary took (also when a hedge beat it)."""
+        with self._lock:
+            self._primary_latency.observe(latency)
+
+    def _record_winner(self, hedge_won: bool):
+        """Count who won a hedged race."""
+        with self._lock:
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+
+    def _record_saved(self, saved: float):
+        """Record the latency a hedge win saved compared with the losing primary."""
+        with self._lock:
+            self.saved_seconds += saved
+            self.saved_samples += 1
+
+    def _timed_call(self, runnable: LLMBackend, input: Any, config: Any, kwargs: dict) -> tuple[Any, float]:
+        """Invoke a runnable and return (result, seconds)."""
+        start = time.perf_counter()
+        result = runnable.invoke(input, config, **kwargs)
+        return result, time.perf_counter() - start
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        """Invoke the primary, hedging if it is slower than the recent percentile."""
+        self._start_request()
+        start = time.perf_counter()
+        delay = self.hedge_delay()
+        # Calls run in a copy of the caller's context, so both follow its cancellation token
+        primary: Future = self._executor.submit(contextvars.copy_context().run, self._timed_call,
+                                                self.primary, input, config, kwargs)
+
+        if delay is None or wait([primary], timeout=delay).done or not self._allow_hedge(needs_worker=True):
+            try:
+                result, latency = primary.result()
+            finally:
+                self._finish_request(time.perf_counter() - start, False)
+            self._record_primary(latency)
+            return result
+
+        # Hedges have their own threads: primaries filling their pool must not queue them
+        hedge = self._hedge_executor.submit(contextvars.copy_context().run, self._timed_call,
+                                            self.alternate or self.primary, input, config, kwargs)
+        hedge.add_done_callback(self._release_hedge_worker)
+        try:
+            done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+            winner = primary if primary in done and primary.exception() is None else hedge
+            if winner is hedge and hedge.done() and hedge.exception() is not None:
+                # The hedge failed first: the primary is the only hope
+                winner = primary
+            result, _ = winner.result()
+        finally:
+            self._finish_request(time.perf_counter() - start, True)
+
+        elapsed = time.perf_counter() - start
+        if winner is primary:
+            self._record_primary(result_latency(primary))
+            self._record_winner(hedge_won=False)
+            hedge.cancel()
+        else:
+            self._record_winner(hedge_won=True)
+
+            # Synchronous HTTP calls cannot be interrupted; the losing primary
+            # finishes in the background and tells us how much time was saved
+            def primary_done(future: Future):
+                if future.cancelled() or future.exception() is not None:
+                    return
+                latency = result_latency(future)
+                self._record_primary(latency)
+                self._record_saved(max(0.0, latency - elapsed))
+            primary.add_done_callback(primary_done)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        """Async variant of invoke; the losing request is cancelled."""
+        self._start_request()
+        start = time.perf_counter()
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self.primary.ainvoke(input, config, **kwargs))
+
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        if delay is None or primary.done() or not self._allow_hedge():
+            try:
+                result = await primary
+            finally:
+                self._finish_request(time.perf_counter() - start, False)
+            self._record_primary(time.perf_counter() - start)
+            return result
+
+        hedge = asyncio.ensure_future((self.alternate or self.primary).ainvoke(input, config, **kwargs))
+        try:
+            done, pending = await asyncio.wait({primary, hedge}, return_when=asyncio.FIRST_COMPLETED)
+            winner = done.pop()
+            if winner.exception() is not None and pending:
+                done, pending = await asyncio.wait(pending)
+                winner = done.pop()
+            for task in pending:
+                task.cancel()
+            result = winner.result()
+        finally:
+            self._finish_request(time.perf_counter() - start, True)
+
+        if winner is primary:
+            self._record_primary(time.perf_counter() - start)
+            self._record_winner(hedge_won=False)
+        else:
+            # The primary was cancelled, so neither its latency nor the time
+            # saved is known; recording a censored value would bias the percentile
+            self._record_winner(hedge_won=True)
+        return result
+
+    def stream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Iterator[Any]:
+        """Stream from the primary (not hedged)."""
+        yield from self.primary.stream(input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """Async stream from the primary (not hedged)."""
+        async for chunk in self.primary.astream(input, config, **kwargs):
+            yield chunk
+
+    def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+              **kwargs: Any) -> list:
+        """Batch through the primary (not hedged)."""
+        return self.primary.batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+    async def abatch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+                     **kwargs: Any) -> list:
+        """Async batch through the primary (not hedged)."""
+        return await self.primary.abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Get hedging counters and latency percentiles.
+
+        primary_* percentiles estimate latency without hedging (they include
+        synchronous primaries that lost the race); observed_* is what callers
+        saw. Time saved is measured for synchronous hedge wins only, since
+        async losers are cancelled before they finish.
+
+        Returns:
+            Dictionary with counters, hedge rate, latency saved and percentiles
+        """
+        with self._lock:
+            primary = self._primary_latency.snapshot()
+            observed = self._observed_latency.snapshot()
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "skipped_rate_cap": self.skipped_rate_cap,
+                "skipped_busy": self.skipped_busy,
+                "saved_ms_total": self.saved_seconds * 1000,
+                "saved_ms_per_hedge_win": self.saved_seconds * 1000 / self.saved_samples if self.saved_samples else 0.0,
+                "primary_p50_ms": primary["p50_ms"],
+                "primary_p99_ms": primary["p99_ms"],
+                "observed_p50_ms": observed["p50_ms"],
+                "observed_p99_ms": observed["p99_ms"],
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._hedge_executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def result_latency(future: Future) -> float:
+    """Latency recorded by a finished _timed_call future."""
+    return future.result()[1]
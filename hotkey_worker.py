@@ -0,0 +1,262 @@
+"""
+Hotkey Worker for ClipIQ
+
+Moves clipboard processing off the pynput hotkey callback thread. The
+callback only snapshots the clipboard and submits a job; a small pool of
+worker threads runs the (slow) LLM round-trip in the background.
+
+Every job carries a CancellationToken. With supersede=True a new press
+cancels the job in flight, so its LLM call is abandoned and its result
+can no longer reach the clipboard (see HotkeyWorker.commit).
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from cancellation import CancellationToken
+
+
+class HotkeyJob:
+    """A single unit of work submitted from a hotkey press."""
+
+    def __init__(self, text: str):
+        """
+        Initialize the job.
+
+        Args:
+            text: Clipboard snapshot taken when the hotkey was pressed
+        """
+        self.text = text
+        self.token = CancellationToken()
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """True once the job was superseded or cancelled."""
+        return self.token.cancelled
+
+    @property
+    def queue_time(self) -> float:
+        """Seconds the job waited in the queue before a worker picked it up."""
+        if self.started_at is None:
+            return 0.0
+        return self.started_at - self.submitted_at
+
+
+class HotkeyWorker:
+    """
+    Bounded, coalescing job queue served by a pool of worker threads.
+
+    - Duplicate presses for text that is already queued or being processed
+      are coalesced into the existing job.
+    - When the queue is full the oldest pending job is dropped, since the
+      most recent press is the one the user is waiting for.
+    - With supersede=True a press for new text cancels every job in flight
+      and drops every pending job, so the newest press runs next.
+    """
+
+    def __init__(self, handler: Callable[[HotkeyJob], None], num_workers: int = 1,
+                 max_queue_size: int = 4,
+                 on_drop: Optional[Callable[[HotkeyJob], None]] = None,
+                 supersede: bool = False):
+        """
+        Initialize the worker pool.
+
+        Args:
+            handler: Callable run on a worker thread for every job
+            num_workers: Number of worker threads
+            max_queue_size: Maximum number of pending (not yet started) jobs
+            on_drop: Optional callback invoked when a pending job is evicted
+            supersede: Cancel older jobs when new text is submitted
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1")
+
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self.on_drop = on_drop
+        self.supersede = supersede
+
+        self._pending: deque[HotkeyJob] = deque()
+        self._in_flight: list[HotkeyJob] = []
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._running = False
+
+        # Counters
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def start(self) -> "HotkeyWorker":
+        """
+        Start the worker threads.
+
+        Returns:
+            The worker itself, for chaining
+        """
+        with self._condition:
+            if self._running:
+                return self
+            self._running = True
+
+        for i in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"clipiq-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, text: str) -> bool:
+        """
+        Submit clipboard text for background processing.
+
+        This never blocks on processing and is safe to call from the
+        hotkey callback thread.
+
+        Args:
+            text: Clipboard snapshot
+
+        Returns:
+            True if a new job was queued, False if it was coalesced
+        """
+        dropped_jobs = []
+        with self._condition:
+            # A cancelled job's result will be discarded, so it cannot absorb a new press
+            in_flight = any(job.text == text and not job.cancelled for job in self._in_flight)
+            if in_flight or any(job.text == text for job in self._pending):
+                self.coalesced += 1
+                return False
+
+            if self.supersede:
+                dropped_jobs = self._cancel_locked("superseded by a newer hotkey press")
+            elif len(self._pending) >= self.max_queue_size:
+                dropped_jobs.append(self._pending.popleft())
+                self.dropped += 1
+
+            self._pending.append(HotkeyJob(text))
+            self.submitted += 1
+            self._condition.notify()
+
+        if self.on_drop:
+            for job in dropped_jobs:
+                self.on_drop(job)
+        return True
+
+    def cancel_in_flight(self, reason: str = "cancelled", keep: Optional[str] = None) -> int:
+        """
+        Cancel every running job and drop every pending one.
+
+        Args:
+            reason: Why the jobs were cancelled
+            keep: Text whose job (running or pending) is left alone
+
+        Returns:
+            Number of running jobs that were cancelled
+        """
+        with self._condition:
+            running = sum(1 for job in self._in_flight if not job.cancelled and job.text != keep)
+            dropped_jobs = self._cancel_locked(reason, keep)
+        if self.on_drop:
+            for job in dropped_jobs:
+                self.on_drop(job)
+        return running
+
+    def _cancel_locked(self, reason: str, keep: Optional[str] = None) -> list[HotkeyJob]:
+        """Cancel running jobs and drop pending ones; returns the dropped jobs."""
+        for job in self._in_flight:
+            if job.text != keep:
+                job.token.cancel(reason)
+        dropped_jobs = [job for job in self._pending if job.text != keep]
+        for job in dropped_jobs:
+            self._pending.remove(job)
+            job.token.cancel(reason)
+        self.dropped += len(dropped_jobs)
+        return dropped_jobs
+
+    def commit(self, job: HotkeyJob, action: Callable[[], None]) -> bool:
+        """
+        Run action (e.g. the clipboard write) unless the job was cancelled.
+
+        The check and the action run under the worker's lock, so a job
+        cannot be superseded between deciding to write and writing.
+
+        Returns:
+            True if action ran, False if the job was stale
+        """
+        with self._condition:
+            if job.cancelled:
+                return False
+            action()
+            return True
+
+    def pending_count(self) -> int:
+        """Return the number of jobs waiting for a worker."""
+        with self._condition:
+            return len(self._pending)
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None):
+        """
+        Stop the worker threads. Pending jobs are discarded.
+
+        Args:
+            wait: Whether to wait for in-flight jobs to finish
+            timeout: Maximum seconds to wait per worker thread
+        """
+        with self._condition:
+            self._running = False
+            self._pending.clear()
+            self._condition.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout)
+        self._threads = []
+
+    def _next_job(self) -> Optional[HotkeyJob]:
+        """Block until a job is available or the worker is stopped."""
+        with self._condition:
+            while self._running and not self._pending:
+                self._condition.wait()
+            if not self._running:
+                return None
+            job = self._pending.popleft()
+            self._in_flight.append(job)
+            return job
+
+    def _worker_loop(self):
+        """Main loop for a worker thread."""
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            job.started_at = time.perf_counter()
+            try:
+                self.handler(job)
+                succeeded = True
+            except Exception:
+                # The handler reports its own errors (a cancelled job raises
+                # CancelledRequestError); keep the worker alive
+                succeeded = False
+            job.finished_at = time.perf_counter()
+            with self._condition:
+                self._in_flight.remove(job)
+                if job.cancelled:
+                    self.cancelled += 1
+                elif succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
@@ -0,0 +1,673 @@
+"""
+LLM Backends for ClipIQ
+
+EnhancedProcessor talks to its LLM through a small interface, LLMBackend:
+invoke/ainvoke, stream/astream and batch/abatch, with the same signatures
+as LangChain's Runnable. LangChain LLMs, the wrappers in resilience.py,
+rate_limit.py and hedging.py, and the built-in DirectOpenAI client all
+provide it, so they can be stacked and swapped freely.
+
+DirectOpenAI is a minimal client for OpenAI-compatible /completions and
+/chat/completions endpoints. It uses only the standard library, keeps a
+pool of keep-alive connections, streams server-sent events and aborts the
+connection of a cancelled call (an async call, or a blocking one running
+under a cancellation token). Together with PromptChain and
+OutputCleanup (the prompt | llm | cleanup chain without LangChain) it keeps
+LangChain off the request path and out of the import graph.
+
+The backend is chosen with CLIPIQ_BACKEND: "langchain" (default;
+langchain_community's OpenAI client and a LangChain chain) or "direct"
+(opt-in; it does not honour HTTP(S)_PROXY).
+"""
+
+import asyncio
+import contextvars
+import http.client
+import itertools
+import json
+import os
+import socket
+import ssl
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Iterator, Optional
+from urllib.parse import urlsplit
+
+from cancellation import CancellationToken, current_token
+from registry import get_registry
+
+BACKENDS = ("direct", "langchain")
+DEFAULT_BACKEND = "langchain"
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+# Defaults of langchain_community's OpenAI client, so both backends answer alike
+DEFAULT_COMPLETION_MODEL = "gpt-3.5-turbo-instruct"
+DEFAULT_CHAT_MODEL = "gpt-3.5-turbo"
+DEFAULT_TEMPERATURE = 0.7
+DEFAULT_MAX_TOKENS = 256
+# Prompts per /completions request in batch()
+BATCH_SIZE = 20
+# Threads running the blocking calls behind ainvoke (see _async_executor)
+ASYNC_WORKERS = 32
+
+_async_pool: Optional[ThreadPoolExecutor] = None
+_async_pool_lock = threading.Lock()
+
+
+def backend_from_environment(backend: Optional[str] = None) -> str:
+    """
+    Resolve the backend name.
+
+    Args:
+        backend: Explicit backend name (default: CLIPIQ_BACKEND, else "langchain")
+
+    Returns:
+        "direct" or "langchain"
+
+    Raises:
+        ValueError: If the name is not a known backend
+    """
+    name = (backend or os.getenv("CLIPIQ_BACKEND") or DEFAULT_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return name
+
+
+def prompt_text(input: Any) -> str:
+    """Prompt string from a str or a LangChain PromptValue."""
+    to_string = getattr(input, "to_string", None)
+    return to_string() if callable(to_string) else str(input)
+
+
+def clean_output(text: str) -> str:
+    """The cleanup step: strip whitespace and surrounding quotes."""
+    return text.strip().strip('"').strip("'")
+
+
+def _async_executor() -> ThreadPoolExecutor:
+    """
+    The pool that runs blocking calls for async callers, created on first use.
+
+    DirectOpenAI (and backends without native async) do blocking HTTP, so
+    at most ASYNC_WORKERS async calls are in flight at once; the others
+    wait for a thread. The pool is separate from the event loop's default
+    executor, so async LLM calls cannot starve other run_in_executor users
+    and vice versa.
+    """
+    global _async_pool
+    with _async_pool_lock:
+        if _async_pool is None:
+            _async_pool = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="clipiq-async")
+        return _async_pool
+
+
+def _max_concurrency(config: Any) -> Optional[int]:
+    """max_concurrency from a LangChain-style config dict (or list of them)."""
+    if isinstance(config, list):
+        config = config[0] if config else None
+    return config.get("max_concurrency") if isinstance(config, dict) else None
+
+
+class LLMBackend(ABC):
+    """
+    Interface ClipIQ expects from an LLM.
+
+    Subclasses implement invoke, and stream when they can stream; the other
+    methods have defaults built on them (async calls run on a shared pool
+    of ASYNC_WORKERS threads, batches on a thread pool).
+    """
+
+    # True if the client aborts its own request when current_token() is
+    # cancelled; call_cancellable then skips its helper thread
+    aborts_on_cancel = False
+
+    @abstractmethod
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> str:
+        """Complete one prompt."""
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> str:
+        """Async variant of invoke (blocking, on the shared async pool; see _async_executor)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_async_executor(), partial(self.invoke, input, config, **kwargs))
+
+    def stream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Iterator[str]:
+        """Stream the completion (default: the whole result as one chunk)."""
+        yield self.invoke(input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[str]:
+        """Async variant of stream."""
+        yield await self.ainvoke(input, config, **kwargs)
+
+    def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+              **kwargs: Any) -> list:
+        """
+        Complete several prompts concurrently.
+
+        Args:
+            inputs: Prompts
+            config: Config dict, or one per input ("max_concurrency" bounds the threads)
+            return_exceptions: Return failures in place instead of raising the first
+
+        Returns:
+            Results (or exceptions) in input order
+        """
+        if not inputs:
+            return []
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+
+        def call(input: Any, item_config: Any) -> Any:
+            try:
+                return self.invoke(input, item_config, **kwargs)
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                return error
+
+        if len(inputs) == 1:
+            return [call(inputs[0], configs[0])]
+        workers = min(len(inputs), _max_concurrency(config) or 16)
+        # Each call runs in a copy of the caller's context (its cancellation token)
+        contexts = [contextvars.copy_context() for _ in inputs]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clipiq-batch") as executor:
+            return list(executor.map(lambda context, *args: context.run(call, *args), contexts, inputs, configs))
+
+    async def abatch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+                     **kwargs: Any) -> list:
+        """Async variant of batch."""
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+        limit = _max_concurrency(config)
+        semaphore = asyncio.Semaphore(limit) if limit else None
+
+        async def call(input: Any, item_config: Any) -> Any:
+            if semaphore is None:
+                return await self.ainvoke(input, item_config, **kwargs)
+            async with semaphore:
+                return await self.ainvoke(input, item_config, **kwargs)
+
+        return list(await asyncio.gather(*(call(input, item_config) for input, item_config in zip(inputs, configs)),
+                                         return_exceptions=return_exceptions))
+
+
+class BackendHTTPError(Exception):
+    """An OpenAI-compatible endpoint answered with an error status."""
+
+    def __init__(self, status_code: int, message: str, response: Any = None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        # Carries the headers (Retry-After) for resilience.retry_after_seconds
+        self.response = response
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections to one host."""
+
+    def __init__(self, base_url: str, timeout: Optional[float] = None, max_idle: int = 8):
+        """
+        Initialize the pool (connections are opened on demand).
+
+        Args:
+            base_url: API base URL, e.g. https://api.openai.com/v1
+            timeout: Socket timeout in seconds for connects and reads (None: no timeout)
+            max_idle: Idle connections kept open for reuse
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported API base URL '{base_url}'")
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._context = ssl.create_default_context() if self.https else None
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+        # Counters
+        self.opened = 0
+        self.reused = 0
+
+    def acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """
+        Take an idle connection or open a new one.
+
+        Returns:
+            Tuple of (connection, reused)
+        """
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+            self.opened += 1
+        if self.https:
+            connection = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                                     context=self._context)
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return connection, False
+
+    def release(self, connection: http.client.HTTPConnection, response: Optional[http.client.HTTPResponse]):
+        """Return a connection whose response was read completely, or close it."""
+        reusable = response is not None and response.isclosed() and not response.will_close
+        with self._lock:
+            if reusable and connection.sock is not None and len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self) -> dict:
+        """
+        Get pool counters.
+
+        Returns:
+            Dictionary with connections opened, requests on reused connections and idle connections
+        """
+        with self._lock:
+            return {"opened": self.opened, "reused": self.reused, "idle": len(self._idle)}
+
+
+class _Exchange:
+    """The connection of one request in flight, so another thread can abort it."""
+
+    def __init__(self, token: Optional[CancellationToken] = None):
+        """
+        Initialize the exchange.
+
+        Args:
+            token: Optional cancellation token that aborts the exchange
+        """
+        self.connection: Optional[http.client.HTTPConnection] = None
+        self.aborted = False
+        self._unlink = token.add_callback(self.abort) if token is not None else (lambda: None)
+
+    def close(self):
+        """Stop following the cancellation token (the request is over)."""
+        self._unlink()
+
+    def abort(self):
+        """Shut the socket down, unblocking the thread that waits on it."""
+        self.aborted = True
+        sock = getattr(self.connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class DirectOpenAI(LLMBackend):
+    """
+    Minimal OpenAI-compatible client over pooled keep-alive connections.
+
+    Attribute names follow langchain_community's OpenAI client (model_name,
+    openai_api_base, max_tokens), so cache keys, rate limits and token
+    budgets treat both backends alike. HTTP proxies are not supported.
+    """
+
+    aborts_on_cancel = True
+
+    def __init__(self, model_name: Optional[str] = None, openai_api_key: Optional[str] = None,
+                 openai_api_base: Optional[str] = None, temperature: float = DEFAULT_TEMPERATURE,
+                 max_tokens: int = DEFAULT_MAX_TOKENS, request_timeout: Optional[float] = None,
+                 max_retries: int = 2, chat: bool = False, openai_organization: Optional[str] = None):
+        """
+        Initialize the client.
+
+        Args:
+            model_name: Model (default: gpt-3.5-turbo-instruct, or gpt-3.5-turbo for chat)
+            openai_api_key: API key (default: OPENAI_API_KEY; none is sent if unset)
+            openai_api_base: API base URL (default: OPENAI_API_BASE, else api.openai.com)
+            temperature: Sampling temperature
+            max_tokens: Completion token limit (-1 or 0: not sent)
+            request_timeout: Socket timeout in seconds (None: no timeout)
+            max_retries: Retries of transient errors (0 when ResilientLLM does the retrying)
+            chat: Use /chat/completions with the prompt as one user message
+            openai_organization: Organization header (default: OPENAI_ORGANIZATION)
+        """
+        self.chat = chat
+        self.model_name = model_name or (DEFAULT_CHAT_MODEL if chat else DEFAULT_COMPLETION_MODEL)
+        self.openai_api_base = openai_api_base or os.getenv("OPENAI_API_BASE")
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.pool = ConnectionPool(self.openai_api_base or DEFAULT_BASE_URL, timeout=request_timeout)
+        self._endpoint = self.pool.path + ("/chat/completions" if chat else "/completions")
+
+        api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+        organization = openai_organization or os.getenv("OPENAI_ORGANIZATION")
+        self._headers = {"Content-Type": "application/json", "User-Agent": "ClipIQ"}
+        if api_key:
+            self._headers["Authorization"] = f"Bearer {api_key}"
+        if organization:
+            self._headers["OpenAI-Organization"] = organization
+
+    def _payload(self, prompts: Any, stream: bool, stop: Optional[list[str]]) -> dict:
+        """Request body for one prompt (or a list of prompts on /completions)."""
+        payload: dict[str, Any] = {"model": self.model_name, "temperature": self.temperature}
+        if self.chat:
+            payload["messages"] = [{"role": "user", "content": prompts}]
+        else:
+            payload["prompt"] = prompts
+        if self.max_tokens and self.max_tokens > 0:
+            payload["max_tokens"] = self.max_tokens
+        if stop:
+            payload["stop"] = stop
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _send(self, payload: dict, exchange: _Exchange) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """
+        Send one request and return its connection and successful response.
+
+        A request that fails on a reused connection (closed by the server
+        while idle) is repeated once on a fresh one.
+
+        Raises:
+            BackendHTTPError: For error statuses
+            ConnectionError: If the connection failed or was aborted
+        """
+        body = json.dumps(payload).encode("utf-8")
+        for attempt in range(2):
+            connection, reused = self.pool.acquire()
+            exchange.connection = connection
+            try:
+                if exchange.aborted:
+                    raise ConnectionAbortedError("Request aborted")
+                connection.request("POST", self._endpoint, body, self._headers)
+                if exchange.aborted:
+                    # Aborted while connecting, before there was a socket to shut down
+                    raise ConnectionAbortedError("Request aborted")
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as error:
+                connection.close()
+                if reused and attempt == 0 and not exchange.aborted:
+                    continue
+                if isinstance(error, OSError):
+                    raise
+                raise ConnectionError(f"LLM connection failed: {error!r}") from error
+            except BaseException:
+                connection.close()
+                raise
+            if response.status >= 400:
+                try:
+                    data = response.read()
+                finally:
+                    self.pool.release(connection, response)
+                raise BackendHTTPError(response.status, self._error_message(data, response.reason), response)
+            return connection, response
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _error_message(data: bytes, reason: str) -> str:
+        """Error message from an OpenAI-style error body."""
+        try:
+            error = json.loads(data).get("error")
+            return str(error.get("message") if isinstance(error, dict) else error or reason)
+        except (ValueError, AttributeError):
+            return data.decode("utf-8", "replace")[:200] or reason
+
+    def _retrying(self, call, exchange: _Exchange):
+        """Run call, retrying transient errors up to max_retries times (unless aborted)."""
+        for attempt in itertools.count():
+            try:
+                return call()
+            except Exception as error:
+                from resilience import is_transient, retry_after_seconds
+                if attempt >= self.max_retries or exchange.aborted or not is_transient(error):
+                    raise
+                delay = retry_after_seconds(error)
+                time.sleep(min(delay if delay is not None else 0.5 * 2 ** attempt, 8.0))
+
+    def _complete(self, prompts: Any, stop: Optional[list[str]], exchange: _Exchange) -> list[str]:
+        """Non-streaming request; returns the text of every choice in index order."""
+        def call() -> list[str]:
+            connection, response = self._send(self._payload(prompts, False, stop), exchange)
+            try:
+                data = json.loads(response.read())
+            except (OSError, http.client.HTTPException) as error:
+                connection.close()
+                raise ConnectionError(f"LLM response was cut off: {error!r}") from error
+            except BaseException:
+                connection.close()
+                raise
+            self.pool.release(connection, response)
+            choices = sorted(data.get("choices") or [], key=lambda choice: choice.get("index", 0))
+            if self.chat:
+                return [(choice.get("message") or {}).get("content") or "" for choice in choices]
+            return [choice.get("text") or "" for choice in choices]
+
+        return self._retrying(call, exchange)
+
+    def invoke(self, input: Any, config: Optional[dict] = None, *, stop: Optional[list[str]] = None,
+               **kwargs: Any) -> str:
+        """Complete one prompt (aborted when the current cancellation token is cancelled)."""
+        exchange = _Exchange(current_token())
+        try:
+            texts = self._complete(prompt_text(input), stop, exchange)
+        finally:
+            exchange.close()
+        return texts[0] if texts else ""
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, *, stop: Optional[list[str]] = None,
+                      **kwargs: Any) -> str:
+        """
+        Async variant of invoke.
+
+        The HTTP client is blocking, so the request runs on the shared async
+        pool: at most ASYNC_WORKERS requests are in flight, the rest queue
+        for a thread. Cancelling the awaiting task shuts its connection down,
+        so the request is abandoned at once.
+        """
+        exchange = _Exchange()
+        loop = asyncio.get_running_loop()
+        try:
+            texts = await loop.run_in_executor(_async_executor(), self._complete, prompt_text(input), stop,
+                                               exchange)
+        except asyncio.CancelledError:
+            exchange.abort()
+            raise
+        return texts[0] if texts else ""
+
+    def stream(self, input: Any, config: Optional[dict] = None, *, stop: Optional[list[str]] = None,
+               **kwargs: Any) -> Iterator[str]:
+        """
+        Stream the completion as server-sent events.
+
+        Closing the generator early, or cancelling the current cancellation
+        token, closes its connection instead of returning it to the pool.
+        """
+        exchange = _Exchange(current_token())
+        try:
+            connection, response = self._retrying(
+                lambda: self._send(self._payload(prompt_text(input), True, stop), exchange), exchange)
+        except BaseException:
+            exchange.close()
+            raise
+        finished = False
+        try:
+            while True:
+                try:
+                    line = response.readline()
+                except (OSError, http.client.HTTPException) as error:
+                    raise ConnectionError(f"LLM stream was cut off: {error!r}") from error
+                if not line:
+                    break
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    finished = True
+                    continue
+                event = json.loads(data)
+                if event.get("error"):
+                    error = event["error"]
+                    raise BackendHTTPError(500, str(error.get("message") if isinstance(error, dict) else error))
+                for choice in event.get("choices") or []:
+                    if self.chat:
+                        text = (choice.get("delta") or {}).get("content")
+                    else:
+                        text = choice.get("text")
+                    if choice.get("finish_reason"):
+                        finished = True
+                    if text:
+                        yield text
+            if not finished:
+                raise ConnectionError("LLM stream ended before the response was complete")
+        finally:
+            exchange.close()
+            if finished and response.isclosed() and not exchange.aborted:
+                self.pool.release(connection, response)
+            else:
+                connection.close()
+
+    def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+              **kwargs: Any) -> list:
+        """
+        Complete several prompts; /completions takes up to BATCH_SIZE prompts
+        per request, chat requests run concurrently.
+        """
+        if self.chat or not inputs:
+            return super().batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        stop = kwargs.get("stop")
+        token = current_token()
+        prompts = [prompt_text(input) for input in inputs]
+        groups = [prompts[start:start + BATCH_SIZE] for start in range(0, len(prompts), BATCH_SIZE)]
+
+        def call(group: list[str]) -> list:
+            exchange = _Exchange(token)
+            try:
+                texts = self._complete(group, stop, exchange)
+                if len(texts) != len(group):
+                    raise BackendHTTPError(500, f"Expected {len(group)} choices, got {len(texts)}")
+                return texts
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                return [error] * len(group)
+            finally:
+                exchange.close()
+
+        if len(groups) == 1:
+            return call(groups[0])
+        workers = min(len(groups), _max_concurrency(config) or 4)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clipiq-batch") as executor:
+            return [result for results in executor.map(call, groups) for result in results]
+
+    def close(self):
+        """Close the pooled connections."""
+        self.pool.close()
+
+
+class OutputCleanup:
+    """The cleanup step (clean_output) with the invoke API of a chain step."""
+
+    def invoke(self, input: str, config: Optional[dict] = None, **kwargs: Any) -> str:
+        """Clean one LLM output."""
+        return clean_output(input)
+
+    def __call__(self, input: str) -> str:
+        return clean_output(input)
+
+
+class PromptChain:
+    """
+    prompt | llm | cleanup without LangChain.
+
+    Inputs are {"text": ...} dicts, as for a LangChain PromptTemplate; the
+    template is rendered by the shared CompiledTemplate.
+    """
+
+    def __init__(self, template: str, llm: Any, cleanup: Any):
+        """
+        Initialize the chain.
+
+        Args:
+            template: Prompt template with {text}
+            llm: LLM with the LLMBackend interface
+            cleanup: Step with invoke(output) applied to every result
+        """
+        self.template = template
+        self.llm = llm
+        self.cleanup = cleanup
+        self._compiled = get_registry().template(template)
+
+    def _prompt(self, input: dict) -> str:
+        """Render the template for one input."""
+        return self._compiled.render(input["text"])
+
+    def invoke(self, input: dict, config: Optional[dict] = None, **kwargs: Any) -> str:
+        """Render, call the LLM and clean up the result."""
+        return self.cleanup.invoke(self.llm.invoke(self._prompt(input), config, **kwargs))
+
+    async def ainvoke(self, input: dict, config: Optional[dict] = None, **kwargs: Any) -> str:
+        """Async variant of invoke."""
+        return self.cleanup.invoke(await self.llm.ainvoke(self._prompt(input), config, **kwargs))
+
+    def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+              **kwargs: Any) -> list:
+        """Batch variant of invoke (failures stay in place with return_exceptions)."""
+        outputs = self.llm.batch([self._prompt(input) for input in inputs], config,
+                                 return_exceptions=return_exceptions, **kwargs)
+        return [output if isinstance(output, Exception) else self.cleanup.invoke(output) for output in outputs]
+
+
+_runnable_class = None
+
+
+def as_runnable(llm: Any) -> Any:
+    """
+    Adapt an LLMBackend to a LangChain Runnable, for use in LangChain chains.
+
+    LangChain is imported only here. Runnables are returned unchanged.
+    """
+    global _runnable_class
+    from langchain_core.runnables import Runnable
+    if isinstance(llm, Runnable):
+        return llm
+    if _runnable_class is None:
+        class BackendRunnable(Runnable):
+            """Runnable that forwards every call to an LLMBackend."""
+
+            def __init__(self, backend: Any):
+                self.backend = backend
+
+            def __getattr__(self, name: str) -> Any:
+                if name == "backend":
+                    raise AttributeError(name)
+                return getattr(self.backend, name)
+
+            def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+                return self.backend.invoke(input, config, **kwargs)
+
+            async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+                return await self.backend.ainvoke(input, config, **kwargs)
+
+            def stream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Iterator[Any]:
+                yield from self.backend.stream(input, config, **kwargs)
+
+            async def astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[Any]:
+                async for chunk in self.backend.astream(input, config, **kwargs):
+                    yield chunk
+
+            def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+                      **kwargs: Any) -> list:
+                return self.backend.batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+            async def abatch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+                             **kwargs: Any) -> list:
+                return await self.backend.abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+        _runnable_class = BackendRunnable
+    return _runnable_class(llm)
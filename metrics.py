@@ -0,0 +1,269 @@
+"""
+Stage Metrics for ClipIQ
+
+Per-stage latency instrumentation for the processing pipeline (clipboard
+paste, parsing, prompt building, LLM call, cleanup, clipboard copy).
+Durations are kept per (stage, command category) as rolling windows for
+p50/p95/p99 plus cumulative Prometheus-style buckets, and can be exported
+as a Prometheus textfile or a JSON snapshot.
+
+Disabled metrics hand out a shared no-op span, so instrumented code costs
+one attribute check per stage.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+# Upper bounds (seconds) of the cumulative histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Pipeline stages in display order
+STAGES = ["paste", "queue", "parse", "prompt", "cache", "first_token", "llm", "cleanup", "copy", "total"]
+
+
+class RollingHistogram:
+    """Latency histogram: cumulative buckets plus a rolling window for percentiles."""
+
+    def __init__(self, window: int = 1024, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            window: Number of recent samples kept for percentiles
+            buckets: Bucket upper bounds in seconds, ascending
+        """
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        """Record one duration (callers hold the owning lock)."""
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def percentile(self, fraction: float) -> float:
+        """Return a percentile of the rolling window in seconds (0.0 if empty)."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """Summarize the histogram in milliseconds."""
+        return {
+            "count": self.count,
+            "sum_ms": self.sum * 1000,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _Span:
+    """Times one stage; the category may be set inside the block."""
+
+    __slots__ = ("metrics", "stage", "category", "started")
+
+    def __init__(self, metrics: "StageMetrics", stage: str, category: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.category = category
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.metrics.record(self.stage, self.category, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span handed out while metrics are disabled."""
+
+    category = "all"
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageMetrics:
+    """Thread-safe per-stage, per-category latency histograms."""
+
+    def __init__(self, enabled: bool = False, window: int = 1024, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Initialize the metrics.
+
+        Args:
+            enabled: Record spans (disabled metrics are near-free no-ops)
+            window: Samples kept per histogram for rolling percentiles
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.enabled = enabled
+        self.window = window
+        self.buckets = buckets
+        self._histograms: dict[tuple[str, str], RollingHistogram] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str, category: str = "all"):
+        """
+        Time a block of code as one stage.
+
+        Usage:
+            with metrics.span("llm", "translation"):
+                result = llm.invoke(prompt)
+
+        Args:
+            stage: Stage name (see STAGES)
+            category: Command category, 'default' for typo fixing, or 'all'
+
+        Returns:
+            Context manager whose category attribute can be updated inside the block
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, category)
+
+    def record(self, stage: str, category: str, seconds: float):
+        """Record a duration measured elsewhere."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get((stage, category))
+            if histogram is None:
+                histogram = self._histograms[(stage, category)] = RollingHistogram(self.window, self.buckets)
+            histogram.observe(seconds)
+
+    def reset(self):
+        """Drop all recorded data."""
+        with self._lock:
+            self._histograms.clear()
+
+    def _sorted_items(self) -> list[tuple[tuple[str, str], RollingHistogram]]:
+        """Histograms ordered by pipeline stage, then category."""
+        def order(item):
+            stage, category = item[0]
+            return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage, category)
+        return sorted(self._histograms.items(), key=order)
+
+    def snapshot(self) -> dict:
+        """
+        Summarize every histogram.
+
+        Returns:
+            Dictionary {stage: {category: {count, sum_ms, p50_ms, p95_ms, p99_ms, max_ms}}}
+        """
+        result: dict[str, dict[str, dict]] = {}
+        with self._lock:
+            for (stage, category), histogram in self._sorted_items():
+                result.setdefault(stage, {})[category] = histogram.snapshot()
+        return result
+
+    def to_json(self) -> str:
+        """Serialize a snapshot as JSON."""
+        return json.dumps({"timestamp": time.time(), "stages": self.snapshot()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Render all histograms in the Prometheus text exposition format.
+
+        Returns:
+            Text suitable for a node_exporter textfile collector
+        """
+        lines = [
+            "# HELP clipiq_stage_duration_seconds Time spent in each ClipIQ pipeline stage.",
+            "# TYPE clipiq_stage_duration_seconds histogram",
+        ]
+        quantiles = [
+            "# HELP clipiq_stage_duration_rolling_seconds Rolling-window latency quantiles per stage.",
+            "# TYPE clipiq_stage_duration_rolling_seconds gauge",
+        ]
+        with self._lock:
+            for (stage, category), histogram in self._sorted_items():
+                labels = f'stage="{_escape(stage)}",category="{_escape(category)}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'clipiq_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'clipiq_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"clipiq_stage_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"clipiq_stage_duration_seconds_count{{{labels}}} {histogram.count}")
+                for fraction in (0.5, 0.95, 0.99):
+                    quantiles.append(
+                        f'clipiq_stage_duration_rolling_seconds{{{labels},quantile="{fraction}"}} '
+                        f"{histogram.percentile(fraction):.6f}"
+                    )
+        return "\n".join(lines + quantiles) + "\n"
+
+    def write(self, path: str):
+        """
+        Atomically write a snapshot to path.
+
+        Paths ending in .json get a JSON snapshot, anything else the
+        Prometheus text format (e.g. clipiq.prom for a textfile collector).
+
+        Args:
+            path: Output file path
+        """
+        content = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            handle.write(content)
+        os.replace(temporary, path)
+
+    def format_table(self) -> str:
+        """Format a human-readable table of all stages."""
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "No stage metrics recorded yet" + ("" if self.enabled else " (metrics are disabled)")
+        rows = [f"{'stage':<12} {'category':<14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for stage, categories in snapshot.items():
+            for category, values in categories.items():
+                rows.append(
+                    f"{stage:<12} {category:<14} {values['count']:>6} {values['p50_ms']:>9.2f} "
+                    f"{values['p95_ms']:>9.2f} {values['p99_ms']:>9.2f} {values['max_ms']:>9.2f}"
+                )
+        return "\n".join(rows)
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Global metrics instance, enabled with CLIPIQ_METRICS=1 or clipiq.py --metrics
+_stage_metrics = StageMetrics(enabled=os.getenv("CLIPIQ_METRICS", "0") == "1")
+
+
+def get_stage_metrics() -> StageMetrics:
+    """Get the global stage metrics instance."""
+    return _stage_metrics
@@ -5,8 +5,11 @@ Core prompt templates are hardcoded and cannot be overridden by users.
 Only the default template (for text without commands) can be customized via environment variables.
 """
 
+import copy
 import os
+from string import Formatter
 from typing import Dict
+from registry import get_registry
 
 
 # Core prompt templates - HARDCODED, cannot be overridden
@@ -94,6 +97,90 @@ def categorize_command(command: str) -> str:
     return COMMAND_CATEGORIES.get(first_word, 'generic')
 
 
+# Fields every template may use
+TEMPLATE_FIELDS = frozenset({'text', 'command_detail'})
+
+
+class CompiledTemplate:
+    """
+    A prompt template pre-compiled into a fast renderer.
+    
+    Rendering gives exactly what PromptManager.build_prompt always did
+    (str.format, falling back to plain {text}/{command_detail} replacement
+    on unknown placeholders), but the template is parsed once:
+    
+    - Templates that only use plain {text} and {command_detail} are
+      rendered with the bound str.format, which cannot raise for them.
+    - Templates with an unknown placeholder (e.g. a custom default template
+      with "{name}") go straight to the replacement fallback instead of
+      raising and catching a KeyError on every call.
+    - Anything else (format specs, indexing, stray braces) is rendered with
+      str.format as before.
+    """
+    
+    FAST = 'fast'
+    FALLBACK = 'fallback'
+    FORMAT = 'format'
+    
+    def __init__(self, template: str):
+        """
+        Compile a template.
+        
+        Args:
+            template: Prompt template string
+        """
+        self.template = template
+        self.mode = self._compile(template)
+        self._format = template.format
+        if self.mode == self.FALLBACK:
+            self._text_pieces = template.split("{text}")
+    
+    @staticmethod
+    def _compile(template: str) -> str:
+        """Parse the template once and pick the rendering mode."""
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError:
+            # Malformed braces: str.format raises the same error at render time
+            return CompiledTemplate.FORMAT
+        
+        mode = CompiledTemplate.FAST
+        for _, field, spec, conversion in parsed:
+            if field is None or (field in TEMPLATE_FIELDS and not spec and conversion is None):
+                continue
+            if field.isidentifier() and field not in TEMPLATE_FIELDS:
+                # str.format would raise KeyError here, before any later field
+                return mode if mode == CompiledTemplate.FORMAT else CompiledTemplate.FALLBACK
+            mode = CompiledTemplate.FORMAT
+        return mode
+    
+    def render(self, content: str, command: str = "") -> str:
+        """
+        Render the template.
+        
+        Args:
+            content: The cleaned content (text without command)
+            command: The command string (optional)
+            
+        Returns:
+            Final prompt ready for LLM
+        """
+        if self.mode == self.FAST:
+            return self._format(text=content, command_detail=command)
+        if self.mode == self.FORMAT:
+            try:
+                return self._format(text=content, command_detail=command)
+            except KeyError:
+                pass
+            result = self.template.replace("{text}", content)
+        else:
+            # Fall back to simple substitution
+            result = content.join(self._text_pieces)
+        if command:
+            result = result.replace("{command_detail}", command)
+        return result
+
+
 class PromptManager:
     """Manages prompt templates and builds prompts for LLM processing."""
     
@@ -138,18 +225,9 @@ class PromptManager:
         Returns:
             Final prompt ready for LLM
         """
-        try:
-            return template.format(
-                text=content,
-                command_detail=command
-            )
-        except KeyError as e:
-            # Handle missing template variables gracefully
-            # Fall back to simple substitution
-            result = template.replace("{text}", content)
-            if command:
-                result = result.replace("{command_detail}", command)
-            return result
+        # Templates are compiled once per process; missing template variables
+        # fall back to simple substitution
+        return get_registry().template(template).render(content, command)
     
     def get_prompt_for_command(self, content: str, command: str) -> str:
         """
@@ -208,8 +286,17 @@ class PromptManager:
 
 # Convenience functions for backward compatibility and easy use
 def get_prompt_manager() -> PromptManager:
-    """Get a configured PromptManager instance."""
-    return PromptManager()
+    """
+    Get a configured PromptManager instance.
+    
+    It is a copy of the shared manager, so callers may change its templates
+    without affecting other users (the copy is cheap: compiled templates
+    stay shared).
+    """
+    shared = get_registry().prompt_manager()
+    manager = copy.copy(shared)
+    manager.templates = shared.templates.copy()
+    return manager
 
 
 def build_prompt_for_command(content: str, command: str) -> str:
@@ -223,8 +310,7 @@ def build_prompt_for_command(content: str, command: str) -> str:
     Returns:
         Complete prompt ready for LLM
     """
-    manager = PromptManager()
-    return manager.get_prompt_for_command(content, command)
+    return get_registry().prompt_manager().get_prompt_for_command(content, command)
 
 
 def build_default_prompt(content: str) -> str:
@@ -237,8 +323,7 @@ def build_default_prompt(content: str) -> str:
     Returns:
         Default prompt ready for LLM
     """
-    manager = PromptManager()
-    return manager.get_default_prompt(content)
+    return get_registry().prompt_manager().get_default_prompt(content)
 
 
 def get_command_category(command: str) -> str:
@@ -0,0 +1,481 @@
+"""
+Client-Side Rate Limiting for ClipIQ
+
+Keeps LLM traffic within the provider's requests-per-minute (RPM) and
+tokens-per-minute (TPM) quotas instead of sending as fast as possible and
+absorbing 429s. Each quota is a token bucket that refills continuously;
+a call reserves one request plus its estimated prompt and completion
+tokens, waits until both buckets cover the reservation, and afterwards
+returns whatever part of the completion estimate it did not use.
+
+Limiters are process-wide: every RateLimitedLLM for the same backend and
+model shares one RateLimiter, so the hotkey path, batch jobs, speculation
+and the daemon all draw from the same quota. Reservations are made under a
+plain lock and the wait happens outside it, so the limiter is safe to share
+between threads and asyncio tasks.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from llm_backend import LLMBackend, prompt_text
+
+from token_budget import DEFAULT_OUTPUT_TOKENS, TokenCounter
+
+
+class TokenBucket:
+    """A bucket of capacity units refilled at a constant rate (not thread-safe on its own)."""
+
+    def __init__(self, capacity: float, per_second: float, now: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            capacity: Maximum units held (the burst size)
+            per_second: Refill rate
+            now: Current clock value
+        """
+        if capacity <= 0 or per_second <= 0:
+            raise ValueError("capacity and rate must be positive")
+        self.capacity = capacity
+        self.per_second = per_second
+        self.level = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available (0.0 if they are now)."""
+        self._refill(now)
+        return max(0.0, (amount - self.level) / self.per_second)
+
+    def take(self, amount: float, now: float):
+        """Remove amount units; the level goes negative for reservations made in advance."""
+        self._refill(now)
+        self.level -= amount
+
+    def give_back(self, amount: float, now: float):
+        """Return unused units."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by many callers."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: RPM quota (None for no request limit)
+            tokens_per_minute: TPM quota, prompt plus completion (None for no token limit)
+            clock: Monotonic clock (injectable for tests)
+            sleep: Blocking sleep (injectable for tests)
+        """
+        now = clock()
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60, now) \
+            if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60, now) \
+            if tokens_per_minute else None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.tokens = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def reserve(self, tokens: int = 0, requests: int = 1) -> float:
+        """
+        Reserve quota now and return how long the caller must wait before using it.
+
+        Reservations are served in the order they are made. Amounts larger
+        than a bucket's capacity are capped at the capacity (see chargeable),
+        so a single huge request waits for a full minute of quota instead of
+        forever; the usage counters record the capped amounts.
+
+        Args:
+            tokens: Estimated prompt + completion tokens
+            requests: Number of requests
+
+        Returns:
+            Seconds to wait
+        """
+        with self._lock:
+            now = self._clock()
+            delay = 0.0
+            requests, tokens = self._cap(self._requests, requests), self._cap(self._tokens, tokens)
+            for bucket, amount in ((self._requests, requests), (self._tokens, tokens)):
+                if bucket is not None and amount:
+                    delay = max(delay, bucket.wait_time(amount, now))
+                    bucket.take(amount, now)
+            self.requests += requests
+            self.tokens += tokens
+            if delay > 0:
+                self.throttled += 1
+                self.waited_seconds += delay
+            return delay
+
+    @staticmethod
+    def _cap(bucket: Optional[TokenBucket], amount: int) -> int:
+        return min(amount, int(bucket.capacity)) if bucket is not None else amount
+
+    def chargeable(self, tokens: int) -> int:
+        """The part of a token reservation that is actually taken from the TPM bucket."""
+        return self._cap(self._tokens, tokens)
+
+    def split(self, tokens: list[int]) -> list[tuple[int, int]]:
+        """
+        Split per-request token reservations into runs that each fit one minute of quota.
+
+        Args:
+            tokens: Estimated tokens per request, in order
+
+        Returns:
+            (start, end) index ranges; each run holds at most the RPM quota
+            in requests and (unless it is a single request) the TPM quota
+            in tokens
+        """
+        max_requests = int(self._requests.capacity) if self._requests is not None else len(tokens)
+        max_tokens = self._tokens.capacity if self._tokens is not None else float("inf")
+        runs = []
+        start, total = 0, 0
+        for index, amount in enumerate(tokens):
+            amount = self.chargeable(amount)
+            if index > start and (index - start >= max(max_requests, 1) or total + amount > max_tokens):
+                runs.append((start, index))
+                start, total = index, 0
+            total += amount
+        if start < len(tokens):
+            runs.append((start, len(tokens)))
+        return runs
+
+    def acquire(self, tokens: int = 0, requests: int = 1) -> float:
+        """Reserve quota and block until it may be used; returns the seconds waited."""
+        delay = self.reserve(tokens, requests)
+        if delay > 0:
+            self._sleep(delay)
+        return delay
+
+    async def aacquire(self, tokens: int = 0, requests: int = 1) -> float:
+        """Async variant of acquire; other tasks run while this one waits."""
+        delay = self.reserve(tokens, requests)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def refund(self, tokens: int):
+        """Return tokens that were reserved but not used (e.g. a shorter completion)."""
+        if tokens <= 0 or self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.give_back(tokens, self._clock())
+            self.tokens -= tokens
+
+    def stats(self) -> dict:
+        """
+        Get the limits and usage counters.
+
+        Returns:
+            Dictionary with the limits, requests and tokens admitted, and how
+            often and how long callers were throttled
+        """
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "throttled": self.throttled,
+                "waited_s": round(self.waited_seconds, 3),
+            }
+
+
+# Process-wide limiters, keyed by (backend URL, model)
+_limits: dict[tuple[str, str], tuple[Optional[float], Optional[float]]] = {}
+_limiters: dict[tuple[str, str], RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+ANY = "*"
+
+
+def limiter_key(llm: Any) -> tuple[str, str]:
+    """The (backend, model) pair whose quota an LLM uses."""
+    base_url = getattr(llm, "openai_api_base", None) or "https://api.openai.com/v1"
+    return str(base_url), str(getattr(llm, "model_name", None) or ANY)
+
+
+def configure_rate_limit(model: str = ANY, requests_per_minute: Optional[float] = None,
+                         tokens_per_minute: Optional[float] = None, backend: str = ANY):
+    """
+    Set the quota for a backend and model.
+
+    Limiters that already exist for the pair are replaced when the quota
+    changes, so configure limits before the LLMs are created.
+
+    Args:
+        model: Model name, or ANY for every model without its own limit
+        requests_per_minute: RPM quota
+        tokens_per_minute: TPM quota
+        backend: Backend base URL, or ANY for every backend
+    """
+    with _registry_lock:
+        if _limits.get((backend, model)) == (requests_per_minute, tokens_per_minute):
+            return
+        _limits[(backend, model)] = (requests_per_minute, tokens_per_minute)
+        for key in [key for key in _limiters if _matches(key, (backend, model))]:
+            del _limiters[key]
+
+
+def _matches(key: tuple[str, str], pattern: tuple[str, str]) -> bool:
+    return all(part == wanted or wanted == ANY for part, wanted in zip(key, pattern))
+
+
+def get_rate_limiter(llm: Any = None, key: Optional[tuple[str, str]] = None) -> Optional[RateLimiter]:
+    """
+    Get the shared limiter for an LLM's backend and model.
+
+    The most specific configured limit wins: backend and model, then model,
+    then backend, then the default.
+
+    Args:
+        llm: LLM whose openai_api_base and model_name select the quota
+        key: Explicit (backend, model) instead of llm
+
+    Returns:
+        Shared RateLimiter, or None if no limit is configured
+    """
+    key = key or limiter_key(llm)
+    backend, model = key
+    with _registry_lock:
+        limiter = _limiters.get(key)
+        if limiter is not None:
+            return limiter
+        for candidate in ((backend, model), (ANY, model), (backend, ANY), (ANY, ANY)):
+            if candidate in _limits:
+                requests_per_minute, tokens_per_minute = _limits[candidate]
+                if not (requests_per_minute or tokens_per_minute):
+                    return None
+                limiter = _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+                return limiter
+        return None
+
+
+def reset_rate_limits():
+    """Forget all configured limits and limiters (for tests)."""
+    global _environment_configured
+    with _registry_lock:
+        _limits.clear()
+        _limiters.clear()
+        _environment_configured = False
+
+
+_environment_configured = False
+
+
+def configure_from_environment():
+    """
+    Configure limits from the environment (once per process).
+
+    CLIPIQ_RPM and CLIPIQ_TPM set the default quota; CLIPIQ_RATE_LIMITS sets
+    per-model quotas as comma-separated MODEL=RPM:TPM entries, e.g.
+    "gpt-4o-mini=500:200000,gpt-4=60:10000" (either number may be empty).
+    Limits configured in code afterwards take precedence.
+    """
+    global _environment_configured
+    with _registry_lock:
+        if _environment_configured:
+            return
+        _environment_configured = True
+    requests_per_minute = float(os.getenv("CLIPIQ_RPM", "0")) or None
+    tokens_per_minute = float(os.getenv("CLIPIQ_TPM", "0")) or None
+    if requests_per_minute or tokens_per_minute:
+        configure_rate_limit(ANY, requests_per_minute, tokens_per_minute)
+    for entry in filter(None, (part.strip() for part in os.getenv("CLIPIQ_RATE_LIMITS", "").split(","))):
+        model, _, quota = entry.partition("=")
+        rpm, _, tpm = quota.partition(":")
+        configure_rate_limit(model.strip(), float(rpm) if rpm else None, float(tpm) if tpm else None)
+
+
+def _output_text(output: Any) -> str:
+    """Text of an LLM output (a string or a message chunk)."""
+    if isinstance(output, str):
+        return output
+    return str(getattr(output, "content", output))
+
+
+def _run_config(config: Any, start: int, end: int) -> Any:
+    """The batch config for inputs[start:end] (per-input config lists are sliced)."""
+    return config[start:end] if isinstance(config, list) else config
+
+
+class RateLimitedLLM(LLMBackend):
+    """
+    LLM wrapper that waits for RPM/TPM quota before every call to an LLM.
+
+    Wrap the raw client (inside HedgedLLM and ResilientLLM) so retries and
+    hedges are counted against the quota too. Attributes not defined here
+    (model_name, openai_api_base, ...) are read from the wrapped LLM.
+    """
+
+    def __init__(self, llm: LLMBackend, limiter: Optional[RateLimiter] = None,
+                 counter: Optional[TokenCounter] = None, output_tokens: Optional[int] = None):
+        """
+        Initialize the rate-limited LLM.
+
+        Args:
+            llm: LLM (or runnable) to limit
+            limiter: Limiter to use (default: the shared limiter for the LLM's
+                     backend and model; no limiting if none is configured)
+            counter: Token counter for prompts and completions (default: for the LLM's model)
+            output_tokens: Completion tokens expected per call (default: the
+                           LLM's max_tokens, or DEFAULT_OUTPUT_TOKENS)
+        """
+        self.llm = llm
+        self.limiter = limiter if limiter is not None else get_rate_limiter(llm)
+        model = getattr(llm, "model_name", None)
+        self.counter = counter or (TokenCounter(model) if model else TokenCounter())
+        if output_tokens is None:
+            max_tokens = getattr(llm, "max_tokens", None)
+            output_tokens = max_tokens if isinstance(max_tokens, int) and max_tokens > 0 else DEFAULT_OUTPUT_TOKENS
+        self.output_tokens = output_tokens
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes missing on the wrapper itself
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _estimate(self, input: Any) -> int:
+        """Prompt tokens plus the expected completion."""
+        return self.counter.count(prompt_text(input)) + self.output_tokens
+
+    def _settle(self, reserved: int, input: Any, output: Any):
+        """Refund the part of the reservation the call did not use (output "" for failures)."""
+        if self.limiter is not None:
+            used = self.counter.count(prompt_text(input)) + self.counter.count(_output_text(output))
+            self.limiter.refund(self.limiter.chargeable(reserved) - used)
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        """Invoke the LLM once quota is available."""
+        if self.limiter is None:
+            return self.llm.invoke(input, config, **kwargs)
+        reserved = self._estimate(input)
+        self.limiter.acquire(reserved)
+        try:
+            result = self.llm.invoke(input, config, **kwargs)
+        except Exception:
+            self._settle(reserved, input, "")
+            raise
+        self._settle(reserved, input, result)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        """Async variant of invoke."""
+        if self.limiter is None:
+            return await self.llm.ainvoke(input, config, **kwargs)
+        reserved = self._estimate(input)
+        await self.limiter.aacquire(reserved)
+        try:
+            result = await self.llm.ainvoke(input, config, **kwargs)
+        except Exception:
+            self._settle(reserved, input, "")
+            raise
+        self._settle(reserved, input, result)
+        return result
+
+    def stream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Iterator[Any]:
+        """Stream from the LLM once quota is available."""
+        if self.limiter is None:
+            yield from self.llm.stream(input, config, **kwargs)
+            return
+        reserved = self._estimate(input)
+        self.limiter.acquire(reserved)
+        chunks = []
+        try:
+            for chunk in self.llm.stream(input, config, **kwargs):
+                chunks.append(_output_text(chunk))
+                yield chunk
+        finally:
+            self._settle(reserved, input, "".join(chunks))
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """Async variant of stream."""
+        if self.limiter is None:
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                yield chunk
+            return
+        reserved = self._estimate(input)
+        await self.limiter.aacquire(reserved)
+        chunks = []
+        try:
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                chunks.append(_output_text(chunk))
+                yield chunk
+        finally:
+            self._settle(reserved, input, "".join(chunks))
+
+    def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+              **kwargs: Any) -> list:
+        """
+        Batch through the LLM, one minute of quota at a time.
+
+        The batch is split into runs that fit the RPM and TPM quotas; each
+        run waits for its quota and goes to the wrapped LLM's batch before
+        the next run reserves, so a large batch is spread over as many
+        minutes as it needs.
+        """
+        if self.limiter is None or not inputs:
+            return self.llm.batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        reserved = [self._estimate(input) for input in inputs]
+        results = []
+        for start, end in self.limiter.split(reserved):
+            self.limiter.acquire(sum(map(self.limiter.chargeable, reserved[start:end])), requests=end - start)
+            try:
+                run = self.llm.batch(inputs[start:end], _run_config(config, start, end), return_exceptions=return_exceptions, **kwargs)
+            except Exception:
+                for amount, input in zip(reserved[start:end], inputs[start:end]):
+                    self._settle(amount, input, "")
+                raise
+            for amount, input, result in zip(reserved[start:end], inputs[start:end], run):
+                self._settle(amount, input, "" if isinstance(result, Exception) else result)
+            results.extend(run)
+        return results
+
+    async def abatch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+                     **kwargs: Any) -> list:
+        """Async variant of batch."""
+        if self.limiter is None or not inputs:
+            return await self.llm.abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        reserved = [self._estimate(input) for input in inputs]
+        results = []
+        for start, end in self.limiter.split(reserved):
+            await self.limiter.aacquire(sum(map(self.limiter.chargeable, reserved[start:end])),
+                                        requests=end - start)
+            try:
+                run = await self.llm.abatch(inputs[start:end], _run_config(config, start, end), return_exceptions=return_exceptions,
+                                            **kwargs)
+            except Exception:
+                for amount, input in zip(reserved[start:end], inputs[start:end]):
+                    self._settle(amount, input, "")
+                raise
+            for amount, input, result in zip(reserved[start:end], inputs[start:end], run):
+                self._settle(amount, input, "" if isinstance(result, Exception) else result)
+            results.extend(run)
+        return results
+
+    def stats(self) -> dict:
+        """Get the shared limiter's counters (empty if no limit applies)."""
+        return self.limiter.stats() if self.limiter is not None else {}
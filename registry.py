@@ -0,0 +1,193 @@
+"""
+Process-Wide Registry for ClipIQ
+
+Holds the objects that are expensive to build and safe to share, so they
+are created once per process instead of on every call:
+
+- prompt templates compiled into fast renderers (CompiledTemplate), in a
+  bounded LRU so user-supplied templates cannot grow it without limit
+- PromptManagers, one per custom default template
+  (NO_MORE_TYPO_PROMPT_TEMPLATE)
+- CommandParsers, one per command pattern, with their compiled regex
+- LLM clients (DirectOpenAI or LangChain's OpenAI), one per backend, set
+  of options and credentials, so their HTTP connection pools are reused
+- the EnhancedProcessor behind the module-level convenience functions
+
+Lookups are plain dictionary reads; creation happens under a lock, and
+each object is built at most once. This module imports nothing heavy at
+import time, so the lightweight modules can use it on the hotkey path.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class Registry:
+    """Thread-safe store of shared, pre-built ClipIQ components."""
+
+    def __init__(self, max_templates: int = 128):
+        """
+        Initialize an empty registry.
+
+        Args:
+            max_templates: Compiled templates kept (least recently used are dropped)
+        """
+        if max_templates < 1:
+            raise ValueError("max_templates must be at least 1")
+        # Reentrant: building the processor fetches its parser, templates and client
+        self._lock = threading.RLock()
+        self.max_templates = max_templates
+        self._templates: OrderedDict[str, Any] = OrderedDict()
+        self._templates_lock = threading.Lock()
+        self._prompt_managers: dict[Optional[str], Any] = {}
+        self._parsers: dict[Optional[str], Any] = {}
+        self._llms: dict[Hashable, Any] = {}
+        self._processor: Any = None
+
+    def _get_or_create(self, store: dict, key: Hashable, create: Callable[[], Any]) -> Any:
+        """Return store[key], building it once under the lock on a miss."""
+        value = store.get(key)
+        if value is None:
+            with self._lock:
+                value = store.get(key)
+                if value is None:
+                    value = store[key] = create()
+        return value
+
+    def template(self, template: str):
+        """
+        Get a template compiled into a fast renderer.
+
+        Args:
+            template: Prompt template string
+
+        Returns:
+            Shared CompiledTemplate (rebuilt if it was evicted)
+        """
+        with self._templates_lock:
+            compiled = self._templates.get(template)
+            if compiled is not None:
+                self._templates.move_to_end(template)
+                return compiled
+        from prompt_templates import CompiledTemplate
+        compiled = CompiledTemplate(template)
+        with self._templates_lock:
+            # Another thread may have compiled it meanwhile; keep the first
+            compiled = self._templates.setdefault(template, compiled)
+            self._templates.move_to_end(template)
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return compiled
+
+    def prompt_manager(self):
+        """
+        Get the shared PromptManager for the current environment.
+
+        A new one is built only when NO_MORE_TYPO_PROMPT_TEMPLATE changes.
+        Callers must not modify its templates.
+
+        Returns:
+            Shared PromptManager
+        """
+        custom_default = os.getenv("NO_MORE_TYPO_PROMPT_TEMPLATE")
+        manager = self._prompt_managers.get(custom_default)
+        if manager is not None:
+            return manager
+        from prompt_templates import PromptManager
+        return self._get_or_create(self._prompt_managers, custom_default, PromptManager)
+
+    def parser(self, command_pattern: Optional[str] = None):
+        """
+        Get the shared CommandParser for a command pattern.
+
+        Args:
+            command_pattern: Regex pattern (default: <#...>)
+
+        Returns:
+            Shared CommandParser (parsers hold no per-call state)
+        """
+        # Keyed by the pattern as given; None is the default pattern
+        parser = self._parsers.get(command_pattern)
+        if parser is not None:
+            return parser
+        from command_parser import CommandParser
+        create = (lambda: CommandParser(command_pattern)) if command_pattern else CommandParser
+        return self._get_or_create(self._parsers, command_pattern, create)
+
+    def llm(self, backend: Optional[str] = None, **options: Any):
+        """
+        Get a pooled LLM client.
+
+        Clients are keyed by backend, their options and the OPENAI_API_KEY
+        and OPENAI_API_BASE they were created with, and share one HTTP
+        connection pool between all callers.
+
+        Args:
+            backend: "direct" or "langchain" (default: CLIPIQ_BACKEND, else "langchain")
+            **options: Keyword arguments for the client
+
+        Returns:
+            Shared DirectOpenAI or LangChain OpenAI client
+        """
+        from llm_backend import DirectOpenAI, backend_from_environment
+        backend = backend_from_environment(backend)
+        key = (backend, tuple(sorted(options.items())), os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_API_BASE"))
+        client = self._llms.get(key)
+        if client is not None:
+            return client
+
+        def create():
+            if backend == "direct":
+                return DirectOpenAI(**options)
+            from langchain_community.llms.openai import OpenAI
+            return OpenAI(**options)
+
+        return self._get_or_create(self._llms, key, create)
+
+    def processor(self):
+        """
+        Get the shared EnhancedProcessor used by the convenience functions.
+
+        Returns:
+            EnhancedProcessor with a pooled LLM client
+        """
+        processor = self._processor
+        if processor is not None:
+            return processor
+        import enhanced_processor
+        with self._lock:
+            if self._processor is None:
+                self._processor = enhanced_processor.EnhancedProcessor()
+            return self._processor
+
+    def stats(self) -> dict:
+        """
+        Get the number of shared objects of each kind.
+
+        Returns:
+            Dictionary of counts
+        """
+        with self._lock, self._templates_lock:
+            return {
+                "templates": len(self._templates),
+                "prompt_managers": len(self._prompt_managers),
+                "parsers": len(self._parsers),
+                "llms": len(self._llms),
+                "processor": self._processor is not None,
+            }
+
+
+_registry = Registry()
+
+
+def get_registry() -> Registry:
+    """Get the process-wide registry."""
+    return _registry
+
+
+def reset_registry():
+    """Drop every shared object (for tests)."""
+    global _registry
+    _registry = Registry()
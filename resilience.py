@@ -0,0 +1,538 @@
+"""
+Retries and Circuit Breaking for ClipIQ
+
+Wraps the LLM so transient upstream errors (429, 5xx, dropped
+connections, timeouts) are retried with full-jitter exponential backoff
+inside a latency budget, and repeated failures open a circuit breaker
+that fails fast instead of waiting for every request to time out. While
+open, the breaker lets a single probe through once the reset timeout has
+passed (half-open) and closes again when the probe succeeds.
+
+Calls that cannot be served raise UpstreamUnavailableError, which tells
+EnhancedProcessor to return the original text straight away rather than
+retrying the same upstream through the default fallback chain.
+"""
+
+import asyncio
+import itertools
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from llm_backend import LLMBackend
+
+# HTTP statuses worth retrying (besides any 5xx)
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 425, 429})
+
+# Exception class names treated as transient, matched anywhere in the MRO so
+# openai and httpx do not have to be imported to classify their errors
+TRANSIENT_ERROR_NAMES = frozenset({
+    "APIConnectionError",   # openai (includes APITimeoutError)
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "TransportError",       # httpx (connect/read errors, dropped connections)
+    "TimeoutException",
+})
+
+
+class UpstreamUnavailableError(Exception):
+    """The LLM could not be reached within the retry budget."""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """The circuit breaker is open, so the call was not attempted."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"LLM circuit breaker is open (next probe in {retry_in:.1f}s)")
+        self.retry_in = retry_in
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """HTTP status carried by an error (or its response), if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Decide whether an error is worth retrying.
+
+    Args:
+        error: Exception raised by the LLM call
+
+    Returns:
+        True for rate limits, server errors, timeouts and connection failures
+    """
+    if isinstance(error, UpstreamUnavailableError):
+        return False
+    status = error_status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header on the error's response."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after")
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff bounded by attempts and a latency budget."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 budget: float = 8.0, seed: Optional[int] = None):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_attempts: Total attempts per call, including the first
+            base_delay: Backoff cap for the first retry in seconds (doubles per retry)
+            max_delay: Upper bound of any single backoff
+            budget: Seconds after the first attempt started within which a retry may begin
+            seed: Optional random seed for reproducible jitter
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Random delay in [0, min(max_delay, base_delay * 2**attempt)]."""
+        with self._lock:
+            return self._rng.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def next_delay(self, attempt: int, error: BaseException, elapsed: float) -> Optional[float]:
+        """
+        Delay before the next attempt, or None to give up.
+
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            error: The transient error it raised
+            elapsed: Seconds since the first attempt started
+
+        Returns:
+            Seconds to sleep, or None when attempts or budget are exhausted
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if elapsed + delay > self.budget:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive transient failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+
+        self.opens = 0
+        self.probes = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Current state; an open circuit past its reset timeout reads as half-open."""
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected without reaching the upstream."""
+        with self._lock:
+            if self._state == self.OPEN:
+                return self.clock() - self._opened_at < self.reset_timeout
+            return self._state == self.HALF_OPEN and self._probe_in_flight
+
+    def before_call(self):
+        """
+        Admit a call or reject it.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or a half-open probe is in flight
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            now = self.clock()
+            if self._state == self.OPEN:
+                remaining = self.reset_timeout - (now - self._opened_at)
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(remaining)
+                self._state = self.HALF_OPEN
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(0.0)
+            self._probe_in_flight = True
+            self.probes += 1
+
+    def record_success(self):
+        """Close the circuit after a call reached a healthy upstream."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+            self.consecutive_failures = 0
+
+    def cancel_probe(self):
+        """Release a half-open probe that was abandoned without an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Count a transient failure, opening the circuit at the threshold or on a failed probe."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opens += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+            self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        """
+        Get breaker state and counters.
+
+        Returns:
+            Dictionary with state, consecutive failures, opens, probes and rejected calls
+        """
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "opens": self.opens,
+                "probes": self.probes,
+                "rejected": self.rejected,
+            }
+
+
+class ResilientLLM(LLMBackend):
+    """
+    LLM wrapper that adds retries and a circuit breaker to an LLM.
+
+    Streams are retried only until the first chunk arrives; a failure after
+    that is raised so the caller can keep the partial result. Attributes
+    not defined here (model_name, openai_api_base, ...) are read from the
+    wrapped LLM, so cache keys and model identity are unaffected.
+    """
+
+    def __init__(self, llm: LLMBackend, breaker: Optional[CircuitBreaker] = None,
+                 policy: Optional[RetryPolicy] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the resilient LLM.
+
+        Args:
+            llm: LLM (or runnable) to protect
+            breaker: Circuit breaker (default: a new CircuitBreaker())
+            policy: Retry policy (default: a new RetryPolicy())
+            sleep: Blocking sleep used between synchronous retries (injectable for tests)
+        """
+        self.llm = llm
+        self.breaker = breaker or CircuitBreaker()
+        self.policy = policy or RetryPolicy()
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.gave_up = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes missing on the wrapper itself
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _start_request(self) -> float:
+        """Count a new request and return its start time."""
+        with self._lock:
+            self.requests += 1
+        return time.perf_counter()
+
+    def _retry_delay(self, error: Exception, attempt: int, start: float) -> float:
+        """
+        Update the breaker for a failed attempt and decide whether to retry.
+
+        Args:
+            error: Exception raised by the attempt
+            attempt: Zero-based attempt number
+            start: perf_counter value when the request started
+
+        Returns:
+            Seconds to wait before the next attempt
+
+        Raises:
+            The original error if it is not transient, or
+            UpstreamUnavailableError once retries or budget are exhausted
+        """
+        if not is_transient(error):
+            # The upstream answered (e.g. a 400), so it is healthy
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        delay = self.policy.next_delay(attempt, error, time.perf_counter() - start)
+        with self._lock:
+            if delay is None:
+                self.gave_up += 1
+            else:
+                self.retries += 1
+        if delay is None:
+            raise UpstreamUnavailableError(
+                f"LLM call failed after {attempt + 1} attempt(s): {error}") from error
+        return delay
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        """Invoke the LLM, retrying transient errors."""
+        start = self._start_request()
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            try:
+                result = self.llm.invoke(input, config, **kwargs)
+            except Exception as error:
+                delay = self._retry_delay(error, attempt, start)
+            except BaseException:
+                self.breaker.cancel_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            self.sleep(delay)
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        """Async variant of invoke."""
+        start = self._start_request()
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            try:
+                result = await self.llm.ainvoke(input, config, **kwargs)
+            except Exception as error:
+                delay = self._retry_delay(error, attempt, start)
+            except BaseException:
+                self.breaker.cancel_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            await asyncio.sleep(delay)
+
+    def stream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Iterator[Any]:
+        """Stream from the LLM, retrying transient errors before the first chunk."""
+        start = self._start_request()
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            streamed = False
+            try:
+                for chunk in self.llm.stream(input, config, **kwargs):
+                    if not streamed:
+                        streamed = True
+                        self.breaker.record_success()
+                    yield chunk
+            except Exception as error:
+                if streamed:
+                    if is_transient(error):
+                        self.breaker.record_failure()
+                    raise
+                delay = self._retry_delay(error, attempt, start)
+            except BaseException:
+                # Closed by the consumer or cancelled
+                if not streamed:
+                    self.breaker.cancel_probe()
+                raise
+            else:
+                if not streamed:
+                    self.breaker.record_success()
+                return
+            self.sleep(delay)
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """Async variant of stream."""
+        start = self._start_request()
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            streamed = False
+            try:
+                async for chunk in self.llm.astream(input, config, **kwargs):
+                    if not streamed:
+                        streamed = True
+                        self.breaker.record_success()
+                    yield chunk
+            except Exception as error:
+                if streamed:
+                    if is_transient(error):
+                        self.breaker.record_failure()
+                    raise
+                delay = self._retry_delay(error, attempt, start)
+            except BaseException:
+                # Closed by the consumer or cancelled
+                if not streamed:
+                    self.breaker.cancel_probe()
+                raise
+            else:
+                if not streamed:
+                    self.breaker.record_success()
+                return
+            await asyncio.sleep(delay)
+
+    def _batch_round(self, outputs: list, pending: list[int], attempt: int,
+                     start: float) -> tuple[list[int], Optional[float]]:
+        """
+        Update the breaker after one batch round and pick the items to retry.
+
+        Args:
+            outputs: Result list filled in place
+            pending: Indexes sent in this round
+            attempt: Zero-based round number
+            start: perf_counter value when the request started
+
+        Returns:
+            Tuple of (indexes to retry, delay before retrying); items that are
+            out of retries are replaced with UpstreamUnavailableError
+        """
+        transient = [index for index in pending
+                     if isinstance(outputs[index], Exception) and is_transient(outputs[index])]
+        if len(transient) < len(pending):
+            # At least one item reached a healthy upstream
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if not transient:
+            return [], None
+
+        delay = self.policy.next_delay(attempt, outputs[transient[0]], time.perf_counter() - start)
+        with self._lock:
+            if delay is None:
+                self.gave_up += 1
+            else:
+                self.retries += 1
+        if delay is None:
+            for index in transient:
+                error = UpstreamUnavailableError(
+                    f"LLM call failed after {attempt + 1} attempt(s): {outputs[index]}")
+                error.__cause__ = outputs[index]
+                outputs[index] = error
+            return [], None
+        return transient, delay
+
+    def _batch_inputs(self, inputs: list, config: Any, pending: list[int]) -> tuple[list, Any]:
+        """Select the pending inputs (and per-input configs) for a round."""
+        if isinstance(config, list):
+            config = [config[index] for index in pending]
+        return [inputs[index] for index in pending], config
+
+    def _reject_pending(self, outputs: list, pending: list[int]) -> bool:
+        """Fill pending items with CircuitOpenError if the breaker rejects the round."""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as error:
+            for index in pending:
+                outputs[index] = error
+            return True
+        return False
+
+    def batch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+              **kwargs: Any) -> list:
+        """Batch through the LLM, retrying only the items that failed transiently."""
+        start = self._start_request()
+        outputs: list = [None] * len(inputs)
+        pending = list(range(len(inputs)))
+        for attempt in itertools.count():
+            if not pending or self._reject_pending(outputs, pending):
+                break
+            sub_inputs, sub_config = self._batch_inputs(inputs, config, pending)
+            try:
+                results = self.llm.batch(sub_inputs, sub_config, return_exceptions=True, **kwargs)
+            except Exception as error:
+                results = [error] * len(pending)
+            for index, result in zip(pending, results):
+                outputs[index] = result
+            pending, delay = self._batch_round(outputs, pending, attempt, start)
+            if pending:
+                self.sleep(delay)
+        return outputs if return_exceptions else raise_first_error(outputs)
+
+    async def abatch(self, inputs: list, config: Any = None, *, return_exceptions: bool = False,
+                     **kwargs: Any) -> list:
+        """Async variant of batch."""
+        start = self._start_request()
+        outputs: list = [None] * len(inputs)
+        pending = list(range(len(inputs)))
+        for attempt in itertools.count():
+            if not pending or self._reject_pending(outputs, pending):
+                break
+            sub_inputs, sub_config = self._batch_inputs(inputs, config, pending)
+            try:
+                results = await self.llm.abatch(sub_inputs, sub_config, return_exceptions=True, **kwargs)
+            except Exception as error:
+                results = [error] * len(pending)
+            for index, result in zip(pending, results):
+                outputs[index] = result
+            pending, delay = self._batch_round(outputs, pending, attempt, start)
+            if pending:
+                await asyncio.sleep(delay)
+        return outputs if return_exceptions else raise_first_error(outputs)
+
+    def stats(self) -> dict:
+        """
+        Get retry counters and the breaker state.
+
+        Returns:
+            Dictionary with requests, retries, requests given up and breaker stats
+        """
+        with self._lock:
+            counters = {"requests": self.requests, "retries": self.retries, "gave_up": self.gave_up}
+        counters.update(self.breaker.stats())
+        return counters
+
+
+def raise_first_error(outputs: list) -> list:
+    """Return batch outputs, raising the first exception among them."""
+    for output in outputs:
+        if isinstance(output, Exception):
+            raise output
+    return outputs
@@ -0,0 +1,322 @@
+"""
+Response Cache for ClipIQ
+
+Caches LLM responses so re-processing the same text with the same command
+and model does not cost another LLM call. A bounded in-memory LRU sits in
+front of an optional SQLite store that can be shared across processes.
+Responses contain copied clipboard text, so the disk tier is opt-in and
+its file is readable by the owner only.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "clipiq", "responses.sqlite3")
+
+
+def normalize_command(command: str) -> str:
+    """
+    Normalize a command for use in cache keys.
+
+    Args:
+        command: Command string (may be empty)
+
+    Returns:
+        Lowercased command with whitespace collapsed
+    """
+    return " ".join((command or "").lower().split())
+
+
+def make_cache_key(category: str, command: str, prompt: str, model: str) -> str:
+    """
+    Build a cache key for an LLM request.
+
+    Args:
+        category: Template category (from categorize_command, or 'default')
+        command: Command string (normalized before hashing)
+        prompt: Fully rendered prompt
+        model: Model identity (name and endpoint)
+
+    Returns:
+        Hex digest identifying the request
+    """
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    key_material = "\x1f".join([category, normalize_command(command), prompt_hash, model])
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl: Optional time-to-live in seconds
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created_at: Optional[float] = None):
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (value, created_at if created_at is not None else time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Persistent cache backed by SQLite.
+
+    Uses WAL mode so several ClipIQ processes can share one cache file.
+    Each thread gets its own connection.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 10000,
+                 ttl: Optional[float] = 7 * 24 * 3600):
+        """
+        Initialize the cache, creating the database if needed.
+
+        Args:
+            path: Database file path (':memory:' is not shared between threads)
+            max_entries: Maximum number of stored entries
+            ttl: Optional time-to-live in seconds
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+
+        if path != ":memory:":
+            # Cached responses are clipboard contents: owner-only directory and file
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get_entry(self, key: str) -> Optional[tuple[str, float]]:
+        """Return (value, created_at), or None if missing or expired."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, created_at = row
+        now = time.time()
+        with connection:
+            if self.ttl is not None and now - created_at > self.ttl:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return value, created_at
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: str):
+        """Store a value, evicting the least recently used entries if full."""
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            (count,) = connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                connection.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def clear(self):
+        """Remove all entries."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        (count,) = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+
+class ResponseCache:
+    """Two-tier response cache: in-memory LRU in front of an optional persistent store."""
+
+    def __init__(self, memory: Optional[LRUCache] = None, disk: Optional[SQLiteCache] = None):
+        """
+        Initialize the tiered cache.
+
+        Args:
+            memory: In-memory tier (default: LRUCache())
+            disk: Optional persistent tier
+        """
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a key in memory, then on disk (promoting disk hits to memory).
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        if self.disk is not None:
+            try:
+                entry = self.disk.get_entry(key)
+            except sqlite3.Error:
+                self._count("errors")
+                entry = None
+            if entry is not None:
+                value, created_at = entry
+                self.memory.set(key, value, created_at)
+                self._count("disk_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str):
+        """Store a value in every tier."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                self._count("errors")
+        self._count("stores")
+
+    def clear(self):
+        """Remove all entries from every tier."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss counters.
+
+        Returns:
+            Dictionary with counters and the overall hit rate
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "errors": self.errors,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def _count(self, counter: str):
+        """Increment a counter under the lock."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def create_default_cache(path: Optional[str] = None) -> ResponseCache:
+    """
+    Create the tiered cache used by the ClipIQ app.
+
+    Responses are cached in memory only unless disk persistence is
+    requested: with path, with the CLIPIQ_CACHE_PATH environment variable,
+    or with CLIPIQ_CACHE_DISK=1 for the default location. If the database
+    cannot be opened the cache stays memory-only.
+
+    Args:
+        path: Optional database path (enables the disk tier)
+
+    Returns:
+        ResponseCache with a memory tier and, if requested, a disk tier
+    """
+    path = path or os.getenv("CLIPIQ_CACHE_PATH")
+    if not path and os.getenv("CLIPIQ_CACHE_DISK", "0") == "1":
+        path = DEFAULT_CACHE_PATH
+    disk = None
+    if path:
+        try:
+            disk = SQLiteCache(path)
+        except (OSError, sqlite3.Error) as e:
+            warnings.warn(f"Could not open response cache {path}: {e}. Caching in memory only.")
+    return ResponseCache(LRUCache(), disk)
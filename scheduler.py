@@ -0,0 +1,487 @@
+"""
+Priority Scheduling for ClipIQ
+
+Puts a scheduler in front of a shared EnhancedProcessor so a hotkey press
+does not wait behind hundreds of queued bulk items. Requests belong to one
+of three priority classes:
+
+- interactive: hotkey presses and editor actions; dispatched first and
+  allowed to use every slot
+- normal: regular daemon requests
+- bulk: batch jobs; limited to a share of the slots
+
+A few slots (interactive_reserve) are only ever used by interactive
+requests, so capacity is left for a hotkey press however much other work
+is queued.
+
+A running LLM call cannot be interrupted, so "preemption" means that a
+freed slot always goes to the highest waiting class and that other work
+can never occupy the reserved slots. Within a class the smallest prompt
+goes first (shortest job first); a job that has waited longer than
+starvation_timeout is dispatched next regardless of its size. Each class has
+a bounded queue: when it is full, new requests are refused with
+SchedulerFullError (or block until there is room), which is the
+backpressure signal for clients.
+
+A request that runs several LLM calls at once (a batch) takes one slot per
+concurrent call, and async callers wait on their event loop (aacquire)
+instead of blocking it.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from token_budget import estimate_tokens
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+
+# Highest priority first
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Bulk work gets at most half of the slots by default; interactive gets all of them
+DEFAULT_CLASS_SHARES = {INTERACTIVE: 1.0, NORMAL: 0.75, BULK: 0.5}
+DEFAULT_MAX_QUEUE = {INTERACTIVE: 16, NORMAL: 64, BULK: 256}
+
+
+class SchedulerFullError(RuntimeError):
+    """The queue of a priority class is full; retry later."""
+
+    def __init__(self, priority: str, queued: int, retry_after: float = 1.0):
+        super().__init__(f"The {priority} queue is full ({queued} waiting); retry later")
+        self.priority = priority
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+def validate_priority(priority: str) -> str:
+    """
+    Check a priority class name.
+
+    Raises:
+        ValueError: If priority is not one of PRIORITIES
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}, not {priority!r}")
+    return priority
+
+
+def _wake(loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+    """Resolve an asyncio future from any thread (no-op once it is done or the loop closed)."""
+    def resolve():
+        if not future.done():
+            future.set_result(None)
+    try:
+        loop.call_soon_threadsafe(resolve)
+    except RuntimeError:
+        pass
+
+
+class Ticket:
+    """A request waiting for, or holding, one or more scheduler slots."""
+
+    def __init__(self, priority: str, size: int, sequence: int, enqueued_at: float, weight: int = 1):
+        self.priority = priority
+        self.size = size
+        self.sequence = sequence
+        self.enqueued_at = enqueued_at
+        self.weight = weight
+        self.started_at: Optional[float] = None
+        self._granted = threading.Event()
+        # Called (lock held) when the ticket is granted; used by async waiters
+        self._on_grant: list[Callable[[], None]] = []
+
+    @property
+    def granted(self) -> bool:
+        """True once the ticket holds a slot."""
+        return self._granted.is_set()
+
+    @property
+    def wait_time(self) -> float:
+        """Seconds spent queued (0.0 until granted)."""
+        return 0.0 if self.started_at is None else self.started_at - self.enqueued_at
+
+
+class _ClassState:
+    """Queue and counters of one priority class."""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue: list[Ticket] = []
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "queued": len(self.queue),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "completed": self.completed,
+            "wait_ms_avg": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "wait_ms_max": round(self.max_wait * 1000, 2),
+        }
+
+
+class PriorityScheduler:
+    """Thread-safe admission control and dispatch for shared processor work."""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 class_limits: Optional[dict[str, int]] = None,
+                 max_queue: Optional[dict[str, int]] = None,
+                 interactive_reserve: Optional[int] = None,
+                 starvation_timeout: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Requests running at once across all classes
+            class_limits: Per-class concurrency limits (default: a share of
+                          max_concurrency, see DEFAULT_CLASS_SHARES)
+            max_queue: Per-class queue lengths before requests are refused
+            interactive_reserve: Slots only interactive requests may use
+                                 (default: a quarter of max_concurrency, at least 1)
+            starvation_timeout: Seconds after which a queued job is dispatched
+                                ahead of smaller jobs of its class
+            clock: Monotonic clock (injectable for tests)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        limits = {priority: max(1, int(max_concurrency * share))
+                  for priority, share in DEFAULT_CLASS_SHARES.items()}
+        limits.update(class_limits or {})
+        queues = dict(DEFAULT_MAX_QUEUE)
+        queues.update(max_queue or {})
+        for priority in list(limits) + list(queues):
+            validate_priority(priority)
+
+        self.max_concurrency = max_concurrency
+        if interactive_reserve is None:
+            interactive_reserve = max(1, max_concurrency // 4) if max_concurrency > 1 else 0
+        self.interactive_reserve = min(interactive_reserve, max_concurrency - 1)
+        self.starvation_timeout = starvation_timeout
+        self._clock = clock
+        self._classes = {priority: _ClassState(min(limits[priority], max_concurrency), queues[priority])
+                         for priority in PRIORITIES}
+        self._running = 0
+        self._sequence = itertools.count()
+        # Signalled whenever a queue shrinks, for callers blocked on a full queue
+        self._room = threading.Condition()
+        self._room_waiters: list[Callable[[], None]] = []
+
+    @property
+    def running(self) -> int:
+        """Slots currently held."""
+        return self._running
+
+    def queued(self, priority: Optional[str] = None) -> int:
+        """Requests waiting, in one class or in total."""
+        with self._room:
+            if priority is not None:
+                return len(self._classes[validate_priority(priority)].queue)
+            return sum(len(state.queue) for state in self._classes.values())
+
+    def _pick(self, state: _ClassState, now: float) -> Ticket:
+        """Choose the next ticket of a class: the oldest if it is starving, else the smallest."""
+        oldest = min(state.queue, key=lambda ticket: ticket.sequence)
+        if now - oldest.enqueued_at >= self.starvation_timeout:
+            return oldest
+        return min(state.queue, key=lambda ticket: (ticket.size, ticket.sequence))
+
+    def _capacity(self, priority: str) -> int:
+        """Slots a class may use in total (all but the interactive reserve for other classes)."""
+        return self.max_concurrency if priority == INTERACTIVE else self.max_concurrency - self.interactive_reserve
+
+    def _next_ticket(self, now: float) -> Optional[Ticket]:
+        """The next waiting ticket of the highest class that may start now (lock held)."""
+        for priority in PRIORITIES:
+            state = self._classes[priority]
+            if not state.queue or state.running >= state.limit:
+                continue
+            ticket = self._pick(state, now)
+            if self._running + ticket.weight > self._capacity(priority):
+                # Lower classes must not take the slots this ticket is waiting for
+                return None
+            if state.running + ticket.weight <= state.limit:
+                return ticket
+        return None
+
+    def _notify_room(self):
+        """Wake callers waiting for queue room, threads and event loops alike (lock held)."""
+        self._room.notify_all()
+        waiters, self._room_waiters = self._room_waiters, []
+        for wake in waiters:
+            wake()
+
+    def _dispatch(self):
+        """Grant free slots to waiting tickets, highest class first (lock held)."""
+        now = self._clock()
+        granted = False
+        ticket = self._next_ticket(now)
+        while ticket is not None:
+            state = self._classes[ticket.priority]
+            state.queue.remove(ticket)
+            state.running += ticket.weight
+            state.admitted += 1
+            self._running += ticket.weight
+            ticket.started_at = now
+            state.total_wait += ticket.wait_time
+            state.max_wait = max(state.max_wait, ticket.wait_time)
+            ticket._granted.set()
+            for wake in ticket._on_grant:
+                wake()
+            granted = True
+            ticket = self._next_ticket(now)
+        if granted:
+            self._notify_room()
+
+    def _enqueue(self, state: _ClassState, priority: str, size: int, weight: int) -> Ticket:
+        """Queue a ticket and dispatch (lock held, queue not full)."""
+        # A ticket can never need more slots than its class may ever hold
+        weight = max(1, min(weight, state.limit, self._capacity(priority)))
+        ticket = Ticket(priority, size, next(self._sequence), self._clock(), weight)
+        state.queue.append(ticket)
+        return ticket
+
+    def acquire(self, priority: str = NORMAL, size: int = 0, timeout: Optional[float] = None,
+                block: bool = False, weight: int = 1) -> Ticket:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: Priority class (see PRIORITIES)
+            size: Job size used for shortest-job-first ordering (prompt tokens)
+            timeout: Maximum seconds to wait (None waits forever)
+            block: Wait for room when the class queue is full instead of raising
+            weight: Slots to take at once, for work running that many calls
+                    concurrently (capped at what the class may hold)
+
+        Returns:
+            Ticket holding the slot; pass it to release()
+
+        Raises:
+            SchedulerFullError: If the class queue is full and block is False
+            TimeoutError: If no slot was granted within timeout
+        """
+        state = self._classes[validate_priority(priority)]
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._room:
+            while len(state.queue) >= state.max_queue:
+                remaining = None if deadline is None else deadline - self._clock()
+                if not block or (remaining is not None and remaining <= 0):
+                    state.rejected += 1
+                    raise SchedulerFullError(priority, len(state.queue))
+                self._room.wait(remaining)
+            ticket = self._enqueue(state, priority, size, weight)
+            self._dispatch()
+
+        remaining = None if deadline is None else max(0.0, deadline - self._clock())
+        if ticket._granted.wait(remaining):
+            return ticket
+        with self._room:
+            if ticket.granted:
+                # Granted between the timeout and taking the lock
+                return ticket
+            state.queue.remove(ticket)
+            state.timed_out += 1
+            self._dispatch()
+            self._notify_room()
+        raise TimeoutError(f"No {priority} slot became free within {timeout} s")
+
+    async def aacquire(self, priority: str = NORMAL, size: int = 0, timeout: Optional[float] = None,
+                       block: bool = False, weight: int = 1) -> Ticket:
+        """
+        Async variant of acquire: waits on the event loop instead of blocking it.
+
+        A task cancelled while queued leaves the queue (or gives back a slot
+        granted at the same moment).
+
+        Raises:
+            SchedulerFullError: If the class queue is full and block is False
+            TimeoutError: If no slot was granted within timeout
+        """
+        state = self._classes[validate_priority(priority)]
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wake = loop.create_future()
+            with self._room:
+                remaining = None if deadline is None else deadline - self._clock()
+                if len(state.queue) < state.max_queue:
+                    ticket = self._enqueue(state, priority, size, weight)
+                    ticket._on_grant.append(partial(_wake, loop, wake))
+                    self._dispatch()
+                    break
+                if not block or (remaining is not None and remaining <= 0):
+                    state.rejected += 1
+                    raise SchedulerFullError(priority, len(state.queue))
+                self._room_waiters.append(partial(_wake, loop, wake))
+            try:
+                await asyncio.wait_for(wake, remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        remaining = None if deadline is None else max(0.0, deadline - self._clock())
+        try:
+            await asyncio.wait_for(wake, remaining)
+            return ticket
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._room:
+                if not ticket.granted:
+                    state.queue.remove(ticket)
+                    if isinstance(e, asyncio.TimeoutError):
+                        state.timed_out += 1
+                    self._dispatch()
+                    self._notify_room()
+                elif isinstance(e, asyncio.TimeoutError):
+                    # Granted between the timeout and taking the lock
+                    return ticket
+            if ticket.granted:
+                self.release(ticket)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        raise TimeoutError(f"No {priority} slot became free within {timeout} s")
+
+    def release(self, ticket: Ticket):
+        """Give a ticket's slots back and dispatch the next waiting request."""
+        with self._room:
+            state = self._classes[ticket.priority]
+            state.running -= ticket.weight
+            state.completed += 1
+            self._running -= ticket.weight
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str = NORMAL, size: int = 0, timeout: Optional[float] = None,
+             block: bool = False, weight: int = 1) -> Iterator[Ticket]:
+        """Hold a slot for the duration of a with block (see acquire)."""
+        ticket = self.acquire(priority, size, timeout, block, weight)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, priority: str = NORMAL, size: int = 0, timeout: Optional[float] = None,
+                    block: bool = False, weight: int = 1) -> AsyncIterator[Ticket]:
+        """Hold a slot for the duration of an async with block (see aacquire)."""
+        ticket = await self.aacquire(priority, size, timeout, block, weight)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def run(self, priority: str, size: int, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run function(*args, **kwargs) once a slot of the given class is free."""
+        with self.slot(priority, size):
+            return function(*args, **kwargs)
+
+    def stats(self) -> dict:
+        """Per-class queue, concurrency and wait-time counters."""
+        with self._room:
+            result: dict = {"max_concurrency": self.max_concurrency, "running": self._running}
+            for priority, state in self._classes.items():
+                result[priority] = state.stats()
+            return result
+
+
+class ScheduledProcessor:
+    """
+    View of a shared processor whose LLM work goes through a PriorityScheduler.
+
+    Processing methods, sync and async, wait for a slot of this view's priority class; every
+    other attribute (preview_prompt, command_parser, cache, ...) is the
+    processor's own. Several views with different priorities can share one
+    processor and one scheduler.
+    """
+
+    def __init__(self, processor: Any, scheduler: PriorityScheduler, priority: str = NORMAL,
+                 block: bool = False, timeout: Optional[float] = None):
+        """
+        Initialize the view.
+
+        Args:
+            processor: EnhancedProcessor (or compatible) instance
+            scheduler: Scheduler shared by all views of the processor
+            priority: Priority class of requests made through this view
+            block: Wait for queue room instead of raising SchedulerFullError
+                   (suits batch jobs, which should slow down rather than fail)
+            timeout: Maximum seconds to wait for a slot
+        """
+        self.processor = processor
+        self.scheduler = scheduler
+        self.priority = validate_priority(priority)
+        self.block = block
+        self.timeout = timeout
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.processor, name)
+
+    def with_priority(self, priority: str, block: Optional[bool] = None) -> "ScheduledProcessor":
+        """Another view of the same processor and scheduler with a different class."""
+        return ScheduledProcessor(self.processor, self.scheduler, priority,
+                                  self.block if block is None else block, self.timeout)
+
+    def _slot(self, text: str):
+        return self.scheduler.slot(self.priority, estimate_tokens(text), self.timeout, self.block)
+
+    def _aslot(self, text: str):
+        return self.scheduler.aslot(self.priority, estimate_tokens(text), self.timeout, self.block)
+
+    def process_clipboard_content(self, clipboard_text: str, **kwargs: Any) -> str:
+        """Scheduled EnhancedProcessor.process_clipboard_content."""
+        with self._slot(clipboard_text):
+            return self.processor.process_clipboard_content(clipboard_text, **kwargs)
+
+    def process_with_specific_command(self, content: str, command: str, **kwargs: Any) -> str:
+        """Scheduled EnhancedProcessor.process_with_specific_command."""
+        with self._slot(content):
+            return self.processor.process_with_specific_command(content, command, **kwargs)
+
+    def stream_clipboard_content(self, clipboard_text: str, **kwargs: Any) -> Iterator[str]:
+        """
+        Scheduled EnhancedProcessor.stream_clipboard_content.
+
+        The slot is taken before the first chunk and held until the stream
+        finishes or is closed.
+        """
+        with self._slot(clipboard_text):
+            yield from self.processor.stream_clipboard_content(clipboard_text, **kwargs)
+
+    def process_many(self, texts: list[str], max_concurrency: Optional[int] = None, **kwargs: Any) -> list[str]:
+        """
+        Scheduled EnhancedProcessor.process_many.
+
+        The batch takes one slot per concurrent LLM call (up to what its class
+        may hold) and runs with at most that many calls in flight.
+        """
+        with self.scheduler.slot(self.priority, sum(estimate_tokens(text) for text in texts),
+                                 self.timeout, self.block, weight=max_concurrency or len(texts)) as ticket:
+            return self.processor.process_many(texts, max_concurrency=ticket.weight, **kwargs)
+
+    async def aprocess_clipboard_content(self, clipboard_text: str, **kwargs: Any) -> str:
+        """Scheduled EnhancedProcessor.aprocess_clipboard_content."""
+        async with self._aslot(clipboard_text):
+            return await self.processor.aprocess_clipboard_content(clipboard_text, **kwargs)
+
+    async def aprocess_with_specific_command(self, content: str, command: str, **kwargs: Any) -> str:
+        """Scheduled EnhancedProcessor.aprocess_with_specific_command."""
+        async with self._aslot(content):
+            return await self.processor.aprocess_with_specific_command(content, command, **kwargs)
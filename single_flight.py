@@ -0,0 +1,182 @@
+"""
+Single-Flight Request Deduplication for ClipIQ
+
+When several callers ask for the same thing at the same time (repeated
+hotkey presses, several editor windows, duplicate daemon requests), only
+the first caller - the leader - calls the LLM; the others wait for the
+leader and receive its result, or its exception. Unlike the response
+cache, nothing is kept once the call finishes, so this also applies when
+the cache is disabled or bypassed.
+
+A caller that passes a CancellationToken stops waiting as soon as its own
+token is cancelled. If the leader is cancelled, its followers are not:
+the next one in line repeats the call as the new leader.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from cancellation import CancellationToken, CancelledRequestError, await_cancellable
+
+
+class _Call:
+    """A call in flight that followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Events of followers that can also be woken by their own cancellation
+        self.waiters: list[threading.Event] = []
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._async_calls: dict[tuple[int, Hashable], asyncio.Future] = {}
+
+        # Counters
+        self.leaders = 0
+        self.shared = 0
+        self.batch_collapsed = 0
+
+    def do(self, key: Hashable, function: Callable[[], Any],
+           cancel_token: Optional[CancellationToken] = None) -> Any:
+        """
+        Run function, unless a call with the same key is already running.
+
+        Args:
+            key: Identifies equivalent calls
+            function: Called by the leader only
+            cancel_token: Optional token that stops this caller waiting
+
+        Returns:
+            The leader's result
+
+        Raises:
+            CancelledRequestError: If cancel_token was cancelled while waiting
+            Whatever the leader's call raised
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                    leader = True
+                else:
+                    self.shared += 1
+                    leader = False
+
+            if leader:
+                break
+            self._wait(call, cancel_token)
+            if isinstance(call.error, CancelledRequestError):
+                # The leader's request went stale, this one did not
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                call.done.set()
+                waiters = call.waiters
+            for wake in waiters:
+                wake.set()
+        return call.result
+
+    def _wait(self, call: _Call, cancel_token: Optional[CancellationToken]):
+        """Wait for call to finish, or raise once cancel_token is cancelled."""
+        if cancel_token is None:
+            call.done.wait()
+            return
+        wake = threading.Event()
+        with self._lock:
+            if call.done.is_set():
+                return
+            call.waiters.append(wake)
+        remove = cancel_token.add_callback(wake.set)
+        try:
+            wake.wait()
+        finally:
+            remove()
+        if not call.done.is_set():
+            cancel_token.raise_if_cancelled()
+
+    async def ado(self, key: Hashable, function: Callable[[], Awaitable[Any]],
+                  cancel_token: Optional[CancellationToken] = None) -> Any:
+        """
+        Async variant of do for callers on the same event loop.
+
+        A follower that is cancelled stops waiting without cancelling the
+        leader; if the leader itself is cancelled by asyncio, its followers
+        see the CancelledError too.
+        """
+        while True:
+            loop_key = (id(asyncio.get_running_loop()), key)
+            with self._lock:
+                future = self._async_calls.get(loop_key)
+                if future is None:
+                    future = self._async_calls[loop_key] = asyncio.get_running_loop().create_future()
+                    self.leaders += 1
+                    leader = True
+                else:
+                    self.shared += 1
+                    leader = False
+
+            if leader:
+                break
+            try:
+                return await await_cancellable(asyncio.shield(future), cancel_token)
+            except CancelledRequestError:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise
+                # The leader's request went stale, this one did not
+
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            # Retrieve the exception so a future without followers is not reported as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._async_calls[loop_key]
+
+    def record_batch_collapsed(self, count: int):
+        """Count batch items answered from an identical item of the same batch."""
+        with self._lock:
+            self.batch_collapsed += count
+
+    def stats(self) -> dict:
+        """
+        Get deduplication counters.
+
+        Returns:
+            Dictionary with calls made (leaders), concurrent calls that shared
+            a leader's result, batch duplicates collapsed and calls in flight
+        """
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "batch_collapsed": self.batch_collapsed,
+                "in_flight": len(self._calls) + len(self._async_calls),
+            }
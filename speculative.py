@@ -0,0 +1,157 @@
+"""
+Speculative Processor for ClipIQ
+
+Starts processing clipboard text in the background as soon as it is
+copied, so a later hotkey press can use the finished (or in-flight)
+result instead of starting from scratch. Speculation is bounded by a
+per-minute call budget and a text length cap to keep LLM cost under
+control, and counters record how often it paid off.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class SpeculativeProcessor:
+    """Runs speculative requests on a background pool and hands out their futures."""
+
+    def __init__(self, process: Callable[[str], str], max_calls_per_minute: int = 10,
+                 max_chars: int = 2000, max_entries: int = 4, max_workers: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the speculative processor.
+
+        Args:
+            process: Blocking function turning clipboard text into the result
+            max_calls_per_minute: Budget of speculative calls in any 60 second window
+            max_chars: Longer texts are not speculated on
+            max_entries: Speculations kept for a later claim (oldest evicted first)
+            max_workers: Concurrent speculative calls
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.process = process
+        self.max_calls_per_minute = max_calls_per_minute
+        self.max_chars = max_chars
+        self.max_entries = max_entries
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clipiq-speculate")
+        # Text -> (future, time its call was charged to the budget)
+        self._entries: OrderedDict[str, tuple[Future, float]] = OrderedDict()
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.skipped_budget = 0
+        self.skipped_length = 0
+        self.hits_ready = 0
+        self.hits_in_flight = 0
+        self.misses = 0
+        self.wasted = 0
+        self.cancelled = 0
+
+    def speculate(self, text: str) -> bool:
+        """
+        Start processing text in the background if allowed.
+
+        Args:
+            text: Newly copied clipboard text
+
+        Returns:
+            True if a speculative call was started (or one already exists)
+        """
+        if not text or not text.strip():
+            return False
+        with self._lock:
+            if text in self._entries:
+                self._entries.move_to_end(text)
+                return True
+            if len(text) > self.max_chars:
+                self.skipped_length += 1
+                return False
+
+            now = self.clock()
+            while self._calls and now - self._calls[0] >= 60.0:
+                self._calls.popleft()
+            if len(self._calls) >= self.max_calls_per_minute:
+                self.skipped_budget += 1
+                return False
+
+            self._calls.append(now)
+            self.started += 1
+            self._entries[text] = (self._executor.submit(self.process, text), now)
+            while len(self._entries) > self.max_entries:
+                _, (evicted, reserved_at) = self._entries.popitem(last=False)
+                self._discard(evicted, reserved_at)
+        return True
+
+    def lookup(self, text: str) -> Optional[Future]:
+        """Return the speculation for text without claiming it (no counters change)."""
+        with self._lock:
+            entry = self._entries.get(text)
+            return entry[0] if entry is not None else None
+
+    def claim(self, text: str) -> Optional[Future]:
+        """
+        Take the speculation for text, counting a hit or a miss.
+
+        Args:
+            text: Clipboard text the user asked to process
+
+        Returns:
+            Future with the result, or None if nothing was speculated
+        """
+        with self._lock:
+            future, _ = self._entries.pop(text, (None, None))
+            if future is None:
+                self.misses += 1
+            elif future.done():
+                self.hits_ready += 1
+            else:
+                self.hits_in_flight += 1
+            return future
+
+    def _discard(self, future: Future, reserved_at: float):
+        """Account for a speculation evicted before anyone claimed it (lock held)."""
+        if future.cancel():
+            self.cancelled += 1
+            # A cancelled call never reached the LLM, so give back its own
+            # budget entry (unless it has already left the window)
+            try:
+                self._calls.remove(reserved_at)
+            except ValueError:
+                pass
+        else:
+            self.wasted += 1
+
+    def stats(self) -> dict:
+        """
+        Get speculation counters.
+
+        Returns:
+            Dictionary with counters and the payoff rate (hits per claim)
+        """
+        with self._lock:
+            hits = self.hits_ready + self.hits_in_flight
+            claims = hits + self.misses
+            return {
+                "started": self.started,
+                "skipped_budget": self.skipped_budget,
+                "skipped_length": self.skipped_length,
+                "hits_ready": self.hits_ready,
+                "hits_in_flight": self.hits_in_flight,
+                "misses": self.misses,
+                "wasted": self.wasted,
+                "cancelled": self.cancelled,
+                "payoff_rate": hits / claims if claims else 0.0,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the background pool, cancelling speculations that have not started."""
+        with self._lock:
+            for future, _ in self._entries.values():
+                future.cancel()
+            self._entries.clear()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
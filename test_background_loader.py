@@ -0,0 +1,69 @@
+"""
+Unit tests for BackgroundLoader
+
+Tests background construction, waiting on first use and error propagation.
+"""
+
+import threading
+import pytest
+from background_loader import BackgroundLoader
+
+
+class TestBackgroundLoader:
+    """Test suite for BackgroundLoader."""
+    
+    def test_get_waits_for_result(self):
+        """Test that get() blocks until the factory finishes."""
+        release = threading.Event()
+        
+        def factory():
+            release.wait(5)
+            return "processor"
+        
+        loader = BackgroundLoader(factory).start()
+        assert loader.ready is False
+        
+        release.set()
+        assert loader.get(timeout=5) == "processor"
+        assert loader.ready is True
+        assert loader.elapsed is not None
+    
+    def test_factory_runs_once(self):
+        """Test that repeated start/get calls build only once."""
+        calls = []
+        loader = BackgroundLoader(lambda: calls.append(1) or len(calls))
+        
+        loader.start()
+        loader.start()
+        assert loader.get(timeout=5) == 1
+        assert loader.get(timeout=5) == 1
+        assert calls == [1]
+    
+    def test_get_starts_lazily(self):
+        """Test that get() starts the loader if start() was never called."""
+        loader = BackgroundLoader(lambda: 42)
+        assert loader.get(timeout=5) == 42
+    
+    def test_factory_error_is_raised_from_get(self):
+        """Test that a factory exception is re-raised to callers."""
+        def factory():
+            raise RuntimeError("no api key")
+        
+        loader = BackgroundLoader(factory).start()
+        with pytest.raises(RuntimeError, match="no api key"):
+            loader.get(timeout=5)
+        assert loader.ready is True
+    
+    def test_get_timeout(self):
+        """Test that get() raises TimeoutError when not ready in time."""
+        release = threading.Event()
+        loader = BackgroundLoader(lambda: release.wait(5)).start()
+        
+        with pytest.raises(TimeoutError):
+            loader.get(timeout=0.01)
+        release.set()
+
+
+if __name__ == "__main__":
+    # Run the tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,307 @@
+"""
+Unit tests for the batch processor
+
+Tests record reading, ordered concurrent processing and the CLI entry point.
+"""
+
+import io
+import json
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from batch_processor import (
+    BatchRecord,
+    BatchSummary,
+    iter_records,
+    run_batch,
+    main
+)
+
+
+class FakeProcessor:
+    """Processor stub that upper-cases text after a per-record delay."""
+    
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+    
+    def _run(self, text):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delays.get(text, 0))
+        with self.lock:
+            self.active -= 1
+        return text.upper()
+    
+    def process_clipboard_content(self, text, use_cache=True):
+        return self._run(text)
+    
+    def process_with_specific_command(self, text, command, use_cache=True):
+        return f"{command}: {self._run(text)}"
+
+
+class TestIterRecords:
+    """Test suite for reading input records."""
+    
+    def test_reads_files_directories_and_jsonl(self, tmp_path):
+        """Test that every input type yields records in order."""
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "b.txt").write_text("second")
+        (tmp_path / "docs" / "a.txt").write_text("first")
+        single = tmp_path / "single.txt"
+        single.write_text("single")
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(
+            json.dumps({"id": "r1", "text": "hola <#translate to english>"}) + "\n\n"
+            + json.dumps({"text": "plain", "command": "summarize"}) + "\n"
+        )
+        
+        records = list(iter_records([str(tmp_path / "docs"), str(single), str(corpus)]))
+        
+        assert [r.text for r in records] == ["first", "second", "single", "hola <#translate to english>", "plain"]
+        assert records[3].record_id == "r1"
+        assert records[4].record_id == f"{corpus}:3"
+        assert records[4].command == "summarize"
+    
+    def test_bad_lines_become_error_records(self, tmp_path):
+        """Test that unreadable JSONL lines are reported without stopping the corpus."""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text("\n".join([
+            json.dumps({"body": "text"}),
+            json.dumps({"id": "n", "text": 42}),
+            "{not json",
+            json.dumps(["text"]),
+            json.dumps({"text": "fine"}),
+        ]) + "\n")
+        
+        records = list(iter_records([str(corpus)]))
+        
+        assert "missing 'text'" in records[0].error
+        assert records[1].record_id == "n" and "'text' must be a string" in records[1].error
+        assert "invalid JSON" in records[2].error
+        assert "expected a JSON object" in records[3].error
+        assert records[4].text == "fine" and records[4].error is None
+    
+    def test_unreadable_files_become_error_records(self, tmp_path):
+        """Test that a binary file in a directory fails only its own record."""
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "a.txt").write_text("first")
+        (tmp_path / "docs" / "b.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff\xfe\x00")
+        (tmp_path / "docs" / "c.txt").write_text("last")
+        (tmp_path / "docs" / "d.jsonl").write_bytes(b"\xff\xfe\n")
+        
+        records = list(iter_records([str(tmp_path / "docs")]))
+        
+        assert [r.text for r in records[:3:2]] == ["first", "last"]
+        assert "UTF-8" in records[1].error
+        assert "not UTF-8" in records[3].error
+        
+        summary = run_batch(FakeProcessor(), records, io.StringIO())
+        assert summary.records == 2
+        assert summary.to_dict()["errors"] == 2
+    
+    def test_custom_text_field(self, tmp_path):
+        """Test reading text from a custom JSONL field."""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(json.dumps({"body": "text"}) + "\n")
+        
+        assert [r.text for r in iter_records([str(corpus)], text_field="body")] == ["text"]
+
+
+class TestRunBatch:
+    """Test suite for concurrent batch processing."""
+    
+    def test_results_are_written_in_input_order(self):
+        """Test that slow early records do not reorder the output."""
+        processor = FakeProcessor(delays={"a": 0.2, "b": 0.0, "c": 0.1})
+        records = [BatchRecord(str(i), text) for i, text in enumerate(["a", "b", "c"])]
+        output = io.StringIO()
+        
+        summary = run_batch(processor, records, output, concurrency=3)
+        
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [line["id"] for line in lines] == ["0", "1", "2"]
+        assert [line["output"] for line in lines] == ["A", "B", "C"]
+        assert summary.records == 3
+        assert processor.max_active > 1
+    
+    def test_concurrency_is_bounded(self):
+        """Test that no more than `concurrency` requests run at once."""
+        processor = FakeProcessor(delays={str(i): 0.01 for i in range(20)})
+        records = (BatchRecord(str(i), str(i)) for i in range(20))
+        
+        run_batch(processor, records, io.StringIO(), concurrency=2)
+        
+        assert processor.max_active <= 2
+    
+    def test_duplicate_records_share_a_request(self):
+        """Test that identical records in the window are processed once."""
+        processor = FakeProcessor()
+        processor.calls = []
+        original = processor._run
+        processor._run = lambda text: processor.calls.append(text) or original(text)
+        records = [BatchRecord(str(i), text) for i, text in enumerate(["a", "b", "a", "a", "b"])]
+        output = io.StringIO()
+
+        summary = run_batch(processor, records, output, concurrency=4)
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [line["output"] for line in lines] == ["A", "B", "A", "A", "B"]
+        assert sorted(processor.calls) == ["a", "b"]
+        assert summary.to_dict()["collapsed"] == 3
+    
+    def test_records_are_read_lazily(self):
+        """Test that only a bounded window of records is read ahead."""
+        processor = FakeProcessor()
+        read = []
+        output = io.StringIO()
+        
+        def records():
+            for i in range(100):
+                read.append(i)
+                # Never more than 2 * concurrency ahead of the output
+                assert len(read) - len(output.getvalue().splitlines()) <= 5
+                yield BatchRecord(str(i), "x")
+        
+        run_batch(processor, records(), output, concurrency=2)
+        assert len(read) == 100
+    
+    def test_record_command_and_input(self):
+        """Test that record commands are applied and inputs optionally echoed."""
+        output = io.StringIO()
+        run_batch(FakeProcessor(), [BatchRecord("1", "text", "summarize")], output, include_input=True)
+        
+        result = json.loads(output.getvalue())
+        assert result["output"] == "summarize: TEXT"
+        assert result["command"] == "summarize"
+        assert result["input"] == "text"
+    
+    def test_error_records_are_written_in_order(self):
+        """Test that bad records are reported in place and the rest are processed."""
+        output = io.StringIO()
+        records = [BatchRecord("1", "one"), BatchRecord("2", "", error="bad line"), BatchRecord("3", "three")]
+        summary = run_batch(FakeProcessor(), records, output)
+        
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [line.get("output") for line in lines] == ["ONE", None, "THREE"]
+        assert lines[1] == {"id": "2", "error": "bad line"}
+        assert summary.to_dict()["errors"] == 1
+        assert summary.records == 2
+    
+    def test_invalid_concurrency(self):
+        """Test that concurrency must be positive."""
+        with pytest.raises(ValueError):
+            run_batch(FakeProcessor(), [], io.StringIO(), concurrency=0)
+
+
+class TestBatchSummary:
+    """Test suite for batch statistics."""
+    
+    def test_percentiles_and_throughput(self):
+        """Test summary statistics."""
+        summary = BatchSummary()
+        for latency in [0.1, 0.2, 0.3, 0.4]:
+            summary.add(latency, 10, 20)
+        summary.finish()
+        
+        stats = summary.to_dict()
+        assert stats["records"] == 4
+        assert stats["input_chars"] == 40
+        assert stats["output_chars"] == 80
+        assert stats["latency_max_ms"] == pytest.approx(400)
+        assert 200 <= stats["latency_p50_ms"] <= 300
+    
+    def test_latency_sample_is_bounded(self):
+        """Test that memory used for latencies does not grow without bound."""
+        summary = BatchSummary(sample_size=10)
+        for i in range(1000):
+            summary.add(i / 1000, 1, 1)
+        
+        assert summary.records == 1000
+        assert len(summary._latencies) == 10
+
+
+class TestBatchCLI:
+    """Test suite for the batch command line entry point."""
+    
+    def test_main_writes_output_file(self, tmp_path, capsys):
+        """Test the CLI end to end with an injected processor."""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text("\n".join(json.dumps({"id": str(i), "text": f"t{i}"}) for i in range(3)) + "\n")
+        output = tmp_path / "out.jsonl"
+        
+        exit_code = main([str(corpus), "-o", str(output), "--command", "fix"], processor=FakeProcessor())
+        
+        assert exit_code == 0
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [line["output"] for line in lines] == ["fix: T0", "fix: T1", "fix: T2"]
+        assert "Processed 3 records" in capsys.readouterr().err
+    
+    def test_main_reports_bad_lines_and_continues(self, tmp_path, capsys):
+        """Test that a bad JSONL line fails its record only."""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(json.dumps({"text": ["not", "text"]}) + "\n" + json.dumps({"text": "ok"}) + "\n")
+        output = tmp_path / "out.jsonl"
+        
+        exit_code = main([str(corpus), "-o", str(output)], processor=FakeProcessor())
+        
+        assert exit_code == 1
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert "must be a string" in lines[0]["error"]
+        assert lines[1]["output"] == "OK"
+        assert "Errors: 1 records" in capsys.readouterr().err
+    
+    def test_main_uses_environment_configuration(self, tmp_path, monkeypatch, capsys):
+        """Test that the default processor honours CLIPIQ_* settings and the CLI options."""
+        from enhanced_processor import ProcessorFactory
+        from fake_llm import FakeLLM
+        create = ProcessorFactory.create_from_environment
+        created = []
+        
+        def create_from_environment(llm=None):
+            created.append(create(FakeLLM()))
+            return created[-1]
+        
+        monkeypatch.setattr(ProcessorFactory, "create_from_environment", create_from_environment)
+        monkeypatch.setenv("CLIPIQ_DEADLINE", "7")
+        monkeypatch.setenv("CLIPIQ_CONTEXT_TOKENS", "9000")
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(json.dumps({"text": "Helo wrld"}) + "\n")
+        
+        assert main([str(corpus), "--no-cache", "--max-prompt-tokens", "500"]) == 0
+        processor = created[0]
+        assert processor.deadline == 7
+        assert processor.cache is None
+        assert processor.token_budget.context_tokens == 9000
+        assert processor.token_budget.max_prompt_tokens == 500
+        
+        monkeypatch.setenv("CLIPIQ_TOKEN_BUDGET", "0")
+        assert main([str(corpus)]) == 0
+        assert created[1].token_budget is None
+        # An explicit --max-prompt-tokens still gets a budget
+        assert main([str(corpus), "--max-prompt-tokens", "500"]) == 0
+        assert created[2].token_budget.max_prompt_tokens == 500
+        assert created[2].token_budget.context_tokens == 9000
+        assert json.loads(capsys.readouterr().out.splitlines()[-1])["output"] == "Helo wrld"
+    
+    def test_main_with_enhanced_processor(self, tmp_path, capsys):
+        """Test the CLI with a real EnhancedProcessor and mocked LLM."""
+        from enhanced_processor import EnhancedProcessor
+        mock_llm = Mock()
+        mock_llm.invoke.return_value = "Hola"
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(json.dumps({"id": "1", "text": "Hello <#translate to spanish>"}) + "\n")
+        
+        main([str(corpus)], processor=EnhancedProcessor(llm=mock_llm))
+        
+        result = json.loads(capsys.readouterr().out)
+        assert result == {"id": "1", "output": "Hola", "latency_ms": result["latency_ms"]}
+
+
+if __name__ == "__main__":
+    # Run the tests
+    pytest.main([__file__, "-v"])
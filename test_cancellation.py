@@ -0,0 +1,309 @@
+"""
+Unit tests for request cancellation
+
+Tests CancellationToken and Deadline, cancellation of blocking, streaming
+and async processing, single-flight behaviour when a caller goes stale,
+and graceful degradation when a deadline runs out.
+"""
+
+import asyncio
+import threading
+import time
+import warnings
+import pytest
+from cancellation import (
+    CancellationToken,
+    CancelledRequestError,
+    Deadline,
+    DeadlineExceededError,
+    await_cancellable,
+    call_cancellable,
+    current_token,
+    iterate_cancellable
+)
+from enhanced_processor import EnhancedProcessor, StreamStats
+from fake_llm import ConstantLatency, FakeLLM
+from response_cache import LRUCache, ResponseCache
+from single_flight import SingleFlight
+
+
+LONG_TEXT = " ".join(f"word{i}" for i in range(50))
+
+
+def cancel_later(token, delay):
+    """Cancel token from another thread after delay seconds."""
+    timer = threading.Timer(delay, token.cancel, args=("superseded",))
+    timer.start()
+    return timer
+
+
+class TestCancellationToken:
+    """Test suite for CancellationToken."""
+
+    def test_cancel_runs_callbacks_once(self):
+        """Test that callbacks run once and late callbacks run immediately."""
+        token = CancellationToken()
+        calls = []
+        token.add_callback(lambda: calls.append("early"))
+        remove = token.add_callback(lambda: calls.append("removed"))
+        remove()
+        assert token.cancel("stale") is True
+        assert token.cancel("again") is False
+        token.add_callback(lambda: calls.append("late"))
+        assert calls == ["early", "late"]
+        assert token.reason == "stale"
+        with pytest.raises(CancelledRequestError, match="stale"):
+            token.raise_if_cancelled()
+
+    def test_await_cancellable_from_another_thread(self):
+        """Test that a thread cancelling the token cancels the awaited task."""
+        token = CancellationToken()
+
+        async def main():
+            cancel_later(token, 0.02)
+            start = time.perf_counter()
+            with pytest.raises(CancelledRequestError):
+                await await_cancellable(asyncio.sleep(5), token)
+            return time.perf_counter() - start
+
+        assert asyncio.run(main()) < 1.0
+
+
+class TestCallCancellable:
+    """Test suite for call_cancellable."""
+
+    def test_helper_threads_are_shared(self):
+        """Test that calls run on the shared helper pool with the token available."""
+        token = CancellationToken()
+        seen = [call_cancellable(lambda: (threading.current_thread().name, current_token()), token)
+                for _ in range(5)]
+        assert all(name.startswith("clipiq-cancellable") for name, _ in seen)
+        assert all(seen_token is token for _, seen_token in seen)
+        assert len({name for name, _ in seen}) < 5
+        assert current_token() is None
+
+    def test_cancelled_call_stops_waiting(self):
+        """Test that a cancelled call returns at once and its result is discarded."""
+        token = CancellationToken()
+        cancel_later(token, 0.05)
+        start = time.perf_counter()
+        with pytest.raises(CancelledRequestError, match="superseded"):
+            call_cancellable(lambda: time.sleep(2) or "late", token)
+        assert time.perf_counter() - start < 1.0
+
+    def test_client_that_aborts_runs_on_the_caller_thread(self):
+        """Test that aborts_on_cancel skips the helper and reports the abort as cancellation."""
+        token = CancellationToken()
+
+        def aborting_call():
+            assert threading.current_thread() is threading.main_thread()
+            aborted = threading.Event()
+            current_token().add_callback(aborted.set)
+            if aborted.wait(2):
+                raise ConnectionAbortedError("Request aborted")
+            return "late"
+
+        cancel_later(token, 0.05)
+        with pytest.raises(CancelledRequestError):
+            call_cancellable(aborting_call, token, aborts_on_cancel=True)
+        assert current_token() is None
+        assert call_cancellable(lambda: "ok", CancellationToken(), aborts_on_cancel=True) == "ok"
+
+
+class TestCancelledProcessing:
+    """Test suite for cancellation inside EnhancedProcessor."""
+
+    def test_stream_stops_at_next_chunk(self):
+        """Test that a cancelled stream closes without yielding more chunks."""
+        llm = FakeLLM(latency=ConstantLatency(5.0), first_token_fraction=0.0)
+        processor = EnhancedProcessor(llm=llm, cache=None)
+        token = CancellationToken()
+        stats = StreamStats()
+        stream = processor.stream_clipboard_content(LONG_TEXT, stats, cancel_token=token)
+
+        start = time.perf_counter()
+        first = next(stream)
+        token.cancel("superseded")
+        with pytest.raises(CancelledRequestError):
+            next(stream)
+        # Well before the 5 s stream would have finished
+        assert time.perf_counter() - start < 2.0
+        assert first and stats.chunks == 1
+        assert stats.status == "cancelled"
+
+    def test_blocking_result_is_discarded_without_fallback(self):
+        """Test that a stale blocking result raises instead of falling back."""
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(0.1)), cache=None)
+        for call in (lambda token: processor.process_clipboard_content("Helo wrld", cancel_token=token),
+                     lambda token: processor.process_clipboard_content("Helo <#fix>", cancel_token=token)):
+            token = CancellationToken()
+            cancel_later(token, 0.02)
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                with pytest.raises(CancelledRequestError):
+                    call(token)
+
+    def test_already_cancelled_skips_the_llm(self):
+        """Test that a token cancelled up front never reaches the LLM."""
+        llm = FakeLLM()
+        processor = EnhancedProcessor(llm=llm, cache=None)
+        token = CancellationToken()
+        token.cancel()
+        with pytest.raises(CancelledRequestError):
+            processor.process_with_specific_command("Hola", "translate to english", cancel_token=token)
+        with pytest.raises(CancelledRequestError):
+            list(processor.stream_clipboard_content("Helo wrld", cancel_token=token))
+        assert llm.calls == 0
+
+    def test_async_call_is_aborted(self):
+        """Test that cancelling aborts the awaited LLM call itself."""
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(2.0)), cache=None)
+
+        async def main():
+            token = CancellationToken()
+            cancel_later(token, 0.02)
+            start = time.perf_counter()
+            with pytest.raises(CancelledRequestError):
+                await processor.aprocess_clipboard_content("Helo wrld", cancel_token=token)
+            return time.perf_counter() - start
+
+        assert asyncio.run(main()) < 1.0
+
+
+class TestSingleFlightCancellation:
+    """Test suite for single-flight callers that go stale."""
+
+    def test_cancelled_follower_stops_waiting(self):
+        """Test that a follower's own token stops its wait, not the leader."""
+        flight = SingleFlight()
+        release = threading.Event()
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", lambda: release.wait(5) and "done")))
+        leader.start()
+        while flight.stats()["in_flight"] == 0:
+            time.sleep(0.001)
+
+        token = CancellationToken()
+        cancel_later(token, 0.02)
+        with pytest.raises(CancelledRequestError):
+            flight.do("k", lambda: "unused", token)
+        release.set()
+        leader.join()
+        assert results == ["done"]
+
+    def test_followers_survive_a_cancelled_leader(self):
+        """Test that a follower repeats the call when the leader is cancelled."""
+        llm = FakeLLM(latency=ConstantLatency(0.2))
+        processor = EnhancedProcessor(llm=llm, cache=None)
+
+        async def main():
+            stale = CancellationToken()
+            leader = asyncio.ensure_future(processor.aprocess_clipboard_content("Helo wrld", cancel_token=stale))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(processor.aprocess_clipboard_content("Helo wrld"))
+            await asyncio.sleep(0.01)
+            stale.cancel("superseded")
+            with pytest.raises(CancelledRequestError):
+                await leader
+            return await follower
+
+        assert asyncio.run(main()) == "Helo wrld"
+        assert llm.calls == 2
+        assert processor.single_flight.stats()["leaders"] == 2
+
+
+class TestDeadline:
+    """Test suite for Deadline tokens."""
+
+    def test_expires_with_deadline_error(self):
+        """Test that an expired deadline raises DeadlineExceededError."""
+        deadline = Deadline(0.02)
+        assert not deadline.expired and deadline.remaining() > 0
+        assert deadline.wait(1)
+        assert deadline.expired and deadline.remaining() == 0
+        with pytest.raises(DeadlineExceededError, match="deadline of 0.02s exceeded"):
+            deadline.raise_if_cancelled()
+
+    def test_parent_cancellation_is_not_expiry(self):
+        """Test that a superseded request is cancelled, not timed out."""
+        parent = CancellationToken()
+        deadline = Deadline(5, parent=parent)
+        parent.cancel("superseded")
+        assert deadline.cancelled and not deadline.expired
+        with pytest.raises(CancelledRequestError) as excinfo:
+            deadline.raise_if_cancelled()
+        assert not isinstance(excinfo.value, DeadlineExceededError)
+        deadline.close()
+
+    def test_iterate_cancellable_stops_waiting(self):
+        """Test that a stalled iterator is abandoned once the deadline passes."""
+        def stalled():
+            yield "first"
+            time.sleep(5)
+            yield "late"
+
+        items = []
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceededError):
+            for item in iterate_cancellable(stalled(), Deadline(0.05)):
+                items.append(item)
+        assert items == ["first"]
+        assert time.perf_counter() - start < 2.0
+
+
+class TestDeadlineDegradation:
+    """Test suite for the best-available results returned at a deadline."""
+
+    def test_command_and_fallback_share_one_budget(self):
+        """Test that a slow command returns the original content at the deadline."""
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(5.0)), cache=None)
+        stats = StreamStats()
+        start = time.perf_counter()
+        with pytest.warns(UserWarning, match="Returning original content"):
+            result = processor.process_clipboard_content("Helo wrld <#fix>", deadline=0.05, stats=stats)
+        # Far below the LLM latency: the command and fallback calls were abandoned
+        assert time.perf_counter() - start < 2.0
+        assert result == "Helo wrld"
+        assert stats.status == "deadline_original"
+        assert stats.category == "fix"
+
+    def test_cached_answer_is_used(self):
+        """Test that a cached default answer beats the original text."""
+        llm = FakeLLM(latency=ConstantLatency(0.05))
+        processor = EnhancedProcessor(llm=llm, cache=ResponseCache(memory=LRUCache()))
+        assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+        llm.latency = ConstantLatency(0.5)
+        stats = StreamStats()
+        with pytest.warns(UserWarning, match="Returning cached result"):
+            result = processor.process_with_specific_command("Helo wrld", "translate to french",
+                                                             deadline=0.05, stats=stats)
+        assert result == "Helo wrld"
+        assert stats.status == "deadline_cached"
+
+    def test_stream_keeps_partial_result(self):
+        """Test that a stream cut by the deadline ends with what it already yielded."""
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(5.0), first_token_fraction=0.0),
+                                      cache=None, deadline=0.2)
+        stats = StreamStats()
+        start = time.perf_counter()
+        with pytest.warns(UserWarning, match="partial result"):
+            output = "".join(processor.stream_clipboard_content(LONG_TEXT, stats))
+        assert time.perf_counter() - start < 2.0
+        assert stats.status == "deadline_partial"
+        assert output and LONG_TEXT.startswith(output) and output != LONG_TEXT
+
+    def test_async_deadline(self):
+        """Test that the async path degrades the same way."""
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(2.0)), cache=None)
+        stats = StreamStats()
+        with pytest.warns(UserWarning):
+            result = asyncio.run(processor.aprocess_clipboard_content("Helo wrld", deadline=0.05, stats=stats))
+        assert result == "Helo wrld"
+        assert stats.status == "deadline_original"
+
+    def test_fast_request_completes(self):
+        """Test that a request within its budget is unaffected."""
+        processor = EnhancedProcessor(llm=FakeLLM(), cache=None, deadline=5)
+        stats = StreamStats()
+        assert processor.process_clipboard_content("Helo wrld <#fix>", stats=stats) == "Helo wrld"
+        assert stats.status == "complete"
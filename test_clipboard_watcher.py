@@ -0,0 +1,184 @@
+"""
+Unit tests for ClipboardWatcher
+
+Tests change detection, command filtering, debouncing, ignoring ClipIQ's
+own writes, sequence-number polling and adaptive intervals.
+"""
+
+import threading
+import time
+from clipboard_watcher import ClipboardWatcher, content_hash
+
+
+class FakeClipboard:
+    """In-memory clipboard counting reads."""
+
+    def __init__(self, text=""):
+        self.text = text
+        self.reads = 0
+        self.sequence = 0
+
+    def paste(self):
+        self.reads += 1
+        return self.text
+
+    def copy(self, text):
+        self.text = text
+        self.sequence += 1
+
+
+def make_watcher(clipboard, dispatched, **kwargs):
+    options = {"debounce": 0.0, "native": False}
+    options.update(kwargs)
+    return ClipboardWatcher(dispatched.append, paste=clipboard.paste, **options)
+
+
+class TestClipboardWatcher:
+    """Test suite for ClipboardWatcher."""
+
+    def test_dispatches_only_command_text(self):
+        """Test that changed text is dispatched only when it has a command."""
+        clipboard = FakeClipboard("initial <#fix>")
+        dispatched = []
+        watcher = make_watcher(clipboard, dispatched)
+        watcher._read_baseline()
+
+        watcher.check()
+        assert dispatched == []  # baseline content is not dispatched
+
+        clipboard.copy("just some text")
+        watcher.check()
+        clipboard.copy("Hola <#translate to english>")
+        watcher.check()
+
+        assert dispatched == ["Hola <#translate to english>"]
+        assert watcher.stats()["skipped_no_command"] == 1
+
+    def test_unchanged_content_is_not_redispatched(self):
+        """Test that hashing suppresses repeated dispatch of the same text."""
+        clipboard = FakeClipboard()
+        dispatched = []
+        watcher = make_watcher(clipboard, dispatched)
+        watcher._read_baseline()
+
+        clipboard.copy("text <#summarize>")
+        for _ in range(3):
+            watcher.check()
+        assert dispatched == ["text <#summarize>"]
+
+    def test_debounce_dispatches_last_copy(self):
+        """Test that rapid copies only dispatch the final text."""
+        clipboard = FakeClipboard()
+        dispatched = []
+        watcher = make_watcher(clipboard, dispatched, debounce=0.05)
+        watcher._read_baseline()
+
+        clipboard.copy("first <#fix>")
+        watcher.check()
+        clipboard.copy("second <#fix>")
+        watcher.check()
+        assert dispatched == []
+
+        time.sleep(0.06)
+        watcher.check()
+        assert dispatched == ["second <#fix>"]
+        assert watcher.stats()["debounced"] == 1
+
+    def test_ignores_own_writes(self):
+        """Test that text announced via ignore() is not dispatched."""
+        clipboard = FakeClipboard()
+        dispatched = []
+        watcher = make_watcher(clipboard, dispatched)
+        watcher._read_baseline()
+
+        watcher.ignore("result <#still has a command>")
+        clipboard.copy("result <#still has a command>")
+        watcher.check()
+
+        assert dispatched == []
+        assert watcher.stats()["ignored_own"] == 1
+
+    def test_own_write_keeps_pending_user_copy(self):
+        """Test that an own write during the debounce does not drop the user's copy."""
+        clipboard = FakeClipboard()
+        dispatched = []
+        watcher = make_watcher(clipboard, dispatched, debounce=0.05)
+        watcher._read_baseline()
+
+        clipboard.copy("user text <#fix>")
+        watcher.check()
+        watcher.ignore("earlier result")
+        clipboard.copy("earlier result")
+        watcher.check()
+
+        time.sleep(0.06)
+        watcher.check()
+        assert dispatched == ["user text <#fix>"]
+        stats = watcher.stats()
+        assert stats["ignored_own"] == 1
+        assert stats["debounced"] == 0
+
+        # Only the exact announced text is ignored
+        watcher.ignore("earlier result")
+        clipboard.copy("earlier result, edited <#fix>")
+        watcher.check()
+        time.sleep(0.06)
+        watcher.check()
+        assert dispatched[-1] == "earlier result, edited <#fix>"
+
+    def test_sequence_number_avoids_reads(self):
+        """Test that an unchanged sequence number skips reading the clipboard."""
+        clipboard = FakeClipboard()
+        dispatched = []
+        watcher = make_watcher(clipboard, dispatched, sequence_number=lambda: clipboard.sequence)
+        watcher._read_baseline()
+        reads = clipboard.reads
+
+        for _ in range(5):
+            watcher.check()
+        assert clipboard.reads == reads
+        assert watcher.mode == "sequence"
+
+        clipboard.copy("x <#explain>")
+        watcher.check()
+        assert dispatched == ["x <#explain>"]
+
+    def test_interval_backs_off_while_idle(self):
+        """Test the adaptive poll interval."""
+        clipboard = FakeClipboard()
+        watcher = make_watcher(clipboard, [], min_interval=0.1, max_interval=1.0)
+        watcher._read_baseline()
+
+        for _ in range(20):
+            watcher.check()
+        assert watcher._interval == 1.0
+
+        clipboard.copy("new")
+        watcher.check()
+        assert watcher._interval == 0.1
+
+    def test_background_thread_and_notify(self):
+        """Test the watch thread end to end, woken by notify()."""
+        clipboard = FakeClipboard()
+        received = threading.Event()
+        dispatched = []
+
+        def on_change(text):
+            dispatched.append(text)
+            received.set()
+
+        watcher = ClipboardWatcher(on_change, paste=clipboard.paste, debounce=0.0,
+                                   native=False, min_interval=5.0, max_interval=5.0).start()
+        try:
+            clipboard.copy("text <#fix>")
+            watcher.notify()
+            assert received.wait(2)
+        finally:
+            watcher.stop()
+        assert dispatched == ["text <#fix>"]
+
+    def test_content_hash(self):
+        """Test that the hash distinguishes content and handles odd characters."""
+        assert content_hash("a") == content_hash("a")
+        assert content_hash("a") != content_hash("b")
+        assert len(content_hash("\ud800 lone surrogate")) == 16
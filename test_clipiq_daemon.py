@@ -0,0 +1,143 @@
+"""
+Unit tests for the ClipIQ daemon and its client
+
+Tests every endpoint over HTTP and the Unix socket, streaming, request
+validation, local-only access and the client command line.
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import threading
+import pytest
+from clipiq_client import ClipIQClient, DaemonError, main as client_main
+from clipiq_daemon import ClipIQDaemon
+from enhanced_processor import EnhancedProcessor
+from fake_llm import ConstantLatency, FakeLLM
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~100 characters, so avoid pytest's long tmp_path
+    directory = tempfile.mkdtemp(prefix="clipiq-")
+    yield os.path.join(directory, "daemon.sock")
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def daemon(socket_path):
+    processor = EnhancedProcessor(llm=FakeLLM())
+    with ClipIQDaemon(processor=processor, port=0, socket_path=socket_path) as running:
+        yield running
+
+
+def clients(daemon):
+    return [ClipIQClient(url=daemon.base_url), ClipIQClient(socket_path=daemon.socket_path)]
+
+
+class TestClipIQDaemon:
+    """Test suite for ClipIQDaemon and ClipIQClient."""
+
+    def test_process_over_http_and_socket(self, daemon):
+        """Test that both transports reach the shared processor."""
+        for client in clients(daemon):
+            assert client.process("Helo wrld <#fix grammar>") == "Helo wrld"
+            assert client.process("Helo wrld") == "Helo wrld"
+            assert client.process("Hola", command="translate to english") == "Hola"
+        assert daemon.stats()["requests"] == 6
+
+    def test_streaming(self, daemon):
+        """Test that streamed chunks join to the full result."""
+        for client in clients(daemon):
+            chunks = list(client.stream("Helo wrld and more words <#explain>"))
+            assert len(chunks) > 1
+            assert "".join(chunks) == "Helo wrld and more words"
+
+    def test_deadline(self, socket_path):
+        """Test that deadline_ms returns the best available result with its status."""
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(0.5)), cache=None)
+        with ClipIQDaemon(processor=processor, port=0, socket_path=socket_path) as running:
+            client = ClipIQClient(url=running.base_url)
+            result = client.request("POST", "/process", {"text": "Helo wrld", "deadline_ms": 50})
+            assert result["output"] == "Helo wrld"
+            assert result["status"] == "deadline_original"
+            with pytest.raises(DaemonError, match="400"):
+                client.process("Helo", deadline_ms=-1)
+
+    def test_preview_and_categorize(self, daemon):
+        """Test the endpoints that do not call the LLM."""
+        client = ClipIQClient(url=daemon.base_url)
+        preview = client.preview("abc <#summarize>")
+        assert preview["category"] == "summarize"
+        assert "abc" in preview["prompt"]
+        assert client.preview("abc")["category"] == "default"
+
+        category = client.categorize("abc <#translate to german>")
+        assert category == {"has_command": True, "command": "translate to german",
+                            "content": "abc", "category": "translate"}
+        assert daemon.processor.llm.calls == 0
+
+    def test_health_and_stats(self, daemon):
+        """Test readiness and counters."""
+        client = ClipIQClient(socket_path=daemon.socket_path)
+        health = client.health()
+        assert health["ready"] is True
+        assert health["model"].startswith("fake-llm")
+        assert client.stats()["errors"] == 0
+
+    def test_invalid_requests(self, daemon):
+        """Test validation errors and unknown paths."""
+        client = ClipIQClient(url=daemon.base_url)
+        with pytest.raises(DaemonError, match="400"):
+            client.request("POST", "/process", {"text": 42})
+        with pytest.raises(DaemonError, match="404"):
+            client.request("GET", "/nope")
+        assert daemon.stats()["errors"] == 1
+
+    def test_refuses_non_local_requests(self, daemon):
+        """Test the Host and Content-Type checks that keep web pages out."""
+        host, port = daemon.httpd.server_address[:2]
+        connection = http.client.HTTPConnection(host, port)
+        connection.request("POST", "/process", body=json.dumps({"text": "a"}),
+                           headers={"Host": "evil.example", "Content-Type": "application/json"})
+        assert connection.getresponse().status == 403
+        connection.close()
+
+        connection = http.client.HTTPConnection(host, port)
+        connection.request("POST", "/process", body=json.dumps({"text": "a"}),
+                           headers={"Content-Type": "text/plain"})
+        assert connection.getresponse().status == 415
+        connection.close()
+
+    def test_concurrent_requests_share_processor(self, daemon):
+        """Test that parallel clients are served by one processor."""
+        client = ClipIQClient(url=daemon.base_url)
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(client.process(f"text {i}")))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(results) == sorted(f"text {i}" for i in range(8))
+        assert daemon.processor.llm.calls == 8
+
+    def test_socket_file_is_private_and_removed(self, socket_path):
+        """Test socket permissions and cleanup on stop."""
+        with ClipIQDaemon(processor=EnhancedProcessor(llm=FakeLLM()), port=None,
+                          socket_path=socket_path):
+            assert os.stat(socket_path).st_mode & 0o777 == 0o600
+        assert not os.path.exists(socket_path)
+
+    def test_client_cli(self, daemon, capsys):
+        """Test the client command line."""
+        assert client_main(["--socket", daemon.socket_path, "process", "Helo <#fix>"]) == 0
+        assert capsys.readouterr().out == "Helo\n"
+        assert client_main(["--url", daemon.base_url, "process", "Helo wrld", "--stream"]) == 0
+        assert capsys.readouterr().out == "Helo wrld\n"
+
+    def test_client_reports_unreachable_daemon(self, capsys):
+        """Test the error when no daemon is running."""
+        assert client_main(["--url", "http://127.0.0.1:9", "health"]) == 1
+        assert "not reachable" in capsys.readouterr().err
@@ -4,6 +4,9 @@ Unit tests for CommandParser class
 Tests the functionality of command parsing, extraction, and content cleaning.
 """
 
+import random
+import re
+import time
 import pytest
 from command_parser import CommandParser, parse_command, extract_command_simple, clean_text
 
@@ -276,6 +279,88 @@ class TestCommandParser:
             assert has_command == scenario["should_have_command"]
 
 
+class TestCommandScan:
+    """Test suite for the single-pass command scanner."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.parser = CommandParser()
+        self.regex = re.compile(r'<#([^>]+)>', re.IGNORECASE)
+    
+    def reference(self, text):
+        """Results of the previous multi-regex implementation."""
+        commands = [match.strip() for match in self.regex.findall(text) if match.strip()]
+        spans = [match.span() for match in self.regex.finditer(text) if match.group(1).strip()]
+        cleaned = re.sub(r'\s+', ' ', self.regex.sub('', text).strip())
+        return commands, spans, cleaned
+    
+    def test_scan_returns_everything_in_one_call(self):
+        """Test that one scan provides commands, spans and cleaned content."""
+        text = "Fix this <#translate> and <#  > also <#explain>"
+        scan = self.parser.scan(text)
+        
+        assert scan.commands == ["translate", "explain"]
+        assert scan.command == "explain"
+        assert scan.has_command is True
+        assert scan.spans == [(9, 21), (37, 47)]
+        assert text[9:21] == "<#translate>"
+        assert scan.cleaned_content == "Fix this and also"
+    
+    def test_scan_without_commands(self):
+        """Test scanning text without commands."""
+        scan = self.parser.scan("plain <#> text <#unclosed")
+        
+        assert scan.commands == []
+        assert scan.command is None
+        assert scan.has_command is False
+        assert scan.spans == []
+    
+    def test_scan_matches_regex_implementation(self):
+        """Test that randomized inputs give the same results as the regex path."""
+        rng = random.Random(1234)
+        alphabet = ['<#', '>', '<', '#', ' ', '\n', '\t', 'a', 'b', '\x1c', '\u00a0']
+        for _ in range(20000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 16)))
+            scan = self.parser.scan(text)
+            assert (scan.commands, scan.spans, scan.cleaned_content) == self.reference(text), repr(text)
+    
+    def test_custom_pattern_uses_regex_scan(self):
+        """Test that custom command patterns still work through scan."""
+        parser = CommandParser(command_pattern=r'\[\[([^\]]+)\]\]')
+        scan = parser.scan("Hello [[translate]] world")
+        
+        assert scan.commands == ["translate"]
+        assert scan.spans == [(6, 19)]
+        assert scan.cleaned_content == "Hello world"
+        assert parser.parse_clipboard_content("Hello [[translate]]") == ("Hello", "translate", True)
+    
+    def test_unclosed_tags_are_linear(self):
+        """Test that parse time grows linearly with runs of unclosed tags."""
+        def best_time(count):
+            text = "<#" * count + "tail"
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                content, command, has_command = self.parser.parse_clipboard_content(text)
+                best = min(best, time.perf_counter() - start)
+            assert has_command is False
+            assert content == text
+            return best
+        
+        # 4x the input takes ~4x as long when linear and ~16x when quadratic;
+        # absolute timings are left to bench_command_parser.py
+        small, large = best_time(20000), best_time(80000)
+        assert large < 10 * small + 0.005
+    
+    def test_unclosed_tail_after_valid_command(self):
+        """Test a valid command followed by unclosed fragments."""
+        text = "Hello <#translate> world <#not closed"
+        content, command, has_command = self.parser.parse_clipboard_content(text)
+        
+        assert command == "translate"
+        assert content == "Hello world <#not closed"
+
+
 class TestConvenienceFunctions:
     """Test suite for convenience functions."""
     
@@ -6,14 +6,19 @@ and LLM processing without actually calling the LLM (using mocks).
 """
 
 import pytest
-from unittest.mock import Mock, patch
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
 from enhanced_processor import (
     EnhancedProcessor, 
     ProcessorFactory,
+    StreamCleaner,
+    StreamStats,
     process_clipboard_content,
     process_with_command,
     get_preview_prompt
 )
+from response_cache import ResponseCache
+from registry import reset_registry
 
 
 class TestEnhancedProcessor:
@@ -230,6 +235,486 @@ class TestEnhancedProcessor:
             assert mock_chain.invoke.called
 
 
+class TestStreamCleaner:
+    """Test suite for incremental stream cleanup."""
+    
+    def cleanup(self, text):
+        """Reference cleanup used by the blocking path."""
+        return text.strip().strip('"').strip("'")
+    
+    def test_matches_blocking_cleanup(self):
+        """Test that joined output equals the blocking cleanup result."""
+        cases = [
+            ['"Hola', ' mundo"'],
+            ['  ', '"', "'Quoted'", '"  '],
+            ['Hello', ' ', 'world', '\n'],
+            ['"', '"'],
+            ["'\"a\"", "'"],
+            ['', 'text', ''],
+        ]
+        for chunks in cases:
+            cleaner = StreamCleaner()
+            output = "".join(cleaner.feed(chunk) for chunk in chunks)
+            assert output == self.cleanup("".join(chunks))
+    
+    def test_emits_content_incrementally(self):
+        """Test that content is emitted before the stream ends."""
+        cleaner = StreamCleaner()
+        assert cleaner.feed('"Hel') == "Hel"
+        assert cleaner.feed('lo ') == "lo"
+        assert cleaner.feed('world"') == " world"
+
+
+class TestStreamingProcessor:
+    """Test suite for the streaming processing API."""
+    
+    def setup_method(self):
+        """Set up test fixtures with mocked LLM."""
+        self.mock_llm = Mock()
+        self.processor = EnhancedProcessor(llm=self.mock_llm)
+    
+    def test_stream_with_command(self):
+        """Test streaming a command yields cleaned chunks."""
+        self.mock_llm.stream.return_value = iter(['"Hola', ' mun', 'do"'])
+        stats = StreamStats()
+        
+        chunks = list(self.processor.stream_clipboard_content("Hello world <#translate to spanish>", stats))
+        
+        assert "".join(chunks) == "Hola mundo"
+        prompt = self.mock_llm.stream.call_args[0][0]
+        assert "translate to spanish" in prompt
+        assert "Hello world" in prompt
+        assert stats.status == "complete"
+        assert stats.chunks == len(chunks)
+        assert stats.time_to_first_token is not None
+        assert stats.total_time >= stats.time_to_first_token
+    
+    def test_stream_default_uses_default_prompt(self):
+        """Test streaming without a command uses the default template."""
+        self.mock_llm.stream.return_value = iter(["Hello ", "world"])
+        
+        result = "".join(self.processor.stream_clipboard_content("Helo wrold"))
+        
+        assert result == "Hello world"
+        prompt = self.mock_llm.stream.call_args[0][0]
+        assert "Fix the syntax and typos" in prompt
+        assert "Helo wrold" in prompt
+    
+    def test_stream_command_failure_falls_back_to_default(self):
+        """Test that a command failing before output falls back to default."""
+        self.mock_llm.stream.side_effect = [Exception("LLM error"), iter(["Fallback"])]
+        stats = StreamStats()
+        
+        with patch('warnings.warn') as mock_warn:
+            result = "".join(self.processor.stream_clipboard_content("Hi <#translate to french>", stats))
+        
+        assert result == "Fallback"
+        assert stats.status == "fallback"
+        assert mock_warn.called
+    
+    def test_stream_complete_failure_returns_content(self):
+        """Test that total failure yields the cleaned original content."""
+        self.mock_llm.stream.side_effect = Exception("LLM error")
+        
+        with patch('warnings.warn'):
+            result = "".join(self.processor.stream_clipboard_content("Hello world <#translate to spanish>"))
+        
+        assert result == "Hello world"
+    
+    def test_stream_mid_stream_failure_keeps_partial(self):
+        """Test that a failure after output has started keeps the partial result."""
+        def broken_stream(prompt):
+            yield "Partial"
+            yield " result"
+            raise Exception("connection dropped")
+        
+        self.mock_llm.stream.side_effect = broken_stream
+        stats = StreamStats()
+        
+        with patch('warnings.warn'):
+            result = "".join(self.processor.stream_clipboard_content("Text <#elaborate>", stats))
+        
+        assert result == "Partial result"
+        assert stats.status == "partial"
+        assert self.mock_llm.stream.call_count == 1
+    
+    def test_stream_empty_input(self):
+        """Test that empty input yields nothing."""
+        assert list(self.processor.stream_clipboard_content("")) == []
+        assert list(self.processor.stream_clipboard_content(None)) == []
+
+
+class TestChunkedProcessing:
+    """Test suite for parallel chunked processing of large content."""
+    
+    def setup_method(self):
+        """Set up test fixtures with mocked LLM."""
+        self.mock_llm = Mock()
+        self.processor = EnhancedProcessor(llm=self.mock_llm, chunk_size=30, max_chunk_workers=4)
+    
+    def test_large_default_content_is_chunked(self):
+        """Test that content over chunk_size is processed chunk by chunk."""
+        text = "Frist paragraf is here.\n\nSecnd paragraf is here.\n\nThrid one."
+        
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.invoke.side_effect = lambda inputs: inputs["text"].upper()
+            result = self.processor.process_clipboard_content(text)
+        
+        assert mock_chain.invoke.call_count == 3
+        assert result == "FRIST PARAGRAF IS HERE.\n\nSECND PARAGRAF IS HERE.\n\nTHRID ONE."
+    
+    def test_small_content_is_not_chunked(self):
+        """Test that short content uses a single default call."""
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.invoke.return_value = "Short"
+            self.processor.process_clipboard_content("Short")
+        
+        assert mock_chain.invoke.call_count == 1
+    
+    def test_chunks_run_concurrently(self):
+        """Test that wall-clock time tracks the slowest chunk, not the total."""
+        import time
+        
+        def slow_invoke(inputs):
+            time.sleep(0.5)
+            return inputs["text"]
+        
+        text = "\n\n".join(f"Paragraph number {i} here." for i in range(4))
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.invoke.side_effect = slow_invoke
+            start = time.perf_counter()
+            result = self.processor.process_chunked(text)
+            elapsed = time.perf_counter() - start
+        
+        assert result == text
+        assert mock_chain.invoke.call_count == 4
+        # Sequential chunks would take 2 s
+        assert elapsed < 1.5
+    
+    def test_chunk_failure_falls_back_per_chunk(self):
+        """Test that one failing chunk keeps its original text."""
+        def flaky_invoke(inputs):
+            if "bad" in inputs["text"]:
+                raise Exception("LLM error")
+            return inputs["text"].upper()
+        
+        text = "good paragraph one.\n\nbad paragraph two."
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.invoke.side_effect = flaky_invoke
+            with patch('warnings.warn'):
+                result = self.processor.process_chunked(text, chunk_size=20)
+        
+        assert result == "GOOD PARAGRAPH ONE.\n\nbad paragraph two."
+    
+    def test_stream_large_content_is_chunked(self):
+        """Test that streaming content over chunk_size sends one prompt per chunk."""
+        paragraphs = ["Frist paragraf is here.", "Secnd paragraf is here.", "Thrid one."]
+        text = "\n\n".join(paragraphs)
+        
+        def stream(prompt):
+            paragraph = next(p for p in paragraphs if p in prompt)
+            return iter([paragraph[:5].upper(), paragraph[5:].upper()])
+        
+        self.mock_llm.stream.side_effect = stream
+        stats = StreamStats()
+        
+        chunks = list(self.processor.stream_clipboard_content(text, stats))
+        
+        assert self.mock_llm.stream.call_count == 3
+        # Every prompt carries exactly one paragraph
+        for call in self.mock_llm.stream.call_args_list:
+            assert sum(paragraph in call[0][0] for paragraph in paragraphs) == 1
+        assert "".join(chunks) == text.upper()
+        assert stats.status == "complete"
+        assert stats.chunks == len(chunks)
+    
+    def test_stream_chunk_failure_falls_back_per_chunk(self):
+        """Test that a chunk failing before output is streamed unchanged."""
+        def stream(prompt):
+            if "bad" in prompt:
+                raise Exception("LLM error")
+            return iter(["GOOD PARAGRAPH ONE."])
+        
+        self.mock_llm.stream.side_effect = stream
+        
+        with patch('warnings.warn'):
+            result = "".join(self.processor.stream_clipboard_content("good paragraph one.\n\nbad paragraph two."))
+        
+        assert result == "GOOD PARAGRAPH ONE.\n\nbad paragraph two."
+    
+    def test_chunked_with_command(self):
+        """Test that an explicit command is applied to every chunk."""
+        self.mock_llm.invoke.side_effect = lambda prompt: "done"
+        
+        result = self.processor.process_chunked("One. Two. Three.", command="translate to french", chunk_size=6)
+        
+        assert result == "done done done"
+        assert all("translate to french" in call[0][0] for call in self.mock_llm.invoke.call_args_list)
+
+
+class TestResponseCaching:
+    """Test suite for response caching in the processor."""
+    
+    def setup_method(self):
+        """Set up test fixtures with mocked LLM and an in-memory cache."""
+        self.mock_llm = Mock()
+        self.mock_llm.model_name = "test-model"
+        self.mock_llm.openai_api_base = None
+        self.cache = ResponseCache()
+        self.processor = EnhancedProcessor(llm=self.mock_llm, cache=self.cache)
+    
+    def test_repeated_command_hits_cache(self):
+        """Test that the same text and command only calls the LLM once."""
+        self.mock_llm.invoke.return_value = '"Hola mundo"'
+        
+        first = self.processor.process_clipboard_content("Hello world <#translate to spanish>")
+        second = self.processor.process_clipboard_content("  Hello world <#translate to spanish>")
+        
+        assert first == second == "Hola mundo"
+        assert self.mock_llm.invoke.call_count == 1
+        assert self.cache.stats()["memory_hits"] == 1
+    
+    def test_repeated_default_hits_cache(self):
+        """Test that default processing results are cached."""
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.invoke.return_value = "Hello world"
+            self.processor.process_clipboard_content("Helo wrold")
+            result = self.processor.process_clipboard_content("Helo wrold")
+        
+        assert result == "Hello world"
+        assert mock_chain.invoke.call_count == 1
+    
+    def test_bypass_cache_per_request(self):
+        """Test that use_cache=False always calls the LLM."""
+        self.mock_llm.invoke.return_value = "Result"
+        
+        self.processor.process_clipboard_content("Text <#explain>")
+        self.processor.process_clipboard_content("Text <#explain>", use_cache=False)
+        
+        assert self.mock_llm.invoke.call_count == 2
+    
+    def test_model_identity_is_part_of_key(self):
+        """Test that a different model does not reuse cached responses."""
+        self.mock_llm.invoke.return_value = "Result"
+        self.processor.process_clipboard_content("Text <#explain>")
+        
+        self.mock_llm.model_name = "other-model"
+        self.processor.process_clipboard_content("Text <#explain>")
+        
+        assert self.mock_llm.invoke.call_count == 2
+    
+    def test_failures_are_not_cached(self):
+        """Test that fallback results are not stored in the cache."""
+        self.mock_llm.invoke.side_effect = Exception("LLM error")
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.invoke.side_effect = Exception("Chain error")
+            with patch('warnings.warn'):
+                self.processor.process_clipboard_content("Text <#explain>")
+        
+        assert self.cache.stats()["stores"] == 0
+    
+    def test_stream_uses_and_fills_cache(self):
+        """Test that streaming stores its result and replays cache hits."""
+        self.mock_llm.stream.return_value = iter(["Hola", " mundo"])
+        
+        first = "".join(self.processor.stream_clipboard_content("Hello world <#translate to spanish>"))
+        second = "".join(self.processor.stream_clipboard_content("Hello world <#translate to spanish>"))
+        
+        assert first == second == "Hola mundo"
+        assert self.mock_llm.stream.call_count == 1
+
+
+class TestAsyncProcessor:
+    """Test suite for the asyncio processing API."""
+    
+    def setup_method(self):
+        """Set up test fixtures with an async-capable mocked LLM."""
+        self.mock_llm = Mock()
+        self.mock_llm.ainvoke = AsyncMock(return_value='"Hola mundo"')
+        self.processor = EnhancedProcessor(llm=self.mock_llm)
+    
+    def test_aprocess_with_command(self):
+        """Test async processing of a command uses ainvoke and cleanup."""
+        result = asyncio.run(self.processor.aprocess_clipboard_content("Hello world <#translate to spanish>"))
+        
+        assert result == "Hola mundo"
+        prompt = self.mock_llm.ainvoke.call_args[0][0]
+        assert "translate to spanish" in prompt
+        assert not self.mock_llm.invoke.called
+    
+    def test_aprocess_default(self):
+        """Test async default processing uses the traditional chain."""
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.ainvoke = AsyncMock(return_value="Hello world")
+            result = asyncio.run(self.processor.aprocess_clipboard_content("Helo wrold"))
+        
+        assert result == "Hello world"
+        assert mock_chain.ainvoke.call_args[0][0] == {"text": "Helo wrold"}
+    
+    def test_aprocess_command_failure_falls_back_to_default(self):
+        """Test that a failing command falls back to default processing."""
+        self.mock_llm.ainvoke.side_effect = Exception("LLM error")
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.ainvoke = AsyncMock(return_value="Fallback result")
+            with patch('warnings.warn') as mock_warn:
+                result = asyncio.run(self.processor.aprocess_clipboard_content("Hi <#translate to french>"))
+        
+        assert result == "Fallback result"
+        assert mock_warn.called
+    
+    def test_aprocess_complete_failure_returns_content(self):
+        """Test that total failure returns the cleaned original content."""
+        self.mock_llm.ainvoke.side_effect = Exception("LLM error")
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.ainvoke = AsyncMock(side_effect=Exception("Chain error"))
+            with patch('warnings.warn'):
+                result = asyncio.run(self.processor.aprocess_clipboard_content("Hello world <#translate to spanish>"))
+        
+        assert result == "Hello world"
+    
+    def test_aprocess_with_specific_command(self):
+        """Test the public async command method."""
+        result = asyncio.run(self.processor.aprocess_with_specific_command("Hello", "translate to spanish"))
+        assert result == "Hola mundo"
+    
+    def test_aprocess_empty_input(self):
+        """Test async edge cases with empty input."""
+        assert asyncio.run(self.processor.aprocess_clipboard_content("")) == ""
+        assert asyncio.run(self.processor.aprocess_clipboard_content(None)) == ""
+    
+    def test_many_concurrent_requests_share_one_loop(self):
+        """Test that hundreds of requests overlap on a single event loop."""
+        import time
+        
+        async def slow_ainvoke(prompt):
+            await asyncio.sleep(0.05)
+            return "done"
+        
+        self.mock_llm.ainvoke.side_effect = slow_ainvoke
+        
+        async def run_all():
+            return await asyncio.gather(*(
+                self.processor.aprocess_clipboard_content(f"Text {i} <#explain>") for i in range(300)
+            ))
+        
+        start = time.perf_counter()
+        results = asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+        
+        assert results == ["done"] * 300
+        assert elapsed < 2.0
+    
+    def test_aprocess_chunked(self):
+        """Test async chunked processing keeps order and whitespace."""
+        processor = EnhancedProcessor(llm=self.mock_llm, chunk_size=12)
+        with patch.object(processor, 'traditional_chain') as mock_chain:
+            mock_chain.ainvoke = AsyncMock(side_effect=lambda inputs: inputs["text"].upper())
+            result = asyncio.run(processor.aprocess_clipboard_content("first one.\n\nsecond one."))
+        
+        assert result == "FIRST ONE.\n\nSECOND ONE."
+
+
+class TestProcessMany:
+    """Test suite for bulk processing through the LLM batch interface."""
+    
+    def setup_method(self):
+        """Set up test fixtures with mocked LLM."""
+        self.mock_llm = Mock()
+        self.processor = EnhancedProcessor(llm=self.mock_llm)
+    
+    def test_groups_by_category_and_preserves_order(self):
+        """Test one batch call per category and results in input order."""
+        self.mock_llm.batch.side_effect = lambda prompts, **kwargs: [
+            '"' + prompt.splitlines()[2] + '"' for prompt in prompts
+        ]
+        texts = [
+            "uno <#translate to english>",
+            "Machine learning <#explain simply>",
+            "dos <#translate to english>",
+        ]
+        
+        results = self.processor.process_many(texts, max_concurrency=8)
+        
+        assert results == ["uno", "Machine learning", "dos"]
+        assert self.mock_llm.batch.call_count == 2
+        assert not self.mock_llm.invoke.called
+        for call in self.mock_llm.batch.call_args_list:
+            assert call.kwargs["return_exceptions"] is True
+            assert call.kwargs["config"] == {"max_concurrency": 8}
+        batch_sizes = sorted(len(call[0][0]) for call in self.mock_llm.batch.call_args_list)
+        assert batch_sizes == [1, 2]
+    
+    def test_default_items_use_traditional_chain_batch(self):
+        """Test that items without commands are batched through the traditional chain."""
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.batch.return_value = ["Hello", "World"]
+            results = self.processor.process_many(["Helo", "Wrold"])
+        
+        assert results == ["Hello", "World"]
+        assert mock_chain.batch.call_args[0][0] == [{"text": "Helo"}, {"text": "Wrold"}]
+    
+    def test_per_item_fallbacks(self):
+        """Test that each failing item falls back independently."""
+        self.mock_llm.batch.return_value = ["Bonjour", Exception("LLM error")]
+        
+        def default_batch(inputs, **kwargs):
+            return [
+                Exception("Chain error") if item["text"] == "bad" else item["text"].upper()
+                for item in inputs
+            ]
+        
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.batch.side_effect = default_batch
+            with patch('warnings.warn') as mock_warn:
+                results = self.processor.process_many([
+                    "Hello <#translate to french>",
+                    "World <#translate to french>",
+                    "bad",
+                    "",
+                ])
+        
+        # Second item fell back to default processing; third returned its content
+        assert results == ["Bonjour", "WORLD", "bad", ""]
+        messages = [call[0][0] for call in mock_warn.call_args_list]
+        assert sum("Command processing failed" in message for message in messages) == 1
+        assert sum("Default processing failed" in message for message in messages) == 1
+    
+    def test_batch_call_failure_falls_back(self):
+        """Test that a batch call raising outright still falls back per item."""
+        self.mock_llm.batch.side_effect = Exception("Connection refused")
+        
+        with patch.object(self.processor, 'traditional_chain') as mock_chain:
+            mock_chain.batch.side_effect = Exception("Connection refused")
+            with patch('warnings.warn'):
+                results = self.processor.process_many(["A <#explain>", "B"])
+        
+        assert results == ["A", "B"]
+    
+    def test_large_default_items_are_chunked(self):
+        """Test that oversized default items join the batch as chunks."""
+        processor = EnhancedProcessor(llm=self.mock_llm, chunk_size=12)
+        with patch.object(processor, 'traditional_chain') as mock_chain:
+            mock_chain.batch.side_effect = lambda inputs, **kwargs: [item["text"].upper() for item in inputs]
+            results = processor.process_many(["first one.\n\nsecond one.", "short"])
+        
+        assert results == ["FIRST ONE.\n\nSECOND ONE.", "SHORT"]
+        assert mock_chain.batch.call_count == 1
+        assert len(mock_chain.batch.call_args[0][0]) == 3
+    
+    def test_cached_items_skip_the_batch(self):
+        """Test that cache hits are served without dispatching."""
+        self.mock_llm.model_name = "test-model"
+        processor = EnhancedProcessor(llm=self.mock_llm, cache=ResponseCache())
+        self.mock_llm.invoke.return_value = "Cached"
+        processor.process_clipboard_content("Hello <#explain>")
+        
+        self.mock_llm.batch.return_value = ["Fresh"]
+        results = processor.process_many(["Hello <#explain>", "Other <#explain>"])
+        
+        assert results == ["Cached", "Fresh"]
+        assert self.mock_llm.batch.call_args[0][0] == [processor.preview_prompt("Other", "explain")]
+
+
 class TestProcessorFactory:
     """Test suite for ProcessorFactory."""
     
@@ -250,6 +735,24 @@ class TestProcessorFactory:
         assert isinstance(processor, EnhancedProcessor)
         assert processor.llm is mock_llm
     
+    def test_chunk_size_from_environment(self, monkeypatch):
+        """Test that CLIPIQ_CHUNK_SIZE sets or disables the chunking threshold."""
+        monkeypatch.setenv("CLIPIQ_CACHE", "0")
+        monkeypatch.delenv("CLIPIQ_CHUNK_SIZE", raising=False)
+        assert ProcessorFactory.create_from_environment(Mock()).chunk_size == 4000
+        monkeypatch.setenv("CLIPIQ_CHUNK_SIZE", "8000")
+        assert ProcessorFactory.create_from_environment(Mock()).chunk_size == 8000
+        
+        monkeypatch.setenv("CLIPIQ_CHUNK_SIZE", "0")
+        mock_llm = Mock()
+        mock_llm.invoke.return_value = "fixed"
+        processor = ProcessorFactory.create_from_environment(mock_llm)
+        assert processor.chunk_size is None
+        assert processor.process_clipboard_content("word " * 2000) == "fixed"
+        assert mock_llm.invoke.call_count == 1
+        # A processor built directly does not chunk unless asked to
+        assert EnhancedProcessor(llm=Mock()).chunk_size is None
+    
     def test_create_processor_for_testing(self):
         """Test creating processor configured for testing."""
         processor = ProcessorFactory.create_processor_for_testing()
@@ -261,6 +764,14 @@ class TestProcessorFactory:
 class TestConvenienceFunctions:
     """Test suite for convenience functions."""
     
+    def setup_method(self):
+        """Drop the shared processor so each test builds its own."""
+        reset_registry()
+    
+    def teardown_method(self):
+        """Do not leak the mocked processor into other tests."""
+        reset_registry()
+    
     @patch('enhanced_processor.EnhancedProcessor')
     def test_process_clipboard_content_function(self, mock_processor_class):
         """Test process_clipboard_content convenience function."""
@@ -269,8 +780,10 @@ class TestConvenienceFunctions:
         mock_processor_class.return_value = mock_processor
         
         result = process_clipboard_content("Test content")
+        process_clipboard_content("More content")
         
-        assert mock_processor_class.called
+        # Built once, then shared by later calls
+        assert mock_processor_class.call_count == 1
         assert mock_processor.process_clipboard_content.called_with("Test content")
         assert result == "Processed content"
     
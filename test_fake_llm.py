@@ -0,0 +1,143 @@
+"""
+Unit tests for FakeLLM and the pipeline benchmark suite
+
+Tests latency distributions, the fake LLM's invoke/stream/batch/async
+paths through EnhancedProcessor, and a minimal benchmark run.
+"""
+
+import asyncio
+import random
+import time
+import pytest
+from enhanced_processor import EnhancedProcessor, StreamStats
+from fake_llm import (
+    ConstantLatency, FakeLLM, FakeLLMError, LogNormalLatency, UniformLatency,
+    extract_prompt_text, parse_distribution, split_tokens
+)
+from bench_pipeline import compare_reports, run_suite
+
+
+class TestDistributions:
+    """Test suite for latency distributions."""
+
+    def test_parse_specs(self):
+        """Test parsing of every supported spec form."""
+        assert isinstance(parse_distribution("0.2"), ConstantLatency)
+        assert parse_distribution("constant:0.5").value == 0.5
+        uniform = parse_distribution("uniform:0.1,0.3")
+        assert isinstance(uniform, UniformLatency)
+        assert (uniform.low, uniform.high) == (0.1, 0.3)
+        lognormal = parse_distribution("lognormal:0.05,0.5")
+        assert isinstance(lognormal, LogNormalLatency)
+        assert parse_distribution(lognormal.describe()).describe() == lognormal.describe()
+
+    def test_invalid_specs(self):
+        """Test that unknown or malformed specs are rejected."""
+        for spec in ["gamma:1,2", "uniform:0.3", "uniform:0.3,0.1", "lognormal:0,1"]:
+            with pytest.raises(ValueError):
+                parse_distribution(spec)
+
+    def test_samples_stay_in_range(self):
+        """Test that uniform samples stay within bounds and lognormal centres on its median."""
+        rng = random.Random(1)
+        samples = [UniformLatency(0.1, 0.2).sample(rng) for _ in range(1000)]
+        assert all(0.1 <= s <= 0.2 for s in samples)
+
+        samples = sorted(LogNormalLatency(0.05, 0.5).sample(rng) for _ in range(2001))
+        assert 0.04 < samples[1000] < 0.06
+
+
+class TestFakeLLM:
+    """Test suite for FakeLLM."""
+
+    def test_echo_returns_prompt_text(self):
+        """Test that echo mode returns the text between the template's blank lines."""
+        assert extract_prompt_text("Fix this:\n\nHelo wrld\n\nCorrected:") == "Helo wrld"
+        assert extract_prompt_text("plain prompt") == "plain prompt"
+        assert FakeLLM().invoke("Fix:\n\nHello\n\nOut:") == "Hello"
+
+    def test_output_size_distribution(self):
+        """Test that output size follows the configured distribution."""
+        llm = FakeLLM(output_chars=ConstantLatency(123))
+        assert len(llm.invoke("prompt")) == 123
+
+    def test_latency_is_simulated_and_counted(self):
+        """Test that calls sleep for the sampled latency and are counted."""
+        llm = FakeLLM(latency=ConstantLatency(0.05))
+        start = time.perf_counter()
+        llm.invoke("prompt")
+        assert time.perf_counter() - start >= 0.05
+        assert llm.calls == 1
+        assert llm.simulated_seconds == pytest.approx(0.05)
+
+        llm.reset_stats()
+        assert llm.calls == 0
+
+    def test_seed_makes_runs_reproducible(self):
+        """Test that the same seed gives the same outputs."""
+        def outputs(seed):
+            llm = FakeLLM(output_chars=UniformLatency(1, 500), seed=seed)
+            return [len(llm.invoke("p")) for _ in range(5)]
+
+        assert outputs(7) == outputs(7)
+
+    def test_failure_rate(self):
+        """Test that failures are raised at the configured rate."""
+        with pytest.raises(FakeLLMError):
+            FakeLLM(failure_rate=1.0).invoke("prompt")
+
+    def test_stream_yields_tokens(self):
+        """Test that streaming yields word tokens that join back to the output."""
+        assert "".join(split_tokens("one two  three\n")) == "one two  three\n"
+        llm = FakeLLM(output_chars=ConstantLatency(60))
+        chunks = list(llm.stream("prompt"))
+        assert len(chunks) > 1
+        assert "".join(chunks) == llm.invoke("prompt")
+
+    def test_batch_runs_prompts_concurrently(self):
+        """Test that one batch call serves its prompts in parallel, like a provider."""
+        llm = FakeLLM(latency=ConstantLatency(0.05))
+        start = time.perf_counter()
+        assert llm.batch(["a", "b", "c", "d"]) == ["a", "b", "c", "d"]
+        assert time.perf_counter() - start < 0.15
+
+
+class TestPipelineWithFakeLLM:
+    """Test EnhancedProcessor end to end against FakeLLM."""
+
+    def test_all_processor_paths(self):
+        """Test sync, stream, bulk and async paths."""
+        processor = EnhancedProcessor(llm=FakeLLM())
+        assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
+        assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+
+        stats = StreamStats()
+        streamed = "".join(processor.stream_clipboard_content("Helo wrld <#explain>", stats=stats))
+        assert streamed == "Helo wrld"
+        assert stats.time_to_first_token is not None
+
+        assert processor.process_many(["a <#summarize>", "b", "c <#explain>"]) == ["a", "b", "c"]
+        assert asyncio.run(processor.aprocess_clipboard_content("d <#summarize>")) == "d"
+
+    def test_failures_fall_back_to_original_text(self):
+        """Test that simulated failures exercise the processor's fallback."""
+        processor = EnhancedProcessor(llm=FakeLLM(failure_rate=1.0))
+        with pytest.warns(UserWarning):
+            assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+
+
+class TestBenchmarkSuite:
+    """Smoke tests for the benchmark suite."""
+
+    def test_run_suite_report(self):
+        """Test that a tiny run produces a complete, comparable report."""
+        report = run_suite(latency="0", requests=3, concurrency=2, repeat=1, micro=False)
+
+        assert report["meta"]["config"]["requests"] == 3
+        assert report["pipeline"]["sequential_command"]["requests"] == 3
+        assert "p99_ms" in report["pipeline"]["async_command"]
+        assert "ttft" in report["pipeline"]["stream_command"]
+
+        rows = compare_reports(report, report)
+        assert rows
+        assert all(change == 0.0 for _, _, _, change in rows)
@@ -0,0 +1,120 @@
+"""
+Unit tests for the fake OpenAI-compatible server
+
+Tests completions, streaming, batching and fault injection through the
+same langchain_community OpenAI client ClipIQ uses.
+"""
+
+import json
+import urllib.request
+import warnings
+import pytest
+from langchain_community.llms.openai import OpenAI
+from enhanced_processor import EnhancedProcessor
+from fake_llm import ConstantLatency
+from fake_openai_server import FakeOpenAIServer, load_responses
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(port=0, seed=0) as running:
+        yield running
+
+
+def make_llm(server):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return OpenAI(openai_api_base=server.base_url, openai_api_key="local", max_retries=0)
+
+
+class TestFakeOpenAIServer:
+    """Test suite for FakeOpenAIServer."""
+
+    def test_echo_completion_through_processor(self, server):
+        """Test that EnhancedProcessor gets the echoed text back over HTTP."""
+        processor = EnhancedProcessor(llm=make_llm(server))
+        assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
+        assert server.stats()["requests"] == 1
+
+    def test_streaming(self, server):
+        """Test that streaming delivers the response token by token."""
+        processor = EnhancedProcessor(llm=make_llm(server))
+        chunks = list(processor.stream_clipboard_content("one two three <#explain>"))
+        assert "".join(chunks) == "one two three"
+        assert len(chunks) == 3
+        assert server.stats()["streams"] == 1
+
+    def test_batch_prompts_in_one_request(self, server):
+        """Test that a prompt list is answered with indexed choices."""
+        llm = make_llm(server)
+        assert llm.batch(["Fix:\n\nfoo\n\nOut:", "Fix:\n\nbar\n\nOut:"]) == ["foo", "bar"]
+
+    def test_scripted_responses(self, tmp_path):
+        """Test that scripted responses are returned in turn."""
+        path = tmp_path / "responses.jsonl"
+        path.write_text(json.dumps("first") + "\n" + json.dumps({"text": "second"}) + "\n")
+        assert load_responses(str(path)) == ["first", "second"]
+
+        with FakeOpenAIServer(port=0, responses=load_responses(str(path))) as scripted:
+            llm = make_llm(scripted)
+            assert [llm.invoke("a"), llm.invoke("b"), llm.invoke("c")] == ["first", "second", "first"]
+
+    def test_chat_completions_and_models(self, server):
+        """Test the chat and models endpoints with plain HTTP."""
+        request = urllib.request.Request(
+            server.base_url + "/chat/completions",
+            data=json.dumps({"model": "m", "messages": [{"role": "user", "content": "hi"}]}).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            body = json.load(response)
+        assert body["choices"][0]["message"]["content"] == "hi"
+
+        with urllib.request.urlopen(server.base_url + "/models") as response:
+            assert json.load(response)["data"][0]["id"] == "fake-model"
+
+    def test_latency(self):
+        """Test that the configured latency is applied."""
+        import time
+        with FakeOpenAIServer(port=0, latency=ConstantLatency(0.1)) as slow:
+            llm = make_llm(slow)
+            start = time.perf_counter()
+            llm.invoke("prompt")
+            assert time.perf_counter() - start >= 0.1
+
+    def test_injected_errors(self, server):
+        """Test 429 and 500 injection."""
+        import openai
+        llm = make_llm(server)
+
+        server.error_429_rate = 1.0
+        with pytest.raises(openai.RateLimitError):
+            llm.invoke("prompt")
+
+        server.error_429_rate = 0.0
+        server.error_500_rate = 1.0
+        with pytest.raises(openai.InternalServerError):
+            llm.invoke("prompt")
+
+        stats = server.stats()
+        assert stats["errors_429"] == 1
+        assert stats["errors_500"] == 1
+
+    def test_dropped_connections(self, server):
+        """Test that drops break both plain and streaming requests."""
+        llm = make_llm(server)
+        server.drop_rate = 1.0
+
+        with pytest.raises(Exception):
+            llm.invoke("prompt")
+        with pytest.raises(Exception):
+            list(llm.stream("Fix:\n\none two three four\n\nOut:"))
+        assert server.stats()["drops"] == 2
+
+    def test_processor_falls_back_on_faults(self, server):
+        """Test that EnhancedProcessor returns the original text when the server fails."""
+        server.error_500_rate = 1.0
+        processor = EnhancedProcessor(llm=make_llm(server))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
@@ -0,0 +1,184 @@
+"""
+Unit tests for HedgedLLM
+
+Tests hedge timing, winner selection, the hedge-rate cap, failure
+handling, async cancellation and use inside EnhancedProcessor.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from langchain_core.runnables import RunnableLambda
+from enhanced_processor import EnhancedProcessor
+from fake_llm import FakeLLM
+from hedging import HedgedLLM
+
+
+def sleeper(delays, calls=None):
+    """Runnable that sleeps delays[i] on its i-th call and echoes the input."""
+    lock = threading.Lock()
+    state = {"calls": 0}
+
+    def run(text):
+        with lock:
+            index = state["calls"]
+            state["calls"] += 1
+        if calls is not None:
+            calls.append(text)
+        time.sleep(delays[min(index, len(delays) - 1)])
+        return f"{text}#{index}"
+
+    return RunnableLambda(run)
+
+
+class TestHedgedLLM:
+    """Test suite for HedgedLLM."""
+
+    def test_no_hedge_without_history(self):
+        """Test that nothing is hedged before enough latencies are known."""
+        hedged = HedgedLLM(sleeper([0.0]), min_samples=5)
+        assert hedged.hedge_delay() is None
+        assert hedged.invoke("a") == "a#0"
+        assert hedged.stats()["hedged"] == 0
+
+    def test_delay_follows_percentile(self):
+        """Test that the hedge delay tracks the recent latency percentile."""
+        hedged = HedgedLLM(sleeper([0.0]), min_samples=3, min_delay=0.0)
+        for latency in [0.1, 0.2, 0.3]:
+            hedged._record_primary(latency)
+        assert hedged.hedge_delay() == pytest.approx(0.3)
+
+        hedged.min_delay = 1.0
+        assert hedged.hedge_delay() == 1.0
+
+    def test_hedge_wins_against_slow_primary(self):
+        """Test that a slow primary is beaten by the hedge."""
+        primary = sleeper([2.0])
+        alternate = sleeper([0.0])
+        hedged = HedgedLLM(primary, alternate=alternate, initial_delay=0.02,
+                           min_delay=0.0, max_hedge_rate=1.0)
+
+        start = time.perf_counter()
+        assert hedged.invoke("a") == "a#0"  # answered by the alternate
+        assert time.perf_counter() - start < 1.0
+
+        stats = hedged.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        # The losing primary reports the time saved when it finishes
+        deadline = time.perf_counter() + 10
+        while not hedged.stats()["saved_ms_total"] and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        assert hedged.stats()["saved_ms_total"] > 1000
+        hedged.shutdown()
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test that a primary answering within the delay is used directly."""
+        calls = []
+        hedged = HedgedLLM(sleeper([0.0]), alternate=sleeper([0.0], calls),
+                           initial_delay=0.5, max_hedge_rate=1.0)
+        assert hedged.invoke("a") == "a#0"
+        assert calls == []
+
+    def test_hedge_rate_cap(self):
+        """Test that hedges stop once the recent hedge rate reaches the cap."""
+        hedged = HedgedLLM(sleeper([0.05]), initial_delay=0.0, min_delay=0.0, max_hedge_rate=0.5)
+        for i in range(6):
+            hedged.invoke(str(i))
+
+        stats = hedged.stats()
+        assert stats["hedged"] <= 3
+        assert stats["skipped_rate_cap"] >= 3
+        hedged.shutdown()
+
+    def test_hedge_rate_cap_counts_in_flight_requests(self):
+        """Test that concurrent slow calls cannot all hedge before any of them finishes."""
+        primary = sleeper([0.0] * 100 + [0.5])
+        hedged = HedgedLLM(primary, alternate=sleeper([0.0]), min_samples=20, min_delay=0.05,
+                           max_hedge_rate=0.1, max_workers=32, max_hedge_workers=32)
+        for i in range(100):
+            hedged.invoke(str(i))
+
+        threads = [threading.Thread(target=hedged.invoke, args=(str(i),)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = hedged.stats()
+        # 10% of 120 requests
+        assert 1 <= stats["hedged"] <= 12
+        assert stats["skipped_rate_cap"] >= 8
+        hedged.shutdown()
+
+    def test_hedges_have_their_own_workers(self):
+        """Test that hedges start even when every primary worker is busy."""
+        hedged = HedgedLLM(sleeper([1.0]), alternate=sleeper([0.0]), initial_delay=0.05,
+                           min_delay=0.0, max_hedge_rate=1.0, max_workers=2, max_hedge_workers=2)
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(hedged.invoke(str(i))))
+                   for i in range(2)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 2
+        assert time.perf_counter() - start < 0.9
+        assert hedged.stats()["hedge_wins"] == 2
+        # Both hedge workers are free again, so a third hedge is not skipped
+        assert hedged.invoke("c") is not None
+        assert hedged.stats()["skipped_busy"] == 0
+        hedged.shutdown()
+
+    def test_failed_hedge_falls_back_to_primary(self):
+        """Test that a failing hedge does not fail a request the primary can answer."""
+        def broken(text):
+            raise RuntimeError("alternate down")
+
+        hedged = HedgedLLM(sleeper([0.1]), alternate=RunnableLambda(broken),
+                           initial_delay=0.01, min_delay=0.0, max_hedge_rate=1.0)
+        assert hedged.invoke("a") == "a#0"
+        assert hedged.stats()["primary_wins"] == 1
+
+    def test_async_hedge_cancels_loser(self):
+        """Test that the async path cancels the losing request."""
+        async def run():
+            state = {"cancelled": False}
+
+            async def slow(text):
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    state["cancelled"] = True
+                    raise
+                return "slow"
+
+            async def fast(text):
+                return "fast"
+
+            hedged = HedgedLLM(RunnableLambda(lambda x: x, afunc=slow),
+                               alternate=RunnableLambda(lambda x: x, afunc=fast),
+                               initial_delay=0.01, min_delay=0.0, max_hedge_rate=1.0)
+            result = await hedged.ainvoke("a")
+            await asyncio.sleep(0)
+            return result, state["cancelled"], hedged.stats()
+
+        result, was_cancelled, stats = asyncio.run(run())
+        assert result == "fast"
+        assert was_cancelled is True
+        assert stats["hedge_wins"] == 1
+
+    def test_processor_integration(self):
+        """Test HedgedLLM as the processor's LLM, including the default chain."""
+        llm = FakeLLM()
+        hedged = HedgedLLM(llm, initial_delay=0.5)
+        processor = EnhancedProcessor(llm=hedged)
+
+        assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
+        assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+        assert "".join(processor.stream_clipboard_content("a b <#explain>")) == "a b"
+        assert processor.model_identity.startswith("fake-llm")
+        assert hedged.stats()["requests"] == 2
@@ -0,0 +1,174 @@
+"""
+Unit tests for HotkeyWorker
+
+Tests background job dispatch, coalescing of duplicate presses, the
+bounded pending queue and superseding stale jobs.
+"""
+
+import threading
+import time
+import pytest
+from hotkey_worker import HotkeyWorker, HotkeyJob
+
+
+class TestHotkeyWorker:
+    """Test suite for HotkeyWorker."""
+    
+    def setup_method(self):
+        """Set up a worker whose handler blocks until released."""
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.processed = []
+        
+        def handler(job):
+            self.started.set()
+            self.release.wait(5)
+            self.processed.append(job.text)
+        
+        self.dropped = []
+        self.worker = HotkeyWorker(handler, max_queue_size=2, on_drop=self.dropped.append)
+    
+    def teardown_method(self):
+        """Stop worker threads."""
+        self.release.set()
+        self.worker.shutdown(wait=True, timeout=5)
+    
+    def wait_for(self, predicate, timeout=5):
+        """Poll until predicate is true or timeout expires."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return False
+    
+    def test_submit_does_not_block_on_handler(self):
+        """Test that submit returns immediately while the handler is busy."""
+        self.worker.start()
+        start = time.perf_counter()
+        assert self.worker.submit("first") is True
+        assert self.started.wait(5)
+        assert self.worker.submit("second") is True
+        elapsed = time.perf_counter() - start
+        
+        # The handler is blocked until release, so any return means submit did not wait
+        assert elapsed < 2.0
+        assert self.processed == []
+        
+        self.release.set()
+        assert self.wait_for(lambda: self.processed == ["first", "second"])
+    
+    def test_duplicate_presses_are_coalesced(self):
+        """Test that duplicate text queued or in flight is not re-queued."""
+        self.worker.start()
+        assert self.worker.submit("same") is True
+        assert self.started.wait(5)
+        
+        # In flight
+        assert self.worker.submit("same") is False
+        # Pending
+        assert self.worker.submit("other") is True
+        assert self.worker.submit("other") is False
+        
+        assert self.worker.coalesced == 2
+        self.release.set()
+        assert self.wait_for(lambda: self.worker.completed == 2)
+        assert self.processed == ["same", "other"]
+    
+    def test_full_queue_drops_oldest_pending(self):
+        """Test that the oldest pending job is evicted when the queue is full."""
+        self.worker.start()
+        self.worker.submit("busy")
+        assert self.started.wait(5)
+        
+        self.worker.submit("a")
+        self.worker.submit("b")
+        self.worker.submit("c")
+        
+        assert self.worker.pending_count() == 2
+        assert self.worker.dropped == 1
+        assert [job.text for job in self.dropped] == ["a"]
+        
+        self.release.set()
+        assert self.wait_for(lambda: self.worker.completed == 3)
+        assert self.processed == ["busy", "b", "c"]
+    
+    def test_handler_exception_keeps_worker_alive(self):
+        """Test that a failing handler does not kill the worker thread."""
+        calls = []
+        
+        def handler(job):
+            calls.append(job.text)
+            if job.text == "boom":
+                raise RuntimeError("failure")
+        
+        worker = HotkeyWorker(handler).start()
+        try:
+            worker.submit("boom")
+            worker.submit("ok")
+            assert self.wait_for(lambda: worker.completed + worker.failed == 2)
+            assert worker.failed == 1
+            assert worker.completed == 1
+            assert calls == ["boom", "ok"]
+        finally:
+            worker.shutdown()
+    
+    def test_job_records_queue_time(self):
+        """Test that jobs record when they were picked up."""
+        job = HotkeyJob("text")
+        assert job.queue_time == 0.0
+        job.started_at = job.submitted_at + 0.25
+        assert job.queue_time == pytest.approx(0.25)
+    
+    def test_new_press_supersedes_stale_jobs(self):
+        """Test that supersede cancels the job in flight and drops pending ones."""
+        writes = []
+        
+        def handler(job):
+            self.started.set()
+            job.token.wait(5)
+            self.worker.commit(job, lambda: writes.append(job.text))
+            self.processed.append(job.text)
+        
+        worker = HotkeyWorker(handler, on_drop=self.dropped.append, supersede=True).start()
+        try:
+            worker.submit("old")
+            assert self.started.wait(5)
+            
+            worker.submit("newer")
+            worker.submit("newest")
+            assert [job.text for job in self.dropped] == ["newer"]
+            assert self.dropped[0].cancelled
+            assert self.wait_for(lambda: worker.cancelled == 1 and worker.completed == 0)
+            
+            # A cancelled job no longer absorbs presses for its text
+            assert worker.submit("old") is True
+            assert self.wait_for(lambda: worker.cancelled == 2)
+            assert writes == []
+            assert worker.cancel_in_flight("clipboard changed", keep="other") == 1
+            assert self.wait_for(lambda: worker.cancelled == 3)
+            assert self.processed == ["old", "newest", "old"]
+        finally:
+            worker.shutdown()
+    
+    def test_commit_skips_cancelled_jobs(self):
+        """Test that commit runs the action only for a live job."""
+        worker = HotkeyWorker(lambda job: None)
+        writes = []
+        job = HotkeyJob("text")
+        assert worker.commit(job, lambda: writes.append(1)) is True
+        job.token.cancel()
+        assert worker.commit(job, lambda: writes.append(2)) is False
+        assert writes == [1]
+    
+    def test_invalid_configuration(self):
+        """Test that invalid pool sizes are rejected."""
+        with pytest.raises(ValueError):
+            HotkeyWorker(lambda job: None, num_workers=0)
+        with pytest.raises(ValueError):
+            HotkeyWorker(lambda job: None, max_queue_size=0)
+
+
+if __name__ == "__main__":
+    # Run the tests
+    pytest.main([__file__, "-v"])
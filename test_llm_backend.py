@@ -0,0 +1,205 @@
+"""
+Unit tests for the LLM backends
+
+Tests the direct OpenAI-compatible client against the fake server
+(completions, chat, streaming, batching, keep-alive reuse, errors and
+cancellation) and EnhancedProcessor with both backends.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from cancellation import CancellationToken, CancelledRequestError, call_cancellable, iterate_cancellable
+from enhanced_processor import EnhancedProcessor
+from fake_llm import ConstantLatency
+from fake_openai_server import FakeOpenAIServer
+from llm_backend import (
+    BackendHTTPError,
+    DirectOpenAI,
+    LLMBackend,
+    OutputCleanup,
+    PromptChain,
+    backend_from_environment
+)
+from resilience import ResilientLLM, is_transient, retry_after_seconds
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(port=0, seed=0) as running:
+        yield running
+
+
+def make_llm(server, **options):
+    options.setdefault("max_retries", 0)
+    return DirectOpenAI(openai_api_base=server.base_url, openai_api_key="local", **options)
+
+
+class TestDirectOpenAI:
+    """Test suite for DirectOpenAI."""
+
+    def test_invoke_reuses_one_connection(self, server):
+        """Test that sequential requests share a keep-alive connection."""
+        llm = make_llm(server)
+        results = [llm.invoke("Hello world") for _ in range(3)]
+        assert results == ["Hello world"] * 3
+        assert llm.pool.stats() == {"opened": 1, "reused": 2, "idle": 1}
+        assert server.stats()["requests"] == 3
+
+    def test_stream_matches_invoke(self, server):
+        """Test that streamed chunks join to the invoke result, on both endpoints."""
+        for chat in (False, True):
+            llm = make_llm(server, chat=chat)
+            chunks = list(llm.stream("The quick brown fox"))
+            assert len(chunks) > 1
+            assert "".join(chunks) == llm.invoke("The quick brown fox")
+            # The finished stream returned its connection to the pool
+            assert llm.pool.stats()["opened"] == 1
+
+    def test_closed_stream_drops_its_connection(self, server):
+        """Test that a stream closed early is not reused."""
+        llm = make_llm(server)
+        stream = llm.stream("one two three four")
+        next(stream)
+        stream.close()
+        assert llm.pool.stats()["idle"] == 0
+        assert llm.invoke("again") == "again"
+
+    def test_batch_sends_one_request(self, server):
+        """Test that completions batches go out as one request."""
+        llm = make_llm(server)
+        assert llm.batch(["alpha", "beta", "gamma"]) == ["alpha", "beta", "gamma"]
+        assert server.stats()["requests"] == 1
+
+    def test_http_errors_are_classified(self):
+        """Test that a 429 carries its status and Retry-After for the retry policy."""
+        with FakeOpenAIServer(port=0, error_429_rate=1.0, retry_after=3) as server:
+            with pytest.raises(BackendHTTPError) as excinfo:
+                make_llm(server).invoke("Hello")
+        assert excinfo.value.status_code == 429
+        assert is_transient(excinfo.value)
+        assert retry_after_seconds(excinfo.value) == 3.0
+
+    def test_max_retries(self):
+        """Test that transient errors are retried max_retries times."""
+        with FakeOpenAIServer(port=0, error_500_rate=1.0) as server:
+            with pytest.raises(BackendHTTPError, match="HTTP 500"):
+                make_llm(server, max_retries=1).invoke("Hello")
+            assert server.stats()["requests"] == 2
+
+    def test_dropped_stream_raises(self):
+        """Test that a stream cut off by the server is an error, not a short result."""
+        with FakeOpenAIServer(port=0, drop_rate=1.0) as server:
+            with pytest.raises(ConnectionError):
+                list(make_llm(server).stream("one two three four five six"))
+
+    def test_ainvoke_runs_on_the_async_pool(self, server):
+        """Test that async calls use the dedicated pool, not the loop's default executor."""
+        llm = make_llm(server)
+
+        class ThreadName(LLMBackend):
+            def invoke(self, input, config=None, **kwargs):
+                return threading.current_thread().name
+
+        async def main():
+            return await asyncio.gather(llm.ainvoke("Hello"), ThreadName().ainvoke("x"))
+
+        text, thread_name = asyncio.run(main())
+        assert text
+        assert thread_name.startswith("clipiq-async")
+
+    def test_cancelled_ainvoke_aborts_the_request(self):
+        """Test that cancelling an async call returns at once and drops the connection."""
+        with FakeOpenAIServer(port=0, latency=ConstantLatency(2.0)) as server:
+            llm = make_llm(server)
+
+            async def main():
+                task = asyncio.ensure_future(llm.ainvoke("Hello"))
+                await asyncio.sleep(0.1)
+                start = time.perf_counter()
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                return time.perf_counter() - start
+
+            assert asyncio.run(main()) < 0.5
+            assert llm.pool.stats()["idle"] == 0
+
+    def test_cancelled_invoke_releases_its_connection(self):
+        """Test that cancelling a blocking call aborts the request instead of waiting it out."""
+        with FakeOpenAIServer(port=0, latency=ConstantLatency(3.0)) as server:
+            llm = make_llm(server)
+            token = CancellationToken()
+            finished = threading.Event()
+
+            def call():
+                try:
+                    return llm.invoke("Hello")
+                finally:
+                    finished.set()
+
+            threading.Timer(0.1, token.cancel).start()
+            with pytest.raises(CancelledRequestError):
+                call_cancellable(call, token)
+            # The worker gives the connection up long before the response is due
+            assert finished.wait(1.5)
+            assert llm.pool.stats()["idle"] == 0
+
+    def test_cancelled_stream_releases_its_connection(self):
+        """Test that cancelling a stream between chunks aborts the request."""
+        with FakeOpenAIServer(port=0, latency=ConstantLatency(6.0), first_token_fraction=0.0) as server:
+            llm = make_llm(server)
+            token = CancellationToken()
+            finished = threading.Event()
+
+            def stream():
+                try:
+                    yield from llm.stream("one two three")
+                finally:
+                    finished.set()
+
+            chunks = iterate_cancellable(stream(), token)
+            assert next(chunks)
+            token.cancel()
+            with pytest.raises(CancelledRequestError):
+                list(chunks)
+            # The next chunk is seconds away; the helper stops without it
+            assert finished.wait(1.0)
+            assert llm.pool.stats()["idle"] == 0
+
+
+class TestBackends:
+    """Test suite for backend selection and the LangChain-free chain."""
+
+    def test_backend_from_environment(self, monkeypatch):
+        """Test the default backend and validation of CLIPIQ_BACKEND."""
+        monkeypatch.delenv("CLIPIQ_BACKEND", raising=False)
+        assert backend_from_environment() == "langchain"
+        monkeypatch.setenv("CLIPIQ_BACKEND", "Direct")
+        assert backend_from_environment() == "direct"
+        with pytest.raises(ValueError, match="Unknown LLM backend"):
+            backend_from_environment("grpc")
+
+    def test_prompt_chain(self):
+        """Test that PromptChain renders, calls the LLM and cleans up like the LangChain chain."""
+        class Echo(LLMBackend):
+            def invoke(self, input, config=None, **kwargs):
+                return f' "{input}" '
+
+        with pytest.raises(TypeError):
+            LLMBackend()
+        chain = PromptChain("Fix: {text}", Echo(), OutputCleanup())
+        assert chain.invoke({"text": "helo"}) == "Fix: helo"
+        assert asyncio.run(chain.ainvoke({"text": "helo"})) == "Fix: helo"
+        assert chain.batch([{"text": "a"}, {"text": "b"}]) == ["Fix: a", "Fix: b"]
+
+    @pytest.mark.parametrize("backend", ["direct", "langchain"])
+    def test_processor_with_both_backends(self, server, backend):
+        """Test that both backends give the same results through the processor."""
+        llm = ResilientLLM(make_llm(server))
+        processor = EnhancedProcessor(llm=llm, backend=backend)
+        assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
+        assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+        assert "".join(processor.stream_clipboard_content("Helo again")) == "Helo again"
+        assert asyncio.run(processor.aprocess_clipboard_content("Helo async")) == "Helo async"
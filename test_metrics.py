@@ -0,0 +1,155 @@
+"""
+Unit tests for StageMetrics
+
+Tests rolling histograms, disabled no-op spans, Prometheus/JSON export
+and the stages recorded by EnhancedProcessor.
+"""
+
+import json
+import threading
+from enhanced_processor import EnhancedProcessor, StreamStats
+from fake_llm import FakeLLM
+from metrics import RollingHistogram, StageMetrics
+
+
+class TestRollingHistogram:
+    """Test suite for RollingHistogram."""
+
+    def test_percentiles_and_buckets(self):
+        """Test percentiles over the window and cumulative bucket counts."""
+        histogram = RollingHistogram(buckets=(0.01, 0.1, 1.0))
+        for value in [0.005, 0.05, 0.05, 0.5, 5.0]:
+            histogram.observe(value)
+
+        assert histogram.count == 5
+        assert histogram.percentile(0.5) == 0.05
+        assert histogram.percentile(0.99) == 5.0
+        assert histogram.bucket_counts == [1, 2, 1]
+        assert histogram.snapshot()["max_ms"] == 5000.0
+
+    def test_window_keeps_recent_samples(self):
+        """Test that percentiles only cover the rolling window."""
+        histogram = RollingHistogram(window=3)
+        for value in [9.0, 9.0, 9.0, 0.1, 0.1, 0.1]:
+            histogram.observe(value)
+
+        assert histogram.percentile(0.99) == 0.1
+        assert histogram.count == 6
+
+
+class TestStageMetrics:
+    """Test suite for StageMetrics."""
+
+    def test_disabled_metrics_are_no_ops(self):
+        """Test that disabled metrics hand out a shared span and record nothing."""
+        metrics = StageMetrics(enabled=False)
+        first = metrics.span("llm", "translate")
+        with first as span:
+            span.category = "other"
+        assert metrics.span("parse") is first
+        metrics.record("llm", "default", 1.0)
+        assert metrics.snapshot() == {}
+
+    def test_span_records_with_updated_category(self):
+        """Test that a span's category can be set inside the block."""
+        metrics = StageMetrics(enabled=True)
+        with metrics.span("parse") as span:
+            span.category = "translate"
+
+        snapshot = metrics.snapshot()
+        assert snapshot["parse"]["translate"]["count"] == 1
+
+    def test_span_records_on_exception(self):
+        """Test that failing stages are still timed."""
+        metrics = StageMetrics(enabled=True)
+        try:
+            with metrics.span("llm", "default"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        assert metrics.snapshot()["llm"]["default"]["count"] == 1
+
+    def test_concurrent_recording(self):
+        """Test that concurrent records are all counted."""
+        metrics = StageMetrics(enabled=True)
+
+        def record():
+            for _ in range(1000):
+                metrics.record("llm", "default", 0.001)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.snapshot()["llm"]["default"]["count"] == 4000
+
+    def test_prometheus_export(self):
+        """Test the Prometheus text format."""
+        metrics = StageMetrics(enabled=True, buckets=(0.01, 0.1))
+        metrics.record("llm", "translate", 0.05)
+        metrics.record("llm", "translate", 0.5)
+        text = metrics.to_prometheus()
+
+        assert "# TYPE clipiq_stage_duration_seconds histogram" in text
+        assert 'clipiq_stage_duration_seconds_bucket{stage="llm",category="translate",le="0.01"} 0' in text
+        assert 'clipiq_stage_duration_seconds_bucket{stage="llm",category="translate",le="0.1"} 1' in text
+        assert 'clipiq_stage_duration_seconds_bucket{stage="llm",category="translate",le="+Inf"} 2' in text
+        assert 'clipiq_stage_duration_seconds_count{stage="llm",category="translate"} 2' in text
+        assert 'quantile="0.99"} 0.500000' in text
+
+    def test_write_files(self, tmp_path):
+        """Test JSON and Prometheus textfile export."""
+        metrics = StageMetrics(enabled=True)
+        metrics.record("copy", "default", 0.002)
+
+        metrics.write(str(tmp_path / "clipiq.json"))
+        data = json.loads((tmp_path / "clipiq.json").read_text())
+        assert data["stages"]["copy"]["default"]["count"] == 1
+
+        metrics.write(str(tmp_path / "textfile" / "clipiq.prom"))
+        assert "clipiq_stage_duration_seconds_sum" in (tmp_path / "textfile" / "clipiq.prom").read_text()
+
+    def test_format_table(self):
+        """Test the console table."""
+        metrics = StageMetrics(enabled=True)
+        assert "No stage metrics" in metrics.format_table()
+        metrics.record("llm", "summary", 0.1)
+        assert "summary" in metrics.format_table()
+
+
+class TestProcessorStages:
+    """Test the stages recorded by EnhancedProcessor."""
+
+    def test_command_path_stages(self):
+        """Test that parse, prompt, llm and cleanup are recorded per category."""
+        metrics = StageMetrics(enabled=True)
+        processor = EnhancedProcessor(llm=FakeLLM(), metrics=metrics)
+        processor.process_clipboard_content("Hola <#translate to english>")
+        processor.process_clipboard_content("Helo wrld")
+
+        snapshot = metrics.snapshot()
+        assert snapshot["parse"]["all"]["count"] == 2
+        assert snapshot["prompt"]["translate"]["count"] == 1
+        assert snapshot["llm"]["translate"]["count"] == 1
+        assert snapshot["cleanup"]["translate"]["count"] == 1
+        assert snapshot["llm"]["default"]["count"] == 1
+
+    def test_stream_records_first_token(self):
+        """Test that streaming records time to first token and sets the category."""
+        metrics = StageMetrics(enabled=True)
+        processor = EnhancedProcessor(llm=FakeLLM(), metrics=metrics)
+        stats = StreamStats()
+        list(processor.stream_clipboard_content("Some text <#summarize>", stats=stats))
+
+        assert stats.category == "summarize"
+        snapshot = metrics.snapshot()
+        assert snapshot["first_token"]["summarize"]["count"] == 1
+        assert snapshot["llm"]["summarize"]["count"] == 1
+
+    def test_default_metrics_are_disabled(self):
+        """Test that processors record nothing unless metrics are enabled."""
+        processor = EnhancedProcessor(llm=FakeLLM())
+        processor.process_clipboard_content("Hola <#translate to english>")
+        assert processor.metrics.enabled is False
+        assert processor.metrics.snapshot() == {}
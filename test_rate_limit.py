@@ -0,0 +1,237 @@
+"""
+Unit tests for client-side rate limiting
+
+Tests the RPM/TPM buckets, reservation order, thread and asyncio safety,
+the process-wide registry, RateLimitedLLM accounting and the environment
+wiring.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+import rate_limit
+from enhanced_processor import EnhancedProcessor, ProcessorFactory
+from fake_llm import FakeLLM
+from rate_limit import (
+    RateLimitedLLM,
+    RateLimiter,
+    configure_from_environment,
+    configure_rate_limit,
+    get_rate_limiter
+)
+from token_budget import TokenCounter
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    rate_limit.reset_rate_limits()
+    yield
+    rate_limit.reset_rate_limits()
+
+
+def frozen_limiter(**kwargs):
+    """Limiter whose clock never advances and whose sleeps are recorded."""
+    sleeps = []
+    limiter = RateLimiter(clock=FakeClock(), sleep=sleeps.append, **kwargs)
+    return limiter, sleeps
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter."""
+
+    def test_requests_per_minute(self):
+        """Test that the burst is one minute of quota, then calls are spaced out."""
+        limiter, sleeps = frozen_limiter(requests_per_minute=60)
+        for _ in range(60):
+            assert limiter.acquire() == 0.0
+        assert limiter.acquire() == pytest.approx(1.0)
+        assert limiter.acquire() == pytest.approx(2.0)
+        assert sleeps == [pytest.approx(1.0), pytest.approx(2.0)]
+        assert limiter.stats()["throttled"] == 2
+
+    def test_tokens_per_minute_and_refill(self):
+        """Test token reservations against a refilling bucket."""
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=600, clock=clock, sleep=lambda seconds: None)
+        assert limiter.reserve(600) == 0.0
+        assert limiter.reserve(100) == pytest.approx(10.0)
+        clock.now = 20.0
+        assert limiter.reserve(100) == 0.0
+
+    def test_both_limits_apply(self):
+        """Test that the stricter of RPM and TPM decides the wait."""
+        limiter, _ = frozen_limiter(requests_per_minute=1000, tokens_per_minute=60)
+        assert limiter.reserve(60) == 0.0
+        assert limiter.reserve(30) == pytest.approx(30.0)
+
+    def test_refund_returns_unused_tokens(self):
+        """Test that refunded tokens are available to the next caller."""
+        limiter, _ = frozen_limiter(tokens_per_minute=600)
+        limiter.reserve(600)
+        limiter.refund(300)
+        assert limiter.reserve(300) == 0.0
+        assert limiter.stats()["tokens"] == 600
+
+    def test_oversized_reservation_is_capped(self):
+        """Test that a call larger than the quota waits one minute at most."""
+        limiter, _ = frozen_limiter(tokens_per_minute=600)
+        limiter.reserve(600)
+        assert limiter.reserve(5000) == pytest.approx(60.0)
+
+    def test_concurrent_threads_are_spaced_exactly(self):
+        """Test that concurrent reservations never overlap or double-book."""
+        limiter, _ = frozen_limiter(requests_per_minute=60)
+        delays = []
+        lock = threading.Lock()
+
+        def reserve():
+            delay = limiter.reserve()
+            with lock:
+                delays.append(delay)
+
+        threads = [threading.Thread(target=reserve) for _ in range(100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(round(delay, 6) for delay in delays) == [0.0] * 60 + [float(i) for i in range(1, 41)]
+
+    def test_async_waits_do_not_block_the_loop(self):
+        """Test that aacquire sleeps without blocking other tasks."""
+        limiter = RateLimiter(tokens_per_minute=600)
+        limiter.reserve(600)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            start = time.perf_counter()
+            waited, _ = await asyncio.gather(limiter.aacquire(1), ticker())
+            return waited, time.perf_counter() - start
+
+        waited, elapsed = asyncio.run(main())
+        assert waited == pytest.approx(0.1, abs=0.01)
+        assert elapsed >= 0.09
+        assert len(ticks) == 5
+
+
+class TestRegistry:
+    """Test suite for the process-wide limiter registry."""
+
+    def test_no_limit_by_default(self):
+        """Test that nothing is limited unless configured."""
+        assert get_rate_limiter(FakeLLM()) is None
+
+    def test_shared_per_backend_and_model(self):
+        """Test that LLMs with the same backend and model share one limiter."""
+        configure_rate_limit(requests_per_minute=100)
+        configure_rate_limit("gpt-4", requests_per_minute=10)
+        default = get_rate_limiter(FakeLLM())
+        assert default is get_rate_limiter(FakeLLM())
+        gpt4 = get_rate_limiter(FakeLLM(model_name="gpt-4"))
+        assert gpt4 is not default
+        assert gpt4.requests_per_minute == 10
+        other_backend = get_rate_limiter(key=("http://localhost:8000/v1", "gpt-4"))
+        assert other_backend is not gpt4 and other_backend.requests_per_minute == 10
+
+    def test_environment(self, monkeypatch):
+        """Test CLIPIQ_RPM/CLIPIQ_TPM defaults and CLIPIQ_RATE_LIMITS entries."""
+        monkeypatch.setenv("CLIPIQ_RPM", "500")
+        monkeypatch.setenv("CLIPIQ_RATE_LIMITS", "gpt-4=60:10000, gpt-4o-mini=:200000")
+        configure_from_environment()
+        assert get_rate_limiter(FakeLLM()).stats()["requests_per_minute"] == 500
+        assert get_rate_limiter(FakeLLM(model_name="gpt-4")).stats()["tokens_per_minute"] == 10000
+        mini = get_rate_limiter(FakeLLM(model_name="gpt-4o-mini")).stats()
+        assert mini["requests_per_minute"] is None and mini["tokens_per_minute"] == 200000
+
+    def test_factory_wraps_raw_client(self, monkeypatch):
+        """Test that the environment LLM waits for quota below retries."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("CLIPIQ_RPM", "500")
+        llm = ProcessorFactory.create_llm_from_environment()
+        assert isinstance(llm.llm, RateLimitedLLM)
+        assert llm.llm.limiter.requests_per_minute == 500
+
+
+class TestRateLimitedLLM:
+    """Test suite for RateLimitedLLM."""
+
+    def make_llm(self, **kwargs):
+        limiter, _ = frozen_limiter(**kwargs)
+        return RateLimitedLLM(FakeLLM(), limiter, counter=TokenCounter(use_tiktoken=False),
+                              output_tokens=100)
+
+    def test_invoke_reserves_estimate_and_settles_actual(self):
+        """Test that only the tokens actually used stay charged."""
+        llm = self.make_llm(tokens_per_minute=10000)
+        output = llm.invoke("hello world")
+        counter = TokenCounter(use_tiktoken=False)
+        used = counter.count("hello world") + counter.count(output)
+        assert llm.stats()["tokens"] == used
+        assert llm.stats()["requests"] == 1
+        assert llm.model_name == "fake-llm"
+
+    def test_stream_batch_and_async(self):
+        """Test accounting for every call style."""
+        llm = self.make_llm(requests_per_minute=1000, tokens_per_minute=10000)
+        assert "".join(llm.stream("a b c")) == "a b c"
+        assert llm.batch(["a", "b"]) == ["a", "b"]
+        assert asyncio.run(llm.ainvoke("d")) == "d"
+        assert asyncio.run(llm.abatch(["e", "f"])) == ["e", "f"]
+        stats = llm.stats()
+        assert stats["requests"] == 6
+        assert stats["tokens"] < 6 * 100
+
+    def test_batch_larger_than_quota_is_spread(self):
+        """Test that a batch over one minute of quota waits for it run by run."""
+        limiter, sleeps = frozen_limiter(requests_per_minute=60, tokens_per_minute=10000)
+        llm = RateLimitedLLM(FakeLLM(), limiter, counter=TokenCounter(use_tiktoken=False),
+                             output_tokens=100)
+        inputs = [f"item {index}" for index in range(200)]
+        assert llm.batch(inputs) == inputs
+        # 60 requests at once, then 60 more per minute
+        assert sleeps == pytest.approx([60.0, 120.0, 140.0])
+        used = limiter.stats()["tokens"]
+        assert limiter.stats()["requests"] == 200
+        # Refunds never return more than was taken: the used tokens stay charged
+        assert limiter.reserve(10000, requests=0) == pytest.approx(used * 60 / 10000)
+
+    def test_batch_runs_fit_token_quota(self):
+        """Test that runs are also bounded by the TPM quota."""
+        limiter = RateLimiter(tokens_per_minute=1000)
+        llm = RateLimitedLLM(FakeLLM(), limiter, counter=TokenCounter(use_tiktoken=False),
+                             output_tokens=100)
+        assert limiter.split([101] * 30) == [(0, 9), (9, 18), (18, 27), (27, 30)]
+        assert asyncio.run(llm.abatch(["a"] * 3)) == ["a"] * 3
+        assert limiter.stats()["tokens"] == 6
+
+    def test_failed_call_refunds_completion(self):
+        """Test that a failing call is charged for its prompt only."""
+        limiter, _ = frozen_limiter(tokens_per_minute=10000)
+        llm = RateLimitedLLM(FakeLLM(failure_rate=1.0), limiter,
+                             counter=TokenCounter(use_tiktoken=False), output_tokens=100)
+        with pytest.raises(Exception):
+            llm.invoke("abcd")
+        assert limiter.stats()["tokens"] == 1
+
+    def test_inside_processor(self):
+        """Test that processor calls go through the limiter."""
+        llm = self.make_llm(requests_per_minute=1000)
+        processor = EnhancedProcessor(llm=llm, cache=None)
+        assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+        assert processor.process_many(["one", "two <#fix>"]) == ["one", "two"]
+        assert llm.stats()["requests"] == 3
@@ -0,0 +1,167 @@
+"""
+Unit tests for the process-wide registry
+
+Tests that compiled templates render exactly like str.format with the
+replacement fallback, that shared components are built once (also under
+concurrent first use) and that the prompt manager and LLM pool follow
+the environment.
+"""
+
+import threading
+import pytest
+from unittest.mock import patch
+from command_parser import CommandParser, parse_command
+from enhanced_processor import EnhancedProcessor
+from llm_backend import DirectOpenAI
+from prompt_templates import (
+    CORE_TEMPLATES,
+    CompiledTemplate,
+    PromptManager,
+    build_default_prompt,
+    get_prompt_manager
+)
+from registry import Registry, get_registry, reset_registry
+
+
+def legacy_build_prompt(template: str, content: str, command: str = "") -> str:
+    """The previous PromptManager.build_prompt."""
+    try:
+        return template.format(text=content, command_detail=command)
+    except KeyError:
+        result = template.replace("{text}", content)
+        if command:
+            result = result.replace("{command_detail}", command)
+        return result
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    """Give every test its own registry."""
+    reset_registry()
+    yield
+    reset_registry()
+
+
+class TestCompiledTemplate:
+    """Test suite for CompiledTemplate."""
+
+    @pytest.mark.parametrize("template, mode", [
+        ("Fix: {text}", CompiledTemplate.FAST),
+        ("{command_detail} of {text} ({text})", CompiledTemplate.FAST),
+        ("Braces {{kept}} around {text}", CompiledTemplate.FAST),
+        ("Hello {name}, fix {text} for {command_detail}", CompiledTemplate.FALLBACK),
+        ("{text!r} and {text:>5}", CompiledTemplate.FORMAT),
+        ("Stray { brace {text}", CompiledTemplate.FORMAT),
+        ("{0} {text}", CompiledTemplate.FORMAT),
+    ])
+    def test_matches_legacy_rendering(self, template, mode):
+        """Test that every mode renders exactly like the previous build_prompt."""
+        compiled = CompiledTemplate(template)
+        assert compiled.mode == mode
+        for content, command in [("Helo {wrld}", "fix"), ("", ""), ("a {text} b", "")]:
+            try:
+                expected = legacy_build_prompt(template, content, command)
+            except (ValueError, IndexError) as error:
+                with pytest.raises(type(error)):
+                    compiled.render(content, command)
+            else:
+                assert compiled.render(content, command) == expected
+
+    def test_core_templates_are_fast(self):
+        """Test that none of the core templates needs str.format."""
+        for name, template in CORE_TEMPLATES.items():
+            assert CompiledTemplate(template).mode == CompiledTemplate.FAST, name
+            assert CompiledTemplate(template).render("x", "y") == legacy_build_prompt(template, "x", "y")
+
+
+class TestRegistry:
+    """Test suite for Registry."""
+
+    def test_components_are_shared(self):
+        """Test that repeated lookups return the same instances."""
+        registry = get_registry()
+        assert registry.template("{text}") is registry.template("{text}")
+        assert registry.parser() is registry.parser()
+        assert registry.parser() is not registry.parser(r'\[\[([^\]]+)\]\]')
+        assert isinstance(registry.parser(), CommandParser)
+        assert registry.prompt_manager() is registry.prompt_manager()
+        assert parse_command("Hola <#translate>") == ("Hola", "translate", True)
+        assert registry.stats()["parsers"] == 2
+
+    def test_templates_are_bounded(self):
+        """Test that the least recently used templates are dropped beyond the limit."""
+        registry = Registry(max_templates=2)
+        first = registry.template("A {text}")
+        registry.template("B {text}")
+        assert registry.template("A {text}") is first
+        registry.template("C {text}")
+        assert registry.stats()["templates"] == 2
+        assert registry.template("A {text}") is first
+        assert registry.template("B {text}").render("x") == "B x"
+        with pytest.raises(ValueError):
+            Registry(max_templates=0)
+
+    def test_prompt_manager_follows_environment(self):
+        """Test that a changed custom default template gets its own manager."""
+        registry = get_registry()
+        default = registry.prompt_manager()
+        with patch.dict('os.environ', {'NO_MORE_TYPO_PROMPT_TEMPLATE': 'Custom {name}: {text}'}):
+            custom = registry.prompt_manager()
+            assert custom is not default
+            assert build_default_prompt("Hi") == "Custom {name}: Hi"
+        assert registry.prompt_manager() is default
+        assert isinstance(default, PromptManager)
+
+    def test_get_prompt_manager_returns_a_private_copy(self):
+        """Test that changing the returned manager leaves the shared one untouched."""
+        manager = get_prompt_manager()
+        assert manager is not get_registry().prompt_manager()
+        assert manager.templates == get_registry().prompt_manager().templates
+        manager.templates["default"] = "Mine: {text}"
+        manager.templates["poem"] = "Poem: {text}"
+        assert manager.get_default_prompt("Hi") == "Mine: Hi"
+        assert build_default_prompt("Hi") != "Mine: Hi"
+        assert "poem" not in get_prompt_manager().list_available_templates()
+
+    def test_concurrent_first_use_builds_once(self):
+        """Test that threads racing on a miss all get one instance."""
+        registry = Registry()
+        built = []
+        barrier = threading.Barrier(16)
+        results = []
+
+        def create():
+            built.append(1)
+            return object()
+
+        def worker():
+            barrier.wait()
+            results.append(registry._get_or_create(registry._parsers, "k", create))
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(built) == 1
+        assert len(results) == 16 and all(result is results[0] for result in results)
+
+    def test_llm_clients_are_pooled(self):
+        """Test that clients are reused per backend, options and credentials."""
+        registry = get_registry()
+        with patch('langchain_community.llms.openai.OpenAI', side_effect=lambda **options: object()) as mock_openai:
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'key-a'}):
+                first = registry.llm("langchain", max_retries=0)
+                assert registry.llm("langchain", max_retries=0) is first
+                assert registry.llm("langchain") is not first
+                assert isinstance(registry.llm("direct", max_retries=0), DirectOpenAI)
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'key-b'}):
+                assert registry.llm("langchain", max_retries=0) is not first
+        assert mock_openai.call_count == 3
+
+    def test_processors_share_the_default_client(self):
+        """Test that processors without an explicit LLM share one client."""
+        first, second = EnhancedProcessor(), EnhancedProcessor()
+        assert first.llm is second.llm
+        assert first.command_parser is second.command_parser
+        assert get_registry().processor() is get_registry().processor()
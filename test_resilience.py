@@ -0,0 +1,212 @@
+"""
+Unit tests for ResilientLLM, RetryPolicy and CircuitBreaker
+
+Tests error classification, jittered retries within the budget, breaker
+opening, half-open probes, stream and batch retries, and the processor
+skipping the default fallback while the upstream is unavailable.
+"""
+
+import asyncio
+import warnings
+import pytest
+from langchain_core.runnables import RunnableLambda
+from enhanced_processor import EnhancedProcessor
+from fake_llm import FakeLLM, FakeLLMError
+from resilience import (CircuitBreaker, CircuitOpenError, ResilientLLM, RetryPolicy,
+                        UpstreamUnavailableError, is_transient)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatusError(Exception):
+    """Error carrying an HTTP status and optional response headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+class APIConnectionError(Exception):
+    """Stand-in with the name of openai's connection error."""
+
+
+def flaky(failures, calls):
+    """Runnable raising failures[i] on its i-th call (None = succeed) and echoing the input."""
+    def run(text):
+        index = len(calls)
+        calls.append(text)
+        if index < len(failures) and failures[index] is not None:
+            raise failures[index]
+        return text.upper()
+
+    async def arun(text):
+        return run(text)
+
+    return RunnableLambda(run, afunc=arun)
+
+
+def resilient(runnable, sleeps=None, threshold=5, attempts=3, clock=None):
+    return ResilientLLM(runnable,
+                        breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=30.0,
+                                               clock=clock or FakeClock()),
+                        policy=RetryPolicy(max_attempts=attempts, base_delay=0.01, seed=1),
+                        sleep=(sleeps.append if sleeps is not None else lambda seconds: None))
+
+
+class TestRetryPolicy:
+    """Test suite for error classification and backoff."""
+
+    def test_transient_classification(self):
+        """Test which errors are worth retrying."""
+        assert is_transient(StatusError(429))
+        assert is_transient(StatusError(503))
+        assert is_transient(APIConnectionError())
+        assert is_transient(TimeoutError())
+        assert is_transient(FakeLLMError("down"))
+        assert not is_transient(StatusError(400))
+        assert not is_transient(ValueError("bad prompt"))
+        assert not is_transient(CircuitOpenError(1.0))
+
+    def test_full_jitter_backoff(self):
+        """Test that backoff stays within the exponential cap."""
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.3, seed=3)
+        for attempt in range(6):
+            assert 0.0 <= policy.backoff(attempt) <= min(0.3, 0.1 * 2 ** attempt)
+
+    def test_retry_after_and_budget(self):
+        """Test that Retry-After is honoured and the latency budget is respected."""
+        policy = RetryPolicy(max_attempts=5, budget=5.0, seed=1)
+        assert policy.next_delay(0, StatusError(429, {"retry-after": "2"}), elapsed=0.0) >= 2.0
+        assert policy.next_delay(0, StatusError(429, {"retry-after": "2"}), elapsed=4.0) is None
+        assert policy.next_delay(4, StatusError(503), elapsed=0.0) is None
+
+
+class TestResilientLLM:
+    """Test suite for ResilientLLM and CircuitBreaker."""
+
+    def test_retries_transient_errors(self):
+        """Test that transient failures are retried until the call succeeds."""
+        calls, sleeps = [], []
+        llm = resilient(flaky([StatusError(503), StatusError(429)], calls), sleeps)
+        assert llm.invoke("a") == "A"
+        assert len(calls) == 3
+        assert len(sleeps) == 2
+        assert llm.stats()["retries"] == 2
+
+    def test_non_transient_error_is_not_retried(self):
+        """Test that a client error is raised as-is after one attempt."""
+        calls = []
+        llm = resilient(flaky([StatusError(400)], calls))
+        with pytest.raises(StatusError):
+            llm.invoke("a")
+        assert len(calls) == 1
+        assert llm.breaker.consecutive_failures == 0
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that exhausted retries raise UpstreamUnavailableError."""
+        calls = []
+        llm = resilient(flaky([StatusError(502)] * 5, calls), attempts=2)
+        with pytest.raises(UpstreamUnavailableError) as info:
+            llm.invoke("a")
+        assert isinstance(info.value.__cause__, StatusError)
+        assert len(calls) == 2
+        assert llm.stats()["gave_up"] == 1
+
+    def test_breaker_opens_and_fails_fast(self):
+        """Test that repeated failures open the circuit and later calls skip the upstream."""
+        calls = []
+        llm = resilient(flaky([StatusError(500)] * 10, calls), threshold=3, attempts=3)
+        with pytest.raises(UpstreamUnavailableError):
+            llm.invoke("a")
+        assert llm.breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            llm.invoke("b")
+        assert len(calls) == 3
+        assert llm.stats()["rejected"] == 1
+
+    def test_half_open_probe(self):
+        """Test that one probe is allowed after the reset timeout and closes the circuit."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0, clock=clock)
+        breaker.record_failure()
+        assert breaker.is_open
+
+        clock.now = 10.0
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()  # the probe
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # only one probe at a time
+
+        breaker.record_failure()  # failed probe reopens
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 20.0
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.stats()["probes"] == 2
+
+    def test_stream_retries_before_first_chunk(self):
+        """Test that a stream failing before any output is retried."""
+        calls = []
+        llm = resilient(flaky([APIConnectionError()], calls))
+        assert "".join(llm.stream("a")) == "A"
+        assert len(calls) == 2
+
+    def test_batch_retries_only_failed_items(self):
+        """Test that a batch re-sends only the items that failed transiently."""
+        calls = []
+        failures = {"b": [StatusError(503)]}
+
+        def run(text):
+            calls.append(text)
+            pending = failures.get(text)
+            if pending:
+                raise pending.pop()
+            return text.upper()
+
+        llm = resilient(RunnableLambda(run))
+        assert llm.batch(["a", "b", "c"], return_exceptions=True) == ["A", "B", "C"]
+        assert sorted(calls) == ["a", "b", "b", "c"]
+
+    def test_async_invoke_retries(self):
+        """Test the async path."""
+        calls = []
+        llm = resilient(flaky([StatusError(503)], calls))
+        llm.policy.base_delay = 0.0
+        assert asyncio.run(llm.ainvoke("a")) == "A"
+        assert len(calls) == 2
+
+    def test_processor_skips_default_fallback_when_unavailable(self):
+        """Test that an unavailable upstream is waited on once, not twice."""
+        calls = []
+        llm = resilient(flaky([StatusError(503)] * 10, calls), threshold=2, attempts=1)
+        processor = EnhancedProcessor(llm=llm)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
+            assert len(calls) == 1  # the default chain was not tried
+
+            processor.process_clipboard_content("other <#explain>")
+            assert llm.breaker.is_open
+            assert processor.process_clipboard_content("Helo again") == "Helo again"
+            assert "".join(processor.stream_clipboard_content("x <#explain>")) == "x"
+        assert len(calls) == 2
+
+    def test_processor_integration(self):
+        """Test ResilientLLM as the processor's LLM, including the default chain."""
+        processor = EnhancedProcessor(llm=ResilientLLM(FakeLLM()))
+        assert processor.process_clipboard_content("Helo wrld <#fix grammar>") == "Helo wrld"
+        assert processor.process_clipboard_content("Helo wrld") == "Helo wrld"
+        assert processor.process_many(["a <#explain>", "b"]) == ["a", "b"]
+        assert processor.model_identity.startswith("fake-llm")
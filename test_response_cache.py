@@ -0,0 +1,205 @@
+"""
+Unit tests for the response cache
+
+Tests cache keys, the in-memory LRU tier, the SQLite tier and the
+combined tiered cache.
+"""
+
+import os
+import threading
+import pytest
+from unittest.mock import patch
+from response_cache import (
+    LRUCache,
+    SQLiteCache,
+    ResponseCache,
+    make_cache_key,
+    normalize_command,
+    create_default_cache
+)
+
+
+class TestCacheKeys:
+    """Test suite for cache key construction."""
+    
+    def test_command_normalization(self):
+        """Test that commands are lowercased with whitespace collapsed."""
+        assert normalize_command("  Translate   to\tSpanish ") == "translate to spanish"
+        assert normalize_command("") == ""
+        assert normalize_command(None) == ""
+    
+    def test_equivalent_commands_share_key(self):
+        """Test that equivalent command spellings produce the same key."""
+        key1 = make_cache_key("translate", "translate to spanish", "prompt", "model")
+        key2 = make_cache_key("translate", "Translate  to Spanish", "prompt", "model")
+        assert key1 == key2
+    
+    def test_key_components_are_distinct(self):
+        """Test that every key component changes the key."""
+        base = make_cache_key("translate", "cmd", "prompt", "model")
+        assert make_cache_key("generic", "cmd", "prompt", "model") != base
+        assert make_cache_key("translate", "other", "prompt", "model") != base
+        assert make_cache_key("translate", "cmd", "other prompt", "model") != base
+        assert make_cache_key("translate", "cmd", "prompt", "other-model") != base
+
+
+class TestLRUCache:
+    """Test suite for the in-memory tier."""
+    
+    def test_get_and_set(self):
+        """Test basic storage and lookup."""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", "1")
+        assert cache.get("a") == "1"
+        assert cache.get("missing") is None
+    
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+        assert len(cache) == 2
+    
+    def test_ttl_expiry(self):
+        """Test that expired entries are not returned."""
+        cache = LRUCache(ttl=10)
+        with patch("response_cache.time.time", return_value=1000.0):
+            cache.set("a", "1")
+        with patch("response_cache.time.time", return_value=1005.0):
+            assert cache.get("a") == "1"
+        with patch("response_cache.time.time", return_value=1011.0):
+            assert cache.get("a") is None
+
+
+class TestSQLiteCache:
+    """Test suite for the persistent tier."""
+    
+    def test_persists_across_instances(self, tmp_path):
+        """Test that entries written by one instance are seen by another."""
+        path = str(tmp_path / "cache.sqlite3")
+        SQLiteCache(path).set("key", "value")
+        
+        assert SQLiteCache(path).get("key") == "value"
+    
+    def test_size_eviction(self, tmp_path):
+        """Test that the least recently accessed entries are evicted."""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl=None)
+        with patch("response_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.set("a", "1")
+            cache.set("b", "2")
+            cache.get("a")
+            cache.set("c", "3")
+        
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+    
+    def test_ttl_expiry(self, tmp_path):
+        """Test that expired entries are deleted on lookup."""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl=10)
+        with patch("response_cache.time.time", return_value=1000.0):
+            cache.set("a", "1")
+        with patch("response_cache.time.time", return_value=1020.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+    
+    def test_usable_from_multiple_threads(self, tmp_path):
+        """Test that each thread can read and write through its own connection."""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+        errors = []
+        
+        def worker(index):
+            try:
+                cache.set(f"key{index}", f"value{index}")
+                assert cache.get(f"key{index}") == f"value{index}"
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        assert len(cache) == 8
+
+
+class TestResponseCache:
+    """Test suite for the tiered cache."""
+    
+    def test_memory_hit_and_miss_counters(self):
+        """Test hit/miss accounting for the memory tier."""
+        cache = ResponseCache()
+        assert cache.get("key") is None
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+        
+        stats = cache.stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["stores"] == 1
+        assert stats["hit_rate"] == 0.5
+    
+    def test_disk_hit_is_promoted_to_memory(self, tmp_path):
+        """Test that a disk hit is copied into the memory tier."""
+        path = str(tmp_path / "cache.sqlite3")
+        ResponseCache(disk=SQLiteCache(path)).set("key", "value")
+        
+        cache = ResponseCache(disk=SQLiteCache(path))
+        assert cache.get("key") == "value"
+        assert cache.get("key") == "value"
+        
+        stats = cache.stats()
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+    
+    def test_create_default_cache_uses_env_path(self, tmp_path):
+        """Test that CLIPIQ_CACHE_PATH enables the disk tier at that location."""
+        path = str(tmp_path / "nested" / "cache.sqlite3")
+        with patch.dict(os.environ, {"CLIPIQ_CACHE_PATH": path}):
+            cache = create_default_cache()
+        
+        cache.set("key", "value")
+        assert os.path.exists(path)
+        # Owner-only directory and database file
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        assert os.stat(os.path.dirname(path)).st_mode & 0o077 == 0
+    
+    def test_create_default_cache_is_memory_only_by_default(self, tmp_path, monkeypatch):
+        """Test that nothing is written to disk unless persistence is requested."""
+        path = str(tmp_path / "clipiq" / "responses.sqlite3")
+        monkeypatch.setattr("response_cache.DEFAULT_CACHE_PATH", path)
+        monkeypatch.delenv("CLIPIQ_CACHE_PATH", raising=False)
+        monkeypatch.delenv("CLIPIQ_CACHE_DISK", raising=False)
+        cache = create_default_cache()
+        
+        assert cache.disk is None
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+        assert not os.path.exists(path)
+        
+        monkeypatch.setenv("CLIPIQ_CACHE_DISK", "1")
+        assert create_default_cache().disk.path == path
+        assert os.path.exists(path)
+    
+    def test_unusable_disk_path_keeps_memory_cache(self, tmp_path):
+        """Test that a cache file that cannot be created only disables the disk tier."""
+        blocker = tmp_path / "file"
+        blocker.write_text("not a directory")
+        with pytest.warns(UserWarning, match="Caching in memory only"):
+            cache = create_default_cache(str(blocker / "cache.sqlite3"))
+        
+        assert cache.disk is None
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+
+if __name__ == "__main__":
+    # Run the tests
+    pytest.main([__file__, "-v"])
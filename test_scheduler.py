@@ -0,0 +1,317 @@
+"""
+Unit tests for the priority scheduler
+
+Tests class ordering, shortest-job-first dispatch, starvation protection,
+per-class limits and the interactive reserve, admission control, the
+scheduled processor view and daemon integration.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import pytest
+from clipiq_client import ClipIQClient, DaemonError
+from clipiq_daemon import ClipIQDaemon
+from enhanced_processor import EnhancedProcessor
+from fake_llm import ConstantLatency, FakeLLM
+from scheduler import (
+    BULK,
+    INTERACTIVE,
+    NORMAL,
+    PriorityScheduler,
+    ScheduledProcessor,
+    SchedulerFullError
+)
+
+
+def wait_until(condition, timeout=2.0):
+    """Poll until condition() is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def start_waiters(scheduler, jobs, order):
+    """Queue (name, priority, size) jobs one by one; each records its name when granted."""
+    threads = []
+    for name, priority, size in jobs:
+        def run(name=name, priority=priority, size=size):
+            with scheduler.slot(priority, size):
+                order.append(name)
+        thread = threading.Thread(target=run)
+        expected = scheduler.queued() + 1
+        thread.start()
+        wait_until(lambda: scheduler.queued() == expected)
+        threads.append(thread)
+    return threads
+
+
+class TestPriorityScheduler:
+    """Test suite for PriorityScheduler."""
+
+    def test_higher_classes_dispatch_first(self):
+        """Test that a freed slot goes to the highest waiting class."""
+        scheduler = PriorityScheduler(max_concurrency=1)
+        order = []
+        holder = scheduler.acquire(INTERACTIVE)
+        threads = start_waiters(scheduler, [("bulk", BULK, 1), ("normal", NORMAL, 1),
+                                            ("interactive", INTERACTIVE, 1)], order)
+        scheduler.release(holder)
+        for thread in threads:
+            thread.join()
+        assert order == ["interactive", "normal", "bulk"]
+
+    def test_shortest_job_first_within_class(self):
+        """Test that smaller prompts of the same class go first."""
+        scheduler = PriorityScheduler(max_concurrency=1)
+        order = []
+        holder = scheduler.acquire(INTERACTIVE)
+        threads = start_waiters(scheduler, [("large", INTERACTIVE, 500), ("small", INTERACTIVE, 5),
+                                            ("medium", INTERACTIVE, 50)], order)
+        scheduler.release(holder)
+        for thread in threads:
+            thread.join()
+        assert order == ["small", "medium", "large"]
+
+    def test_starving_job_goes_next(self):
+        """Test that a job waiting past starvation_timeout beats smaller ones."""
+        now = [0.0]
+        scheduler = PriorityScheduler(max_concurrency=1, starvation_timeout=5.0, clock=lambda: now[0])
+        order = []
+        holder = scheduler.acquire(BULK)
+        threads = start_waiters(scheduler, [("large", BULK, 500)], order)
+        now[0] = 10.0
+        threads += start_waiters(scheduler, [("small", BULK, 5)], order)
+        scheduler.release(holder)
+        for thread in threads:
+            thread.join()
+        assert order == ["large", "small"]
+
+    def test_class_limits_and_interactive_reserve(self):
+        """Test that bulk work leaves slots free for interactive requests."""
+        scheduler = PriorityScheduler(max_concurrency=4, class_limits={NORMAL: 4, BULK: 4},
+                                      interactive_reserve=1)
+        tickets = [scheduler.acquire(BULK, timeout=0.1) for _ in range(3)]
+        with pytest.raises(TimeoutError):
+            scheduler.acquire(NORMAL, timeout=0.05)
+        interactive = scheduler.acquire(INTERACTIVE, timeout=0.05)
+        assert scheduler.running == 4
+        for ticket in tickets + [interactive]:
+            scheduler.release(ticket)
+
+        limited = PriorityScheduler(max_concurrency=8, class_limits={BULK: 2})
+        held = [limited.acquire(BULK) for _ in range(2)]
+        with pytest.raises(TimeoutError):
+            limited.acquire(BULK, timeout=0.05)
+        assert limited.stats()[BULK]["timed_out"] == 1
+        for ticket in held:
+            limited.release(ticket)
+
+    def test_full_queue_is_refused(self):
+        """Test admission control when a class queue is full."""
+        scheduler = PriorityScheduler(max_concurrency=1, max_queue={BULK: 1})
+        order = []
+        holder = scheduler.acquire(INTERACTIVE)
+        threads = start_waiters(scheduler, [("queued", BULK, 1)], order)
+        with pytest.raises(SchedulerFullError) as excinfo:
+            scheduler.acquire(BULK)
+        assert excinfo.value.priority == BULK
+        assert scheduler.stats()[BULK]["rejected"] == 1
+        scheduler.release(holder)
+        for thread in threads:
+            thread.join()
+        assert order == ["queued"]
+
+    def test_blocking_admission_waits_for_room(self):
+        """Test that block=True applies backpressure instead of raising."""
+        scheduler = PriorityScheduler(max_concurrency=1, max_queue={BULK: 1})
+        order = []
+        holder = scheduler.acquire(INTERACTIVE)
+        threads = start_waiters(scheduler, [("first", BULK, 1)], order)
+
+        def blocked_job():
+            with scheduler.slot(BULK, 1, block=True):
+                order.append("second")
+
+        blocked = threading.Thread(target=blocked_job)
+        blocked.start()
+        time.sleep(0.05)
+        assert blocked.is_alive() and scheduler.queued(BULK) == 1
+        scheduler.release(holder)
+        for thread in threads + [blocked]:
+            thread.join()
+        assert order == ["first", "second"]
+
+    def test_weighted_tickets_take_several_slots(self):
+        """Test that a batch ticket holds one slot per concurrent call."""
+        scheduler = PriorityScheduler(max_concurrency=4, class_limits={NORMAL: 4}, interactive_reserve=1)
+        batch = scheduler.acquire(NORMAL, weight=10)
+        # Capped at the three slots a normal request may use
+        assert batch.weight == 3 and scheduler.running == 3
+        with pytest.raises(TimeoutError):
+            scheduler.acquire(NORMAL, timeout=0.05)
+        scheduler.release(batch)
+        assert scheduler.running == 0
+
+        single = scheduler.acquire(NORMAL)
+        waiter = threading.Thread(target=lambda: scheduler.release(scheduler.acquire(NORMAL, weight=3)))
+        waiter.start()
+        wait_until(lambda: scheduler.queued(NORMAL) == 1)
+        # The waiting batch keeps the slots it needs from lower classes
+        with pytest.raises(TimeoutError):
+            scheduler.acquire(BULK, timeout=0.05)
+        scheduler.release(single)
+        waiter.join()
+        assert scheduler.stats()[NORMAL]["completed"] == 3
+
+    def test_async_acquire_waits_on_the_event_loop(self):
+        """Test aacquire ordering, timeouts and cancellation without blocking the loop."""
+        scheduler = PriorityScheduler(max_concurrency=1)
+
+        async def main():
+            holder = await scheduler.aacquire(INTERACTIVE)
+            order = []
+
+            async def job(name, priority):
+                async with scheduler.aslot(priority):
+                    order.append(name)
+
+            tasks = [asyncio.ensure_future(job("bulk", BULK))]
+            await asyncio.sleep(0.01)
+            tasks.append(asyncio.ensure_future(job("interactive", INTERACTIVE)))
+            cancelled = asyncio.ensure_future(job("cancelled", NORMAL))
+            await asyncio.sleep(0.01)
+            assert scheduler.queued() == 3
+            with pytest.raises(TimeoutError):
+                await scheduler.aacquire(NORMAL, timeout=0.02)
+            cancelled.cancel()
+            await asyncio.sleep(0.01)
+            assert scheduler.queued() == 2
+            scheduler.release(holder)
+            await asyncio.gather(*tasks)
+            return order
+
+        assert asyncio.run(main()) == ["interactive", "bulk"]
+        assert scheduler.running == 0
+        assert scheduler.stats()[NORMAL]["timed_out"] == 1
+
+    def test_stats(self):
+        """Test per-class counters."""
+        scheduler = PriorityScheduler(max_concurrency=2)
+        with scheduler.slot(NORMAL, 10):
+            assert scheduler.stats()[NORMAL]["running"] == 1
+        stats = scheduler.stats()
+        assert stats["running"] == 0
+        assert stats[NORMAL]["admitted"] == stats[NORMAL]["completed"] == 1
+        with pytest.raises(ValueError):
+            scheduler.acquire("urgent")
+
+
+class TestScheduledProcessor:
+    """Test suite for ScheduledProcessor."""
+
+    def test_views_share_processor_and_scheduler(self):
+        """Test processing, streaming and delegation through scheduled views."""
+        scheduler = PriorityScheduler(max_concurrency=2)
+        processor = EnhancedProcessor(llm=FakeLLM())
+        bulk = ScheduledProcessor(processor, scheduler, BULK, block=True)
+        interactive = bulk.with_priority(INTERACTIVE)
+
+        assert interactive.process_clipboard_content("Helo wrld") == "Helo wrld"
+        assert bulk.process_with_specific_command("Hola", "translate to english") == "Hola"
+        stream = interactive.stream_clipboard_content("Helo wrld and more words")
+        first = next(stream)
+        assert scheduler.running == 1
+        assert first + "".join(stream) == "Helo wrld and more words"
+        assert scheduler.running == 0
+        assert bulk.process_many(["a", "b"]) == ["a", "b"]
+        assert interactive.get_command_category("summarize this") == "summarize"
+        assert scheduler.stats()[INTERACTIVE]["completed"] == 2
+
+        async def run_async():
+            return (await interactive.aprocess_clipboard_content("Helo wrld"),
+                    await bulk.aprocess_with_specific_command("Hola", "translate to english"))
+
+        assert asyncio.run(run_async()) == ("Helo wrld", "Hola")
+        assert scheduler.stats()[INTERACTIVE]["completed"] == 3
+        assert scheduler.stats()[BULK]["completed"] == 3
+
+    def test_process_many_takes_a_slot_per_concurrent_call(self):
+        """Test that a batch holds as many slots as calls it runs at once."""
+        scheduler = PriorityScheduler(max_concurrency=8)
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(0.05)), cache=None)
+        normal = ScheduledProcessor(processor, scheduler, NORMAL)
+        seen = []
+        original = processor.process_many
+
+        def spy(texts, max_concurrency=None, **kwargs):
+            seen.append((scheduler.running, max_concurrency))
+            return original(texts, max_concurrency=max_concurrency, **kwargs)
+
+        processor.process_many = spy
+        assert normal.process_many([f"t{i}" for i in range(20)]) == [f"t{i}" for i in range(20)]
+        assert normal.process_many(["a", "b", "c"], max_concurrency=2) == ["a", "b", "c"]
+        # Normal requests may use 6 of 8 slots
+        assert seen == [(6, 6), (2, 2)]
+
+    def test_interactive_latency_under_bulk_load(self):
+        """Test that interactive requests do not queue behind saturated bulk work."""
+        scheduler = PriorityScheduler(max_concurrency=4)
+        processor = EnhancedProcessor(llm=FakeLLM(latency=ConstantLatency(0.05)), cache=None)
+        bulk = ScheduledProcessor(processor, scheduler, BULK, block=True)
+        interactive = bulk.with_priority(INTERACTIVE)
+
+        workers = [threading.Thread(target=bulk.process_clipboard_content, args=(f"bulk {i}",))
+                   for i in range(40)]
+        for worker in workers:
+            worker.start()
+        wait_until(lambda: scheduler.queued(BULK) > 20)
+
+        latencies = []
+        bulk_start = time.perf_counter()
+        for i in range(3):
+            start = time.perf_counter()
+            interactive.process_clipboard_content(f"press {i}")
+            latencies.append(time.perf_counter() - start)
+        for worker in workers:
+            worker.join()
+        bulk_elapsed = time.perf_counter() - bulk_start
+
+        # The queued bulk jobs take ~1 s to drain; interactive presses only pay their
+        # own call instead of waiting behind them (relative, so slow machines pass too)
+        assert sum(latencies) < bulk_elapsed / 2
+        assert scheduler.stats()[BULK]["completed"] == 40
+
+
+class TestDaemonScheduling:
+    """Test suite for priorities in the daemon."""
+
+    @pytest.fixture
+    def socket_path(self):
+        directory = tempfile.mkdtemp(prefix="clipiq-")
+        yield os.path.join(directory, "daemon.sock")
+        os.rmdir(directory)
+
+    def test_priority_requests_and_backpressure(self, socket_path):
+        """Test priority validation, scheduler stats and 503 when a queue is full."""
+        scheduler = PriorityScheduler(max_concurrency=1, max_queue={BULK: 0})
+        processor = EnhancedProcessor(llm=FakeLLM())
+        with ClipIQDaemon(processor=processor, port=0, socket_path=socket_path,
+                          scheduler=scheduler) as daemon:
+            client = ClipIQClient(url=daemon.base_url)
+            assert client.process("Helo wrld", priority=INTERACTIVE) == "Helo wrld"
+            assert "".join(client.stream("Helo wrld", priority=NORMAL)) == "Helo wrld"
+            with pytest.raises(DaemonError, match="400"):
+                client.process("Helo", priority="urgent")
+            with pytest.raises(DaemonError, match="503"):
+                client.process("Helo", priority=BULK)
+            with pytest.raises(DaemonError, match="503"):
+                list(client.stream("Helo", priority=BULK))
+
+            stats = client.stats()["scheduler"]
+            assert stats[INTERACTIVE]["completed"] == 1
+            assert stats[NORMAL]["completed"] == 1
+            assert stats[BULK]["rejected"] == 2
@@ -0,0 +1,169 @@
+"""
+Unit tests for single-flight deduplication
+
+Tests sharing of concurrent calls, error propagation, async leaders and
+followers, and deduplication inside EnhancedProcessor.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from enhanced_processor import EnhancedProcessor
+from fake_llm import ConstantLatency, FakeLLM
+from single_flight import SingleFlight
+
+
+def run_concurrently(function, count):
+    """Call function from count threads at once and return the results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        results[index] = function()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test that only the leader runs the function."""
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+
+        results = run_concurrently(lambda: flight.do("key", slow), 8)
+        assert results == ["result"] * 8
+        assert len(calls) == 1
+        assert flight.stats() == {"leaders": 1, "shared": 7, "batch_collapsed": 0, "in_flight": 0}
+
+    def test_finished_calls_are_not_reused(self):
+        """Test that sequential calls run again (nothing is cached)."""
+        flight = SingleFlight()
+        counter = iter(range(10))
+        assert flight.do("key", lambda: next(counter)) == 0
+        assert flight.do("key", lambda: next(counter)) == 1
+        assert flight.do("other", lambda: next(counter)) == 2
+
+    def test_errors_reach_every_caller(self):
+        """Test that followers receive the leader's exception."""
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                flight.do("key", failing)
+            except ValueError as e:
+                return str(e)
+
+        assert run_concurrently(call, 4) == ["boom"] * 4
+        assert flight.stats()["leaders"] == 1
+
+    def test_async_followers(self):
+        """Test sharing between tasks, and that a cancelled follower leaves the leader running."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0)
+            impatient = asyncio.ensure_future(flight.ado("key", slow))
+            followers = [flight.ado("key", slow) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            impatient.cancel()
+            return await asyncio.gather(leader, *followers)
+
+        assert asyncio.run(main()) == ["result"] * 4
+        assert len(calls) == 1
+        assert flight.stats()["shared"] == 4
+
+    def test_async_leader_cancellation(self):
+        """Test that followers see the leader's cancellation."""
+        flight = SingleFlight()
+
+        async def main():
+            leader = asyncio.ensure_future(flight.ado("key", lambda: asyncio.sleep(1)))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado("key", lambda: asyncio.sleep(1)))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await follower
+
+        asyncio.run(main())
+        assert flight.stats()["in_flight"] == 0
+
+
+class TestProcessorDeduplication:
+    """Test suite for deduplication in EnhancedProcessor."""
+
+    def test_identical_concurrent_requests_call_llm_once(self):
+        """Test command and default requests under concurrency."""
+        llm = FakeLLM(latency=ConstantLatency(0.1))
+        processor = EnhancedProcessor(llm=llm, cache=None)
+
+        results = run_concurrently(lambda: processor.process_clipboard_content("Helo wrld <#fix>"), 6)
+        assert results == ["Helo wrld"] * 6
+        assert llm.calls == 1
+
+        results = run_concurrently(lambda: processor.process_clipboard_content("Helo wrld"), 6)
+        assert results == ["Helo wrld"] * 6
+        assert llm.calls == 2
+        assert processor.single_flight.stats()["shared"] == 10
+
+    def test_different_commands_are_not_shared(self):
+        """Test that the command is part of the key."""
+        llm = FakeLLM(latency=ConstantLatency(0.05))
+        processor = EnhancedProcessor(llm=llm, cache=None)
+        commands = iter(["fix", "summarize", "explain"])
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                command = next(commands)
+            return processor.process_with_specific_command("text", command)
+
+        run_concurrently(call, 3)
+        assert llm.calls == 3
+
+    def test_async_requests_share_one_call(self):
+        """Test deduplication on the async path."""
+        llm = FakeLLM(latency=ConstantLatency(0.05))
+        processor = EnhancedProcessor(llm=llm, cache=None)
+
+        async def main():
+            return await asyncio.gather(*(processor.aprocess_clipboard_content("Hola <#translate to english>")
+                                          for _ in range(5)))
+
+        assert asyncio.run(main()) == ["Hola"] * 5
+        assert llm.calls == 1
+
+    def test_process_many_collapses_duplicates(self):
+        """Test that duplicate batch items are sent once and fanned back out."""
+        llm = FakeLLM()
+        processor = EnhancedProcessor(llm=llm, cache=None)
+        texts = ["a <#fix>", "b", "a <#fix>", "b", "a <#summarize>", "b", ""]
+
+        assert processor.process_many(texts) == ["a", "b", "a", "b", "a", "b", ""]
+        assert llm.calls == 3
+        assert processor.single_flight.stats()["batch_collapsed"] == 3
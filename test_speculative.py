@@ -0,0 +1,136 @@
+"""
+Unit tests for SpeculativeProcessor
+
+Tests background pre-processing, claims of ready and in-flight results,
+the per-minute budget, the length cap and eviction accounting.
+"""
+
+import threading
+from speculative import SpeculativeProcessor
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSpeculativeProcessor:
+    """Test suite for SpeculativeProcessor."""
+
+    def test_claim_ready_result(self):
+        """Test that a finished speculation is handed out and counted as a hit."""
+        speculator = SpeculativeProcessor(str.upper)
+        assert speculator.speculate("hello") is True
+        assert speculator.lookup("hello").result(timeout=5) == "HELLO"
+
+        future = speculator.claim("hello")
+        assert future.result() == "HELLO"
+        assert speculator.stats()["hits_ready"] == 1
+        assert speculator.claim("hello") is None  # claimed only once
+        speculator.shutdown()
+
+    def test_claim_in_flight_result(self):
+        """Test that an unfinished speculation can be claimed and awaited."""
+        release = threading.Event()
+
+        def slow(text):
+            release.wait(5)
+            return text[::-1]
+
+        speculator = SpeculativeProcessor(slow)
+        speculator.speculate("abc")
+        future = speculator.claim("abc")
+        release.set()
+
+        assert future.result(timeout=5) == "cba"
+        stats = speculator.stats()
+        assert stats["hits_in_flight"] == 1
+        assert stats["payoff_rate"] == 1.0
+        speculator.shutdown()
+
+    def test_miss(self):
+        """Test that claiming unspeculated text counts a miss."""
+        speculator = SpeculativeProcessor(str.upper)
+        assert speculator.claim("never copied") is None
+        assert speculator.stats()["misses"] == 1
+        speculator.shutdown()
+
+    def test_budget_per_minute(self):
+        """Test that the call budget is enforced over a sliding minute."""
+        clock = FakeClock()
+        speculator = SpeculativeProcessor(str.upper, max_calls_per_minute=2, max_entries=10, clock=clock)
+
+        assert speculator.speculate("a")
+        assert speculator.speculate("b")
+        assert speculator.speculate("c") is False
+        assert speculator.stats()["skipped_budget"] == 1
+
+        clock.now = 61.0
+        assert speculator.speculate("c")
+        speculator.shutdown()
+
+    def test_same_text_is_not_speculated_twice(self):
+        """Test that repeated copies of one text cost a single call."""
+        calls = []
+        speculator = SpeculativeProcessor(lambda text: calls.append(text) or text)
+        speculator.speculate("same")
+        speculator.speculate("same")
+        speculator.lookup("same").result(timeout=5)
+
+        assert calls == ["same"]
+        assert speculator.stats()["started"] == 1
+        speculator.shutdown()
+
+    def test_length_cap_and_blank_text(self):
+        """Test that long or blank text is not speculated on."""
+        speculator = SpeculativeProcessor(str.upper, max_chars=5)
+        assert speculator.speculate("too long text") is False
+        assert speculator.speculate("   ") is False
+        assert speculator.stats()["skipped_length"] == 1
+        assert speculator.stats()["started"] == 0
+        speculator.shutdown()
+
+    def test_eviction_cancels_or_wastes(self):
+        """Test that evicted speculations are cancelled if queued, wasted if run."""
+        release = threading.Event()
+        speculator = SpeculativeProcessor(lambda text: release.wait(5) and text, max_entries=1)
+
+        speculator.speculate("running")   # occupies the single worker
+        speculator.speculate("queued")    # evicts 'running' (already started: wasted)
+        speculator.speculate("latest")    # evicts 'queued' (not started: cancelled)
+        release.set()
+
+        assert speculator.lookup("latest").result(timeout=5) == "latest"
+        stats = speculator.stats()
+        assert stats["wasted"] == 1
+        assert stats["cancelled"] == 1
+        speculator.shutdown()
+
+    def test_cancelled_speculation_refunds_its_own_call(self):
+        """Test that a cancelled eviction gives back the budget entry it was charged."""
+        clock = FakeClock()
+        release = threading.Event()
+        speculator = SpeculativeProcessor(lambda text: release.wait(5) and text, max_calls_per_minute=3,
+                                          max_entries=1, clock=clock)
+
+        speculator.speculate("running")   # t=0, occupies the single worker
+        clock.now = 10.0
+        speculator.speculate("queued")    # t=10
+        clock.now = 20.0
+        speculator.speculate("latest")    # t=20, evicts 'queued' before it started
+        release.set()
+        speculator.lookup("latest").result(timeout=5)
+        assert speculator.stats()["cancelled"] == 1
+
+        # The t=10 call was refunded; the t=20 one still counts until t=80
+        clock.now = 75.0
+        speculator.max_entries = 10
+        assert speculator.speculate("one")
+        assert speculator.speculate("two")
+        assert speculator.speculate("three") is False
+        speculator.shutdown()
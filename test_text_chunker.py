@@ -0,0 +1,87 @@
+"""
+Unit tests for TextChunker
+
+Tests splitting on paragraph/sentence/word boundaries and lossless
+reassembly with the original whitespace.
+"""
+
+import pytest
+from text_chunker import TextChunker, ChunkedText, split_text
+
+
+class TestTextChunker:
+    """Test suite for TextChunker class."""
+    
+    def test_small_text_is_single_chunk(self):
+        """Test that text under the limit is not split."""
+        chunked = TextChunker(100).split("  Short text.  \n")
+        
+        assert chunked.chunks == ["Short text."]
+        assert chunked.separators == ["  ", "  \n"]
+        assert chunked.reassemble(chunked.chunks) == "  Short text.  \n"
+    
+    def test_splits_on_paragraphs_first(self):
+        """Test that paragraphs are preferred as split boundaries."""
+        text = "First paragraph here.\n\nSecond paragraph here.\n\n\nThird one."
+        chunked = TextChunker(25).split(text)
+        
+        assert chunked.chunks == ["First paragraph here.", "Second paragraph here.", "Third one."]
+        assert chunked.separators == ["", "\n\n", "\n\n\n", ""]
+    
+    def test_splits_long_paragraph_on_sentences(self):
+        """Test that oversized paragraphs are split on sentence boundaries."""
+        text = "One sentence. Two sentence! Three sentence?"
+        chunked = TextChunker(20).split(text)
+        
+        assert chunked.chunks == ["One sentence.", "Two sentence!", "Three sentence?"]
+    
+    def test_packs_small_units_together(self):
+        """Test that adjacent small units are merged up to the limit."""
+        text = "A. B. C. D."
+        chunked = TextChunker(5).split(text)
+        
+        assert chunked.chunks == ["A. B.", "C. D."]
+        assert chunked.reassemble(chunked.chunks) == text
+    
+    def test_hard_split_for_unbreakable_words(self):
+        """Test that a single oversized word is split by characters."""
+        chunked = TextChunker(4).split("abcdefghij")
+        
+        assert chunked.chunks == ["abcd", "efgh", "ij"]
+        assert chunked.reassemble(chunked.chunks) == "abcdefghij"
+    
+    def test_reassemble_preserves_whitespace_with_processed_chunks(self):
+        """Test that processed chunks are joined with the original separators."""
+        text = "\n helo wrld.\n\n  teh end. \n"
+        chunked = TextChunker(12).split(text)
+        
+        processed = [chunk.upper() for chunk in chunked.chunks]
+        assert chunked.reassemble(processed) == "\n HELO WRLD.\n\n  TEH END. \n"
+    
+    def test_custom_length_function(self):
+        """Test measuring chunk size with a custom length function."""
+        word_count = lambda text: len(text.split())
+        chunked = TextChunker(2, length_function=word_count).split("a b c d e")
+        
+        assert chunked.chunks == ["a b", "c d", "e"]
+    
+    def test_empty_and_whitespace_input(self):
+        """Test that empty or whitespace-only text yields no chunks."""
+        assert len(split_text("")) == 0
+        whitespace = split_text("  \n ")
+        assert len(whitespace) == 0
+        assert whitespace.reassemble([]) == "  \n "
+    
+    def test_invalid_arguments(self):
+        """Test that invalid sizes and mismatched lists are rejected."""
+        with pytest.raises(ValueError):
+            TextChunker(0)
+        with pytest.raises(ValueError):
+            ChunkedText(["a"], [""])
+        with pytest.raises(ValueError):
+            split_text("a b", 1).reassemble(["a"])
+
+
+if __name__ == "__main__":
+    # Run the tests
+    pytest.main([__file__, "-v"])
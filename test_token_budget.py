@@ -0,0 +1,146 @@
+"""
+Unit tests for token budgets
+
+Tests context window lookup, token counting, the send/split/reject
+decision, its use inside EnhancedProcessor and the batch dry run.
+"""
+
+import json
+import warnings
+import pytest
+from batch_processor import main
+from enhanced_processor import EnhancedProcessor
+from fake_llm import FakeLLM
+from token_budget import (
+    DEFAULT_CONTEXT_WINDOW,
+    BudgetDecision,
+    PromptBudget,
+    TokenBudgetError,
+    TokenCounter,
+    context_window,
+    estimate_tokens
+)
+
+
+def make_budget(context_tokens, **kwargs):
+    """Budget with deterministic (estimated) counts and no completion reserve."""
+    return PromptBudget("test-model", counter=TokenCounter(use_tiktoken=False),
+                        context_tokens=context_tokens, output_tokens=0, **kwargs)
+
+
+LONG_TEXT = " ".join(f"Sentence number {i} has a few words." for i in range(60))
+
+
+class TestTokenBudget:
+    """Test suite for TokenCounter and PromptBudget."""
+
+    def test_context_window_lookup(self):
+        """Test exact, prefix and unknown model names."""
+        assert context_window("gpt-4") == 8192
+        assert context_window("gpt-4-32k-0613") == 32768
+        assert context_window("gpt-4o-mini-2024-07-18") == 128000
+        assert context_window("local-llama") == DEFAULT_CONTEXT_WINDOW
+        assert context_window(None) == DEFAULT_CONTEXT_WINDOW
+
+    def test_estimated_counts(self):
+        """Test the byte-based estimate used without tiktoken."""
+        counter = TokenCounter(use_tiktoken=False)
+        assert counter.exact is False
+        assert counter.count("") == 0
+        assert counter.count("abcd") == 1
+        assert counter.count("abcde") == 2
+        assert estimate_tokens("日本") == 2  # 6 UTF-8 bytes
+
+    def test_send_when_prompt_fits(self):
+        """Test that a small prompt is sent as-is."""
+        decision = make_budget(1000).decide("Fix: hello", "hello")
+        assert decision.action == BudgetDecision.SEND
+        assert decision.prompt_tokens == 3
+
+    def test_split_leaves_room_for_instructions(self):
+        """Test the chunk size of an oversized prompt."""
+        budget = make_budget(200)
+        prompt = "x" * 400 + LONG_TEXT
+        decision = budget.decide(prompt, LONG_TEXT)
+        assert decision.action == BudgetDecision.SPLIT
+        overhead = budget.counter.count(prompt) - budget.counter.count(LONG_TEXT)
+        assert decision.chunk_tokens <= 200 - overhead
+        assert decision.chunks >= 2
+
+    def test_reject_when_instructions_fill_the_budget(self):
+        """Test rejection when the template alone nearly fills the window."""
+        budget = make_budget(100)
+        decision = budget.decide("x" * 400 + "text", "text")
+        assert decision.action == BudgetDecision.REJECT
+        assert "no room" in decision.reason
+        with pytest.raises(TokenBudgetError):
+            budget.check("x" * 400 + "text", "text")
+
+    def test_reject_when_too_many_chunks(self):
+        """Test rejection when splitting needs more calls than allowed."""
+        decision = make_budget(100, max_chunks=2).decide(LONG_TEXT, LONG_TEXT)
+        assert decision.action == BudgetDecision.REJECT
+        assert decision.to_dict()["calls"] == 0
+
+    def test_max_prompt_tokens_caps_limit(self):
+        """Test that the cost cap lowers the per-call limit."""
+        assert make_budget(4096, max_prompt_tokens=500).limit == 500
+
+    def test_for_llm_reads_model(self):
+        """Test that the budget follows the LLM's model name."""
+        budget = PromptBudget.for_llm(FakeLLM(model_name="gpt-4"))
+        assert budget.model == "gpt-4"
+        assert budget.limit == 8192 - 256
+
+
+class TestProcessorBudget:
+    """Test suite for token budgets inside EnhancedProcessor."""
+
+    def test_oversized_command_is_split(self):
+        """Test that an oversized command prompt is processed in chunks."""
+        llm = FakeLLM()
+        processor = EnhancedProcessor(llm=llm, chunk_size=None, token_budget=make_budget(300))
+        result = processor.process_clipboard_content(f"{LONG_TEXT} <#fix grammar>")
+        assert result == LONG_TEXT
+        assert llm.calls > 1
+
+    def test_oversized_default_is_split(self):
+        """Test default (typo fixing) splitting, blocking and streamed."""
+        llm = FakeLLM()
+        processor = EnhancedProcessor(llm=llm, chunk_size=None, token_budget=make_budget(300))
+        assert processor.process_clipboard_content(LONG_TEXT) == LONG_TEXT
+        assert "".join(processor.stream_clipboard_content(LONG_TEXT)) == LONG_TEXT
+        assert processor.process_many([LONG_TEXT, "short"]) == [LONG_TEXT, "short"]
+
+    def test_rejected_prompt_skips_llm(self):
+        """Test that a rejected prompt returns the content without any LLM call."""
+        llm = FakeLLM()
+        processor = EnhancedProcessor(llm=llm, chunk_size=None,
+                                      token_budget=make_budget(300, max_chunks=1))
+        with pytest.warns(UserWarning, match="select a shorter passage"):
+            assert processor.process_clipboard_content(f"{LONG_TEXT} <#explain>") == LONG_TEXT
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            assert "".join(processor.stream_clipboard_content(f"{LONG_TEXT} <#explain>")) == LONG_TEXT
+        assert llm.calls == 0
+
+
+class TestDryRun:
+    """Test suite for `clipiq batch --dry-run`."""
+
+    def test_dry_run_reports_tokens(self, tmp_path, capsys):
+        """Test per-record estimates and totals without an LLM."""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(
+            json.dumps({"id": "short", "text": "helo <#fix>"}) + "\n"
+            + json.dumps({"id": "long", "text": LONG_TEXT * 10}) + "\n"
+        )
+        assert main(["--dry-run", "--max-prompt-tokens", "500", str(corpus)]) == 0
+
+        captured = capsys.readouterr()
+        lines = [json.loads(line) for line in captured.out.splitlines()]
+        assert [line["id"] for line in lines] == ["short", "long"]
+        assert lines[0]["action"] == "send" and lines[0]["category"] == "fix"
+        assert lines[1]["action"] == "split" and lines[1]["calls"] > 1
+        assert "2 records" in captured.err
+        assert "1 split" in captured.err
@@ -0,0 +1,193 @@
+"""
+Text Chunker for ClipIQ
+
+Splits large clipboard contents into chunks on paragraph and sentence
+boundaries so they can be processed independently, and puts processed
+chunks back together with the original whitespace between them.
+"""
+
+import re
+from typing import Callable, Optional
+
+
+# Boundaries tried in order, from coarsest to finest
+PARAGRAPH_PATTERN = re.compile(r'\s*\n[ \t]*\n\s*')
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+WORD_PATTERN = re.compile(r'\s+')
+
+
+def _default_length(text: str) -> int:
+    """Measure chunk size in characters."""
+    return len(text)
+
+
+class ChunkedText:
+    """
+    A text split into processable chunks and the separators between them.
+
+    The original text is ``separators[0] + chunks[0] + separators[1] + ...
+    + chunks[-1] + separators[-1]``.
+    """
+
+    def __init__(self, chunks: list[str], separators: list[str]):
+        """
+        Initialize the chunked text.
+
+        Args:
+            chunks: Text chunks to process
+            separators: Whitespace around and between chunks (len(chunks) + 1 items)
+        """
+        if len(separators) != len(chunks) + 1:
+            raise ValueError("separators must have exactly one more item than chunks")
+        self.chunks = chunks
+        self.separators = separators
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def reassemble(self, processed: list[str]) -> str:
+        """
+        Join processed chunks back together with the original separators.
+
+        Args:
+            processed: Processed chunks, in the same order as self.chunks
+
+        Returns:
+            Reassembled text
+        """
+        if len(processed) != len(self.chunks):
+            raise ValueError("processed must have the same number of items as chunks")
+
+        parts = [self.separators[0]]
+        for chunk, separator in zip(processed, self.separators[1:]):
+            parts.append(chunk)
+            parts.append(separator)
+        return "".join(parts)
+
+
+class TextChunker:
+    """Splits text into chunks no larger than a maximum size."""
+
+    def __init__(self, max_chunk_size: int = 4000,
+                 length_function: Optional[Callable[[str], int]] = None):
+        """
+        Initialize the chunker.
+
+        Args:
+            max_chunk_size: Maximum chunk size, measured by length_function
+            length_function: Function measuring text size (default: characters)
+        """
+        if max_chunk_size < 1:
+            raise ValueError("max_chunk_size must be at least 1")
+        self.max_chunk_size = max_chunk_size
+        self.length_function = length_function or _default_length
+
+    def split(self, text: str) -> ChunkedText:
+        """
+        Split text into chunks on the coarsest boundary that fits.
+
+        Paragraphs are kept together where possible, then sentences, then
+        words. A single word larger than the limit is split by characters.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            ChunkedText with the chunks and the separators between them
+        """
+        if not text:
+            return ChunkedText([], [text or ""])
+
+        body = text.strip()
+        leading = text[:len(text) - len(text.lstrip())]
+        trailing = text[len(leading) + len(body):]
+        if not body:
+            return ChunkedText([], [text])
+
+        units, gaps = self._split_units(body, [PARAGRAPH_PATTERN, SENTENCE_PATTERN, WORD_PATTERN])
+        chunks, separators = self._pack(units, gaps)
+        return ChunkedText(chunks, [leading] + separators + [trailing])
+
+    def _split_units(self, text: str, patterns: list[re.Pattern]) -> tuple[list[str], list[str]]:
+        """
+        Recursively split text into units that each fit the size limit.
+
+        Returns:
+            Tuple of (units, gaps) where gaps[i] separates units[i] and units[i + 1]
+        """
+        if self.length_function(text) <= self.max_chunk_size:
+            return [text], []
+
+        if not patterns:
+            return self._split_hard(text)
+
+        pattern, rest = patterns[0], patterns[1:]
+        pieces = []
+        separators = []
+        position = 0
+        for match in pattern.finditer(text):
+            if match.start() == 0 or match.end() == len(text):
+                continue
+            pieces.append(text[position:match.start()])
+            separators.append(match.group())
+            position = match.end()
+        pieces.append(text[position:])
+
+        units: list[str] = []
+        gaps: list[str] = []
+        for index, piece in enumerate(pieces):
+            piece_units, piece_gaps = self._split_units(piece, rest)
+            if index > 0:
+                gaps.append(separators[index - 1])
+            units.extend(piece_units)
+            gaps.extend(piece_gaps)
+        return units, gaps
+
+    def _split_hard(self, text: str) -> tuple[list[str], list[str]]:
+        """Split text with no usable boundary into fixed-size pieces."""
+        units = []
+        start = 0
+        while start < len(text):
+            # Binary search for the longest prefix that fits (at least one character)
+            low, high = start + 1, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.length_function(text[start:middle]) <= self.max_chunk_size:
+                    low = middle
+                else:
+                    high = middle - 1
+            units.append(text[start:low])
+            start = low
+        return units, [""] * (len(units) - 1)
+
+    def _pack(self, units: list[str], gaps: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Greedily merge consecutive units into chunks up to the size limit.
+
+        Returns:
+            Tuple of (chunks, separators between chunks)
+        """
+        chunks = [units[0]]
+        separators = []
+        for unit, gap in zip(units[1:], gaps):
+            candidate = chunks[-1] + gap + unit
+            if self.length_function(candidate) <= self.max_chunk_size:
+                chunks[-1] = candidate
+            else:
+                separators.append(gap)
+                chunks.append(unit)
+        return chunks, separators
+
+
+def split_text(text: str, max_chunk_size: int = 4000) -> ChunkedText:
+    """
+    Convenience function to split text into chunks.
+
+    Args:
+        text: Text to split
+        max_chunk_size: Maximum chunk size in characters
+
+    Returns:
+        ChunkedText with the chunks and separators
+    """
+    return TextChunker(max_chunk_size).split(text)
@@ -0,0 +1,359 @@
+"""
+Token Budgets for ClipIQ
+
+Counts the tokens of rendered prompts locally and decides, before any
+LLM call, whether a prompt is sent as-is, split into token-sized chunks
+that are processed in parallel, or rejected with a clear message. Context
+windows come from a per-model table; tiktoken is used when available, with
+a conservative bytes-per-token estimate otherwise.
+
+estimate_corpus backs `clipiq batch --dry-run`, which reports token counts
+for a whole corpus without calling the LLM.
+"""
+
+import math
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional
+
+DEFAULT_MODEL = "gpt-3.5-turbo-instruct"
+
+# Context window (prompt + completion tokens) per model; names not listed
+# here match the longest listed prefix ("gpt-4o-mini-2024-07-18" -> "gpt-4o-mini")
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo-instruct": 4096,
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4.1": 1047576,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "davinci-002": 16384,
+    "babbage-002": 16384,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Completion tokens reserved when the LLM does not say (LangChain's OpenAI default)
+DEFAULT_OUTPUT_TOKENS = 256
+
+# Estimate used without tiktoken; counting UTF-8 bytes keeps it conservative for non-English text
+BYTES_PER_TOKEN = 4
+
+# Chunks are sized this many tokens below the limit, since text can tokenize
+# slightly differently once cut at a chunk boundary
+CHUNK_MARGIN_TOKENS = 8
+
+
+def context_window(model: Optional[str]) -> int:
+    """
+    Look up the context window of a model.
+
+    Args:
+        model: Model name (None for unknown)
+
+    Returns:
+        Context window in tokens (DEFAULT_CONTEXT_WINDOW for unknown models)
+    """
+    if not model:
+        return DEFAULT_CONTEXT_WINDOW
+    if model in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model]
+    prefixes = [name for name in MODEL_CONTEXT_WINDOWS if model.startswith(name)]
+    return MODEL_CONTEXT_WINDOWS[max(prefixes, key=len)] if prefixes else DEFAULT_CONTEXT_WINDOW
+
+
+@lru_cache(maxsize=None)
+def _tiktoken_encoding(model: str) -> Any:
+    """Load (once per model) the tiktoken encoding, or None if it is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Encodings are downloaded on first use and may be unreachable offline
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate a token count without a tokenizer (rounds up)."""
+    return math.ceil(len(text.encode("utf-8", "surrogatepass")) / BYTES_PER_TOKEN)
+
+
+class TokenCounter:
+    """Counts tokens for one model."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, use_tiktoken: bool = True):
+        """
+        Initialize the counter.
+
+        Args:
+            model: Model whose tokenizer is used
+            use_tiktoken: False to always use the byte-based estimate
+        """
+        self.model = model
+        self._encoding = _tiktoken_encoding(model) if use_tiktoken else None
+
+    @property
+    def exact(self) -> bool:
+        """True when counts come from the model's tokenizer rather than an estimate."""
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in text.
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            Token count
+        """
+        if not text:
+            return 0
+        if self._encoding is None:
+            return estimate_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class TokenBudgetError(ValueError):
+    """A prompt is too large to send, even split into chunks."""
+
+
+class BudgetDecision:
+    """Outcome of checking a prompt against the budget."""
+
+    SEND = "send"
+    SPLIT = "split"
+    REJECT = "reject"
+
+    def __init__(self, action: str, prompt_tokens: int, limit: int,
+                 chunk_tokens: Optional[int] = None, chunks: int = 1, reason: str = ""):
+        """
+        Initialize the decision.
+
+        Args:
+            action: SEND, SPLIT or REJECT
+            prompt_tokens: Tokens in the rendered prompt
+            limit: Prompt tokens allowed per call
+            chunk_tokens: Content tokens per chunk (SPLIT only)
+            chunks: Estimated number of LLM calls
+            reason: Explanation shown to the user (REJECT and SPLIT)
+        """
+        self.action = action
+        self.prompt_tokens = prompt_tokens
+        self.limit = limit
+        self.chunk_tokens = chunk_tokens
+        self.chunks = chunks
+        self.reason = reason
+
+    def to_dict(self) -> dict:
+        """Describe the decision."""
+        return {
+            "action": self.action,
+            "prompt_tokens": self.prompt_tokens,
+            "limit": self.limit,
+            "chunk_tokens": self.chunk_tokens,
+            "calls": self.chunks if self.action != self.REJECT else 0,
+            "reason": self.reason,
+        }
+
+
+class PromptBudget:
+    """Decides whether a rendered prompt is sent, split or rejected."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, counter: Optional[TokenCounter] = None,
+                 context_tokens: Optional[int] = None, output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+                 max_prompt_tokens: Optional[int] = None, max_chunks: int = 32,
+                 min_chunk_tokens: int = 64):
+        """
+        Initialize the budget.
+
+        Args:
+            model: Model name used for the context window and tokenizer
+            counter: Token counter (default: TokenCounter(model))
+            context_tokens: Context window override (default: looked up for model)
+            output_tokens: Tokens reserved for the completion
+            max_prompt_tokens: Optional cost cap on prompt tokens per call
+            max_chunks: Content needing more chunks than this is rejected
+            min_chunk_tokens: Splitting is refused if chunks would be smaller than this
+        """
+        self.model = model
+        self.counter = counter or TokenCounter(model)
+        self.context_tokens = context_tokens or context_window(model)
+        self.output_tokens = output_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_chunks = max_chunks
+        self.min_chunk_tokens = min_chunk_tokens
+
+    @classmethod
+    def for_llm(cls, llm: Any, **kwargs: Any) -> "PromptBudget":
+        """
+        Build a budget from an LLM's model name and completion size.
+
+        Args:
+            llm: LangChain LLM (or wrapper exposing model_name / max_tokens)
+            **kwargs: Passed to PromptBudget
+
+        Returns:
+            PromptBudget for the LLM's model
+        """
+        model = getattr(llm, "model_name", None) or DEFAULT_MODEL
+        max_tokens = getattr(llm, "max_tokens", None)
+        if isinstance(max_tokens, int) and max_tokens > 0:
+            kwargs.setdefault("output_tokens", max_tokens)
+        return cls(model, **kwargs)
+
+    @property
+    def limit(self) -> int:
+        """Prompt tokens allowed in a single call."""
+        limit = self.context_tokens - self.output_tokens
+        if self.max_prompt_tokens:
+            limit = min(limit, self.max_prompt_tokens)
+        return limit
+
+    @property
+    def length_function(self) -> Callable[[str], int]:
+        """Token-counting length function for TextChunker."""
+        return self.counter.count
+
+    def decide(self, prompt: str, content: str) -> BudgetDecision:
+        """
+        Check a rendered prompt against the budget.
+
+        Args:
+            prompt: Fully rendered prompt
+            content: The user content embedded in the prompt
+
+        Returns:
+            BudgetDecision to send, split (with the chunk size in tokens) or reject
+        """
+        limit = self.limit
+        prompt_tokens = self.counter.count(prompt)
+        if prompt_tokens <= limit:
+            return BudgetDecision(BudgetDecision.SEND, prompt_tokens, limit)
+
+        content_tokens = self.counter.count(content)
+        chunk_tokens = limit - max(0, prompt_tokens - content_tokens) - CHUNK_MARGIN_TOKENS
+        if chunk_tokens < self.min_chunk_tokens:
+            return BudgetDecision(
+                BudgetDecision.REJECT, prompt_tokens, limit,
+                reason=f"Prompt needs {prompt_tokens} tokens but {self.model} allows {limit}, "
+                       f"and the instructions leave no room to split the text"
+            )
+
+        chunks = math.ceil(content_tokens / chunk_tokens)
+        if chunks > self.max_chunks:
+            return BudgetDecision(
+                BudgetDecision.REJECT, prompt_tokens, limit, chunks=chunks,
+                reason=f"Text is about {content_tokens} tokens and would need {chunks} calls "
+                       f"(limit {self.max_chunks}); select a shorter passage"
+            )
+        return BudgetDecision(
+            BudgetDecision.SPLIT, prompt_tokens, limit, chunk_tokens=chunk_tokens, chunks=chunks,
+            reason=f"Prompt needs {prompt_tokens} tokens but {self.model} allows {limit}; "
+                   f"splitting into ~{chunks} chunks"
+        )
+
+    def check(self, prompt: str, content: str) -> BudgetDecision:
+        """
+        Like decide, but raise on rejection.
+
+        Raises:
+            TokenBudgetError: If the prompt must be rejected
+        """
+        decision = self.decide(prompt, content)
+        if decision.action == BudgetDecision.REJECT:
+            raise TokenBudgetError(decision.reason)
+        return decision
+
+
+def estimate_request(text: str, budget: PromptBudget, command: Optional[str] = None,
+                     command_parser: Any = None, prompt_manager: Any = None) -> dict:
+    """
+    Estimate the tokens and calls one request would use, without calling the LLM.
+
+    Args:
+        text: Raw clipboard text (may contain a <#command>)
+        budget: Budget used for the decision
+        command: Optional command applied when the text has none
+        command_parser: CommandParser to reuse (default: a new one)
+        prompt_manager: PromptManager to reuse (default: a new one)
+
+    Returns:
+        Dictionary with the category, decision and token counts
+    """
+    from command_parser import CommandParser
+    from prompt_templates import PromptManager, categorize_command
+
+    command_parser = command_parser or CommandParser()
+    prompt_manager = prompt_manager or PromptManager()
+    content, parsed_command, has_command = command_parser.parse_clipboard_content(text)
+    if not has_command and command:
+        content, parsed_command, has_command = text, command, True
+
+    if has_command:
+        category = categorize_command(parsed_command)
+        prompt = prompt_manager.get_prompt_for_command(content, parsed_command)
+    else:
+        category = "default"
+        prompt = prompt_manager.get_default_prompt(content)
+
+    result = budget.decide(prompt, content).to_dict()
+    result["category"] = category
+    result["content_tokens"] = budget.counter.count(content)
+    return result
+
+
+def estimate_corpus(records: Iterable[Any], budget: PromptBudget, command: Optional[str] = None,
+                    on_record: Optional[Callable[[Any, dict], None]] = None) -> dict:
+    """
+    Dry-run a corpus: count prompt tokens and LLM calls without calling the LLM.
+
+    Args:
+        records: Iterable of BatchRecord (anything with record_id, text and command)
+        budget: Budget used for every decision
+        command: Command for records without their own
+        on_record: Optional callback receiving (record, estimate) per record
+
+    Returns:
+        Totals: records, prompt/content tokens, calls, sends/splits/rejects and
+        the largest prompt
+    """
+    from command_parser import CommandParser
+    from prompt_templates import PromptManager
+
+    command_parser = CommandParser()
+    prompt_manager = PromptManager()
+    totals = {
+        "model": budget.model,
+        "exact_counts": budget.counter.exact,
+        "limit": budget.limit,
+        "records": 0,
+        "prompt_tokens": 0,
+        "content_tokens": 0,
+        "calls": 0,
+        "send": 0,
+        "split": 0,
+        "reject": 0,
+        "max_prompt_tokens": 0,
+    }
+    for record in records:
+        estimate = estimate_request(record.text, budget, record.command or command,
+                                    command_parser, prompt_manager)
+        totals["records"] += 1
+        totals["prompt_tokens"] += estimate["prompt_tokens"]
+        totals["content_tokens"] += estimate["content_tokens"]
+        totals["calls"] += estimate["calls"]
+        totals[estimate["action"]] += 1
+        totals["max_prompt_tokens"] = max(totals["max_prompt_tokens"], estimate["prompt_tokens"])
+        if on_record is not None:
+            on_record(record, estimate)
+    return totals